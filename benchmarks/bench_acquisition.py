@@ -0,0 +1,110 @@
+"""Benchmark the frame-time jitter with in-process and process acquisition.
+
+Records a simulated 1200 Hz eye tracker with the samples converted to deg
+and published to the gaze feed, while a frame loop renders at 60 Hz (a
+busy loop of Python work and a wait for the next frame) and reads the
+newest gaze position every frame, with the latency and quality monitors
+and a gaze trigger running. The intervals between frames are reported for
+acquisition="thread" (the callback and the monitors share the GIL with the
+frame loop) and acquisition="process" (a dedicated process).
+
+Usage:
+    python benchmarks/bench_acquisition.py [duration_s] [rate_hz] [work_ms]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from psychopy_tobii_infant import TobiiController
+from psychopy_tobii_infant.discovery import EyeTrackerFinder
+from psychopy_tobii_infant.simulation import SimulatedEyeTracker
+
+FRAME_RATE = 60.0
+
+
+class Monitor:
+    name = "bench"
+
+    def getWidth(self):
+        return 53.0
+
+    def getDistance(self):
+        return 65.0
+
+    def getSizePix(self):
+        return [1920, 1080]
+
+
+class Window:
+    units = "deg"
+    size = np.array([1920, 1080])
+    monitor = Monitor()
+
+
+class HeadlessController(TobiiController):
+    """Record without PsychoPy."""
+    def _wait_for_eyetracker(self):
+        time.sleep(1)
+
+
+def render(work):
+    """Python work standing for drawing the stimuli of a frame."""
+    end = time.perf_counter() + work
+    x = 0
+    while time.perf_counter() < end:
+        x += sum(range(100))
+    return x
+
+
+def run(acquisition, duration, rate, work, filename):
+    et = SimulatedEyeTracker(frequency=rate, seed=0)
+    controller = HeadlessController(
+        Window(),
+        et.address,
+        filename,
+        finder=EyeTrackerFinder.from_eyetrackers(et),
+        acquisition=acquisition)
+    controller.start_gaze_feed()
+    controller.start_latency_monitor()
+    controller.start_quality_monitor()
+    controller.add_region_trigger((0, 0), (1, 1), once=False)
+    controller.start_recording()
+    period = 1.0 / FRAME_RATE
+    flips = []
+    next_flip = time.perf_counter() + period
+    for i in range(int(duration * FRAME_RATE)):
+        controller.get_current_gaze_position()
+        render(work)
+        # wait for the vertical blank
+        while time.perf_counter() < next_flip:
+            pass
+        flips.append(time.perf_counter())
+        next_flip += period
+        if next_flip < flips[-1]:
+            next_flip = flips[-1] + period
+    controller.stop_recording()
+    n = len(controller.gaze_data)
+    controller.close()
+    return np.diff(flips) * 1e3, n
+
+
+def main(duration=10, rate=1200, work_ms=10):
+    duration, rate, work = float(duration), float(rate), float(work_ms) / 1e3
+    filename = os.path.join(tempfile.mkdtemp(), "bench.tsv")
+    print("frame intervals (ms) at {:g} Hz with {:g} ms of work per frame, "
+          "{:g} Hz eye tracker:".format(FRAME_RATE, work * 1e3, rate))
+    print("{:<10}{:>8}{:>8}{:>8}{:>8}{:>8}{:>10}".format(
+        "mode", "mean", "sd", "p99", "max", "late", "samples"))
+    for acquisition in ("thread", "process"):
+        intervals, n = run(acquisition, duration, rate, work, filename)
+        late = (intervals > 1.5e3 / FRAME_RATE).sum()
+        print("{:<10}{:>8.2f}{:>8.3f}{:>8.2f}{:>8.2f}{:>8}{:>10}".format(
+            acquisition, intervals.mean(), intervals.std(),
+            np.percentile(intervals, 99), intervals.max(), late, n))
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,84 @@
+"""Benchmark the compressed output against plain text.
+
+Writes one session of simulated 1200 Hz gaze data in the format of
+TobiiController through DataFile with each compression, then reads it back
+with read_recording.
+
+Usage:
+    python benchmarks/bench_compression.py [seconds]
+"""
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from psychopy_tobii_infant.output import DataFile
+from psychopy_tobii_infant.reader import read_recording
+
+HEADER = ("TimeStamp\tGazePointXLeft\tGazePointYLeft\tValidityLeft\t"
+          "GazePointXRight\tGazePointYRight\tValidityRight\tGazePointX\t"
+          "GazePointY\tPupilSizeLeft\tPupilValidityLeft\tPupilSizeRight\t"
+          "PupilValidityRight\tPupilSize\n")
+
+
+def make_rows(seconds, rate=1200, seed=0):
+    rng = np.random.RandomState(seed)
+    n = int(seconds * rate)
+    t = np.round(np.arange(n) * 1000.0 / rate, 1)
+    xy = np.cumsum(rng.normal(0, 0.002, (n, 4)), axis=0).round(4)
+    valid = (rng.random_sample(n) > 0.05).astype(int)
+    pupil = (3.5 + rng.normal(0, 0.05, (n, 2))).round(4)
+    rows = []
+    for i in range(n):
+        rows.append("\t".join(
+            str(x) for x in (t[i], xy[i, 0], xy[i, 1], valid[i], xy[i, 2],
+                             xy[i, 3], valid[i], xy[i, 0], xy[i, 1],
+                             pupil[i, 0], valid[i], pupil[i, 1], valid[i],
+                             pupil[i].mean().round(4))) + "\n")
+    return rows
+
+
+def bench(rows, compression, directory):
+    filename = os.path.join(directory, "bench-{}.tsv".format(compression))
+    start = time.perf_counter()
+    datafile = DataFile(filename, "w", compression)
+    datafile.write("Session Start\n" + HEADER)
+    for row in rows:
+        datafile.write(row)
+    datafile.write("Session End\n")
+    datafile.commit()
+    datafile.close()
+    write_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    recording = read_recording(filename)
+    read_time = time.perf_counter() - start
+    assert len(recording.sessions[0]) == len(rows)
+    return os.path.getsize(filename), write_time, read_time
+
+
+def main(seconds=60):
+    rows = make_rows(seconds)
+    print("{} s of 1200 Hz data ({} samples)".format(seconds, len(rows)))
+    print("{:<8}{:>12}{:>10}{:>12}{:>12}".format("", "size (MB)", "ratio",
+                                                 "write (s)", "read (s)"))
+    compressions = [None, "gzip"]
+    try:
+        import zstandard  # noqa: F401
+        compressions.append("zstd")
+    except ImportError:
+        pass
+    with tempfile.TemporaryDirectory() as directory:
+        plain = None
+        for compression in compressions:
+            size, write_time, read_time = bench(rows, compression, directory)
+            plain = plain or size
+            print("{:<8}{:>12.2f}{:>10.2f}{:>12.3f}{:>12.3f}".format(
+                str(compression), size / 1e6, plain / size, write_time,
+                read_time))
+
+
+if __name__ == "__main__":
+    main(*(float(x) for x in sys.argv[1:]))
@@ -0,0 +1,74 @@
+"""Benchmark finding the eye tracker with and without the discovery cache.
+
+Uses a simulated backend whose discovery and connection take the given
+times, and reports how long EyeTrackerFinder.find() blocks the start of the
+experiment in each case. With a real eye tracker, pass "real" to use
+tobii_research instead (the cache is written to a temporary folder).
+
+Usage:
+    python benchmarks/bench_discovery.py [discovery (s)] [connect (s)]
+    python benchmarks/bench_discovery.py real [serial number]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from psychopy_tobii_infant.discovery import EyeTrackerFinder
+from psychopy_tobii_infant.simulation import SimulatedEyeTracker
+
+
+def simulated_backend(discovery_time, connect_time):
+    def connect(address):
+        time.sleep(connect_time)
+        return SimulatedEyeTracker(address=address, serial_number="SIM-0001")
+
+    def discover():
+        time.sleep(discovery_time)
+        return [SimulatedEyeTracker(address="tobii-prp://SIM-0001",
+                                    serial_number="SIM-0001")]
+
+    return discover, connect
+
+
+def measure(name, finder, id, setup_time=0.0):
+    start = time.perf_counter()
+    if setup_time:
+        finder.prefetch()
+        # e.g. opening the window and loading the stimuli
+        time.sleep(setup_time)
+    blocked = time.perf_counter()
+    finder.find(id)
+    end = time.perf_counter()
+    cache = finder.timings.get("cache", "")
+    print("{:<36}{:>10.3f}{:>10.3f}  {}".format(name, end - blocked,
+                                                end - start, cache))
+
+
+def main(*args):
+    if args and args[0] == "real":
+        discover = connect = None
+        serial_number = args[1] if len(args) > 1 else None
+    else:
+        discover, connect = simulated_backend(
+            *(float(x) for x in (list(args) + [2.0, 0.05][len(args):])))
+        serial_number = "SIM-0001"
+    with tempfile.TemporaryDirectory() as directory:
+        cache_file = os.path.join(directory, "eyetrackers.json")
+
+        def make_finder():
+            return EyeTrackerFinder(discover, connect, cache_file)
+
+        print("{:<36}{:>10}{:>10}".format("", "find (s)", "total (s)"))
+        measure("index, discovery", make_finder(), 0)
+        address = make_finder().find(0).address
+        serial_number = serial_number or make_finder().find(0).serial_number
+        measure("index, prefetch during 1 s setup", make_finder(), 0, 1.0)
+        os.remove(cache_file)
+        measure("serial number, no cache", make_finder(), serial_number)
+        measure("serial number, cache", make_finder(), serial_number)
+        measure("address", make_finder(), address)
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
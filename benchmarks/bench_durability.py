@@ -0,0 +1,66 @@
+"""Benchmark the durability policies of the data file.
+
+Writes trials of simulated 1200 Hz gaze data in the format of
+TobiiController, with a commit point at the end of each trial as in
+stop_recording, and reports the time the experiment is blocked by the
+commits and the fsync statistics of each policy. Run it in the data folder
+of the lab (e.g. a network drive) to choose a policy.
+
+Usage:
+    python benchmarks/bench_durability.py [directory] [trials] [seconds]
+"""
+import os
+import sys
+import tempfile
+import time
+
+from psychopy_tobii_infant.durability import (SyncAlways, SyncInBackground,
+                                              SyncOnClose, SyncPeriodic)
+from psychopy_tobii_infant.output import DataFile
+
+from bench_compression import HEADER, make_rows
+
+POLICIES = [
+    ("always", SyncAlways),
+    ("periodic", lambda: SyncPeriodic(nbytes=4 * 1048576, interval=10.0)),
+    ("on close", SyncOnClose),
+    ("background", SyncInBackground),
+]
+
+
+def bench(rows, policy, directory, trials):
+    filename = os.path.join(directory, "bench-durability.tsv")
+    datafile = DataFile(filename, "w", durability=policy)
+    blocked = []
+    for _ in range(trials):
+        datafile.write("Session Start\n" + HEADER)
+        datafile.write("".join(rows))
+        datafile.write("Session End\n")
+        start = time.perf_counter()
+        datafile.commit()
+        blocked.append(time.perf_counter() - start)
+    start = time.perf_counter()
+    datafile.close()
+    close_time = time.perf_counter() - start
+    os.remove(filename)
+    return max(blocked) * 1000, sum(blocked) * 1000, close_time * 1000
+
+
+def main(directory=None, trials=20, seconds=10):
+    rows = make_rows(float(seconds))
+    print("{} trials of {} s of 1200 Hz data".format(int(trials), seconds))
+    print("{:<12}{:>14}{:>14}{:>12}{:>8}{:>12}".format(
+        "", "max commit", "total commit", "close", "fsync", "fsync p95"))
+    with tempfile.TemporaryDirectory(dir=directory or None) as tmp:
+        for name, make_policy in POLICIES:
+            policy = make_policy()
+            max_commit, total_commit, close_time = bench(
+                rows, policy, tmp, int(trials))
+            summary = policy.summary()
+            print("{:<12}{:>11.1f} ms{:>11.1f} ms{:>9.1f} ms{:>8}{:>9.1f} ms".
+                  format(name, max_commit, total_commit, close_time,
+                         summary["n"], summary["p95"]))
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:2], *(float(x) for x in sys.argv[2:]))
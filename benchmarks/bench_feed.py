@@ -0,0 +1,62 @@
+"""Benchmark the latency of the shared memory gaze feed.
+
+Publishes samples at the rate of the eye tracker and reads them in another
+process polling the feed, and reports the latency from publishing to
+reading, and the time of a publish.
+
+Usage:
+    python benchmarks/bench_feed.py [duration_s] [rate_hz] [poll_ms]
+"""
+import multiprocessing
+import sys
+import time
+
+import numpy as np
+
+from psychopy_tobii_infant.feed import FIELDS, GazeFeed, GazeFeedReader
+
+
+def consume(name, n, poll, queue):
+    reader = GazeFeedReader(name, start="oldest")
+    received = 0
+    while received < n:
+        received += len(reader.read())
+        if poll:
+            time.sleep(poll)
+    queue.put((reader.latency.summary(), reader.dropped))
+    reader.close()
+
+
+def main(duration=5, rate=1200, poll_ms=1):
+    duration, rate, poll = float(duration), float(rate), float(poll_ms) / 1e3
+    n = int(duration * rate)
+    feed = GazeFeed()
+    queue = multiprocessing.Queue()
+    process = multiprocessing.Process(target=consume,
+                                      args=(feed.name, n, poll, queue))
+    process.start()
+    values = np.zeros(len(FIELDS))
+    publish = []
+    start = time.perf_counter()
+    for i in range(n):
+        delay = start + i / rate - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+        t = time.perf_counter()
+        values[2] = t * 1e6
+        feed.publish(values)
+        publish.append(time.perf_counter() - t)
+    latency, dropped = queue.get()
+    process.join()
+    feed.close()
+    publish = np.array(publish) * 1e6
+    print("publish: mean {:.1f} us, max {:.1f} us".format(
+        publish.mean(), publish.max()))
+    print("latency ({} samples, polling every {} ms, {} dropped):".format(
+        latency["n"], poll_ms, dropped))
+    print("  mean {mean:.3f} ms, p50 {p50:.1f} ms, p95 {p95:.1f} ms, "
+          "p99 {p99:.1f} ms, max {max:.3f} ms".format(**latency))
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
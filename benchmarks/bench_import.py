@@ -0,0 +1,52 @@
+"""Benchmark the import time of psychopy_tobii_infant.
+
+Imports the package in fresh interpreters with `python -X importtime` and
+reports the cumulative import time of the package and of its largest
+dependencies. tobii_research, psychopy and PIL should not appear: they are
+imported when a controller or visual routine first needs them. Neither
+should multiprocessing and concurrent.futures, which are only needed by the
+acquisition process and the parallel heatmaps.
+
+Usage:
+    python benchmarks/bench_import.py [runs]
+"""
+import subprocess
+import sys
+
+
+def import_times():
+    """Import the package once and parse the output of -X importtime."""
+    command = [sys.executable, "-X", "importtime", "-c"]
+    command.append("import psychopy_tobii_infant")
+    output = subprocess.run(command, stderr=subprocess.PIPE,
+                            check=True).stderr.decode()
+    times = {}
+    for line in output.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        _, cumulative, name = line.split("|")
+        try:
+            times[name.strip()] = int(cumulative) / 1000.0
+        except ValueError:
+            # the header line
+            continue
+    return times
+
+
+def main(runs=5):
+    runs = [import_times() for _ in range(int(runs))]
+    best = {name: min(x[name] for x in runs) for name in runs[0]}
+    top = [name for name in best if "." not in name]
+    top.sort(key=best.get, reverse=True)
+    print("best of {} runs (cumulative, ms)".format(len(runs)))
+    for name in top[:8]:
+        print("{:<30}{:>10.1f}".format(name, best[name]))
+    heavy = [x for x in best if x.split(".")[0] in
+             ("tobii_research", "psychopy", "PIL")]
+    print("heavy modules imported: {}".format(", ".join(heavy) or "none"))
+    slow = [x for x in best if x in ("multiprocessing", "concurrent.futures")]
+    print("slow modules imported: {}".format(", ".join(slow) or "none"))
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
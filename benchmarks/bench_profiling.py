@@ -0,0 +1,53 @@
+"""Benchmark the cost of the profiling spans of the controller.
+
+Times a method decorated with profiled() and a with-block span, with the
+profiler disabled (the default of the controllers) and enabled, against
+the undecorated method.
+
+Usage:
+    python benchmarks/bench_profiling.py [n_calls]
+"""
+import sys
+import timeit
+
+from psychopy_tobii_infant.profiling import DISABLED, Profiler, profiled
+
+
+class Controller:
+    profiler = DISABLED
+
+    def plain(self, x):
+        return x
+
+    @profiled("decorated")
+    def decorated(self, x):
+        return x
+
+    def block(self, x):
+        with self.profiler.span("block"):
+            return x
+
+
+def per_call(stmt, n):
+    """The best time of a call in nanoseconds."""
+    return min(timeit.repeat(stmt, number=n, repeat=5)) / n * 1e9
+
+
+def main(n=200000):
+    n = int(n)
+    controller = Controller()
+    print("ns per call ({} calls)".format(n))
+    print("{:<12}{:>10.0f}".format("plain", per_call(
+        lambda: controller.plain(1), n)))
+    for state in ("disabled", "enabled"):
+        if state == "enabled":
+            controller.profiler = Profiler(capacity=2 * 5 * n + 10)
+        for name in ("decorated", "block"):
+            method = getattr(controller, name)
+            print("{:<12}{:>10.0f}  ({})".format(
+                name, per_call(lambda: method(1), n), state))
+    print("dropped spans: {}".format(controller.profiler.dropped))
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,57 @@
+"""Benchmark the pupil preprocessing.
+
+Processes a simulated session of pupil sizes at once (offline) and in
+batches of the size delivered between two frames (real time), and checks
+that the results are identical.
+
+Usage:
+    python benchmarks/bench_pupil.py [duration_s] [rate_hz]
+"""
+import sys
+import time
+
+import numpy as np
+
+from psychopy_tobii_infant.pupil import PupilPipeline
+
+
+def main(duration=600, rate=1200):
+    duration, rate = float(duration), float(rate)
+    n = int(duration * rate)
+    rng = np.random.default_rng(0)
+    t = np.arange(n) / rate
+    size = 3.5 + 0.3 * np.sin(t) + rng.normal(0, 0.002, n)
+    size[rng.random(n) < 0.01] = np.nan
+    onsets = np.arange(5.0, duration, 10.0)
+
+    pipeline = PupilPipeline()
+    for onset in onsets:
+        pipeline.start_trial(onset)
+    start = time.perf_counter()
+    batch = pipeline.process(t, size + 0.05, size - 0.05)
+    elapsed = time.perf_counter() - start
+    print("offline: {} samples in {:.1f} ms".format(n, elapsed * 1e3))
+
+    pipeline = PupilPipeline()
+    for onset in onsets:
+        pipeline.start_trial(onset)
+    step = int(round(rate / 60))
+    times = []
+    outputs = []
+    for i in range(0, n, step):
+        start = time.perf_counter()
+        outputs.append(
+            pipeline.process(t[i:i + step], size[i:i + step] + 0.05,
+                             size[i:i + step] - 0.05))
+        times.append(time.perf_counter() - start)
+    times = np.array(times) * 1e6
+    print("real time: {} samples per frame, mean {:.0f} us, max {:.0f} us".
+          format(step, times.mean(), times.max()))
+    stream = np.concatenate(outputs)
+    print("identical: {}".format(
+        np.array_equal(stream["corrected"], batch["corrected"],
+                       equal_nan=True)))
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
@@ -0,0 +1,59 @@
+"""Benchmark the conversions of the monitor units.
+
+Converts arrays of gaze positions from pixels to degFlat and back with the
+cached coefficients of UnitConverter, and a single point with the
+coefficients checked at each call, as the controller does.
+
+Usage:
+    python benchmarks/bench_units.py [n_samples]
+"""
+import sys
+import timeit
+
+import numpy as np
+
+from psychopy_tobii_infant.units import UnitConverter
+
+
+class Monitor:
+    name = "bench"
+
+    def getWidth(self):
+        return 53.0
+
+    def getDistance(self):
+        return 65.0
+
+    def getSizePix(self):
+        return [1920, 1080]
+
+
+class Window:
+    monitor = Monitor()
+
+
+def best(stmt, number):
+    """The best time of a call in microseconds."""
+    return min(timeit.repeat(stmt, number=number, repeat=5)) / number * 1e6
+
+
+def main(n=100000):
+    n = int(n)
+    converter = UnitConverter(Window())
+    rng = np.random.default_rng(0)
+    x, y = rng.uniform(-960, 960, size=(2, n))
+    deg = converter.from_pix(x, y, "degFlat")
+    print("us per call")
+    print("{:<24}{:>10.1f}".format(
+        "pix -> degFlat ({})".format(n),
+        best(lambda: converter.from_pix(x, y, "degFlat"), 10)))
+    print("{:<24}{:>10.1f}".format(
+        "degFlat -> pix ({})".format(n),
+        best(lambda: converter.to_pix(deg[0], deg[1], "degFlat"), 10)))
+    print("{:<24}{:>10.1f}".format(
+        "pix -> degFlat (1)",
+        best(lambda: converter.from_pix(100.0, 50.0, "degFlat"), 10000)))
+
+
+if __name__ == "__main__":
+    main(*sys.argv[1:])
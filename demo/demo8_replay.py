@@ -0,0 +1,40 @@
+import sys
+
+from psychopy import core, visual
+
+from psychopy_tobii_infant import (EyeTrackerFinder, ReplayEyeTracker,
+                                   TobiiInfantController)
+
+###############################################################################
+# Constants
+# the data file recorded by demo2 (or a .npz file saved by save_raw)
+RECORDING = sys.argv[1] if len(sys.argv) > 1 else 'demo2-test.tsv'
+
+###############################################################################
+# Demo
+# replay the last session of the recording in real time (speed=1). Use a
+# larger speed or speed=None to run faster, e.g. in regression tests of
+# routines that do not depend on the frame rate.
+eyetracker = ReplayEyeTracker.from_file(RECORDING, speed=1)
+
+win = visual.Window(size=[1280, 1024],
+                    units='pix',
+                    fullscr=False,
+                    allowGUI=False)
+
+# the controller receives the replayed samples as if they came from the
+# eyetracker (calibration is not available)
+controller = TobiiInfantController(
+    win, finder=EyeTrackerFinder.from_eyetrackers(eyetracker))
+
+controller.start_recording('demo8-replay.tsv')
+for trial in range(2):
+    win.callOnFlip(controller.record_event, event='stim_onset')
+    lt = controller.collect_lt(10, 2)
+    win.callOnFlip(controller.record_event, event='stim_offset')
+    print('Looking time in trial {}: {}'.format(trial, lt))
+controller.stop_recording()
+controller.close()
+
+win.close()
+core.quit()
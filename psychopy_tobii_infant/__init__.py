@@ -1,27 +1,64 @@
 import atexit
-import os
+import time
+from contextlib import contextmanager
 from datetime import datetime
+from math import ceil
 
 import numpy as np
-import tobii_research as tr
-from PIL import Image, ImageDraw
-from psychopy import core, event, visual
-from psychopy.tools.monitorunittools import cm2pix, deg2pix, pix2cm, pix2deg
-
-_has_addons = True
-# yapf: disable
-try:
-    from tobii_research_addons import (
-        ScreenBasedCalibrationValidation, Point2)
-    from math import ceil
-except ModuleNotFoundError:
-    try:
-        from .tobii_research_addons import (
-            ScreenBasedCalibrationValidation, Point2)
-        from math import ceil
-    except ModuleNotFoundError:
-        _has_addons = False
-# yapf: enable
+
+from .acquisition import (ACQUISITION_FIELDS, AcquisitionProcess,
+                          FeedSamples, RemoteLatencyMonitor,
+                          RemoteQualityMonitor, RemoteTriggerEngine,
+                          WindowGeometry, sample_values, serve)
+from .audio import AudioPool
+from .buffer import ChunkedBuffer, SampleStore
+from .discovery import (EyeTrackerFinder, get_default_finder,
+                        prefetch_eyetrackers)
+from .durability import (DurabilityPolicy, SyncAlways, SyncInBackground,
+                         SyncOnClose, SyncPeriodic)
+from .feed import GazeFeed, GazeFeedReader, feed_clock
+from .filters import (GazeFilter, GazeFilterPipeline, MedianFilter,
+                      MovingAverage, OneEuroFilter, VelocityHold)
+from .habituation import HabituationCriterion, HabituationRunner
+from .heatmap import HeatmapBuilder, split_trials
+from .index import SessionIndex
+from .latency import LatencyMonitor
+from .looking import LookingTimeScorer
+from .lazy import LazyModule, is_available, lazy_function
+from .output import DataFile
+from .profiling import DISABLED, Profiler, profiled
+from .pupil import PupilPipeline, gaze_data_columns
+from .quality import DataQualityMonitor, QualityOverlay
+from .reader import read_recording, read_session, verify_recording
+from .schema import Column, OutputSchema, extract
+from .replay import (ReplayEyeTracker, load_raw, save_raw,
+                     session_to_gaze_data)
+from .simulation import (SimulatedEyeTracker, get_subscription,
+                         get_system_time_stamp)
+from .streams import StreamRecorder
+from .trials import END_EVENT, START_EVENT, Trial, TrialIndex
+from .triggers import (DwellTrigger, GazeTrigger, GazeTriggerEngine,
+                       PredicateTrigger, Region, RegionTrigger)
+from .units import UnitConverter
+from .validation import (ValidationEngine, ValidationPointResult,
+                         ValidationResult)
+from .video import FrameBuffer, VideoStim
+
+# the hardware and visual dependencies are imported when first used
+tr = LazyModule("tobii_research")
+core = LazyModule("psychopy.core")
+event = LazyModule("psychopy.event")
+visual = LazyModule("psychopy.visual")
+monitorunittools = LazyModule("psychopy.tools.monitorunittools")
+cm2pix, deg2pix, pix2cm, pix2deg = (
+    lazy_function(monitorunittools, name)
+    for name in ("cm2pix", "deg2pix", "pix2cm", "pix2deg"))
+Image = LazyModule("PIL.Image")
+ImageDraw = LazyModule("PIL.ImageDraw")
+# the installed tobii_research_addons or the bundled copy
+addons = LazyModule("tobii_research_addons",
+                    ".tobii_research_addons",
+                    package=__name__)
 __version__ = "0.8.0"
 
 
@@ -81,11 +118,24 @@ class TobiiController:
 
     Args:
         win: psychopy.visual.Window object.
-        id: the id of eyetracker. Default is 0 (use the first found eye
-            tracker).
+        id: the id of eyetracker: its index in the found eye trackers, its
+            serial number (e.g. "TPNA1-030109123456") or its address (e.g.
+            "tobii-prp://TPNA1-030109123456"). An address connects without
+            discovery and a serial number uses the cached discovery results.
+            Default is 0 (use the first found eye tracker).
         filename: the name of the data file.
+        finder: EyeTrackerFinder object used to find the eye tracker. If
+            None, the default finder is used (see prefetch_eyetrackers).
+            Default is None.
+        acquisition: where the gaze data are acquired and written: "thread"
+            (the callback of the Tobii SDK in this process) or "process" (a
+            dedicated process started now, see AcquisitionProcess). The
+            process connects to the eye tracker by its address, or gets a
+            copy of a SimulatedEyeTracker. Default is "thread".
 
     Attributes:
+        connection_timings: the time spent finding the eye tracker. See
+            EyeTrackerFinder.timings.
         shrink_speed: the shrinking speed of target in calibration.
             Default is 1.5.
         calibration_dot_size: the size of the central dot in the
@@ -105,6 +155,25 @@ class TobiiController:
             update accordingly (my bad), be cautious!
         update_calibration: the presentation of calibration target.
             Default is auto calibration.
+        validation_engine: the computation of the validation results:
+            "native" (ValidationEngine) or "addons" (tobii_research_addons).
+            Default is "native".
+        looking_times: the results of collect_lt in the current recording,
+            dicts with the system timestamp of the start of the trial
+            ("start"), the parameters and the looking time ("lt").
+        gaze_data: the samples of the current recording (a SampleStore,
+            appended by the callback of the Tobii SDK), or of the last
+            recording after stop_recording (a read-only SampleView).
+        trials: the trials of the current or the last recording
+            (TrialIndex), started and ended by start_trial and end_trial or
+            the trial context.
+        acquisition: AcquisitionProcess with acquisition="process", or None.
+            The gaze data are then FeedSamples: during recording, the latest
+            acquisition_capacity samples; after stop_recording, all the
+            samples of the recording, readable until close(). Gaze
+            triggers and the latency and quality monitors run in the
+            acquisition process, which sends back only the firings of the
+            triggers and the summaries of the monitors.
     """
     _default_numkey_dict = {
         "0": -1,
@@ -153,11 +222,39 @@ class TobiiController:
     calibration_target_min = 0.2
     update_calibration = None
     update_validation = None
+    validation_engine = "native"
     recording = False
     datafile = None
+    session_index = None
+    compression = None
+    durability = None
+    output_schema = OutputSchema()
+    _flush_chunk_size = 10000
     validation_result_buffers = None
-
-    def __init__(self, win, id=0, filename="gaze_TOBII_output.tsv"):
+    # the latency of the calibration sounds, written in the header of the
+    # next session
+    audio_latency_header = None
+    quality_monitor = None
+    trigger_engine = None
+    latency_monitor = None
+    stream_recorders = {}
+    gaze_filter = None
+    pupil_pipeline = None
+    gaze_feed = None
+    profiler = DISABLED
+    _unit_converter = None
+    acquisition = None
+    acquisition_capacity = 131072
+
+    def __init__(self,
+                 win,
+                 id=0,
+                 filename="gaze_TOBII_output.tsv",
+                 finder=None,
+                 acquisition="thread"):
+        if acquisition not in ("thread", "process"):
+            raise ValueError(
+                "acquisition ({}) is not supported.".format(acquisition))
         self.eyetracker_id = id
         self.win = win
         self.filename = filename
@@ -168,25 +265,34 @@ class TobiiController:
         self.calibration_disc_size = self._default_calibration_disc_size[
             self.win.units]
 
-        eyetrackers = tr.find_all_eyetrackers()
-
-        if len(eyetrackers) == 0:
-            raise RuntimeError("No Tobii eyetrackers detected.")
-
-        try:
-            self.eyetracker = eyetrackers[self.eyetracker_id]
-        except IndexError:
-            raise ValueError(
-                "Invalid eyetracker ID {}\n({} eyetrackers found)".format(
-                    self.eyetracker_id, len(eyetrackers)))
+        if finder is None:
+            finder = get_default_finder()
+        self.eyetracker = finder.find(self.eyetracker_id)
+        self.connection_timings = dict(finder.timings)
 
-        self.calibration = tr.ScreenBasedCalibration(self.eyetracker)
+        if isinstance(self.eyetracker, SimulatedEyeTracker):
+            # calibration is not supported without the hardware
+            self.calibration = None
+        else:
+            self.calibration = tr.ScreenBasedCalibration(self.eyetracker)
         self.update_calibration = self._update_calibration_auto
-        if _has_addons:
-            self.update_validation = self._update_validation_auto
-        self.gaze_data = []
+        self.update_validation = self._update_validation_auto
+        self._samples = SampleStore()
+        self.gaze_data = self._samples
+        self.trials = TrialIndex(self._samples)
+        self.looking_times = []
+        if acquisition == "process":
+            if isinstance(self.eyetracker, SimulatedEyeTracker):
+                eyetracker = self.eyetracker
+            else:
+                eyetracker = self.eyetracker.address
+            self.acquisition = AcquisitionProcess(
+                _run_acquisition, WindowGeometry.from_window(self.win),
+                eyetracker, self.acquisition_capacity)
+            self.acquisition.start()
         atexit.register(self.close)
 
+    @profiled("_on_gaze_data")
     def _on_gaze_data(self, gaze_data):
         """Callback function used by Tobii SDK.
 
@@ -196,8 +302,30 @@ class TobiiController:
         Returns:
             None
         """
-        self.gaze_data.append(gaze_data)
+        if self.latency_monitor is not None:
+            self.latency_monitor.on_sample(gaze_data, get_system_time_stamp())
+        self._samples.append(gaze_data)
+        feed = self.gaze_feed
+        if feed is not None:
+            self._publish_gaze_data(feed, gaze_data)
+        if self.quality_monitor is not None:
+            self.quality_monitor.update(gaze_data)
+        if self.trigger_engine is not None:
+            self.trigger_engine.process(gaze_data)
+
+    def _on_user_position_data(self, user_position_data):
+        """Callback function used by Tobii SDK in show_status.
+
+        Args:
+            user_position_data: user position guide provided by the eye
+                tracker.
 
+        Returns:
+            None
+        """
+        self._samples.append(user_position_data)
+
+    @profiled("_get_psychopy_pos")
     def _get_psychopy_pos(self, p, units=None):
         """Convert Tobii ADCS coordinates to PsychoPy coordinates.
 
@@ -220,18 +348,12 @@ class TobiiController:
             p_pix = self._tobii2pix(p)
             if units == "pix":
                 return p_pix
-            elif units == "cm":
-                return tuple(pix2cm(pos, self.win.monitor) for pos in p_pix)
-            elif units == "deg":
-                tuple(pix2deg(pos, self.win.monitor) for pos in p_pix)
-            else:
-                return tuple(
-                    pix2deg(np.array(p_pix),
-                            self.win.monitor,
-                            correctFlat=True))
+            return self._get_unit_converter().from_pix(
+                p_pix[0], p_pix[1], units)
         else:
             raise ValueError("unit ({}) is not supported.".format(units))
 
+    @profiled("_get_tobii_pos")
     def _get_tobii_pos(self, p, units=None):
         """Convert PsychoPy coordinates to Tobii ADCS coordinates.
 
@@ -253,23 +375,28 @@ class TobiiController:
         elif units == "pix":
             return self._pix2tobii(p)
         elif units in ["cm", "deg", "degFlat", "degFlatPos"]:
-            if units == "cm":
-                p_pix = (cm2pix(p[0], self.win.monitor),
-                         cm2pix(p[1], self.win.monitor))
-            elif units == "deg":
-                p_pix = (
-                    deg2pix(p[0], self.win.monitor),
-                    deg2pix(p[1], self.win.monitor),
-                )
-            elif units in ["degFlat", "degFlatPos"]:
-                p_pix = deg2pix(np.array(p),
-                                self.win.monitor,
-                                correctFlat=True)
+            p_pix = self._get_unit_converter().to_pix(p[0], p[1], units)
             p_pix = tuple(round(pos, 0) for pos in p_pix)
             return self._pix2tobii(p_pix)
         else:
             raise ValueError("unit ({}) is not supported".format(units))
 
+    def _get_unit_converter(self):
+        """Get the conversions of the units of the monitor of the window.
+
+            The converter is created again if the window is replaced.
+
+        Args:
+            None
+
+        Returns:
+            UnitConverter object.
+        """
+        converter = self._unit_converter
+        if converter is None or converter.win is not self.win:
+            converter = self._unit_converter = UnitConverter(self.win)
+        return converter
+
     def _pix2tobii(self, p):
         """Convert PsychoPy pixel coordinates to Tobii ADCS.
 
@@ -293,11 +420,16 @@ class TobiiController:
 
         Returns:
             Gaze position in PsychoPy pixels coordinate system. For example:
-            (0, 0).
+            (0, 0). Arrays of positions give arrays.
         """
-        return (round(self.win.size[0] * (p[0] - 0.5),
-                      0), round(-self.win.size[1] * (p[1] - 0.5), 0))
-
+        x = self.win.size[0] * (p[0] - 0.5)
+        y = -self.win.size[1] * (p[1] - 0.5)
+        if np.ndim(x) or np.ndim(y):
+            # the data file converts all samples at once
+            return (np.round(x), np.round(y))
+        return (round(x, 0), round(y, 0))
+
+    @profiled("_get_psychopy_pos_from_trackbox")
     def _get_psychopy_pos_from_trackbox(self, p, units=None):
         """Convert Tobii TBCS coordinates to PsychoPy coordinates.
 
@@ -325,82 +457,41 @@ class TobiiController:
             )
             if units == "pix":
                 return p_pix
-            elif units == "cm":
-                return tuple(pix2cm(pos, self.win.monitor) for pos in p_pix)
-            elif units == "deg":
-                return tuple(pix2deg(pos, self.win.monitor) for pos in p_pix)
-            else:
-                return tuple(
-                    pix2deg(np.array(p_pix),
-                            self.win.monitor,
-                            correctFlat=True))
+            return self._get_unit_converter().from_pix(
+                p_pix[0], p_pix[1], units)
         else:
             raise ValueError("unit ({}) is not supported.".format(units))
 
+    @profiled("_flush_to_file")
     def _flush_to_file(self):
         """Write data to disk.
 
+            The data are flushed to the operating system; whether they are
+            synced to the disk is decided by the durability policy.
+
         Args:
             None
 
         Returns:
             None
         """
-        self.datafile.flush()  # internal buffer to RAM
-        os.fsync(self.datafile.fileno())  # RAM file cache to disk
+        self.datafile.commit()
 
-    def _convert_tobii_record(self, record):
+    @profiled("_convert_tobii_records")
+    def _convert_tobii_records(self, records):
         """Convert tobii coordinates to output style.
 
         Args:
-            record: raw gaze data
+            records: list of raw gaze data
 
         Returns:
-            reformed gaze data
+            str: the rows of the data file in the format of output_schema.
         """
-        lp = self._get_psychopy_pos(record["left_gaze_point_on_display_area"])
-        rp = self._get_psychopy_pos(record["right_gaze_point_on_display_area"])
-
-        # gaze
-        if not (record["left_gaze_point_validity"]
-                or record["right_gaze_point_validity"]):  # not detected
-            ave = (np.nan, np.nan)
-        elif not record["left_gaze_point_validity"]:
-            ave = rp  # use right eye
-        elif not record["right_gaze_point_validity"]:
-            ave = lp  # use left eye
-        else:
-            ave = ((lp[0] + rp[0]) / 2.0, (lp[1] + rp[1]) / 2.0)
-
-        # pupil
-        if not (record["left_pupil_validity"]
-                or record["right_pupil_validity"]):  # not detected
-            pup = np.nan
-        elif not record["left_pupil_validity"]:
-            pup = record["right_pupil_diameter"]  # use right pupil
-        elif not record["right_pupil_validity"]:
-            pup = record["left_pupil_diameter"]  # use left pupil
-        else:
-            pup = (record["left_pupil_diameter"] +
-                   record["right_pupil_diameter"]) / 2.0
-        out = (
-            round((record["system_time_stamp"] - self.t0) / 1000.0, 1),
-            round(lp[0], 4),
-            round(lp[1], 4),
-            int(record["left_gaze_point_validity"]),
-            round(rp[0], 4),
-            round(rp[1], 4),
-            int(record["right_gaze_point_validity"]),
-            round(ave[0], 4),
-            round(ave[1], 4),
-            round(record["left_pupil_diameter"], 4),
-            int(record["left_pupil_validity"]),
-            round(record["right_pupil_diameter"], 4),
-            int(record["right_pupil_validity"]),
-            round(pup, 4))  # yapf: disable
-        out = (str(x) for x in out)
-        return out
+        values = extract(records, self.output_schema.fields,
+                         self._get_psychopy_pos, self.t0)
+        return self.output_schema.format(values)
 
+    @profiled("_flush_data")
     def _flush_data(self):
         """Wrapper for writing the header and data to the data file.
 
@@ -419,36 +510,49 @@ class TobiiController:
                 "stop_recording() is called to prevent large latency in the "
                 "eye-tracking data.")
 
+        # start the session at a full flush point, so it can be read from
+        # its offset in the index
+        self.datafile.flush(full=True)
+        offset = self.datafile.tell()
         self.datafile.write("Session Start\n")
+        if self.latency_monitor is not None:
+            self.datafile.write(self.latency_monitor.format_header())
+        if self.audio_latency_header is not None:
+            self.datafile.write(self.audio_latency_header)
+            self.audio_latency_header = None
         # write header
-        self.datafile.write("\t".join([
-            "TimeStamp",
-            "GazePointXLeft",
-            "GazePointYLeft",
-            "ValidityLeft",
-            "GazePointXRight",
-            "GazePointYRight",
-            "ValidityRight",
-            "GazePointX",
-            "GazePointY",
-            "PupilSizeLeft",
-            "PupilValidityLeft",
-            "PupilSizeRight",
-            "PupilValidityRight",
-            "PupilSize"]) + "\n")  # yapf: disable
+        self.datafile.write(self.output_schema.header)
         self._flush_to_file()
 
-        for gaze_data in self.gaze_data:
-            output = self._convert_tobii_record(gaze_data)
-            self.datafile.write("\t".join(output))
-            self.datafile.write("\n")
+        for i in range(0, len(self.gaze_data), self._flush_chunk_size):
+            self.datafile.write(
+                self._convert_tobii_records(
+                    self.gaze_data[i:i + self._flush_chunk_size]))
         else:
             # write the events in the end of data
             for this_event in self.event_data:
                 self.datafile.write("{}\t{}\n".format(*this_event))
+        # the additional streams follow the events
+        for name, recorder in self.stream_recorders.items():
+            self.datafile.write("Stream Start\t{}\n".format(name))
+            self.datafile.write(
+                recorder.format_rows(self.t0, self.output_schema))
+            self.datafile.write("Stream End\t{}\n".format(name))
         self.datafile.write("Session End\n")
         self._flush_to_file()
 
+        first, last = (self.output_schema.convert_time(
+            self.gaze_data[i]["system_time_stamp"] - self.t0) for i in (0, -1))
+        self.session_index.append(
+            offset=offset,
+            end=self.datafile.tell(),
+            n_samples=len(self.gaze_data),
+            first=first,
+            last=last,
+            n_events=len(self.event_data),
+            trials=self.trials.to_dicts(lambda t: self.output_schema.
+                                        convert_time(t - self.t0).item()))
+
     def _collect_calibration_data(self, p):
         """Callback function used by Tobii calibration in run_calibration.
 
@@ -461,8 +565,11 @@ class TobiiController:
         self.calibration.collect_data(*self._get_tobii_pos(p))
 
     def _collect_validation_data(self, p):
-        """Callback function used by Tobii Pro SDK addons."""
-        self.validation.start_collecting_data(Point2(*self._get_tobii_pos(p)))
+        """Callback function used by the validation procedures."""
+        pos = self._get_tobii_pos(p)
+        if not isinstance(self.validation, ValidationEngine):
+            pos = addons.Point2(*pos)
+        self.validation.start_collecting_data(pos)
         # wait a bit for data collection
         while self.validation.is_collecting_data:
             core.wait(0.5, 0.0)
@@ -476,7 +583,11 @@ class TobiiController:
         Returns:
             None
         """
-        self.datafile = open(self.filename, "w")
+        self.datafile = DataFile(self.filename,
+                                 "w",
+                                 self.compression,
+                                 durability=self.durability)
+        self.session_index = SessionIndex(self.filename, self.compression)
         _write_buffer = "Recording date:\t{}\n".format(
             datetime.now().strftime("%Y/%m/%d"))
         _write_buffer += "Recording time:\t{}\n".format(
@@ -491,13 +602,37 @@ class TobiiController:
         self.datafile.write(_write_buffer)
         self._flush_to_file()
 
-    def start_recording(self, filename=None, newfile=True):
+    def start_recording(self,
+                        filename=None,
+                        newfile=True,
+                        streams=None,
+                        compression=None,
+                        schema=None,
+                        durability=None):
         """Start recording
 
         Args:
             filename: the name of the data file. If None, use default name.
                 Default is None.
             newfile: open a new file to save data. Default is True.
+            streams: list of additional streams to record along with the
+                gaze data: "external_signal" (TTL input), "time_sync" (time
+                synchronization data) and "eye_openness" (only supported by
+                some models). The streams are written after the events of
+                each session. Default is None.
+            compression: compress the new data file while writing: None,
+                "gzip" or "zstd" (requires the zstandard package). Use
+                read_recording() to read compressed files. Has no effects if
+                newfile is False. Default is None.
+            schema: OutputSchema object defining the columns of the gaze
+                data, their precision and the representation of the
+                timestamps. If None, the previous schema is kept (the 14
+                default columns initially). Default is None.
+            durability: DurabilityPolicy deciding when the new data file is
+                synced to the disk: SyncAlways (after the header and every
+                session, as before), SyncPeriodic (every N bytes or T seconds),
+                SyncOnClose or SyncInBackground. If None, SyncAlways is used.
+                Has no effects if newfile is False. Default is None.
 
         Returns:
             None
@@ -506,16 +641,84 @@ class TobiiController:
             self.filename = filename
 
         if newfile:
-            self._open_datafile()
+            self.compression = compression
+            self.durability = durability
+            if self.acquisition is None:
+                self._open_datafile()
+        if schema is not None:
+            self.output_schema = schema
 
-        self.gaze_data = []
         self.event_data = []
-        self.eyetracker.subscribe_to(tr.EYETRACKER_GAZE_DATA,
-                                     self._on_gaze_data,
-                                     as_dictionary=True)
-        core.wait(1)  # wait a bit for the eye tracker to get ready
+        self.looking_times = []
+        if self.pupil_pipeline is not None:
+            self.pupil_pipeline.reset()
+            self._pupil_index = 0
+        if self.latency_monitor is not None:
+            self.latency_monitor.reset()
+        if self.quality_monitor is not None:
+            self.quality_monitor.reset()
+        if self.gaze_filter is not None:
+            self.gaze_filter.reset()
+            self._filter_index = 0
+            self._filtered_position = (np.nan, np.nan)
+        if self.acquisition is not None:
+            self._start_acquisition(newfile, streams)
+            return
+
+        # discard the samples of the previous recording, show_status and
+        # run_validation
+        self._samples.swap()
+        self.gaze_data = self._samples
+        self.trials = TrialIndex(self._samples)
+        self.eyetracker.subscribe_to(
+            get_subscription("EYETRACKER_GAZE_DATA"),
+            self._on_gaze_data,
+            as_dictionary=True)
+        self.stream_recorders = {
+            name: StreamRecorder(name)
+            for name in (streams or [])
+        }
+        for recorder in self.stream_recorders.values():
+            self.eyetracker.subscribe_to(
+                get_subscription(recorder.subscription),
+                recorder.callback,
+                as_dictionary=True)
+        self._wait_for_eyetracker()
+        self.recording = True
+        self.t0 = get_system_time_stamp()
+
+    def _wait_for_eyetracker(self):
+        """Wait a bit for the eye tracker to get ready after subscribing."""
+        core.wait(1)
+
+    def _start_acquisition(self, newfile, streams):
+        """Start recording in the acquisition process.
+
+            Called by start_recording.
+
+        Args:
+            newfile: open a new data file.
+            streams: list of additional streams.
+
+        Returns:
+            None
+        """
+        buffers = None
+        if newfile:
+            buffers, self.validation_result_buffers = (
+                self.validation_result_buffers, None)
+        start, self.t0 = self.acquisition.request(
+            "start",
+            filename=self.filename,
+            newfile=newfile,
+            streams=streams,
+            compression=self.compression,
+            schema=self.output_schema,
+            durability=self.durability,
+            validation_result_buffers=buffers)
+        self.gaze_data = FeedSamples(self.acquisition.reader, start=start)
+        self.trials = TrialIndex(self.gaze_data)
         self.recording = True
-        self.t0 = tr.get_system_time_stamp()
 
     def stop_recording(self):
         """Stop recording.
@@ -529,49 +732,229 @@ class TobiiController:
         if not self.recording:
             raise RuntimeWarning("Not recoding now.")
 
-        self.eyetracker.unsubscribe_from(tr.EYETRACKER_GAZE_DATA,
-                                         self._on_gaze_data)
+        if self.trials.current is not None:
+            self.end_trial()
+        if self.acquisition is not None:
+            self._stop_acquisition()
+            return
+        self.eyetracker.unsubscribe_from(
+            get_subscription("EYETRACKER_GAZE_DATA"), self._on_gaze_data)
+        for recorder in self.stream_recorders.values():
+            self.eyetracker.unsubscribe_from(
+                get_subscription(recorder.subscription), recorder.callback)
         self.recording = False
+        # the samples of this recording are kept, and written to the file,
+        # apart from any sample delivered after unsubscribing
+        self.gaze_data = self._samples.swap()
+        self.trials.source = self.gaze_data
         # time correction for event data
-        self.event_data = [(round((x[0] - self.t0) / 1000.0, 1), x[1])
-                           for x in self.event_data]
+        self.event_data = [
+            (self.output_schema.convert_time(x[0] - self.t0), x[1])
+            for x in self.event_data
+        ]
         self._flush_data()
 
-    def get_current_gaze_position(self):
-        """Get the newest gaze position.
+    def _stop_acquisition(self):
+        """Stop recording in the acquisition process, which writes the data.
+
+            Called by stop_recording. The process hands back all the samples
+            of the recording in a feed of their own, so the oldest samples
+            stay readable after the acquisition feed has wrapped around.
 
         Args:
             None
 
+        Returns:
+            None
+        """
+        header, self.audio_latency_header = self.audio_latency_header, None
+        try:
+            n, name = self.acquisition.request("stop",
+                                               audio_latency_header=header)
+        finally:
+            self.recording = False
+        self.gaze_data = FeedSamples(self.acquisition.attach(name), n)
+        self.trials.source = self.gaze_data
+        self.event_data = [
+            (self.output_schema.convert_time(x[0] - self.t0), x[1])
+            for x in self.event_data
+        ]
+
+    def _get_average_position(self, gaze_data):
+        """Get the gaze position averaged from both eyes.
+
+        Args:
+            gaze_data: gaze data provided by the eye tracker.
+
+        Returns:
+            The gaze position (x, y) in PsychoPy coordinate system. If both
+            eyes are detected, return the average position. If either of the
+            eyes is detected, it will be returned. (nan, nan) if not detected.
+        """
+        if not (gaze_data["left_gaze_point_validity"]
+                or gaze_data["right_gaze_point_validity"]):  # not detected
+            return (np.nan, np.nan)
+        lp = self._get_psychopy_pos(
+            gaze_data["left_gaze_point_on_display_area"])
+        rp = self._get_psychopy_pos(
+            gaze_data["right_gaze_point_on_display_area"])
+        if not gaze_data["left_gaze_point_validity"]:
+            return rp  # use right eye
+        elif not gaze_data["right_gaze_point_validity"]:
+            return lp  # use left eye
+        else:
+            return ((lp[0] + rp[0]) / 2.0, (lp[1] + rp[1]) / 2.0)
+
+    def set_gaze_filter(self, *filters, max_batch=256):
+        """Set the filters for get_current_gaze_position(filtered=True).
+
+            The filters are applied to the average gaze position in PsychoPy
+            coordinate system. The samples arrived since the previous call of
+            get_current_gaze_position(filtered=True) are filtered in a batch.
+
+        Args:
+            *filters: GazeFilter objects (e.g. MovingAverage, MedianFilter,
+                OneEuroFilter, VelocityHold), applied in the given order. If
+                no filters are given, the filtering is disabled.
+            max_batch: the maximum number of samples filtered per call. If
+                more samples have arrived, the filters are reset and only the
+                latest max_batch samples are filtered. Default is 256.
+
+        Returns:
+            GazeFilterPipeline, or None if the filtering is disabled.
+        """
+        if filters:
+            self.gaze_filter = GazeFilterPipeline(*filters)
+        else:
+            self.gaze_filter = None
+        self._filter_max_batch = max_batch
+        self._filter_index = 0
+        self._filtered_position = (np.nan, np.nan)
+        return self.gaze_filter
+
+    def _update_gaze_filter(self):
+        """Filter the samples arrived since the last update.
+
+        Args:
+            None
+
+        Returns:
+            The latest filtered gaze position.
+        """
+        gaze_data = self.gaze_data.snapshot()
+        n = len(gaze_data)
+        start = self._filter_index
+        if n - start > self._filter_max_batch:
+            start = n - self._filter_max_batch
+            self.gaze_filter.reset()
+        if start == n:
+            return self._filtered_position
+
+        batch = [gaze_data[i] for i in range(start, n)]
+        t = np.array([x["device_time_stamp"] for x in batch]) / 1e6
+        pos = np.array([self._get_average_position(x) for x in batch],
+                       dtype=float)
+        x, y = self.gaze_filter.process(t, pos[:, 0], pos[:, 1])
+        self._filter_index = n
+        self._filtered_position = (x[-1], y[-1])
+        return self._filtered_position
+
+    def set_pupil_pipeline(self, pipeline=None):
+        """Set the preprocessing for get_current_pupil_size(corrected=True).
+
+            The samples arrived since the previous call of
+            get_current_pupil_size(corrected=True) are processed in a batch.
+            Start the trials with start_pupil_trial(). The pipeline is reset
+            by start_recording(); after stop_recording(), the same results
+            are given by pipeline.process_gaze_data(controller.gaze_data,
+            [onset for onset, baseline in pipeline.baselines]).
+
+        Args:
+            pipeline: PupilPipeline object. If None, the preprocessing is
+                disabled. Default is None.
+
+        Returns:
+            The pipeline.
+        """
+        self.pupil_pipeline = pipeline
+        self._pupil_index = 0
+        return pipeline
+
+    def start_pupil_trial(self):
+        """Start a trial of the pupil preprocessing at the current time.
+
+            The baseline of the trial is the mean pupil size before it. See
+            PupilPipeline.
+
+        Args:
+            None
+
+        Returns:
+            The onset of the trial (the system timestamp in seconds).
+        """
+        if self.pupil_pipeline is None:
+            raise RuntimeWarning(
+                "No pupil pipeline. Use set_pupil_pipeline() first.")
+        onset = get_system_time_stamp() / 1e6
+        self.pupil_pipeline.start_trial(onset)
+        return onset
+
+    def _update_pupil_pipeline(self):
+        """Process the samples arrived since the last update.
+
+        Args:
+            None
+
+        Returns:
+            The output of the newest sample (see PupilPipeline.process), or
+            None if no samples were processed.
+        """
+        gaze_data = self.gaze_data.snapshot()
+        n = len(gaze_data)
+        start = self._pupil_index
+        if start > n:
+            # start_recording() replaced the gaze data
+            start = 0
+            self.pupil_pipeline.reset()
+        if start < n:
+            self.pupil_pipeline.process(
+                *gaze_data_columns(gaze_data[start:n]))
+            self._pupil_index = n
+        return self.pupil_pipeline.latest
+
+    def get_current_gaze_position(self, filtered=False):
+        """Get the newest gaze position.
+
+        Args:
+            filtered: whether to apply the filters set by set_gaze_filter().
+                Default is False.
+
         Returns:
             A tuple of the newest gaze position in PsychoPy coordinate system.
             For example: (0, 0).
         """
         if not self.gaze_data:
             return (np.nan, np.nan)
+        elif filtered:
+            if self.gaze_filter is None:
+                raise RuntimeWarning(
+                    "No gaze filters. Use set_gaze_filter() first.")
+            self._mark_consumed(self.gaze_data[-1])
+            ave = self._update_gaze_filter()
+            return tuple(round(pos, 4) for pos in ave)
         else:
             gaze_data = self.gaze_data[-1]
-            lp = self._get_psychopy_pos(
-                gaze_data["left_gaze_point_on_display_area"])
-            rp = self._get_psychopy_pos(
-                gaze_data["right_gaze_point_on_display_area"])
-            if not (gaze_data["left_gaze_point_validity"]
-                    or gaze_data["right_gaze_point_validity"]):  # not detected
-                return (np.nan, np.nan)
-            elif not gaze_data["left_gaze_point_validity"]:
-                ave = rp  # use right eye
-            elif not gaze_data["right_gaze_point_validity"]:
-                ave = lp  # use left eye
-            else:
-                ave = ((lp[0] + rp[0]) / 2.0, (lp[1] + rp[1]) / 2.0)
-
+            self._mark_consumed(gaze_data)
+            ave = self._get_average_position(gaze_data)
             return tuple(round(pos, 4) for pos in ave)
 
-    def get_current_pupil_size(self):
+    def get_current_pupil_size(self, corrected=False):
         """Get the newest pupil size.
 
         Args:
-            None
+            corrected: whether to return the pupil size preprocessed and
+                corrected for the baseline of the trial by the pipeline set
+                by set_pupil_pipeline(). Default is False.
 
         Returns:
             The newest pupil diameter (mm) reported by the eye-tracker.
@@ -581,8 +964,17 @@ class TobiiController:
         """
         if not self.gaze_data:
             return np.nan
+        elif corrected:
+            if self.pupil_pipeline is None:
+                raise RuntimeWarning(
+                    "No pupil pipeline. Use set_pupil_pipeline() first.")
+            self._mark_consumed(self.gaze_data[-1])
+            latest = self._update_pupil_pipeline()
+            return np.nan if latest is None else round(
+                float(latest["corrected"]), 4)
         else:
             gaze_data = self.gaze_data[-1]
+            self._mark_consumed(gaze_data)
             if not (gaze_data["left_pupil_validity"]
                     or gaze_data["right_pupil_validity"]):  # not detected
                 pup = np.nan
@@ -596,6 +988,380 @@ class TobiiController:
 
             return round(pup, 4)
 
+    def _mark_consumed(self, gaze_data):
+        """Record the first read of a sample for latency instrumentation.
+
+        Args:
+            gaze_data: the sample read by the frame loop.
+
+        Returns:
+            None
+        """
+        if self.latency_monitor is not None:
+            self.latency_monitor.consume(gaze_data)
+
+    def start_profiling(self, capacity=1000000):
+        """Record the time spent in the controller.
+
+            Spans are recorded for the gaze data callback (on the thread of
+            the Tobii SDK), the coordinate conversions, the writing of the
+            data file, every frame of the calibration, the validation and
+            show_status, and every iteration of collect_lt. Save them with
+            stop_profiling().save("trace.json") and open the file in
+            chrome://tracing or Perfetto.
+
+        Args:
+            capacity: the maximum number of spans. Default is 1000000.
+
+        Returns:
+            Profiler
+        """
+        self.profiler = Profiler(capacity)
+        return self.profiler
+
+    def stop_profiling(self):
+        """Stop recording the time spent in the controller.
+
+        Args:
+            None
+
+        Returns:
+            Profiler with the recorded spans.
+        """
+        profiler, self.profiler = self.profiler, DISABLED
+        return profiler
+
+    def start_gaze_feed(self, name=None, capacity=65536):
+        """Publish the gaze data to other processes through shared memory.
+
+            Every sample is converted to the PsychoPy coordinate system of
+            the window in the callback of the Tobii SDK and published into a
+            GazeFeed (see feed.FIELDS). Other processes read it with
+            GazeFeedReader(name).
+
+            With acquisition="process", the feed of the acquisition process
+            is returned; it has the fields in ACQUISITION_FIELDS, which
+            start with feed.FIELDS, and name and capacity are ignored.
+
+        Args:
+            name: the name of the shared memory block. If None, a unique
+                name is chosen. Default is None.
+            capacity: the number of samples kept in the ring buffer.
+                Default is 65536.
+
+        Returns:
+            The name of the feed.
+        """
+        if self.acquisition is not None:
+            return self.acquisition.feed_name
+        if self.gaze_feed is not None:
+            raise RuntimeWarning("The gaze feed is already started.")
+        self.gaze_feed = GazeFeed(name, capacity)
+        return self.gaze_feed.name
+
+    def stop_gaze_feed(self):
+        """Stop publishing the gaze data and remove the feed.
+
+            The feed cannot be stopped during recording, because the
+            callback of the Tobii SDK may be publishing a sample.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        if self.recording:
+            raise RuntimeWarning(
+                "The gaze feed cannot be stopped during recording. Use "
+                "stop_recording() first.")
+        feed, self.gaze_feed = self.gaze_feed, None
+        if feed is not None:
+            feed.close()
+
+    def _publish_gaze_data(self, feed, gaze_data):
+        """Convert a sample and publish it to the gaze feed.
+
+            Called by _on_gaze_data.
+
+        Args:
+            feed: the GazeFeed to publish to.
+            gaze_data: gaze data provided by the eye tracker.
+
+        Returns:
+            None
+        """
+        feed.publish(self._feed_row(gaze_data))
+
+    def _feed_row(self, gaze_data):
+        """Get the values of feed.FIELDS of a sample.
+
+        Args:
+            gaze_data: gaze data provided by the eye tracker.
+
+        Returns:
+            tuple
+        """
+        lv = gaze_data["left_gaze_point_validity"]
+        rv = gaze_data["right_gaze_point_validity"]
+        lp = self._get_psychopy_pos(
+            gaze_data["left_gaze_point_on_display_area"]) if lv else (np.nan,
+                                                                       np.nan)
+        rp = self._get_psychopy_pos(
+            gaze_data["right_gaze_point_on_display_area"]) if rv else (np.nan,
+                                                                        np.nan)
+        if lv and rv:
+            x, y = (lp[0] + rp[0]) / 2.0, (lp[1] + rp[1]) / 2.0
+        else:
+            x, y = lp if lv else rp
+        lpv = gaze_data["left_pupil_validity"]
+        rpv = gaze_data["right_pupil_validity"]
+        pupils = [
+            d for d, v in ((gaze_data["left_pupil_diameter"], lpv),
+                           (gaze_data["right_pupil_diameter"], rpv)) if v
+        ]
+        pupil = sum(pupils) / len(pupils) if pupils else np.nan
+        return (gaze_data["system_time_stamp"], gaze_data["device_time_stamp"],
+                feed_clock(), x, y, lp[0], lp[1], rp[0], rp[1], pupil, lv, rv)
+
+    def start_latency_monitor(self, bin_width=0.1, max_value=200.0):
+        """Instrument the latency of every gaze sample.
+
+            The latencies are reset at every start_recording() and the
+            summary is written to the header of each session.
+
+        Args:
+            bin_width: the width of the histogram bins in milliseconds.
+                Default is 0.1.
+            max_value: the upper limit of the histogram bins in milliseconds.
+                Default is 200.
+
+        Returns:
+            LatencyMonitor
+        """
+        if self.acquisition is not None:
+            self.latency_monitor = RemoteLatencyMonitor(
+                self.acquisition, get_system_time_stamp, bin_width, max_value)
+        else:
+            self.latency_monitor = LatencyMonitor(get_system_time_stamp,
+                                                  bin_width, max_value)
+        return self.latency_monitor
+
+    def get_latency_stats(self, percentiles=(50, 95, 99)):
+        """Get the latency statistics of the current session.
+
+            start_latency_monitor() must be called first.
+
+        Args:
+            percentiles: the percentiles to report. Default is (50, 95, 99).
+
+        Returns:
+            A dict of latency statistics in milliseconds. See
+            LatencyMonitor.summary for the details.
+        """
+        if self.latency_monitor is None:
+            raise RuntimeWarning(
+                "Latency is not monitored. Use start_latency_monitor() first.")
+
+        return self.latency_monitor.summary(percentiles)
+
+    def get_fsync_stats(self, percentiles=(50, 95, 99)):
+        """Get the time spent syncing the data file to the disk.
+
+        Args:
+            percentiles: the percentiles to report. Default is (50, 95, 99).
+
+        Returns:
+            A dict of fsync statistics in milliseconds. See
+            DurabilityPolicy.summary for the details.
+        """
+        if self.acquisition is not None:
+            return self.acquisition.request("fsync_stats", percentiles)
+        if self.datafile is None:
+            raise RuntimeWarning(
+                "Data file is not found. Use start_recording() to record and "
+                "save the data.")
+
+        return self.datafile.durability.summary(percentiles)
+
+    def start_quality_monitor(self, window=1.0, sampling_rate=None):
+        """Monitor the data quality while the gaze data are collected.
+
+        Args:
+            window: the length of the sliding window in seconds. Default is 1.
+            sampling_rate: the nominal sampling rate in Hz. If None, the gaze
+                output frequency of the eye tracker is used. Default is None.
+
+        Returns:
+            DataQualityMonitor
+        """
+        if sampling_rate is None:
+            sampling_rate = self.eyetracker.get_gaze_output_frequency()
+        if self.acquisition is not None:
+            self.quality_monitor = RemoteQualityMonitor(
+                self.acquisition, window, sampling_rate)
+        else:
+            self.quality_monitor = DataQualityMonitor(window, sampling_rate)
+        return self.quality_monitor
+
+    def stop_quality_monitor(self):
+        """Stop monitoring the data quality.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        if self.acquisition is not None and self.quality_monitor is not None:
+            self.acquisition.request("stop_quality_monitor")
+        self.quality_monitor = None
+
+    def get_data_quality(self):
+        """Get the data quality of the latest gaze data.
+
+            start_quality_monitor() must be called first.
+
+        Args:
+            None
+
+        Returns:
+            A dict of data quality measures in the sliding window. See
+            DataQualityMonitor.summary for the details.
+        """
+        if self.quality_monitor is None:
+            raise RuntimeWarning(
+                "Data quality is not monitored. Use start_quality_monitor() "
+                "first.")
+
+        return self.quality_monitor.summary()
+
+    def _get_tobii_region(self, pos, size, shape="rect"):
+        """Convert an area in PsychoPy coordinates to a Region in Tobii ADCS.
+
+        Args:
+            pos: the center (x, y) of the area in PsychoPy coordinate system.
+            size: the width and the height of the area.
+            shape: "rect" or "ellipse". Default is "rect".
+
+        Returns:
+            Region
+        """
+        center = self._get_tobii_pos(pos)
+        corner = self._get_tobii_pos(
+            (pos[0] + size[0] / 2.0, pos[1] + size[1] / 2.0))
+        return Region(center, (corner[0] - center[0], corner[1] - center[1]),
+                      shape)
+
+    def add_gaze_trigger(self, trigger):
+        """Register a gaze-contingent trigger.
+
+            The trigger is evaluated for every sample as it arrives from the
+            eye tracker, without waiting for the next frame.
+
+        Args:
+            trigger: GazeTrigger object.
+
+        Returns:
+            The trigger.
+        """
+        if self.trigger_engine is None:
+            if self.acquisition is not None:
+                self.trigger_engine = RemoteTriggerEngine(self.acquisition)
+            else:
+                self.trigger_engine = GazeTriggerEngine(
+                    get_system_time_stamp)
+        return self.trigger_engine.add(trigger)
+
+    def add_region_trigger(self,
+                           pos,
+                           size,
+                           shape="rect",
+                           callback=None,
+                           once=True):
+        """Register a trigger fired when the gaze enters an area.
+
+        Args:
+            pos: the center (x, y) of the area in PsychoPy coordinate system.
+            size: the width and the height of the area.
+            shape: "rect" or "ellipse". Default is "rect".
+            callback: a function called with the trigger when fired. It runs
+                on the thread of the Tobii SDK. Default is None.
+            once: whether to disarm the trigger after it is fired. Default is
+                True.
+
+        Returns:
+            RegionTrigger: check `triggered` in the frame loop.
+        """
+        return self.add_gaze_trigger(
+            RegionTrigger(self._get_tobii_region(pos, size, shape), callback,
+                          once))
+
+    def add_dwell_trigger(self,
+                          pos,
+                          size,
+                          dwell,
+                          shape="rect",
+                          max_gap=0.1,
+                          callback=None,
+                          once=True):
+        """Register a trigger fired when the gaze stays in an area.
+
+        Args:
+            pos: the center (x, y) of the area in PsychoPy coordinate system.
+            size: the width and the height of the area.
+            dwell: the duration of dwelling in seconds.
+            shape: "rect" or "ellipse". Default is "rect".
+            max_gap: the tolerable duration of missing data in seconds.
+                Default is 0.1.
+            callback: a function called with the trigger when fired. It runs
+                on the thread of the Tobii SDK. Default is None.
+            once: whether to disarm the trigger after it is fired. Default is
+                True.
+
+        Returns:
+            DwellTrigger: check `triggered` in the frame loop.
+        """
+        return self.add_gaze_trigger(
+            DwellTrigger(self._get_tobii_region(pos, size, shape), dwell,
+                         max_gap, callback, once))
+
+    def add_predicate_trigger(self, predicate, callback=None, once=True):
+        """Register a trigger fired when a custom predicate returns True.
+
+        Args:
+            predicate: a function called with (p, gaze_data) for every
+                sample, where p is the average gaze point in Tobii ADCS (None
+                if not detected). It runs on the thread of the Tobii SDK and
+                must be cheap.
+            callback: a function called with the trigger when fired. Default
+                is None.
+            once: whether to disarm the trigger after it is fired. Default is
+                True.
+
+        Returns:
+            PredicateTrigger: check `triggered` in the frame loop.
+        """
+        return self.add_gaze_trigger(
+            PredicateTrigger(predicate, callback, once))
+
+    def remove_gaze_trigger(self, trigger=None):
+        """Unregister a gaze-contingent trigger.
+
+        Args:
+            trigger: the trigger to remove. If None, remove all triggers.
+                Default is None.
+
+        Returns:
+            None
+        """
+        if self.trigger_engine is None:
+            return
+        if trigger is None:
+            self.trigger_engine.clear()
+        else:
+            self.trigger_engine.remove(trigger)
+
     def record_event(self, event):
         """Record events with timestamp.
 
@@ -610,7 +1376,78 @@ class TobiiController:
         if not self.recording:
             raise RuntimeWarning("Not recoding now.")
 
-        self.event_data.append([tr.get_system_time_stamp(), event])
+        t = get_system_time_stamp()
+        self.event_data.append([t, event])
+        if self.acquisition is not None:
+            self.acquisition.send("event", t, event)
+
+    def start_trial(self, name, **metadata):
+        """Start a trial of the trial index.
+
+            The event "Trial start <name>" is recorded. Only one trial runs
+            at a time. This method works only during recording.
+
+        Args:
+            name: the name of the trial (without tabs).
+            **metadata: information of the trial saved in the index, e.g.
+                stimulus="face.png". The values must be JSON serializable.
+
+        Returns:
+            Trial
+        """
+        if not self.recording:
+            raise RuntimeWarning("Not recoding now.")
+        trial = self.trials.start(name, get_system_time_stamp(),
+                                  **metadata)
+        self.event_data.append([trial.start, START_EVENT + name])
+        if self.acquisition is not None:
+            self.acquisition.send("start_trial", name, trial.start,
+                                  trial.metadata)
+        return trial
+
+    def end_trial(self, **metadata):
+        """End the running trial of the trial index.
+
+            The event "Trial end <name>" is recorded. This method works only
+            during recording.
+
+        Args:
+            **metadata: information of the trial added to that given at the
+                start, e.g. lt=12.3.
+
+        Returns:
+            Trial
+        """
+        if not self.recording:
+            raise RuntimeWarning("Not recoding now.")
+        trial = self.trials.end(get_system_time_stamp(), **metadata)
+        self.event_data.append([trial.end, END_EVENT + trial.name])
+        if self.acquisition is not None:
+            self.acquisition.send("end_trial", trial.end, metadata)
+        return trial
+
+    @contextmanager
+    def trial(self, name, **metadata):
+        """Run a trial of the trial index.
+
+            E.g.
+            with controller.trial("face", stimulus="face.png") as trial:
+                ...
+            print(len(trial.samples))
+
+        Args:
+            name: the name of the trial.
+            **metadata: information of the trial. See start_trial.
+
+        Returns:
+            A context manager giving the Trial.
+        """
+        trial = self.start_trial(name, **metadata)
+        try:
+            yield trial
+        finally:
+            if self.recording and self.trials.current is trial:
+                self.end_trial()
 
     def close(self):
         """Close the data file.
@@ -624,6 +1461,11 @@ class TobiiController:
         # stop recording if not already
         if self.recording:
             self.stop_recording()
+        self.stop_gaze_feed()
+        if self.acquisition is not None:
+            # the data file is closed by the acquisition process
+            self.acquisition.close()
+            return
         if self.datafile is None:
             raise RuntimeWarning(
                 "Data file is not found. Use start_recording() to record and "
@@ -783,7 +1625,8 @@ class TobiiController:
                        result_msg_color="white"):
         """Run validation.
 
-        tobii_research_addons is required for running validation. Validation
+        The validation is computed by ValidationEngine, or by
+        tobii_research_addons if validation_engine is "addons". Validation
         procedure is only available after a successful calibration or an error
         will be raised.
         Args:
@@ -803,14 +1646,12 @@ class TobiiController:
                 Accepts any PsychoPy color specification. Default is white.
 
         Returns:
-            tobii_research_addons.ScreenBasedCalibrationValidation.CalibrationValidationResult
+            ValidationResult with the accuracy, precision and data loss of
+            every point, or the CalibrationValidationResult of
+            tobii_research_addons.
         """
-        if self.update_validation is None:
-            raise ModuleNotFoundError("tobii_research_addons is not found.")
-
         # setup the procedure
-        self.validation = ScreenBasedCalibrationValidation(
-            self.eyetracker, sample_count, int(1000 * timeout))
+        self.validation = self._make_validation(sample_count, timeout)
 
         if validation_points is None:
             validation_points = self.original_calibration_points
@@ -818,11 +1659,8 @@ class TobiiController:
         # clear the display
         self.win.flip()
 
-        self.validation.enter_validation_mode()
-        self.update_validation(validation_points=validation_points,
-                               _focus_time=focus_time)
-        validation_result = self.validation.compute()
-        self.validation.leave_validation_mode()
+        validation_result = self._run_validation_procedure(
+            validation_points, focus_time)
         self.win.flip()
 
         if not (save_to_file or show_results):
@@ -834,6 +1672,66 @@ class TobiiController:
 
         return validation_result
 
+    def _run_validation_procedure(self, validation_points, focus_time):
+        """Present the validation points and compute the result.
+
+            The native engine reads the gaze data from the sample buffer of
+            the controller, which is filled here if not recording.
+
+        Args:
+            validation_points: list of position of the validation points.
+            focus_time: the duration allowing the subject to focus in seconds.
+
+        Returns:
+            The result of the validation procedure.
+        """
+        fill_buffer = (isinstance(self.validation, ValidationEngine)
+                       and not self.recording)
+        if fill_buffer:
+            self.eyetracker.subscribe_to(
+                get_subscription("EYETRACKER_GAZE_DATA"),
+                self._samples.append,
+                as_dictionary=True)
+        try:
+            self.validation.enter_validation_mode()
+            self.update_validation(validation_points=validation_points,
+                                   _focus_time=focus_time)
+            validation_result = self.validation.compute()
+            self.validation.leave_validation_mode()
+        finally:
+            if fill_buffer:
+                self.eyetracker.unsubscribe_from(
+                    get_subscription("EYETRACKER_GAZE_DATA"),
+                    self._samples.append)
+        return validation_result
+
+    def _make_validation(self, sample_count, timeout):
+        """Create the validation procedure of validation_engine.
+
+        Args:
+            sample_count: The number of samples to collect.
+            timeout: Timeout in seconds.
+
+        Returns:
+            ValidationEngine or
+            tobii_research_addons.ScreenBasedCalibrationValidation
+        """
+        if self.validation_engine == "native":
+            return ValidationEngine(
+                self.eyetracker,
+                sample_count,
+                int(1000 * timeout),
+                samples=self.gaze_data if self.recording else self._samples)
+        elif self.validation_engine == "addons":
+            if not is_available(addons):
+                raise ModuleNotFoundError(
+                    "tobii_research_addons is not found.")
+            return addons.ScreenBasedCalibrationValidation(
+                self.eyetracker, sample_count, int(1000 * timeout))
+        else:
+            raise ValueError("validation_engine ({}) is not supported.".format(
+                self.validation_engine))
+
     def _process_validation_result(self, validation_result):
         """Process validation result"""
         result_buffer = "Validation time:\t{}\n".format(
@@ -876,6 +1774,20 @@ class TobiiController:
             pass
         result_buffer += "left={}\tright={}\n".format(*val)
 
+        if isinstance(validation_result, ValidationResult):
+            # STD and data loss
+            result_buffer += "Mean precision (STD, in degrees):\t"
+            val = (round(this_eye, 4) for this_eye in
+                   (validation_result.average_precision_std_left,
+                    validation_result.average_precision_std_right))
+            result_buffer += "left={}\tright={}\n".format(*val)
+
+            result_buffer += "Mean data loss (proportion):\t"
+            val = (round(this_eye, 4)
+                   for this_eye in (validation_result.average_data_loss_left,
+                                    validation_result.average_data_loss_right))
+            result_buffer += "left={}\tright={}\n".format(*val)
+
         return result_buffer
 
     def _show_validation_result(self, result_buffer, show_results,
@@ -913,23 +1825,24 @@ class TobiiController:
             self.calibration_target_dot.setPos(current_validation_point)
             clock.reset()
             while True:
-                t = clock.getTime() * self.shrink_speed
-                self.calibration_target_disc.setRadius([
-                    (np.sin(t)**2 + self.calibration_target_min) *
-                    self.calibration_disc_size
-                ])
-                self.calibration_target_dot.setRadius([
-                    (np.sin(t)**2 + self.calibration_target_min) *
-                    self.calibration_dot_size
-                ])
-                self.calibration_target_disc.draw()
-                self.calibration_target_dot.draw()
-                if clock.getTime() >= self._shrink_sec:
-                    core.wait(_focus_time, 0.0)
-                    self._collect_validation_data(current_validation_point)
-                    break
+                with self.profiler.span("validation frame"):
+                    t = clock.getTime() * self.shrink_speed
+                    self.calibration_target_disc.setRadius([
+                        (np.sin(t)**2 + self.calibration_target_min) *
+                        self.calibration_disc_size
+                    ])
+                    self.calibration_target_dot.setRadius([
+                        (np.sin(t)**2 + self.calibration_target_min) *
+                        self.calibration_dot_size
+                    ])
+                    self.calibration_target_disc.draw()
+                    self.calibration_target_dot.draw()
+                    if clock.getTime() >= self._shrink_sec:
+                        core.wait(_focus_time, 0.0)
+                        self._collect_validation_data(current_validation_point)
+                        break
 
-                self.win.flip()
+                    self.win.flip()
 
     def _show_calibration_result(self):
         img = Image.new("RGBA", tuple(self.win.size))
@@ -999,23 +1912,24 @@ class TobiiController:
             self.calibration_target_dot.setPos(this_pos)
             clock.reset()
             while True:
-                t = clock.getTime() * self.shrink_speed
-                self.calibration_target_disc.setRadius([
-                    (np.sin(t)**2 + self.calibration_target_min) *
-                    self.calibration_disc_size
-                ])
-                self.calibration_target_dot.setRadius([
-                    (np.sin(t)**2 + self.calibration_target_min) *
-                    self.calibration_dot_size
-                ])
-                self.calibration_target_disc.draw()
-                self.calibration_target_dot.draw()
-                if clock.getTime() >= self._shrink_sec:
-                    core.wait(_focus_time, 0.0)
-                    self._collect_calibration_data(this_pos)
-                    break
+                with self.profiler.span("calibration frame"):
+                    t = clock.getTime() * self.shrink_speed
+                    self.calibration_target_disc.setRadius([
+                        (np.sin(t)**2 + self.calibration_target_min) *
+                        self.calibration_disc_size
+                    ])
+                    self.calibration_target_dot.setRadius([
+                        (np.sin(t)**2 + self.calibration_target_min) *
+                        self.calibration_dot_size
+                    ])
+                    self.calibration_target_disc.draw()
+                    self.calibration_target_dot.draw()
+                    if clock.getTime() >= self._shrink_sec:
+                        core.wait(_focus_time, 0.0)
+                        self._collect_calibration_data(this_pos)
+                        break
 
-                self.win.flip()
+                    self.win.flip()
 
     def show_status(self, decision_key="space"):
         """Showing the participant's gaze position in track box.
@@ -1079,49 +1993,54 @@ class TobiiController:
         if self.eyetracker is None:
             raise ValueError("Eyetracker is not found.")
 
-        self.eyetracker.subscribe_to(tr.EYETRACKER_USER_POSITION_GUIDE,
-                                     self._on_gaze_data,
-                                     as_dictionary=True)
+        self.eyetracker.subscribe_to(
+            get_subscription("EYETRACKER_USER_POSITION_GUIDE"),
+            self._on_user_position_data,
+            as_dictionary=True)
         core.wait(1)  # wait a bit for the eye tracker to get ready
 
         b_show_status = True
 
         while b_show_status:
-            bgrect.draw()
-            zbar.draw()
-            zc.draw()
-            gaze_data = self.gaze_data[-1]
-            lv = gaze_data["left_user_position_validity"]
-            rv = gaze_data["right_user_position_validity"]
-            lx, ly, lz = gaze_data["left_user_position"]
-            rx, ry, rz = gaze_data["right_user_position"]
-            if lv:
-                lx, ly = self._get_psychopy_pos_from_trackbox([lx, ly],
-                                                              units="height")
-                leye.setPos((round(lx * 0.25, 4), round(ly * 0.2 + 0.4, 4)))
-                leye.draw()
-            if rv:
-                rx, ry = self._get_psychopy_pos_from_trackbox([rx, ry],
-                                                              units="height")
-                reye.setPos((round(rx * 0.25, 4), round(ry * 0.2 + 0.4, 4)))
-                reye.draw()
-            if lv or rv:
-                zpos.setPos((
-                    round((((lz * int(lv) + rz * int(rv)) /
-                            (int(lv) + int(rv))) - 0.5) * 0.125, 4),
-                    0.28,
-                ))
-                zpos.draw()
-
-            for key in event.getKeys():
-                if key == decision_key:
-                    b_show_status = False
-                    break
+            with self.profiler.span("show_status frame"):
+                bgrect.draw()
+                zbar.draw()
+                zc.draw()
+                gaze_data = self._samples[-1]
+                lv = gaze_data["left_user_position_validity"]
+                rv = gaze_data["right_user_position_validity"]
+                lx, ly, lz = gaze_data["left_user_position"]
+                rx, ry, rz = gaze_data["right_user_position"]
+                if lv:
+                    lx, ly = self._get_psychopy_pos_from_trackbox(
+                        [lx, ly], units="height")
+                    leye.setPos(
+                        (round(lx * 0.25, 4), round(ly * 0.2 + 0.4, 4)))
+                    leye.draw()
+                if rv:
+                    rx, ry = self._get_psychopy_pos_from_trackbox(
+                        [rx, ry], units="height")
+                    reye.setPos(
+                        (round(rx * 0.25, 4), round(ry * 0.2 + 0.4, 4)))
+                    reye.draw()
+                if lv or rv:
+                    zpos.setPos((
+                        round((((lz * int(lv) + rz * int(rv)) /
+                                (int(lv) + int(rv))) - 0.5) * 0.125, 4),
+                        0.28,
+                    ))
+                    zpos.draw()
 
-            self.win.flip()
+                for key in event.getKeys():
+                    if key == decision_key:
+                        b_show_status = False
+                        break
+
+                self.win.flip()
 
-        self.eyetracker.unsubscribe_from(tr.EYETRACKER_USER_POSITION_GUIDE,
-                                         self._on_gaze_data)
+        self.eyetracker.unsubscribe_from(
+            get_subscription("EYETRACKER_USER_POSITION_GUIDE"),
+            self._on_user_position_data)
 
     # property getters and setters for parameter changes
     @property
@@ -1143,6 +2062,94 @@ class TobiiController:
         self._shrink_sec = value
 
 
+class _AcquisitionController(TobiiController):
+    """The controller of the acquisition process (see AcquisitionProcess).
+
+        It records and writes the gaze data as TobiiController does, and
+        publishes every sample with ACQUISITION_FIELDS. The rows published
+        during a recording are also kept, and copied into a feed holding
+        the whole recording at stop_recording (see archive_samples).
+
+    Args:
+        win: WindowGeometry of the window of the experiment.
+        eyetracker: the address of the eye tracker, or a copy of a
+            SimulatedEyeTracker.
+        capacity: the number of samples of the feed.
+        firings: the connection sending the firings of the gaze triggers
+            to the experiment.
+    """
+    def __init__(self, win, eyetracker, capacity, firings):
+        if isinstance(eyetracker, str):
+            finder = EyeTrackerFinder(cache_file=None)
+        else:
+            finder = EyeTrackerFinder.from_eyetrackers(eyetracker)
+            eyetracker = eyetracker.address
+        super().__init__(win, eyetracker, finder=finder)
+        # closed by the experiment
+        atexit.unregister(self.close)
+        self.gaze_feed = GazeFeed(capacity=capacity,
+                                  fields=ACQUISITION_FIELDS)
+        self.firings = firings
+        self.remote_triggers = {}
+        self._published = ChunkedBuffer(ACQUISITION_FIELDS)
+        self._archive = None
+
+    def _wait_for_eyetracker(self):
+        # PsychoPy is not imported in this process
+        time.sleep(1)
+
+    def _publish_gaze_data(self, feed, gaze_data):
+        row = (self._feed_row(gaze_data) + (get_system_time_stamp(), ) +
+               sample_values(gaze_data))
+        feed.publish(row)
+        self._published.append(row)
+
+    def start_recording(self, *args, **kwargs):
+        self._published.clear()
+        super().start_recording(*args, **kwargs)
+
+    def archive_samples(self, n):
+        """Copy the samples of the last recording into a new feed.
+
+            The experiment reads them after stop_recording, when the
+            acquisition feed may have overwritten the oldest ones. The feed
+            of the previous recording is unlinked; the experiment keeps its
+            own mapping of it.
+
+        Args:
+            n: the number of samples of the recording.
+
+        Returns:
+            The name of the feed.
+        """
+        if self._archive is not None:
+            self._archive.close()
+        self._archive = GazeFeed(capacity=max(n, 1),
+                                 fields=ACQUISITION_FIELDS)
+        self._archive.extend(self._published.to_array(0, n))
+        self._published.clear()
+        return self._archive.name
+
+    def close(self):
+        try:
+            super().close()
+        finally:
+            if self._archive is not None:
+                self._archive.close()
+                self._archive = None
+
+
+def _run_acquisition(conn, firings, win, eyetracker, capacity):
+    """Run the acquisition process of a controller."""
+    try:
+        controller = _AcquisitionController(win, eyetracker, capacity,
+                                            firings)
+    except Exception as e:
+        conn.send(("error", e))
+        return
+    serve(conn, controller)
+
+
 class TobiiInfantController(TobiiController):
     """Tobii controller with children-friendly calibration procedure.
 
@@ -1151,21 +2158,27 @@ class TobiiInfantController(TobiiController):
 
     Args:
         win: psychopy.visual.Window object.
-        id: the id of eyetracker.
+        id: the id of eyetracker: its index, serial number or address.
         filename: the name of the data file.
+        finder: EyeTrackerFinder object used to find the eye tracker.
+        acquisition: "thread" or "process". See TobiiController.
 
     Attributes:
         shrink_speed: the shrinking speed of target in calibration.
             Default is 1.
         numkey_dict: keys used for calibration. Default is the number pad.
     """
-    def __init__(self, win, id=0, filename="gaze_TOBII_output.tsv"):
-        super().__init__(win, id, filename)
+    def __init__(self,
+                 win,
+                 id=0,
+                 filename="gaze_TOBII_output.tsv",
+                 finder=None,
+                 acquisition="thread"):
+        super().__init__(win, id, filename, finder, acquisition)
         self.update_calibration = self._update_calibration_infant
         # slower for infants
         self.shrink_speed = 1
-        if _has_addons:
-            self.update_validation = self._update_validation_infant
+        self.update_validation = self._update_validation_infant
 
     def _update_calibration_infant(self,
                                    _focus_time=0.5,
@@ -1194,45 +2207,46 @@ class TobiiInfantController(TobiiController):
         in_calibration = True
         clock = core.Clock()
         while in_calibration:
-            # get keys
-            keys = event.getKeys()
-            for key in keys:
-                if key in self.numkey_dict:
-                    point_idx = self.numkey_dict[key]
-
-                    # play the sound if it exists
-                    if self._audio is not None:
-                        if point_idx in self.retry_points:
-                            self._audio.play()
-                elif key == collect_key:
-                    # allow the participant to focus
-                    core.wait(_focus_time, 0.0)
-                    # collect samples when space is pressed
-                    if point_idx in self.retry_points:
-                        self._collect_calibration_data(
-                            self.original_calibration_points[point_idx])
-                        point_idx = -1
-                        # stop the sound
+            with self.profiler.span("calibration frame"):
+                # get keys
+                keys = event.getKeys()
+                for key in keys:
+                    if key in self.numkey_dict:
+                        point_idx = self.numkey_dict[key]
+
+                        # play the sound if it exists
                         if self._audio is not None:
-                            self._audio.pause()
-                elif key == exit_key:
-                    # exit calibration when return is pressed
-                    in_calibration = False
-                    break
-
-            # draw calibration target
-            if point_idx in self.retry_points:
-                this_target = self.targets.get_stim(point_idx)
-                this_pos = self.original_calibration_points[point_idx]
-                this_target.setPos(this_pos)
-                t = clock.getTime() * self.shrink_speed
-                newsize = [
-                    (np.sin(t)**2 + self.calibration_target_min) * e
-                    for e in self.targets.get_stim_original_size(point_idx)
-                ]
-                this_target.setSize(newsize)
-                this_target.draw()
-            self.win.flip()
+                            if point_idx in self.retry_points:
+                                self._audio.play(point_idx)
+                    elif key == collect_key:
+                        # allow the participant to focus
+                        core.wait(_focus_time, 0.0)
+                        # collect samples when space is pressed
+                        if point_idx in self.retry_points:
+                            self._collect_calibration_data(
+                                self.original_calibration_points[point_idx])
+                            point_idx = -1
+                            # stop the sound
+                            if self._audio is not None:
+                                self._audio.pause()
+                    elif key == exit_key:
+                        # exit calibration when return is pressed
+                        in_calibration = False
+                        break
+
+                # draw calibration target
+                if point_idx in self.retry_points:
+                    this_target = self.targets.get_stim(point_idx)
+                    this_pos = self.original_calibration_points[point_idx]
+                    this_target.setPos(this_pos)
+                    t = clock.getTime() * self.shrink_speed
+                    newsize = [
+                        (np.sin(t)**2 + self.calibration_target_min) * e
+                        for e in self.targets.get_stim_original_size(point_idx)
+                    ]
+                    this_target.setSize(newsize)
+                    this_target.draw()
+                self.win.flip()
 
     def _update_validation_infant(self,
                                   validation_points,
@@ -1250,18 +2264,20 @@ class TobiiInfantController(TobiiController):
             this_target.setPos(current_validation_point)
             in_validation = True
             while in_validation:
-                deg += 0.5
-                this_target.setOri(ceil(deg))
-                this_target.draw()
-                self.win.flip()
-
-                keys = event.getKeys()
-                for key in keys:
-                    if key == collect_key:
-                        core.wait(_focus_time, 0.0)
-                        self._collect_validation_data(current_validation_point)
-                        in_validation = False
-                        break
+                with self.profiler.span("validation frame"):
+                    deg += 0.5
+                    this_target.setOri(ceil(deg))
+                    this_target.draw()
+                    self.win.flip()
+
+                    keys = event.getKeys()
+                    for key in keys:
+                        if key == collect_key:
+                            core.wait(_focus_time, 0.0)
+                            self._collect_validation_data(
+                                current_validation_point)
+                            in_validation = False
+                            break
 
     def run_calibration(self,
                         calibration_points,
@@ -1297,8 +2313,12 @@ class TobiiInfantController(TobiiController):
                 will be repeated.
             shuffle: whether to shuffle the presentation order of the stimuli.
                 Default is True.
-            audio: the psychopy.sound.Sound object to play during calibration.
-                If None, no sound will be played. Default is None.
+            audio: the sound to play during calibration: an AudioPool, or
+                psychopy.sound.Sound objects or file names (one or a list,
+                one per calibration point) to make an AudioPool. The sounds
+                are loaded before the calibration starts and the onset
+                latency is saved in the data file. If None, no sound will be
+                played. Default is None.
             focus_time: the duration allowing the subject to focus in seconds.
                         Default is 0.5.
             decision_key: key to leave the procedure. Default is space.
@@ -1326,6 +2346,10 @@ class TobiiInfantController(TobiiController):
                                      infant_stims,
                                      shuffle=shuffle,
                                      *kwargs)
+        if audio is not None and not isinstance(audio, AudioPool):
+            audio = AudioPool(audio)
+        if audio is not None:
+            audio.prepare()
         self._audio = audio
 
         self.retry_marker = visual.Circle(
@@ -1417,6 +2441,9 @@ class TobiiInfantController(TobiiController):
                 in_calibration_loop = False
 
         self.calibration.leave_calibration_mode()
+        if self._audio is not None:
+            self._audio.close()
+            self.audio_latency_header = self._audio.format_header()
 
         return retval
 
@@ -1458,14 +2485,12 @@ class TobiiInfantController(TobiiController):
             *kwargs: other arguments to pass into psychopy.visual.ImageStim.
                 Has no effects if infant_stims is set to None.
         Returns:
-            tobii_research_addons.ScreenBasedCalibrationValidation.CalibrationValidationResult
+            ValidationResult with the accuracy, precision and data loss of
+            every point, or the CalibrationValidationResult of
+            tobii_research_addons.
         """
-        if self.update_validation is None:
-            raise ModuleNotFoundError("tobii_research_addons is not found.")
-
         # setup the procedure
-        self.validation = ScreenBasedCalibrationValidation(
-            self.eyetracker, sample_count, int(1000 * timeout))
+        self.validation = self._make_validation(sample_count, timeout)
 
         if validation_points is None:
             validation_points = self.original_calibration_points
@@ -1479,11 +2504,8 @@ class TobiiInfantController(TobiiController):
         # clear the display
         self.win.flip()
 
-        self.validation.enter_validation_mode()
-        self.update_validation(validation_points=validation_points,
-                               _focus_time=focus_time)
-        validation_result = self.validation.compute()
-        self.validation.leave_validation_mode()
+        validation_result = self._run_validation_procedure(
+            validation_points, focus_time)
         self.win.flip()
 
         if not (save_to_file or show_results):
@@ -1496,7 +2518,28 @@ class TobiiInfantController(TobiiController):
         return validation_result
 
     # Collect looking time
-    def collect_lt(self, max_time, min_away, blink_dur=1):
+    def _log_lt(self, start, max_time, min_away, blink_dur, lt):
+        """Keep the result of collect_lt.
+
+        Args:
+            start: the system timestamp of the start of the trial.
+            max_time, min_away, blink_dur: the parameters of collect_lt.
+            lt: the looking time.
+
+        Returns:
+            The looking time rounded to milliseconds.
+        """
+        lt = round(lt, 3)
+        self.looking_times.append({
+            "start": start,
+            "max_time": max_time,
+            "min_away": min_away,
+            "blink_dur": blink_dur,
+            "lt": lt
+        })
+        return lt
+
+    def collect_lt(self, max_time, min_away, blink_dur=1, stimuli=None):
         """Collect looking time data in runtime.
 
             Collect and calculate looking time in runtime. Also end the trial
@@ -1506,10 +2549,14 @@ class TobiiInfantController(TobiiController):
             max_time: maximum looking time in seconds.
             min_away: minimum duration to stop in seconds.
             blink_dur: the tolerable duration of missing data in seconds.
+            stimuli: stimuli drawn before every flip, e.g. a VideoStim.
+                Default is None (only the stimuli with autoDraw are shown).
 
         Returns:
-            lt (float): The looking time in the trial.
+            lt (float): The looking time in the trial. It is also added to
+            looking_times, so it can be compared with LookingTimeScorer.
         """
+        start = get_system_time_stamp()
         trial_timer = core.Clock()
         absence_timer = core.Clock()
         away_time = []
@@ -1519,42 +2566,48 @@ class TobiiInfantController(TobiiController):
         absence_timer.reset()
 
         while trial_timer.getTime() <= max_time:
-            gaze_data = self.gaze_data[-1]
-            lv = gaze_data["left_gaze_point_validity"]
-            rv = gaze_data["right_gaze_point_validity"]
-
-            if any((lv, rv)):
-                # if the last sample is missing
-                if not looking:
-                    away_dur = absence_timer.getTime()
-                    if away_dur >= min_away:
+            with self.profiler.span("collect_lt iteration"):
+                gaze_data = self.gaze_data[-1]
+                self._mark_consumed(gaze_data)
+                lv = gaze_data["left_gaze_point_validity"]
+                rv = gaze_data["right_gaze_point_validity"]
+
+                if any((lv, rv)):
+                    # if the last sample is missing
+                    if not looking:
+                        away_dur = absence_timer.getTime()
+                        if away_dur >= min_away:
+                            away_time.append(away_dur)
+                            lt = trial_timer.getTime() - np.sum(away_time)
+                            # stop the trial
+                            return self._log_lt(start, max_time, min_away,
+                                                blink_dur, lt)
+                        elif away_dur >= blink_dur:
+                            away_time.append(away_dur)
+                        # if missing samples are tolerable
+                        else:
+                            pass
+                    looking = True
+                    absence_timer.reset()
+                else:
+                    if absence_timer.getTime() >= min_away:
+                        away_dur = absence_timer.getTime()
                         away_time.append(away_dur)
                         lt = trial_timer.getTime() - np.sum(away_time)
-                        # stop the trial
-                        return round(lt, 3)
-                    elif away_dur >= blink_dur:
-                        away_time.append(away_dur)
-                    # if missing samples are tolerable
+                        # terminate the trial
+                        return self._log_lt(start, max_time, min_away,
+                                            blink_dur, lt)
                     else:
                         pass
-                looking = True
-                absence_timer.reset()
-            else:
-                if absence_timer.getTime() >= min_away:
-                    away_dur = absence_timer.getTime()
-                    away_time.append(away_dur)
-                    lt = trial_timer.getTime() - np.sum(away_time)
-                    # terminate the trial
-                    return round(lt, 3)
-                else:
-                    pass
-                looking = False
+                    looking = False
 
-            self.win.flip()
+                for stim in stimuli or ():
+                    stim.draw()
+                self.win.flip()
         # if the loop is completed, return the looking time
         else:
             lt = max_time - np.sum(away_time)
-            return round(lt, 3)
+            return self._log_lt(start, max_time, min_away, blink_dur, lt)
 
 
 # backward compatible
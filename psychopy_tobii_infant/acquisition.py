@@ -0,0 +1,764 @@
+"""Acquisition of the gaze data in a dedicated process."""
+import itertools
+import pickle
+import sys
+import threading
+import traceback
+from collections.abc import Sequence
+from contextlib import contextmanager
+from functools import partial
+
+from .feed import FIELDS, GazeFeedReader
+from .trials import END_EVENT, START_EVENT
+
+EYES = ("left", "right")
+# the values of the samples besides those converted to the window (FIELDS),
+# so the samples can be rebuilt in the experiment
+SAMPLE_FIELDS = ("callback_time_stamp", ) + tuple(
+    "{}_{}".format(eye, name) for eye in EYES
+    for name in ("display_x", "display_y", "point_x", "point_y", "point_z",
+                 "origin_x", "origin_y", "origin_z", "origin_validity",
+                 "pupil_diameter", "pupil_validity"))
+ACQUISITION_FIELDS = FIELDS + SAMPLE_FIELDS
+
+
+def sample_values(gaze_data):
+    """Get the values of SAMPLE_FIELDS of a sample, but the callback time.
+
+    Args:
+        gaze_data: gaze data provided by the eye tracker.
+
+    Returns:
+        tuple
+    """
+    values = []
+    for eye in EYES:
+        values.extend(gaze_data[eye + "_gaze_point_on_display_area"])
+        values.extend(gaze_data[eye + "_gaze_point_in_user_coordinate_system"])
+        values.extend(
+            gaze_data[eye + "_gaze_origin_in_user_coordinate_system"])
+        values.append(gaze_data[eye + "_gaze_origin_validity"])
+        values.append(gaze_data[eye + "_pupil_diameter"])
+        values.append(gaze_data[eye + "_pupil_validity"])
+    return tuple(values)
+
+
+def row_to_sample(row):
+    """Rebuild the gaze data of a row of the acquisition feed.
+
+    Args:
+        row: a row with ACQUISITION_FIELDS.
+
+    Returns:
+        dict with the keys of the gaze data of the Tobii SDK used by the
+        controller.
+    """
+    sample = {
+        "system_time_stamp": int(row["system_time_stamp"]),
+        "device_time_stamp": int(row["device_time_stamp"]),
+    }
+    for eye in EYES:
+
+        def point(*names):
+            return tuple(float(row[eye + "_" + name]) for name in names)
+
+        sample.update({
+            eye + "_gaze_point_on_display_area":
+            point("display_x", "display_y"),
+            eye + "_gaze_point_in_user_coordinate_system":
+            point("point_x", "point_y", "point_z"),
+            eye + "_gaze_point_validity": int(row[eye + "_validity"]),
+            eye + "_pupil_diameter": float(row[eye + "_pupil_diameter"]),
+            eye + "_pupil_validity": int(row[eye + "_pupil_validity"]),
+            eye + "_gaze_origin_in_user_coordinate_system":
+            point("origin_x", "origin_y", "origin_z"),
+            eye + "_gaze_origin_validity": int(row[eye + "_origin_validity"]),
+        })
+    return sample
+
+
+class MonitorGeometry:
+    """The calibration of a monitor used by UnitConverter, without PsychoPy.
+
+    Args:
+        name: the name of the monitor.
+        width: the width of the screen in cm.
+        distance: the viewing distance in cm.
+        size_pix: the size of the screen in pixels.
+    """
+    def __init__(self, name, width, distance, size_pix):
+        self.name = name
+        self.width = width
+        self.distance = distance
+        self.size_pix = None if size_pix is None else tuple(size_pix)
+
+    @classmethod
+    def from_monitor(cls, monitor):
+        """Copy the calibration of a psychopy.monitors.Monitor.
+
+        Args:
+            monitor: psychopy.monitors.Monitor object.
+
+        Returns:
+            MonitorGeometry
+        """
+        return cls(getattr(monitor, "name", None), monitor.getWidth(),
+                   monitor.getDistance(), monitor.getSizePix())
+
+    def getWidth(self):
+        return self.width
+
+    def getDistance(self):
+        return self.distance
+
+    def getSizePix(self):
+        return self.size_pix
+
+
+class WindowGeometry:
+    """The properties of a window used to convert and write the gaze data.
+
+        It replaces the window in the acquisition process, which does not
+        import PsychoPy.
+
+    Args:
+        size: the size of the window in pixels.
+        units: the units of the window.
+        monitor: MonitorGeometry of the monitor. Default is None.
+    """
+    def __init__(self, size, units, monitor=None):
+        self.size = tuple(int(x) for x in size)
+        self.units = units
+        self.monitor = monitor
+
+    @classmethod
+    def from_window(cls, win):
+        """Copy the properties of a window.
+
+        Args:
+            win: psychopy.visual.Window object.
+
+        Returns:
+            WindowGeometry
+        """
+        monitor = getattr(win, "monitor", None)
+        return cls(win.size, win.units,
+                   None if monitor is None else
+                   MonitorGeometry.from_monitor(monitor))
+
+
+class FeedSamples(Sequence):
+    """The samples of a recording in the acquisition feed.
+
+        The samples are read from the shared memory when they are accessed,
+        as dicts like the gaze data of the Tobii SDK. Only the latest
+        samples (the capacity of the feed) are kept; an older sample raises
+        IndexError.
+
+    Args:
+        reader: GazeFeedReader of the acquisition feed.
+        n: the number of samples. If None, all samples published since
+            start, so the sequence grows during recording. Default is None.
+        start: the sequence number of the first sample. Default is 0.
+    """
+    __slots__ = ("_reader", "_n", "_start")
+
+    def __init__(self, reader, n=None, start=0):
+        self._reader = reader
+        self._n = n
+        self._start = start
+
+    def __len__(self):
+        if self._n is not None:
+            return self._n
+        return max(0, self._reader.sequence - self._start)
+
+    def __getitem__(self, index):
+        n = len(self)
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(n))]
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("sample index out of range")
+        row = self._reader.get(self._start + index)
+        if row is None:
+            raise IndexError(
+                "sample {} was overwritten in the acquisition feed".format(
+                    index))
+        return row_to_sample(row)
+
+    def view(self, start, stop):
+        """Get a range of the samples.
+
+        Args:
+            start, stop: the range of the samples.
+
+        Returns:
+            FeedSamples object.
+        """
+        start, stop, _ = slice(start, stop).indices(len(self))
+        return FeedSamples(self._reader, max(start, stop) - start,
+                           self._start + start)
+
+    def snapshot(self):
+        """Get the samples published so far.
+
+        Args:
+            None
+
+        Returns:
+            FeedSamples object which does not grow.
+        """
+        if self._n is not None:
+            return self
+        return FeedSamples(self._reader, len(self), self._start)
+
+
+def _start(controller, validation_result_buffers=None, **kwargs):
+    if validation_result_buffers is not None:
+        controller.validation_result_buffers = validation_result_buffers
+    start = controller.gaze_feed.sequence
+    controller.start_recording(**kwargs)
+    return start, controller.t0
+
+
+def _stop(controller, audio_latency_header=None):
+    controller.audio_latency_header = audio_latency_header
+    controller.stop_recording()
+    n = len(controller.gaze_data)
+    return n, controller.archive_samples(n)
+
+
+def _event(controller, t, event):
+    controller.event_data.append([t, event])
+
+
+def _start_trial(controller, name, t, metadata):
+    controller.trials.start(name, t, **metadata)
+    controller.event_data.append([t, START_EVENT + name])
+
+
+def _end_trial(controller, t, metadata):
+    trial = controller.trials.end(t, **metadata)
+    controller.event_data.append([t, END_EVENT + trial.name])
+
+
+def _fsync_stats(controller, percentiles):
+    return controller.get_fsync_stats(percentiles)
+
+
+def _start_latency_monitor(controller, bin_width, max_value):
+    controller.start_latency_monitor(bin_width, max_value)
+
+
+def _consume(controller, system_time_stamp, now):
+    if controller.latency_monitor is not None:
+        controller.latency_monitor.consume(
+            {"system_time_stamp": system_time_stamp}, now)
+
+
+def _latency_stats(controller, percentiles):
+    return controller.get_latency_stats(percentiles)
+
+
+def _latency_array(controller):
+    return controller.latency_monitor.to_array()
+
+
+def _start_quality_monitor(controller, window, sampling_rate):
+    controller.start_quality_monitor(window, sampling_rate)
+
+
+def _stop_quality_monitor(controller):
+    controller.stop_quality_monitor()
+
+
+def _data_quality(controller):
+    return controller.get_data_quality()
+
+
+def _send_firing(conn, key, trigger):
+    conn.send((key, trigger.sample, trigger.fire_time))
+
+
+def _add_trigger(controller, key, trigger):
+    trigger.callback = partial(_send_firing, controller.firings, key)
+    controller.remote_triggers[key] = trigger
+    controller.add_gaze_trigger(trigger)
+
+
+def _remove_trigger(controller, key):
+    if key is None:
+        controller.remote_triggers.clear()
+        controller.remove_gaze_trigger()
+        return
+    trigger = controller.remote_triggers.pop(key, None)
+    if trigger is not None:
+        controller.remove_gaze_trigger(trigger)
+
+
+def _reset_trigger(controller, key):
+    trigger = controller.remote_triggers.get(key)
+    if trigger is not None:
+        trigger.reset()
+
+
+def _close(controller):
+    if controller.datafile is None:
+        # nothing was recorded, e.g. the experiment failed before
+        # start_recording() or exits normally
+        controller.stop_gaze_feed()
+        return
+    controller.close()
+
+
+_COMMANDS = {
+    "start": _start,
+    "stop": _stop,
+    "event": _event,
+    "start_trial": _start_trial,
+    "end_trial": _end_trial,
+    "fsync_stats": _fsync_stats,
+    "start_latency_monitor": _start_latency_monitor,
+    "consume": _consume,
+    "latency_stats": _latency_stats,
+    "latency_array": _latency_array,
+    "start_quality_monitor": _start_quality_monitor,
+    "stop_quality_monitor": _stop_quality_monitor,
+    "data_quality": _data_quality,
+    "add_trigger": _add_trigger,
+    "remove_trigger": _remove_trigger,
+    "reset_trigger": _reset_trigger,
+    "close": _close,
+}
+
+
+def _reply(conn, status, value):
+    try:
+        conn.send((status, value))
+    except Exception:
+        # e.g. an exception which cannot be pickled
+        conn.send(("error", RuntimeError(repr(value))))
+
+
+def serve(conn, controller):
+    """Run the commands of AcquisitionProcess in the acquisition process.
+
+        The events and the trials are given the times of the experiment;
+        the other commands call the methods of the controller, whose
+        exceptions are raised in the experiment.
+
+    Args:
+        conn: the connection to the experiment.
+        controller: the controller acquiring the gaze data, which publishes
+            every sample into controller.gaze_feed. The gaze triggers added
+            by the experiment are kept in controller.remote_triggers and
+            send their firings through controller.firings.
+
+    Returns:
+        None
+    """
+    _reply(conn, "ready", controller.gaze_feed.name)
+    while True:
+        try:
+            command, args, kwargs, reply = conn.recv()
+        except EOFError:
+            # the experiment has exited
+            command, args, kwargs, reply = "close", (), {}, False
+        try:
+            result = _COMMANDS[command](controller, *args, **kwargs)
+        except Exception as e:
+            if reply:
+                _reply(conn, "error", e)
+            else:
+                traceback.print_exc()
+        else:
+            if reply:
+                _reply(conn, "ok", result)
+        if command == "close":
+            return
+
+
+@contextmanager
+def _without_main_script():
+    """Start processes without running the script of the experiment.
+
+        A spawned process runs the main script again unless it is guarded
+        by if __name__ == "__main__", which experiment scripts (e.g. those
+        of PsychoPy Builder) usually are not. The acquisition process does
+        not need the script.
+    """
+    main = sys.modules["__main__"]
+    saved = {
+        key: main.__dict__[key]
+        for key in ("__file__", "__spec__") if key in main.__dict__
+    }
+    main.__dict__.pop("__file__", None)
+    main.__spec__ = None
+    try:
+        yield
+    finally:
+        main.__dict__.pop("__spec__", None)
+        main.__dict__.update(saved)
+
+
+class AcquisitionProcess:
+    """Acquire the gaze data in a dedicated process.
+
+        The subscription to the gaze data, the buffering of the samples,
+        their conversion and the writing of the data file run in a child
+        process, which does not share the GIL with the rendering of the
+        experiment. Every sample is published into a GazeFeed with
+        ACQUISITION_FIELDS, from which the experiment reads only the
+        samples it asks for (see FeedSamples). The commands are sent
+        through a pipe. The gaze triggers and the latency and quality
+        monitors also run in the process (see RemoteTriggerEngine,
+        RemoteLatencyMonitor and RemoteQualityMonitor); the firings of the
+        triggers come back through a second pipe, on which a thread of the
+        experiment waits without polling.
+
+        The process is spawned without running the script of the
+        experiment again, so the arguments of target must be picklable
+        from the modules of the package or other importable modules.
+
+    Args:
+        target: the function run in the process, called with the connection
+            of the commands, the connection of the firings and args. It
+            creates the GazeFeed and calls serve().
+        *args: the arguments of target.
+
+    Attributes:
+        feed_name: the name of the acquisition feed, after start().
+        reader: GazeFeedReader of the feed, after start().
+        triggers: dict of the gaze triggers evaluated in the process, by
+            their keys.
+    """
+    def __init__(self, target, *args):
+        self.target = target
+        self.args = args
+        self.process = None
+        self.feed_name = None
+        self.reader = None
+        self.triggers = {}
+        self._readers = []
+        self._conn = None
+        self._firings = None
+        self._listener = None
+
+    def start(self, timeout=60.0):
+        """Start the process and wait until it is ready.
+
+        Args:
+            timeout: the time to wait in seconds. Default is 60.
+
+        Returns:
+            None
+        """
+        import multiprocessing
+
+        context = multiprocessing.get_context("spawn")
+        self._conn, child_conn = context.Pipe()
+        self._firings, child_firings = context.Pipe(duplex=False)
+        self.process = context.Process(target=self.target,
+                                       args=(child_conn, child_firings) +
+                                       self.args,
+                                       name="acquisition",
+                                       daemon=True)
+        with _without_main_script():
+            self.process.start()
+        child_conn.close()
+        child_firings.close()
+        self._listener = threading.Thread(target=self._listen,
+                                          name="acquisition firings",
+                                          daemon=True)
+        self._listener.start()
+        if not self._conn.poll(timeout):
+            self.process.terminate()
+            raise RuntimeError("The acquisition process did not start.")
+        try:
+            self.feed_name = self._receive()
+        except Exception:
+            self.process.join()
+            raise
+        self.reader = GazeFeedReader(self.feed_name, start="oldest")
+
+    def attach(self, name):
+        """Read another feed of the process, e.g. the samples of a recording.
+
+        Args:
+            name: the name of the feed.
+
+        Returns:
+            GazeFeedReader, closed by close().
+        """
+        reader = GazeFeedReader(name, start="oldest")
+        self._readers.append(reader)
+        return reader
+
+    def _listen(self):
+        """Fire the triggers fired in the process, until it exits."""
+        while True:
+            try:
+                key, sample, fire_time = self._firings.recv()
+            except (EOFError, OSError):
+                return
+            trigger = self.triggers.get(key)
+            if trigger is None:
+                # removed in the meantime
+                continue
+            try:
+                trigger._fire(sample, fire_time)
+            except Exception:
+                # an error in the callback must not stop the other triggers
+                traceback.print_exc()
+
+    def _receive(self):
+        try:
+            status, value = self._conn.recv()
+        except EOFError:
+            raise RuntimeError("The acquisition process has exited.")
+        if status == "error":
+            raise value
+        return value
+
+    def send(self, command, *args, **kwargs):
+        """Send a command without waiting for it.
+
+        Args:
+            command: the name of the command (see serve).
+            *args, **kwargs: the arguments of the command.
+
+        Returns:
+            None
+        """
+        self._conn.send((command, args, kwargs, False))
+
+    def request(self, command, *args, **kwargs):
+        """Run a command and wait for the result.
+
+        Args:
+            command: the name of the command (see serve).
+            *args, **kwargs: the arguments of the command.
+
+        Returns:
+            The result of the command; its exception is raised.
+        """
+        self._conn.send((command, args, kwargs, True))
+        return self._receive()
+
+    @property
+    def alive(self):
+        return self.process is not None and self.process.is_alive()
+
+    def close(self, timeout=10.0):
+        """Close the controller of the process and wait for it to exit.
+
+        Args:
+            timeout: the time to wait in seconds. Default is 10.
+
+        Returns:
+            None
+        """
+        if self._conn is None:
+            return
+        try:
+            if self.alive:
+                self.request("close")
+        finally:
+            self._conn.close()
+            self._conn = None
+            if self.reader is not None:
+                self.reader.close()
+            for reader in self._readers:
+                reader.close()
+            self._readers = []
+            self.process.join(timeout)
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join(timeout)
+            # the listener returns when the pipe of the firings is closed by
+            # the exit of the process
+            self._listener.join(timeout)
+            self._firings.close()
+            self.triggers.clear()
+
+
+class RemoteTriggerEngine:
+    """The gaze triggers evaluated in the acquisition process.
+
+        It replaces GazeTriggerEngine with acquisition="process". A copy of
+        each trigger, without its callback, is evaluated for every sample in
+        the process, which sends back only its firings; the trigger is then
+        fired in the experiment, and its callback called, on the thread of
+        AcquisitionProcess waiting for the firings. The predicate of a
+        PredicateTrigger must be picklable, e.g. a function of an importable
+        module.
+
+    Args:
+        process: AcquisitionProcess object.
+    """
+    def __init__(self, process):
+        self.process = process
+        self._keys = itertools.count()
+
+    @property
+    def triggers(self):
+        return tuple(self.process.triggers.values())
+
+    def add(self, trigger):
+        """Register a trigger.
+
+        Args:
+            trigger: GazeTrigger object.
+
+        Returns:
+            The trigger.
+        """
+        key = next(self._keys)
+        # registered first, so an immediate firing is not lost
+        self.process.triggers[key] = trigger
+        try:
+            self.process.request("add_trigger", key, trigger)
+        except (pickle.PicklingError, AttributeError, TypeError) as e:
+            del self.process.triggers[key]
+            raise ValueError(
+                "The trigger cannot be sent to the acquisition process: "
+                "{}".format(e))
+        except Exception:
+            del self.process.triggers[key]
+            raise
+        trigger._reset_hook = partial(self.process.send, "reset_trigger", key)
+        return trigger
+
+    def remove(self, trigger):
+        """Unregister a trigger.
+
+        Args:
+            trigger: GazeTrigger object.
+
+        Returns:
+            None
+        """
+        for key, x in list(self.process.triggers.items()):
+            if x is trigger:
+                del self.process.triggers[key]
+                trigger._reset_hook = None
+                self.process.send("remove_trigger", key)
+
+    def clear(self):
+        """Unregister all triggers."""
+        for trigger in self.process.triggers.values():
+            trigger._reset_hook = None
+        self.process.triggers.clear()
+        self.process.send("remove_trigger", None)
+
+
+class RemoteLatencyMonitor:
+    """The latency monitor of the acquisition process.
+
+        It replaces LatencyMonitor with acquisition="process". The samples
+        are recorded by a LatencyMonitor in the process, which writes its
+        summary in the header of each session. The frame loop only sends
+        the time it first reads a sample, without waiting for the process.
+
+    Args:
+        process: AcquisitionProcess object.
+        clock: a function returning the current time in the eye tracker's
+            system clock (microseconds).
+        bin_width: see LatencyMonitor.
+        max_value: see LatencyMonitor.
+    """
+    def __init__(self, process, clock, bin_width=0.1, max_value=200.0):
+        self.process = process
+        self.clock = clock
+        self._consumed = None
+        process.request("start_latency_monitor", bin_width, max_value)
+
+    def reset(self):
+        """Start a new session. The process resets its monitor by itself at
+        every start_recording().
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self._consumed = None
+
+    def consume(self, gaze_data):
+        """Record the first read of a sample by the frame loop.
+
+        Args:
+            gaze_data: the sample read by the frame loop.
+
+        Returns:
+            None
+        """
+        t = gaze_data["system_time_stamp"]
+        if t == self._consumed:
+            # only the first read is recorded
+            return
+        self._consumed = t
+        self.process.send("consume", t, self.clock())
+
+    def summary(self, percentiles=(50, 95, 99)):
+        """Summarize the latencies of the current session.
+
+        Args:
+            percentiles: the percentiles to report. Default is (50, 95, 99).
+
+        Returns:
+            See LatencyMonitor.summary.
+        """
+        return self.process.request("latency_stats", percentiles)
+
+    def to_array(self):
+        """Get the per-sample time points.
+
+        Args:
+            None
+
+        Returns:
+            See LatencyMonitor.to_array.
+        """
+        return self.process.request("latency_array")
+
+
+class RemoteQualityMonitor:
+    """The data quality monitor of the acquisition process.
+
+        It replaces DataQualityMonitor with acquisition="process"; the
+        summary is computed in the process when it is requested.
+
+    Args:
+        process: AcquisitionProcess object.
+        window: see DataQualityMonitor.
+        sampling_rate: see DataQualityMonitor.
+    """
+    def __init__(self, process, window=1.0, sampling_rate=60):
+        self.process = process
+        process.request("start_quality_monitor", window, sampling_rate)
+
+    def reset(self):
+        """Start a new session. The process resets its monitor by itself at
+        every start_recording().
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+
+    def summary(self):
+        """Summarize the data quality in the sliding window.
+
+        Args:
+            None
+
+        Returns:
+            See DataQualityMonitor.summary.
+        """
+        return self.process.request("data_quality")
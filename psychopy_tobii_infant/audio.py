@@ -0,0 +1,232 @@
+"""Preloaded sounds for the calibration, played from a worker thread."""
+import queue
+import random
+import threading
+
+import numpy as np
+
+from .simulation import get_system_time_stamp
+
+
+class AudioPool:
+    """Sounds of the calibration points, loaded before the calibration.
+
+        The sounds are loaded (and played once silently, so the audio
+        backend is started) by prepare(). play() and pause() only queue a
+        command for a worker thread, so they never block the frame loop.
+        The onset latency of every sound, from the call of play() to the
+        return of Sound.play() in the worker thread, is measured on the
+        clock of the eye tracker and kept in log. It does not include the
+        output latency of the audio device.
+
+    Args:
+        sounds: list of psychopy.sound.Sound objects or file names (or a
+            single one).
+        order: how the sounds are assigned to the calibration points:
+            "point" (the sound of the same index, repeated if there are
+            fewer sounds than points), "shuffle" (as "point" after shuffling
+            the sounds in prepare()) or "random" (a random sound at each
+            play). Default is "point".
+        seed: the seed of the random order. Default is None.
+        clock: function returning the current time in microseconds. Default
+            is None (the clock of tobii_research, see
+            simulation.get_system_time_stamp).
+        prime: whether to play every sound silently in prepare(). Default
+            is True.
+
+    Attributes:
+        log: list of dicts with the keys point, sound (its index),
+            requested and started (timestamps in microseconds) and latency
+            (in milliseconds).
+    """
+    orders = ("point", "shuffle", "random")
+
+    def __init__(self,
+                 sounds,
+                 order="point",
+                 seed=None,
+                 clock=None,
+                 prime=True):
+        if order not in self.orders:
+            raise ValueError("order ({}) is not supported.".format(order))
+        if not isinstance(sounds, (list, tuple)):
+            sounds = [sounds]
+        if len(sounds) == 0:
+            raise ValueError("No sounds in the pool.")
+        self.sounds = list(sounds)
+        self.order = order
+        self.clock = clock
+        self.prime = prime
+        self.log = []
+        self._random = random.Random(seed)
+        self._permutation = list(range(len(self.sounds)))
+        self._current = None
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def prepare(self):
+        """Load the sounds and start the worker thread.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        if self.clock is None:
+            self.clock = get_system_time_stamp
+        for i, sound in enumerate(self.sounds):
+            if isinstance(sound, str):
+                from psychopy import sound as psychopy_sound
+                self.sounds[i] = sound = psychopy_sound.Sound(sound)
+            if self.prime:
+                volume = getattr(sound, "volume", 1.0)
+                sound.setVolume(0)
+                sound.play()
+                sound.stop()
+                sound.setVolume(volume)
+        if self.order == "shuffle":
+            self._random.shuffle(self._permutation)
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def sound_index(self, point):
+        """Get the index of the sound of a calibration point.
+
+        Args:
+            point: the index of the calibration point.
+
+        Returns:
+            int
+        """
+        n = len(self.sounds)
+        if self.order == "random":
+            return self._random.randrange(n)
+        return self._permutation[point % n]
+
+    def play(self, point=0):
+        """Start the sound of a calibration point (without blocking).
+
+        Args:
+            point: the index of the calibration point. Default is 0.
+
+        Returns:
+            None
+        """
+        if self._thread is None:
+            self.prepare()
+        self._queue.put(("play", point, self.sound_index(point),
+                         self.clock()))
+
+    def pause(self):
+        """Pause the current sound (without blocking).
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self._queue.put(("pause", None, None, None))
+
+    def stop(self):
+        """Stop the current sound (without blocking).
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self._queue.put(("stop", None, None, None))
+
+    def close(self):
+        """Stop the sound and the worker thread.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        if self._thread is None:
+            return
+        self._queue.put(("stop", None, None, None))
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def wait(self):
+        """Wait until the queued commands are done.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self._queue.join()
+
+    def _run(self):
+        while True:
+            command = self._queue.get()
+            try:
+                if command is None:
+                    return
+                self._execute(*command)
+            finally:
+                self._queue.task_done()
+
+    def _execute(self, action, point, index, requested):
+        current = self._current
+        if action == "play":
+            sound = self.sounds[index]
+            if current is not None and current is not sound:
+                current.stop()
+            sound.play()
+            started = self.clock()
+            self._current = sound
+            self.log.append({
+                "point": point,
+                "sound": index,
+                "requested": requested,
+                "started": started,
+                "latency": (started - requested) / 1000.0,
+            })
+        elif current is not None:
+            if action == "pause":
+                current.pause()
+            else:
+                current.stop()
+                self._current = None
+
+    def summary(self):
+        """Get the statistics of the onset latency.
+
+        Args:
+            None
+
+        Returns:
+            dict with the keys n, mean and max (in milliseconds).
+        """
+        latency = np.array([x["latency"] for x in self.log], dtype=float)
+        if len(latency) == 0:
+            return {"n": 0, "mean": np.nan, "max": np.nan}
+        return {
+            "n": len(latency),
+            "mean": float(latency.mean()),
+            "max": float(latency.max())
+        }
+
+    def format_header(self):
+        """Format the latency statistics for the header of the data file.
+
+        Args:
+            None
+
+        Returns:
+            str
+        """
+        return ("Calibration audio latency (ms):\tn={n}\tmean={mean:.3f}\t"
+                "max={max:.3f}\n".format(**self.summary()))
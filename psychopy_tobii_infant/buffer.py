@@ -0,0 +1,296 @@
+"""Compact buffers for the data streamed by the eye tracker."""
+from collections.abc import Sequence
+
+import numpy as np
+
+
+class ChunkedBuffer:
+    """A growable table of numeric rows stored in preallocated chunks.
+
+        Appending never copies the rows already stored: when a chunk is full,
+        a new one is allocated. The buffer is designed for a single producer
+        (the callback of the Tobii SDK) and any number of readers. The row
+        count is increased only after a row is written, so readers never see
+        a partially written row.
+
+    Args:
+        columns: the names of the columns.
+        chunk_size: the number of rows per chunk. Default is 4096.
+        dtype: the data type of the values. Default is numpy.float64.
+    """
+    def __init__(self, columns, chunk_size=4096, dtype=np.float64):
+        self.columns = tuple(columns)
+        self.chunk_size = chunk_size
+        self.dtype = np.dtype(dtype)
+        self._col_index = {c: i for i, c in enumerate(self.columns)}
+        self.clear()
+
+    def clear(self):
+        """Remove all rows.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self._chunks = []
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    def _new_chunk(self):
+        chunk = np.empty((self.chunk_size, len(self.columns)), self.dtype)
+        if self.dtype.kind == "f":
+            chunk.fill(np.nan)
+        return chunk
+
+    def append(self, row):
+        """Append a row.
+
+        Args:
+            row: a sequence of values in the order of the columns.
+
+        Returns:
+            The index of the row.
+        """
+        n = self._n
+        i = n % self.chunk_size
+        if i == 0:
+            self._chunks.append(self._new_chunk())
+        self._chunks[n // self.chunk_size][i] = row
+        self._n = n + 1
+        return n
+
+    def get(self, index, column):
+        """Get a value.
+
+        Args:
+            index: the index of the row. Negative indices count from the end.
+            column: the name of the column.
+
+        Returns:
+            The value.
+        """
+        if index < 0:
+            index += self._n
+        if not 0 <= index < self._n:
+            raise IndexError("buffer index out of range")
+        return self._chunks[index // self.chunk_size][
+            index % self.chunk_size, self._col_index[column]]
+
+    def set(self, index, column, value):
+        """Set a value of a row which has been appended.
+
+        Args:
+            index: the index of the row. Negative indices count from the end.
+            column: the name of the column.
+            value: the new value.
+
+        Returns:
+            None
+        """
+        if index < 0:
+            index += self._n
+        if not 0 <= index < self._n:
+            raise IndexError("buffer index out of range")
+        self._chunks[index // self.chunk_size][
+            index % self.chunk_size, self._col_index[column]] = value
+
+    def to_array(self, start=0, stop=None):
+        """Get the rows as a single array.
+
+        Args:
+            start: the index of the first row. Default is 0.
+            stop: the index after the last row. If None, all rows appended so
+                far are included. Default is None.
+
+        Returns:
+            numpy.ndarray of shape (n_rows, n_columns). The rows are copied.
+        """
+        n = self._n
+        stop = n if stop is None else min(stop, n)
+        chunks = self._chunks[:]
+        if stop <= start:
+            return np.empty((0, len(self.columns)), self.dtype)
+        first, last = start // self.chunk_size, (stop - 1) // self.chunk_size
+        out = np.concatenate(chunks[first:last + 1])
+        offset = first * self.chunk_size
+        return out[start - offset:stop - offset]
+
+    def column(self, name, start=0, stop=None):
+        """Get a column as an array.
+
+        Args:
+            name: the name of the column.
+            start: the index of the first row. Default is 0.
+            stop: the index after the last row. Default is None (all rows).
+
+        Returns:
+            numpy.ndarray of shape (n_rows, ).
+        """
+        return self.to_array(start, stop)[:, self._col_index[name]]
+
+
+class SampleView(Sequence):
+    """A read-only view of the samples of a SampleStore.
+
+        The view only covers the samples appended before it was taken, so it
+        does not change while the producer keeps appending.
+
+    Args:
+        samples: the list of samples.
+        n: the end of the view in the list. If None, the whole list; this is
+            used for lists to which nothing is appended anymore.
+        start: the start of the view in the list. Default is 0.
+    """
+    __slots__ = ("_samples", "_n", "_start")
+
+    def __init__(self, samples, n=None, start=0):
+        self._samples = samples
+        self._n = n
+        self._start = start
+
+    def __len__(self):
+        n = len(self._samples) if self._n is None else self._n
+        return max(0, n - self._start)
+
+    def __getitem__(self, index):
+        n = len(self)
+        if isinstance(index, slice):
+            start, stop, step = index.indices(n)
+            if step < 0:
+                # stop may be -1 (before the first sample), which cannot be
+                # shifted into the list
+                return [self._samples[self._start + i]
+                        for i in range(start, stop, step)]
+            return self._samples[self._start + start:self._start + stop:step]
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("sample index out of range")
+        return self._samples[self._start + index]
+
+    def view(self, start, stop):
+        """Get a view of a range of the samples, without copying them.
+
+        Args:
+            start, stop: the range of the samples in this view.
+
+        Returns:
+            SampleView object.
+        """
+        start, stop, _ = slice(start, stop).indices(len(self))
+        return SampleView(self._samples, self._start + max(start, stop),
+                          self._start + start)
+
+    def snapshot(self):
+        """Get a view of the samples.
+
+        Args:
+            None
+
+        Returns:
+            The view itself.
+        """
+        return self
+
+
+class SampleStore:
+    """The samples of a recording, appended by one thread and read by others.
+
+        The producer (the callback of the Tobii SDK) appends to a list, which
+        is never reordered or shortened while it is current, so an append
+        needs no lock and a sample once seen by a reader never changes. A
+        consistent snapshot is the list with its length at the time of the
+        snapshot; taking one does not copy the samples. swap() gives the
+        producer a new list and returns a view of the old one, which the
+        readers can use (e.g. to write the data file) while the producer
+        appends to the new list.
+
+    Attributes:
+        swaps: the number of times swap() was called.
+    """
+    def __init__(self):
+        self._samples = []
+        self._append = self._samples.append
+        self.swaps = 0
+
+    def append(self, sample):
+        """Append a sample. Called by the producer only.
+
+        Args:
+            sample: the sample.
+
+        Returns:
+            None
+        """
+        # the bound method is read once, so the sample goes to either the
+        # old or the new list if swap() is called at the same time
+        self._append(sample)
+
+    def __len__(self):
+        return len(self._samples)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return self.snapshot()[index]
+        return self._samples[index]
+
+    def __iter__(self):
+        return iter(self.snapshot())
+
+    def latest(self):
+        """Get the newest sample.
+
+        Args:
+            None
+
+        Returns:
+            The sample, or None if no samples were appended.
+        """
+        samples = self._samples
+        return samples[-1] if samples else None
+
+    def view(self, start, stop):
+        """Get a view of a range of the samples, without copying them.
+
+        Args:
+            start, stop: the range of the samples.
+
+        Returns:
+            SampleView object.
+        """
+        return self.snapshot().view(start, stop)
+
+    def snapshot(self):
+        """Get a consistent view of the samples appended so far.
+
+        Args:
+            None
+
+        Returns:
+            SampleView object.
+        """
+        samples = self._samples
+        return SampleView(samples, len(samples))
+
+    def swap(self):
+        """Give the producer a new empty list.
+
+            A call of append() in progress may still add its sample to the
+            old list, which is included in the returned view.
+
+        Args:
+            None
+
+        Returns:
+            SampleView object of the samples appended before the swap.
+        """
+        samples = self._samples
+        new = []
+        self._samples = new
+        self._append = new.append
+        self.swaps += 1
+        return SampleView(samples)
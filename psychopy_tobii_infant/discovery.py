@@ -0,0 +1,278 @@
+"""Finding and connecting to eye trackers, with a cache of the results."""
+import json
+import os
+import threading
+import time
+
+DEFAULT_CACHE_FILE = os.path.join(os.path.expanduser("~"),
+                                  ".psychopy_tobii_infant",
+                                  "eyetrackers.json")
+INFO_KEYS = ("address", "serial_number", "model", "device_name")
+
+
+def _find_all_eyetrackers():
+    import tobii_research as tr
+    return tr.find_all_eyetrackers()
+
+
+def _connect(address):
+    import tobii_research as tr
+    return tr.EyeTracker(address)
+
+
+class EyeTrackerFinder:
+    """Find eye trackers by address, serial number or index.
+
+        An address connects directly without discovery. A serial number is
+        looked up in the cache of the latest discovery, so the eye tracker
+        is found quickly and regardless of the order of discovery; if it is
+        not cached (or the connection fails), the eye trackers are
+        discovered again. An index keeps the behavior of earlier versions
+        and always needs discovery.
+
+        Discovery can take seconds, so it can be started in the background
+        with prefetch() while the experiment is set up.
+
+    Args:
+        discover: function returning a list of eye tracker objects. Default
+            is tobii_research.find_all_eyetrackers.
+        connect: function returning the eye tracker object of an address.
+            Default is tobii_research.EyeTracker.
+        cache_file: the JSON file of the cached discovery results. None
+            disables the cache. Default is DEFAULT_CACHE_FILE.
+        ttl: the time in seconds the cached results are used. Default is
+            86400 (a day).
+
+    Attributes:
+        timings: dict of the durations (in seconds) of the latest
+            "discovery", "connect" and "find", and "cache", which is "hit",
+            "miss" or "stale".
+    """
+    def __init__(self,
+                 discover=None,
+                 connect=None,
+                 cache_file=DEFAULT_CACHE_FILE,
+                 ttl=86400.0):
+        self.discover_func = discover or _find_all_eyetrackers
+        self.connect_func = connect or _connect
+        self.cache_file = cache_file
+        self.ttl = ttl
+        self.timings = {}
+        self._eyetrackers = None
+        self._thread = None
+        self._error = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_eyetrackers(cls, *eyetrackers):
+        """Create a finder of the given eye tracker objects.
+
+            E.g. to run a controller with SimulatedEyeTracker or
+            ReplayEyeTracker. The finder does not use the cache.
+
+        Args:
+            eyetrackers: the eye tracker objects.
+
+        Returns:
+            EyeTrackerFinder
+        """
+        addresses = {et.address: et for et in eyetrackers}
+
+        def connect(address):
+            try:
+                return addresses[address]
+            except KeyError:
+                raise ValueError(
+                    "Eyetracker {} is not found.".format(address))
+
+        return cls(lambda: list(eyetrackers), connect, cache_file=None)
+
+    def discover(self):
+        """Discover the eye trackers and cache the results.
+
+        Args:
+            None
+
+        Returns:
+            list of eye tracker objects.
+        """
+        start = time.perf_counter()
+        eyetrackers = list(self.discover_func())
+        self.timings["discovery"] = time.perf_counter() - start
+        with self._lock:
+            self._eyetrackers = eyetrackers
+        self._save_cache(eyetrackers)
+        return eyetrackers
+
+    def prefetch(self):
+        """Start discovering the eye trackers in the background.
+
+            Has no effects if the discovery is already running.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return
+            self._error = None
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        try:
+            self.discover()
+        except Exception as e:
+            self._error = e
+
+    def _discovered(self):
+        """Get the discovered eye trackers, waiting for the prefetch."""
+        thread = self._thread
+        if thread is not None:
+            thread.join()
+            if self._error is not None:
+                error, self._error = self._error, None
+                raise error
+        with self._lock:
+            eyetrackers = self._eyetrackers
+        if eyetrackers is None:
+            eyetrackers = self.discover()
+        return eyetrackers
+
+    def _load_cache(self):
+        """Read the cached eye trackers.
+
+        Args:
+            None
+
+        Returns:
+            list of dicts of INFO_KEYS, or None if there is no fresh cache.
+        """
+        if self.cache_file is None:
+            return None
+        try:
+            with open(self.cache_file, "r") as f:
+                cache = json.load(f)
+        except (OSError, ValueError):
+            self.timings["cache"] = "miss"
+            return None
+        if time.time() - cache.get("time", 0) > self.ttl:
+            self.timings["cache"] = "stale"
+            return None
+        self.timings["cache"] = "hit"
+        return cache.get("eyetrackers", [])
+
+    def _save_cache(self, eyetrackers):
+        if self.cache_file is None:
+            return
+        cache = {
+            "time": time.time(),
+            "eyetrackers": [{key: getattr(et, key, None)
+                             for key in INFO_KEYS} for et in eyetrackers]
+        }
+        try:
+            os.makedirs(os.path.dirname(os.path.abspath(self.cache_file)),
+                        exist_ok=True)
+            tmp = self.cache_file + ".tmp"
+            with open(tmp, "w") as f:
+                json.dump(cache, f, indent=1)
+            os.replace(tmp, self.cache_file)
+        except OSError:
+            # the cache is optional
+            pass
+
+    def _connect(self, address):
+        start = time.perf_counter()
+        eyetracker = self.connect_func(address)
+        self.timings["connect"] = time.perf_counter() - start
+        return eyetracker
+
+    def find(self, id=0):
+        """Get an eye tracker.
+
+        Args:
+            id: the address of the eye tracker (e.g.
+                "tobii-prp://TPNA1-030109123456"), its serial number or its
+                index in the discovered eye trackers. Default is 0.
+
+        Returns:
+            The eye tracker object.
+        """
+        start = time.perf_counter()
+        if isinstance(id, str) and "://" in id:
+            eyetracker = self._connect(id)
+        elif isinstance(id, str):
+            eyetracker = self._find_serial_number(id)
+        else:
+            eyetrackers = self._discovered()
+            if len(eyetrackers) == 0:
+                raise RuntimeError("No Tobii eyetrackers detected.")
+            try:
+                eyetracker = eyetrackers[id]
+            except IndexError:
+                raise ValueError(
+                    "Invalid eyetracker ID {}\n({} eyetrackers found)".format(
+                        id, len(eyetrackers)))
+        self.timings["find"] = time.perf_counter() - start
+        return eyetracker
+
+    def _find_serial_number(self, serial_number):
+        for info in self._load_cache() or []:
+            if info.get("serial_number") != serial_number:
+                continue
+            try:
+                eyetracker = self._connect(info["address"])
+            except Exception:
+                # e.g. the address changed; discover again
+                break
+            if getattr(eyetracker, "serial_number",
+                       serial_number) == serial_number:
+                return eyetracker
+            break
+
+        eyetrackers = self._discovered()
+        for eyetracker in eyetrackers:
+            if eyetracker.serial_number == serial_number:
+                return eyetracker
+        raise ValueError(
+            "Eyetracker {} is not found ({} eyetrackers found)".format(
+                serial_number, len(eyetrackers)))
+
+
+_default_finder = None
+
+
+def get_default_finder():
+    """Get the EyeTrackerFinder used by the controllers by default.
+
+    Args:
+        None
+
+    Returns:
+        EyeTrackerFinder
+    """
+    global _default_finder
+    if _default_finder is None:
+        _default_finder = EyeTrackerFinder()
+    return _default_finder
+
+
+def prefetch_eyetrackers():
+    """Start discovering the eye trackers in the background.
+
+        Call this early during the setup of the experiment (e.g. before
+        opening the window), so the controller does not wait for the
+        discovery.
+
+    Args:
+        None
+
+    Returns:
+        EyeTrackerFinder, the default finder.
+    """
+    finder = get_default_finder()
+    finder.prefetch()
+    return finder
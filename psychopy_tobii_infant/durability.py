@@ -0,0 +1,231 @@
+"""Policies deciding when the data file is synced to the disk."""
+import os
+import threading
+import time
+
+import numpy as np
+
+
+class DurabilityPolicy:
+    """Base class of the durability policies of DataFile.
+
+        DataFile notifies the policy of every write, of every commit point
+        (e.g. the end of a session) and of closing. The policy decides when
+        to call os.fsync(), which blocks until the data are on the disk and
+        can take long on network drives. Every fsync is timed, so the policies
+        can be compared on the storage at hand.
+
+    Attributes:
+        timings: list of (bytes, duration in milliseconds) of each fsync.
+    """
+    def __init__(self):
+        self.timings = []
+        self._lock = threading.Lock()
+        self._unsynced = 0
+
+    def __getstate__(self):
+        # a policy can be sent to the acquisition process, without its lock
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def attach(self, datafile):
+        """Called when a DataFile starts using the policy."""
+        self._unsynced = 0
+
+    def on_write(self, datafile, nbytes):
+        """Called after nbytes were written to the DataFile."""
+        self._unsynced += nbytes
+
+    def on_commit(self, datafile):
+        """Called at a commit point, after the DataFile was flushed."""
+        self.sync(datafile)
+
+    def on_close(self, datafile):
+        """Called when all data were flushed, before the file is closed."""
+        self.sync(datafile)
+
+    def sync(self, datafile):
+        """Sync the file to the disk and record the time it took.
+
+        Args:
+            datafile: the DataFile to sync. It must be flushed already.
+
+        Returns:
+            None
+        """
+        nbytes, self._unsynced = self._unsynced, 0
+        start = time.perf_counter()
+        os.fsync(datafile.fileno())
+        duration = (time.perf_counter() - start) * 1000.0
+        with self._lock:
+            self.timings.append((nbytes, duration))
+
+    def summary(self, percentiles=(50, 95, 99)):
+        """Summarize the durations of fsync.
+
+        Args:
+            percentiles: the percentiles to report. Default is (50, 95, 99).
+
+        Returns:
+            A dict with n, total, mean, max and p<q> for each percentile, in
+            milliseconds, and bytes, the amount of data synced.
+        """
+        with self._lock:
+            timings = np.array(self.timings, dtype=float).reshape(-1, 2)
+        durations = timings[:, 1]
+        result = {
+            "n": len(durations),
+            "bytes": int(timings[:, 0].sum()),
+            "total": float(durations.sum()),
+        }
+        for key, func in (("mean", np.mean), ("max", np.max)):
+            result[key] = float(func(durations)) if len(durations) else np.nan
+        for q in percentiles:
+            result["p{}".format(q)] = (float(np.percentile(durations, q))
+                                       if len(durations) else np.nan)
+        return result
+
+
+class SyncAlways(DurabilityPolicy):
+    """Sync at every commit point.
+
+        The data file is synced after its header, after the column header of
+        each session and at the end of each session. This is the default.
+    """
+
+
+class SyncPeriodic(DurabilityPolicy):
+    """Sync after an amount of data or time (group commit).
+
+        Commit points only flush the data to the operating system until
+        either limit is reached; the data written in between are synced
+        together.
+
+    Args:
+        nbytes: sync after this many bytes were written since the last sync.
+            Default is None (no limit).
+        interval: sync if this many seconds passed since the last sync.
+            Default is None (no limit).
+    """
+    def __init__(self, nbytes=None, interval=None):
+        super().__init__()
+        if nbytes is None and interval is None:
+            raise ValueError("Set nbytes or interval.")
+        self.nbytes = nbytes
+        self.interval = interval
+        self._last = time.perf_counter()
+
+    def attach(self, datafile):
+        super().attach(datafile)
+        self._last = time.perf_counter()
+
+    def _due(self):
+        if self.nbytes is not None and self._unsynced >= self.nbytes:
+            return True
+        return (self.interval is not None and
+                time.perf_counter() - self._last >= self.interval)
+
+    def on_write(self, datafile, nbytes):
+        super().on_write(datafile, nbytes)
+        if self._due():
+            datafile.flush()
+            self.sync(datafile)
+
+    def on_commit(self, datafile):
+        if self._due():
+            self.sync(datafile)
+
+    def sync(self, datafile):
+        super().sync(datafile)
+        self._last = time.perf_counter()
+
+
+class SyncOnClose(DurabilityPolicy):
+    """Sync only when the file is closed.
+
+        Commit points still flush the data to the operating system, so the
+        data survive a crash of the experiment but not of the computer.
+    """
+    def on_commit(self, datafile):
+        pass
+
+
+class SyncInBackground(DurabilityPolicy):
+    """Sync on a background thread.
+
+        Commit points flush the data to the operating system and wake up the
+        thread, which syncs the file without blocking the experiment. Commits
+        made while a sync is running or within interval after it are synced
+        together.
+
+    Args:
+        interval: the minimum time in seconds between syncs. Default is 1.
+    """
+    def __init__(self, interval=1.0):
+        super().__init__()
+        self.interval = interval
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._fd = None
+        self._pending = 0
+
+    def __getstate__(self):
+        state = super().__getstate__()
+        for key in ("_wake", "_stop", "_thread", "_fd"):
+            del state[key]
+        return state
+
+    def __setstate__(self, state):
+        super().__setstate__(state)
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._fd = None
+
+    def attach(self, datafile):
+        super().attach(datafile)
+        self._stop.clear()
+        self._fd = datafile.fileno()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def on_commit(self, datafile):
+        with self._lock:
+            self._pending += self._unsynced
+        self._unsynced = 0
+        self._wake.set()
+
+    def _run(self):
+        while not self._stop.is_set():
+            self._wake.wait()
+            self._wake.clear()
+            self._sync_pending()
+            self._stop.wait(self.interval)
+
+    def _sync_pending(self):
+        with self._lock:
+            nbytes, self._pending = self._pending, 0
+        if not nbytes:
+            return
+        start = time.perf_counter()
+        os.fsync(self._fd)
+        duration = (time.perf_counter() - start) * 1000.0
+        with self._lock:
+            self.timings.append((nbytes, duration))
+
+    def on_close(self, datafile):
+        if self._thread is not None:
+            self._stop.set()
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+        with self._lock:
+            self._pending += self._unsynced
+        self._unsynced = 0
+        self._sync_pending()
@@ -0,0 +1,345 @@
+"""Live gaze feed in shared memory for other local processes."""
+import time
+
+import numpy as np
+
+from .latency import StreamingHistogram
+
+FEED_MAGIC = 0x47415a45  # "GAZE"
+FEED_VERSION = 1
+# the header: magic, version, capacity, number of fields, sequence (the
+# number of rows published so far) and the size of the field names
+_HEADER = 6
+_SEQUENCE = 4
+_NAMES_SIZE = 1024
+
+FIELDS = ("system_time_stamp", "device_time_stamp", "published", "x", "y",
+          "left_x", "left_y", "right_x", "right_y", "pupil",
+          "left_validity", "right_validity")
+
+
+def feed_clock():
+    """The clock of the published times (microseconds).
+
+        time.perf_counter is monotonic and shared by the processes of the
+        computer on Linux, macOS and Windows.
+    """
+    return time.perf_counter() * 1e6
+
+
+def _attach(name):
+    from multiprocessing import shared_memory
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass
+    # Python < 3.13: a reader must not register the block with the resource
+    # tracker, which would remove it when the reader exits (or fail when
+    # the publisher removes it, if the tracker is shared after a fork)
+    from multiprocessing import resource_tracker
+    register = resource_tracker.register
+
+    def register_others(name, rtype):
+        if rtype != "shared_memory":
+            register(name, rtype)
+
+    resource_tracker.register = register_others
+    try:
+        return shared_memory.SharedMemory(name=name)
+    finally:
+        resource_tracker.register = register
+
+
+def _close(shm):
+    try:
+        shm.close()
+    except BufferError:
+        # views returned by read() are still used; the memory is released
+        # when they are deleted
+        pass
+
+
+class _Layout:
+    """The arrays of a feed in a shared memory block."""
+    def __init__(self, buf, capacity, fields):
+        self.capacity = capacity
+        self.fields = tuple(fields)
+        self.dtype = np.dtype([(name, np.float64)
+                               for name in ("seq", ) + self.fields])
+        self.header = np.ndarray(_HEADER, np.int64, buf)
+        offset = self.header.nbytes + _NAMES_SIZE
+        self.rows = np.ndarray(capacity, self.dtype, buf, offset)
+
+    @staticmethod
+    def size(capacity, n_fields):
+        return (_HEADER * 8 + _NAMES_SIZE + capacity * (n_fields + 1) * 8)
+
+
+class GazeFeed:
+    """Publish samples into a ring buffer in shared memory.
+
+        One process (the experiment) publishes; any number of processes
+        read the feed with GazeFeedReader by its name. Each row starts with
+        its sequence number. To publish row s, the sequence of its slot is
+        cleared, the values are written, the sequence of the slot is set
+        to s and the sequence of the header is set to s + 1, so a reader
+        can tell whether a row was overwritten while it was read. No locks
+        are used.
+
+    Args:
+        name: the name of the shared memory block. If None, a unique name
+            is chosen. Default is None.
+        capacity: the number of rows of the ring buffer. Default is 65536
+            (almost 1 minute at 1200 Hz, 6.8 MB).
+        fields: the names of the values of a row. Default is FIELDS.
+
+    Attributes:
+        name: the name to give to GazeFeedReader.
+    """
+    def __init__(self, name=None, capacity=65536, fields=FIELDS):
+        from multiprocessing import shared_memory
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1.")
+        names = "\t".join(fields).encode()
+        if len(names) > _NAMES_SIZE:
+            raise ValueError("The names of the fields are too long.")
+        self._shm = shared_memory.SharedMemory(name=name,
+                                               create=True,
+                                               size=_Layout.size(
+                                                   capacity, len(fields)))
+        self.name = self._shm.name
+        self._layout = _Layout(self._shm.buf, capacity, fields)
+        self._shm.buf[_HEADER * 8:_HEADER * 8 + len(names)] = names
+        self._layout.rows["seq"] = -1
+        self._layout.header[:] = (FEED_MAGIC, FEED_VERSION, capacity,
+                                  len(fields), 0, len(names))
+        self._values = self._layout.rows.view(np.float64).reshape(
+            capacity, len(fields) + 1)
+        self._seq = 0
+
+    @property
+    def fields(self):
+        return self._layout.fields
+
+    @property
+    def sequence(self):
+        """The number of rows published so far."""
+        return self._seq
+
+    def publish(self, values):
+        """Publish a row. Called by one thread only.
+
+        Args:
+            values: the values in the order of the fields.
+
+        Returns:
+            The sequence number of the row.
+        """
+        seq = self._seq
+        row = self._values[seq % self._layout.capacity]
+        row[0] = -1
+        row[1:] = values
+        row[0] = seq
+        self._seq = seq + 1
+        self._layout.header[_SEQUENCE] = seq + 1
+        return seq
+
+    def extend(self, values):
+        """Publish rows at once. Called by one thread only.
+
+            Only the last capacity rows are kept, as if they were published
+            one by one.
+
+        Args:
+            values: 2-D array of the rows, with the values in the order of
+                the fields.
+
+        Returns:
+            The sequence number of the first row.
+        """
+        values = np.asarray(values, np.float64).reshape(-1, len(self.fields))
+        capacity = self._layout.capacity
+        first, n = self._seq, len(values)
+        kept = values[-capacity:]
+        seqs = np.arange(first + n - len(kept), first + n)
+        slots = seqs % capacity
+        self._values[slots, 0] = -1
+        self._values[slots, 1:] = kept
+        self._values[slots, 0] = seqs
+        self._seq = first + n
+        self._layout.header[_SEQUENCE] = first + n
+        return first
+
+    def close(self, unlink=True):
+        """Close the feed.
+
+        Args:
+            unlink: whether to remove the shared memory block, after which
+                no readers can attach. Default is True.
+
+        Returns:
+            None
+        """
+        if self._shm is None:
+            return
+        self._layout = self._values = None
+        _close(self._shm)
+        if unlink:
+            self._shm.unlink()
+        self._shm = None
+
+
+class GazeFeedReader:
+    """Read the rows of a GazeFeed, usually in another process.
+
+        read() returns the new rows as a view into the shared memory, not a
+        copy. The rows of a view stay valid until the publisher wraps
+        around the ring buffer; intact() tells whether that has happened
+        since the last read(). The latency from publishing to reading is
+        measured for every row.
+
+    Args:
+        name: the name of the feed (GazeFeed.name).
+        start: "latest" to read only the rows published after attaching,
+            or "oldest" to start with the oldest row in the buffer. Default
+            is "latest".
+
+    Attributes:
+        dropped: the number of rows overwritten before they were read.
+        latency: StreamingHistogram of the latency (ms).
+    """
+    def __init__(self, name, start="latest"):
+        if start not in ("latest", "oldest"):
+            raise ValueError("start ({}) is not supported.".format(start))
+        self._shm = _attach(name)
+        header = np.ndarray(_HEADER, np.int64, self._shm.buf)
+        if header[0] != FEED_MAGIC or header[1] != FEED_VERSION:
+            _close(self._shm)
+            raise ValueError("{} is not a gaze feed.".format(name))
+        capacity, n_fields, names_size = (int(header[2]), int(header[3]),
+                                          int(header[5]))
+        names = bytes(self._shm.buf[_HEADER * 8:_HEADER * 8 + names_size])
+        fields = names.decode().split("\t")
+        if len(fields) != n_fields:
+            _close(self._shm)
+            raise ValueError("The header of {} is corrupted.".format(name))
+        self._layout = _Layout(self._shm.buf, capacity, fields)
+        self.capacity = capacity
+        self.fields = self._layout.fields
+        seq = int(self._layout.header[_SEQUENCE])
+        self._next = seq if start == "latest" else max(0, seq - capacity)
+        self._first = self._next
+        self.dropped = 0
+        self.latency = StreamingHistogram()
+
+    @property
+    def sequence(self):
+        """The number of rows published so far."""
+        return int(self._layout.header[_SEQUENCE])
+
+    def read(self, max_rows=None, clock=feed_clock):
+        """Get the rows published since the previous read.
+
+            If the new rows wrap around the end of the ring buffer, only
+            the rows up to the end are returned; call read() again for the
+            others.
+
+        Args:
+            max_rows: the maximum number of rows. Default is None (no
+                limit).
+            clock: the clock of the published times. Default is feed_clock.
+
+        Returns:
+            numpy structured array (a view into the shared memory) with the
+            field seq and the fields of the feed.
+        """
+        capacity = self.capacity
+        rows = self._layout.rows
+        while True:
+            seq = int(self._layout.header[_SEQUENCE])
+            if seq - self._next > capacity:
+                self.dropped += seq - capacity - self._next
+                self._next = seq - capacity
+            start = self._next % capacity
+            n = min(seq - self._next, capacity - start)
+            if max_rows is not None:
+                n = min(n, max_rows)
+            view = rows[start:start + n]
+            if n == 0 or view["seq"][0] == self._next:
+                break
+            # the publisher has just overwritten the first row
+        self._first = self._next
+        self._next += n
+        if n and "published" in self.fields:
+            now = clock()
+            for value in (now - view["published"]) / 1000.0:
+                self.latency.add(value)
+        return view
+
+    def intact(self):
+        """Whether the rows of the last read() have not been overwritten.
+
+        Args:
+            None
+
+        Returns:
+            bool
+        """
+        # the first row is overwritten when row first + capacity is
+        # published
+        seq = int(self._layout.header[_SEQUENCE])
+        return seq < self._first + self.capacity
+
+    def latest(self):
+        """Get the newest row, without changing the position of read().
+
+        Args:
+            None
+
+        Returns:
+            A copy of the row (numpy.void), or None if nothing was
+            published.
+        """
+        while True:
+            seq = int(self._layout.header[_SEQUENCE])
+            if seq == 0:
+                return None
+            row = self._layout.rows[(seq - 1) % self.capacity].copy()
+            if row["seq"] == seq - 1:
+                return row
+
+    def get(self, seq):
+        """Get a row by its sequence number, without changing the position
+        of read().
+
+        Args:
+            seq: the sequence number of the row.
+
+        Returns:
+            A copy of the row (numpy.void), or None if it was not published
+            yet or was overwritten.
+        """
+        if not 0 <= seq < int(self._layout.header[_SEQUENCE]):
+            return None
+        rows = self._layout.rows
+        slot = seq % self.capacity
+        row = rows[slot].copy()
+        # the slot is unchanged if its sequence is still seq after copying
+        if row["seq"] != seq or rows["seq"][slot] != seq:
+            return None
+        return row
+
+    def close(self):
+        """Detach from the feed.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        if self._shm is None:
+            return
+        self._layout = None
+        _close(self._shm)
+        self._shm = None
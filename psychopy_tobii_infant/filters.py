@@ -0,0 +1,211 @@
+"""Streaming filters for the gaze position."""
+import math
+from collections import deque
+
+import numpy as np
+
+
+class GazeFilter:
+    """Base class of the streaming gaze filters.
+
+        A filter keeps its state between calls, so a stream can be processed
+        in batches of any size. Missing samples (NaN) reset the state and are
+        passed through.
+    """
+    def reset(self):
+        """Clear the state of the filter."""
+        raise NotImplementedError
+
+    def step(self, t, x, y):
+        """Filter one sample.
+
+        Args:
+            t: the timestamp of the sample in seconds.
+            x, y: the gaze position.
+
+        Returns:
+            The filtered position (x, y).
+        """
+        raise NotImplementedError
+
+    def process(self, t, x, y):
+        """Filter a batch of samples.
+
+        Args:
+            t: array of timestamps in seconds.
+            x, y: arrays of gaze positions.
+
+        Returns:
+            Two arrays of the filtered positions.
+        """
+        out_x = np.empty(len(t))
+        out_y = np.empty(len(t))
+        for i in range(len(t)):
+            if math.isnan(x[i]) or math.isnan(y[i]):
+                self.reset()
+                out_x[i] = out_y[i] = np.nan
+            else:
+                out_x[i], out_y[i] = self.step(t[i], x[i], y[i])
+        return out_x, out_y
+
+
+class MovingAverage(GazeFilter):
+    """Average of the latest samples.
+
+    Args:
+        n: the number of samples to average. Default is 5.
+    """
+    def __init__(self, n=5):
+        self.n = n
+        self.reset()
+
+    def reset(self):
+        self._window = deque()
+        self._sum_x = self._sum_y = 0.0
+
+    def step(self, t, x, y):
+        self._window.append((x, y))
+        self._sum_x += x
+        self._sum_y += y
+        if len(self._window) > self.n:
+            old_x, old_y = self._window.popleft()
+            self._sum_x -= old_x
+            self._sum_y -= old_y
+        n = len(self._window)
+        return (self._sum_x / n, self._sum_y / n)
+
+
+class MedianFilter(GazeFilter):
+    """Median of the latest samples, for each dimension.
+
+    Args:
+        n: the number of samples. Default is 5.
+    """
+    def __init__(self, n=5):
+        self.n = n
+        self.reset()
+
+    def reset(self):
+        self._x = deque(maxlen=self.n)
+        self._y = deque(maxlen=self.n)
+
+    def step(self, t, x, y):
+        self._x.append(x)
+        self._y.append(y)
+        return (float(np.median(self._x)), float(np.median(self._y)))
+
+
+class _LowPass:
+    """Exponential smoothing used by OneEuroFilter."""
+    def __init__(self):
+        self.y = None
+
+    def __call__(self, x, alpha):
+        if self.y is None:
+            self.y = x
+        else:
+            self.y = alpha * x + (1 - alpha) * self.y
+        return self.y
+
+
+class OneEuroFilter(GazeFilter):
+    """The 1 euro filter (Casiez, Roussel & Vogel, 2012).
+
+        The cutoff frequency increases with the speed of the gaze, which
+        reduces the jitter during fixations and the lag during saccades.
+
+    Args:
+        min_cutoff: the minimum cutoff frequency in Hz. Default is 1.
+        beta: the speed coefficient. Default is 0.007.
+        d_cutoff: the cutoff frequency for the speed in Hz. Default is 1.
+    """
+    def __init__(self, min_cutoff=1.0, beta=0.007, d_cutoff=1.0):
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+        self.reset()
+
+    def reset(self):
+        self._t = None
+        self._x = [_LowPass(), _LowPass()]
+        self._dx = [_LowPass(), _LowPass()]
+        self._prev = None
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        tau = 1.0 / (2 * math.pi * cutoff)
+        return 1.0 / (1.0 + tau / dt)
+
+    def step(self, t, x, y):
+        if self._t is None or t <= self._t:
+            self._t = t
+            self._prev = (x, y)
+            for i, v in enumerate((x, y)):
+                self._x[i](v, 1.0)
+                self._dx[i](0.0, 1.0)
+            return (x, y)
+
+        dt = t - self._t
+        self._t = t
+        out = []
+        for i, v in enumerate((x, y)):
+            dv = self._dx[i]((v - self._prev[i]) / dt,
+                             self._alpha(self.d_cutoff, dt))
+            cutoff = self.min_cutoff + self.beta * abs(dv)
+            out.append(self._x[i](v, self._alpha(cutoff, dt)))
+        self._prev = (x, y)
+        return tuple(out)
+
+
+class VelocityHold(GazeFilter):
+    """Hold the position during fixations.
+
+        While the gaze moves slower than the threshold, the output is held at
+        the mean position of the current fixation. A faster movement starts
+        a new fixation.
+
+    Args:
+        threshold: the velocity threshold in units of the position per
+            second.
+    """
+    def __init__(self, threshold):
+        self.threshold = threshold
+        self.reset()
+
+    def reset(self):
+        self._t = None
+        self._prev = None
+        self._n = 0
+        self._sum_x = self._sum_y = 0.0
+
+    def step(self, t, x, y):
+        if self._t is not None and t > self._t:
+            v = math.hypot(x - self._prev[0], y - self._prev[1]) / (t - self._t)
+            if v >= self.threshold:
+                self._n = 0
+                self._sum_x = self._sum_y = 0.0
+        self._t = t
+        self._prev = (x, y)
+        self._n += 1
+        self._sum_x += x
+        self._sum_y += y
+        return (self._sum_x / self._n, self._sum_y / self._n)
+
+
+class GazeFilterPipeline(GazeFilter):
+    """Apply several filters in sequence.
+
+    Args:
+        filters: GazeFilter objects, applied in the given order.
+    """
+    def __init__(self, *filters):
+        self.filters = list(filters)
+
+    def reset(self):
+        for this_filter in self.filters:
+            this_filter.reset()
+
+    def step(self, t, x, y):
+        for this_filter in self.filters:
+            x, y = this_filter.step(t, x, y)
+        return (x, y)
@@ -0,0 +1,272 @@
+"""Habituation paradigm: trial loop and criterion over looking times."""
+import threading
+import time
+from collections import deque
+
+
+class HabituationCriterion:
+    """Running-window criterion of habituation.
+
+        The participant is habituated when the sum of the looking times in
+        a window of trials falls below a ratio of the baseline, e.g. "the
+        sum of 3 consecutive looks < 50% of the first 3" with the defaults.
+        The sums are updated incrementally, so each trial costs O(1).
+
+    Args:
+        window: the number of trials in a window. Default is 3.
+        ratio: the criterion as a proportion of the baseline. Default is
+            0.5.
+        mode: "sliding" to test every window after the baseline or "fixed"
+            to test consecutive blocks of trials. Default is "sliding".
+        baseline: "first" for the first window or "max" for the window with
+            the longest looking time so far (not overlapping the tested
+            window). Default is "first".
+
+    Attributes:
+        looks: list of the looking times.
+        baseline_sum: the sum of the baseline window (None before the first
+            window is complete).
+        window_sum: the sum of the latest window.
+        tested: whether the latest window was tested.
+        habituated: whether the criterion was met.
+    """
+    modes = ("sliding", "fixed")
+    baselines = ("first", "max")
+
+    def __init__(self, window=3, ratio=0.5, mode="sliding", baseline="first"):
+        if window < 1:
+            raise ValueError("window must be positive.")
+        if mode not in self.modes:
+            raise ValueError("mode ({}) is not supported.".format(mode))
+        if baseline not in self.baselines:
+            raise ValueError(
+                "baseline ({}) is not supported.".format(baseline))
+        self.window = window
+        self.ratio = ratio
+        self.mode = mode
+        self.baseline = baseline
+        self.reset()
+
+    def reset(self):
+        """Forget the looking times.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self.looks = []
+        self.baseline_sum = None
+        self.window_sum = 0.0
+        self.tested = False
+        self.habituated = False
+        self._current = deque()
+        # the sums of the windows which may become the baseline
+        self._sums = deque()
+
+    def update(self, lt):
+        """Add the looking time of a trial.
+
+        Args:
+            lt: the looking time in seconds.
+
+        Returns:
+            True if the participant is habituated.
+        """
+        w = self.window
+        self.looks.append(lt)
+        self._current.append(lt)
+        self.window_sum += lt
+        if len(self._current) > w:
+            self.window_sum -= self._current.popleft()
+        n = len(self.looks)
+        self.tested = False
+        if n < w:
+            return False
+
+        if self.baseline == "first":
+            if n == w:
+                self.baseline_sum = self.window_sum
+        else:
+            self._sums.append(self.window_sum)
+            # the window ending w trials ago does not overlap this one
+            if len(self._sums) > w:
+                eligible = self._sums.popleft()
+                if self.baseline_sum is None or eligible > self.baseline_sum:
+                    self.baseline_sum = eligible
+            elif n == w:
+                self.baseline_sum = self.window_sum
+
+        if n < 2 * w:
+            return False
+        if self.mode == "fixed" and n % w:
+            return False
+        self.tested = True
+        self.habituated = self.window_sum < self.ratio * self.baseline_sum
+        return self.habituated
+
+    @property
+    def state(self):
+        """A summary of the criterion for the data file."""
+        return ("looks={} window={} window_sum={:.3f} baseline={} tested={} "
+                "habituated={}".format(
+                    len(self.looks), list(self._current), self.window_sum,
+                    "None" if self.baseline_sum is None else
+                    "{:.3f}".format(self.baseline_sum), self.tested,
+                    self.habituated))
+
+
+class HabituationRunner:
+    """Run the trials of a habituation paradigm with collect_lt.
+
+        While a trial is running, the stimuli of the next trial are loaded
+        in a background thread, so the inter-trial interval is not extended
+        by loading. The runner records events for the start and the end of
+        each trial with the criterion decision, the timing of the trial and
+        the state of the preloading, so they are saved in the data file.
+        Call it during recording.
+
+    Args:
+        controller: TobiiController object.
+        trials: list of the trials, e.g. file names of the stimuli.
+        criterion: HabituationCriterion object. Default is None
+            (HabituationCriterion()).
+        load: function called in a background thread with a trial, returning
+            its loaded data (e.g. decoded images or sounds). It should not
+            create PsychoPy stimuli, which need the thread of the window.
+            Default is None (the trial is used as is).
+        show: function called with the trial and its loaded data before
+            collect_lt, returning the stimulus to present, an object with
+            setAutoDraw (e.g. visual.ImageStim). Default is None (present
+            nothing; collect_lt flips the window only).
+        max_time, min_away, blink_dur: the arguments of collect_lt.
+        max_trials: the maximum number of trials. Default is None (all the
+            trials).
+        iti: the duration between the end of a trial and the start of the
+            next one in seconds. Default is 1.0.
+
+    Attributes:
+        log: list of dicts, one per trial, with the keys trial, lt,
+            habituated, tested, window_sum, baseline_sum, start, end (in
+            seconds on time.perf_counter), iti (the actual interval before
+            the trial), load_time and preloaded (whether loading finished
+            before the interval ended).
+    """
+    def __init__(self,
+                 controller,
+                 trials,
+                 criterion=None,
+                 load=None,
+                 show=None,
+                 max_time=20,
+                 min_away=2,
+                 blink_dur=1,
+                 max_trials=None,
+                 iti=1.0):
+        self.controller = controller
+        self.trials = list(trials)
+        self.criterion = criterion or HabituationCriterion()
+        self.load = load or (lambda trial: trial)
+        self.show = show
+        self.max_time = max_time
+        self.min_away = min_away
+        self.blink_dur = blink_dur
+        self.max_trials = (len(self.trials) if max_trials is None else min(
+            max_trials, len(self.trials)))
+        self.iti = iti
+        self.log = []
+
+    def _preload(self, idx):
+        """Start loading a trial in the background.
+
+        Args:
+            idx: the index of the trial.
+
+        Returns:
+            dict with the keys "thread", "data", "error", "time" (the
+            duration of loading) and "done" (the end of loading).
+        """
+        slot = {"data": None, "error": None, "time": None, "done": None}
+
+        def _run():
+            start = time.perf_counter()
+            try:
+                slot["data"] = self.load(self.trials[idx])
+            except Exception as e:
+                slot["error"] = e
+            slot["done"] = time.perf_counter()
+            slot["time"] = slot["done"] - start
+
+        slot["thread"] = threading.Thread(target=_run, daemon=True)
+        slot["thread"].start()
+        return slot
+
+    def _wait_until(self, deadline, slot):
+        """Keep flipping the window until the deadline and the loading."""
+        while time.perf_counter() < deadline or slot["thread"].is_alive():
+            self.controller.win.flip()
+
+    def run(self):
+        """Run the trials until habituation or the last trial.
+
+        Args:
+            None
+
+        Returns:
+            True if the participant habituated.
+        """
+        self.criterion.reset()
+        self.log = []
+        if self.max_trials == 0:
+            return False
+        slot = self._preload(0)
+        previous_end = None
+        for idx in range(self.max_trials):
+            deadline = (time.perf_counter()
+                        if previous_end is None else previous_end + self.iti)
+            self._wait_until(deadline, slot)
+            preloaded = slot["done"] <= deadline
+            if slot["error"] is not None:
+                raise slot["error"]
+            data, load_time = slot["data"], slot["time"]
+            if idx + 1 < self.max_trials:
+                slot = self._preload(idx + 1)
+
+            stim = None
+            if self.show is not None:
+                stim = self.show(self.trials[idx], data)
+                stim.setAutoDraw(True)
+            start = time.perf_counter()
+            iti = None if previous_end is None else start - previous_end
+            self.controller.record_event(
+                "Habituation trial {} start iti={} load={:.3f}s "
+                "preloaded={}".format(
+                    idx + 1, "None" if iti is None else "{:.3f}s".format(iti),
+                    load_time, preloaded))
+            lt = self.controller.collect_lt(self.max_time, self.min_away,
+                                            self.blink_dur)
+            if stim is not None:
+                stim.setAutoDraw(False)
+            previous_end = time.perf_counter()
+
+            habituated = self.criterion.update(lt)
+            self.controller.record_event(
+                "Habituation trial {} end lt={:.3f} {}".format(
+                    idx + 1, lt, self.criterion.state))
+            self.log.append({
+                "trial": idx + 1,
+                "lt": lt,
+                "habituated": habituated,
+                "tested": self.criterion.tested,
+                "window_sum": self.criterion.window_sum,
+                "baseline_sum": self.criterion.baseline_sum,
+                "start": start,
+                "end": previous_end,
+                "iti": iti,
+                "load_time": load_time,
+                "preloaded": preloaded,
+            })
+            if habituated:
+                return True
+        return False
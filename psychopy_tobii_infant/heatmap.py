@@ -0,0 +1,377 @@
+"""Offline heatmaps and scanpaths of the gaze data per trial."""
+import hashlib
+import os
+
+import numpy as np
+
+from .reader import read_recording
+
+
+def window_extent(info):
+    """Get the extent of the window in the units of a data file.
+
+    Args:
+        info: Recording.info with "PsychoPy units" and "Recording
+            resolution".
+
+    Returns:
+        (left, right, bottom, top)
+    """
+    units = info.get("PsychoPy units")
+    w, h = (int(x) for x in info["Recording resolution"].split("x"))
+    if units == "norm":
+        return (-1.0, 1.0, -1.0, 1.0)
+    elif units == "height":
+        return (-w / h / 2, w / h / 2, -0.5, 0.5)
+    elif units == "pix":
+        return (-w / 2, w / 2, -h / 2, h / 2)
+    raise ValueError(
+        "Set the extent for units ({}).".format(units))
+
+
+def split_trials(session, start_event, end_event=None):
+    """Split a session into trials delimited by events.
+
+    Args:
+        session: Session read from a data file.
+        start_event: the beginning of the events starting a trial, e.g.
+            "onset" for the events "onset face.png" and "onset car.png". The
+            event is the label of the trial.
+        end_event: the beginning of the events ending a trial. If None, a
+            trial ends at the next trial or at the end of the session.
+            Default is None.
+
+    Returns:
+        list of (label, start, stop), the label of the trial and the range
+        of its samples in session.data.
+    """
+    t = session.column("TimeStamp") if len(session) else np.empty(0)
+    trials = []
+    current = None
+    for time, event in session.events:
+        if event.startswith(start_event):
+            if current is not None:
+                trials.append(current + (time, ))
+            current = (event, time)
+        elif (end_event is not None and event.startswith(end_event)
+              and current is not None):
+            trials.append(current + (time, ))
+            current = None
+    if current is not None:
+        trials.append(current + (np.inf, ))
+    if not trials:
+        return []
+    labels, starts, ends = zip(*trials)
+    start_idx = np.searchsorted(t, starts, side="left")
+    stop_idx = np.searchsorted(t, ends, side="left")
+    return list(zip(labels, start_idx.tolist(), stop_idx.tolist()))
+
+
+def gaussian_kernel(sigma):
+    """A normalized 1D Gaussian kernel truncated at 3 sigma."""
+    radius = max(1, int(np.ceil(3 * sigma)))
+    x = np.arange(-radius, radius + 1)
+    kernel = np.exp(-0.5 * (x / sigma)**2)
+    return kernel / kernel.sum()
+
+
+def smooth(image, sigma):
+    """Gaussian smoothing as two 1D convolutions.
+
+        Each pass adds shifted copies of the whole image, so the cost is
+        O(bins * kernel size) in vectorized operations. The image is
+        zero-padded: gaze outside the window does not leak in.
+
+    Args:
+        image: 2D array.
+        sigma: the standard deviation in bins. 0 returns the image.
+
+    Returns:
+        2D array of the same shape.
+    """
+    if not sigma:
+        return np.asarray(image, dtype=float)
+    kernel = gaussian_kernel(sigma)
+    radius = len(kernel) // 2
+    out = np.asarray(image, dtype=float)
+    for axis in (0, 1):
+        n = out.shape[axis]
+        pad = [(0, 0), (0, 0)]
+        pad[axis] = (radius, radius)
+        padded = np.pad(out, pad)
+        result = np.zeros_like(out)
+        for i, weight in enumerate(kernel):
+            index = [slice(None), slice(None)]
+            index[axis] = slice(i, i + n)
+            result += weight * padded[tuple(index)]
+        out = result
+    return out
+
+
+def histogram(x, y, bins, extent):
+    """Count the valid gaze samples in each bin.
+
+    Args:
+        x, y: arrays of the gaze positions.
+        bins: the number of bins (nx, ny).
+        extent: (left, right, bottom, top) of the window.
+
+    Returns:
+        2D array of shape (ny, nx), with the top row first as in an image.
+    """
+    valid = np.isfinite(x) & np.isfinite(y)
+    counts, _, _ = np.histogram2d(y[valid],
+                                  x[valid],
+                                  bins=(bins[1], bins[0]),
+                                  range=((extent[2], extent[3]),
+                                         (extent[0], extent[1])))
+    return counts[::-1]
+
+
+def scanpath(x, y, bins, extent):
+    """Rasterise the path between successive valid gaze samples.
+
+        Each segment is sampled at steps shorter than a bin, all segments at
+        once, and the bins it crosses are counted once per segment.
+
+    Args:
+        x, y: arrays of the gaze positions.
+        bins: the number of bins (nx, ny).
+        extent: (left, right, bottom, top) of the window.
+
+    Returns:
+        2D array of shape (ny, nx), with the top row first as in an image.
+    """
+    valid = np.isfinite(x) & np.isfinite(y)
+    # positions in bins
+    bx = (x[valid] - extent[0]) / (extent[1] - extent[0]) * bins[0]
+    by = (y[valid] - extent[2]) / (extent[3] - extent[2]) * bins[1]
+    if len(bx) < 2:
+        return histogram(x, y, bins, extent)
+    raster = np.zeros((bins[1], bins[0]))
+    dx = np.diff(bx)
+    dy = np.diff(by)
+    steps = np.ceil(np.maximum(np.abs(dx), np.abs(dy))).astype(int) + 1
+    segment = np.repeat(np.arange(len(dx)), steps)
+    # the position along each segment, from 0 to 1
+    first = np.cumsum(steps) - steps
+    frac = (np.arange(steps.sum()) - np.repeat(first, steps)) / np.repeat(
+        np.maximum(steps - 1, 1), steps)
+    px = np.floor(bx[segment] + frac * dx[segment]).astype(int)
+    py = np.floor(by[segment] + frac * dy[segment]).astype(int)
+    inside = (px >= 0) & (px < bins[0]) & (py >= 0) & (py < bins[1])
+    # count each bin once per segment
+    cells = np.unique(
+        np.stack([segment[inside], py[inside], px[inside]]), axis=1)
+    np.add.at(raster, (cells[1], cells[2]), 1)
+    return raster[::-1]
+
+
+def trial_maps(filename,
+               start_event,
+               end_event=None,
+               bins=(64, 48),
+               extent=None,
+               with_scanpath=False):
+    """Compute the histograms of every trial in a data file.
+
+    Args:
+        filename: the name of the data file.
+        start_event, end_event: see split_trials.
+        bins: the number of bins (nx, ny). Default is (64, 48).
+        extent: (left, right, bottom, top) of the window. If None, it is
+            taken from the data file. Default is None.
+        with_scanpath: whether to rasterise the scanpaths. Default is False.
+
+    Returns:
+        dict of arrays: "label", "session", "n_samples", "histogram" of
+        shape (n_trials, ny, nx) and, if with_scanpath, "scanpath".
+    """
+    recording = read_recording(filename)
+    if extent is None:
+        extent = window_extent(recording.info)
+    labels, sessions, n_samples, histograms, scanpaths = [], [], [], [], []
+    for s, session in enumerate(recording.sessions):
+        if not len(session):
+            continue
+        x = session.column("GazePointX")
+        y = session.column("GazePointY")
+        for label, start, stop in split_trials(session, start_event,
+                                               end_event):
+            labels.append(label)
+            sessions.append(s)
+            n_samples.append(stop - start)
+            histograms.append(
+                histogram(x[start:stop], y[start:stop], bins, extent))
+            if with_scanpath:
+                scanpaths.append(
+                    scanpath(x[start:stop], y[start:stop], bins, extent))
+    shape = (0, bins[1], bins[0])
+    maps = {
+        "label": np.array(labels, dtype=str),
+        "session": np.array(sessions, dtype=int),
+        "n_samples": np.array(n_samples, dtype=int),
+        "histogram": np.array(histograms).reshape(-1, *shape[1:]),
+        "extent": np.array(extent, dtype=float),
+    }
+    if with_scanpath:
+        maps["scanpath"] = np.array(scanpaths).reshape(-1, *shape[1:])
+    return maps
+
+
+class HeatmapBuilder:
+    """Build heatmaps of many trials in many data files.
+
+        The trials of every data file are histogrammed in a single pass, in
+        parallel across the data files. The unsmoothed histograms of each
+        file are cached, so trials can be regrouped (e.g. by stimulus, by
+        age group) and smoothed with other parameters without reading the
+        data files again.
+
+    Args:
+        bins: the number of bins (nx, ny). Default is (64, 48).
+        extent: (left, right, bottom, top) of the window in its units. If
+            None, it is taken from each data file. Default is None.
+        sigma: the standard deviation of the Gaussian smoothing in bins.
+            Default is 1.5.
+        with_scanpath: whether to rasterise the scanpaths. Default is False.
+        cache_dir: the folder of the cached histograms. None disables the
+            cache. Default is None.
+        processes: the number of worker processes. 1 computes in this
+            process; None uses the number of CPUs. Default is None.
+    """
+    def __init__(self,
+                 bins=(64, 48),
+                 extent=None,
+                 sigma=1.5,
+                 with_scanpath=False,
+                 cache_dir=None,
+                 processes=None):
+        self.bins = tuple(bins)
+        self.extent = extent
+        self.sigma = sigma
+        self.with_scanpath = with_scanpath
+        self.cache_dir = cache_dir
+        self.processes = processes
+
+    def _cache_path(self, filename, start_event, end_event):
+        stat = os.stat(filename)
+        key = repr((os.path.abspath(filename), stat.st_size, stat.st_mtime_ns,
+                    start_event, end_event, self.bins, self.extent,
+                    self.with_scanpath))
+        digest = hashlib.sha1(key.encode("utf-8")).hexdigest()[:16]
+        name = "{}-{}.npz".format(os.path.basename(filename), digest)
+        return os.path.join(self.cache_dir, name)
+
+    def trial_maps(self, filenames, start_event, end_event=None):
+        """Compute (or load from the cache) the histograms of every trial.
+
+        Args:
+            filenames: list of data files.
+            start_event, end_event: see split_trials.
+
+        Returns:
+            list of dicts returned by trial_maps, one per data file.
+        """
+        results = [None] * len(filenames)
+        todo = []
+        for i, filename in enumerate(filenames):
+            if self.cache_dir is not None:
+                path = self._cache_path(filename, start_event, end_event)
+                if os.path.exists(path):
+                    with np.load(path) as f:
+                        results[i] = {key: f[key] for key in f.files}
+                    continue
+            todo.append(i)
+
+        args = [(filenames[i], start_event, end_event, self.bins, self.extent,
+                 self.with_scanpath) for i in todo]
+        if self.processes == 1 or len(todo) < 2:
+            computed = [trial_maps(*x) for x in args]
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(self.processes) as executor:
+                computed = list(executor.map(trial_maps, *zip(*args)))
+
+        for i, maps in zip(todo, computed):
+            results[i] = maps
+            if self.cache_dir is not None:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                np.savez_compressed(
+                    self._cache_path(filenames[i], start_event, end_event),
+                    **maps)
+        return results
+
+    def heatmaps(self,
+                 filenames,
+                 start_event,
+                 end_event=None,
+                 key=None,
+                 normalize=True,
+                 kind="histogram"):
+        """Build a heatmap for each group of trials.
+
+        Args:
+            filenames: list of data files.
+            start_event, end_event: see split_trials.
+            key: a function mapping (filename, session, label) of a trial to
+                its group, or None to drop the trial. If None, trials are
+                grouped by their label. Default is None.
+            normalize: whether to scale each heatmap to sum to 1 (before
+                smoothing), so every group has the same weight regardless of
+                its number of samples. Default is True.
+            kind: "histogram" for the gaze samples or "scanpath" for the
+                rasterised scanpaths (requires with_scanpath). Default is
+                "histogram".
+
+        Returns:
+            dict mapping each group to a smoothed 2D array (top row first).
+        """
+        groups = {}
+        for filename, maps in zip(
+                filenames, self.trial_maps(filenames, start_event,
+                                           end_event)):
+            for label, session, image in zip(maps["label"], maps["session"],
+                                             maps[kind]):
+                group = (str(label) if key is None else key(
+                    filename, int(session), str(label)))
+                if group is None:
+                    continue
+                if group in groups:
+                    groups[group] += image
+                else:
+                    groups[group] = image.astype(float)
+        result = {}
+        for group, image in groups.items():
+            total = image.sum()
+            if normalize and total > 0:
+                image = image / total
+            result[group] = smooth(image, self.sigma)
+        return result
+
+
+def render(heatmap, filename=None, color=(255, 0, 0), gamma=0.5):
+    """Render a heatmap as an RGBA image.
+
+    Args:
+        heatmap: 2D array (top row first).
+        filename: save the image to this file (requires PIL). Default is
+            None.
+        color: the RGB color of the maximum. Default is red.
+        gamma: the exponent applied to the normalized values; below 1 makes
+            the low values more visible. Default is 0.5.
+
+    Returns:
+        numpy.ndarray of shape (ny, nx, 4) and dtype uint8, transparent
+        where there is no gaze.
+    """
+    peak = heatmap.max()
+    level = (heatmap / peak)**gamma if peak > 0 else np.zeros_like(heatmap)
+    image = np.empty(heatmap.shape + (4, ), dtype=np.uint8)
+    image[..., :3] = color
+    image[..., 3] = np.round(level * 255)
+    if filename is not None:
+        from PIL import Image
+        Image.fromarray(image, "RGBA").save(filename)
+    return image
@@ -0,0 +1,114 @@
+"""Sidecar index of the sessions in a data file."""
+import json
+import os
+
+INDEX_SUFFIX = ".index.json"
+INDEX_VERSION = 1
+
+
+def index_filename(filename):
+    """Get the name of the index of a data file.
+
+    Args:
+        filename: the name of the data file.
+
+    Returns:
+        str
+    """
+    return filename + INDEX_SUFFIX
+
+
+class SessionIndex:
+    """The position and summary of every session in a data file.
+
+        Each session starts at a full flush point of the data file, so it can
+        be read from its offset without the earlier data, even if the file
+        is compressed. The index is rewritten after every session; it is
+        small and can be recreated from the data file.
+
+    Args:
+        filename: the name of the data file.
+        compression: the compression of the data file. Default is None.
+
+    Attributes:
+        sessions: list of dicts with the keys offset and end (the byte
+            range of the session in the data file), n_samples, first and
+            last (the first and last TimeStamp) and n_events. Other keys
+            may be added by the writer.
+    """
+    def __init__(self, filename, compression=None):
+        self.filename = filename
+        self.compression = compression
+        self.sessions = []
+
+    def __len__(self):
+        return len(self.sessions)
+
+    def __getitem__(self, idx):
+        return self.sessions[idx]
+
+    def append(self, offset, end, n_samples, first, last, n_events, **extra):
+        """Add a session and save the index.
+
+        Args:
+            offset: the position of "Session Start" in the data file.
+            end: the position after "Session End".
+            n_samples: the number of rows of gaze data.
+            first, last: the first and last TimeStamp.
+            n_events: the number of events.
+            **extra: other information of the session.
+
+        Returns:
+            None
+        """
+        session = {
+            "offset": int(offset),
+            "end": int(end),
+            "n_samples": int(n_samples),
+            "first": float(first),
+            "last": float(last),
+            "n_events": int(n_events),
+        }
+        session.update(extra)
+        self.sessions.append(session)
+        self.save()
+
+    def save(self):
+        """Write the index next to the data file.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        content = {
+            "version": INDEX_VERSION,
+            "data_file": os.path.basename(self.filename),
+            "compression": self.compression,
+            "sessions": self.sessions,
+        }
+        path = index_filename(self.filename)
+        tmp = path + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(content, f, indent=1)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, filename):
+        """Read the index of a data file.
+
+        Args:
+            filename: the name of the data file.
+
+        Returns:
+            SessionIndex
+        """
+        with open(index_filename(filename), "r") as f:
+            content = json.load(f)
+        if content.get("version") != INDEX_VERSION:
+            raise ValueError("Unsupported index version ({}).".format(
+                content.get("version")))
+        index = cls(filename, content.get("compression"))
+        index.sessions = content["sessions"]
+        return index
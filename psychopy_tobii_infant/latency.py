@@ -0,0 +1,249 @@
+"""Instrumentation of the latency from the eye tracker to the frame loop."""
+import threading
+
+import numpy as np
+
+from .buffer import ChunkedBuffer
+
+
+class StreamingHistogram:
+    """Histogram of latencies with fixed bins.
+
+        Values are added one at a time in O(1); percentiles are estimated
+        from the bins.
+
+    Args:
+        bin_width: the width of the bins in milliseconds. Default is 0.1.
+        max_value: the upper limit of the bins in milliseconds. Larger values
+            are counted in the last bin. Default is 200.
+    """
+    def __init__(self, bin_width=0.1, max_value=200.0):
+        self.bin_width = bin_width
+        self.max_value = max_value
+        self.counts = np.zeros(int(np.ceil(max_value / bin_width)) + 1,
+                               dtype=np.int64)
+        self.n = 0
+        self.total = 0.0
+        self.min = np.inf
+        self.max = -np.inf
+
+    def add(self, value):
+        """Add a value in milliseconds.
+
+        Args:
+            value: the latency in milliseconds.
+
+        Returns:
+            None
+        """
+        idx = int(value / self.bin_width)
+        if idx < 0:
+            idx = 0
+        elif idx >= len(self.counts):
+            idx = len(self.counts) - 1
+        self.counts[idx] += 1
+        self.n += 1
+        self.total += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+    def percentile(self, q):
+        """Estimate a percentile.
+
+        Args:
+            q: percentile between 0 and 100.
+
+        Returns:
+            The upper edge of the bin containing the percentile in
+            milliseconds (the maximum if it is beyond the bins). NaN if no
+            values were added.
+        """
+        if self.n == 0:
+            return np.nan
+        cum = np.cumsum(self.counts)
+        idx = int(np.searchsorted(cum, q / 100.0 * self.n))
+        if idx >= len(self.counts) - 1:
+            # values beyond the bins
+            return self.max
+        return min((idx + 1) * self.bin_width, self.max)
+
+    def summary(self, percentiles=(50, 95, 99)):
+        """Summarize the histogram.
+
+        Args:
+            percentiles: the percentiles to report. Default is (50, 95, 99).
+
+        Returns:
+            A dict with n, mean, min, max and p<q> for each percentile, in
+            milliseconds.
+        """
+        if self.n == 0:
+            out = {"n": 0, "mean": np.nan, "min": np.nan, "max": np.nan}
+        else:
+            out = {
+                "n": self.n,
+                "mean": self.total / self.n,
+                "min": self.min,
+                "max": self.max
+            }
+        for q in percentiles:
+            out["p{}".format(q)] = self.percentile(q)
+        return out
+
+
+class LatencyMonitor:
+    """Record the timing of every gaze sample from the eye tracker.
+
+        Four time points are recorded per sample: the device timestamp, the
+        system timestamp of the eye tracker, the time the callback of the
+        Tobii SDK received the sample and the time the sample was first read
+        by the frame loop. The latencies are streamed into histograms:
+
+            callback: from the system timestamp to the callback. Large values
+                indicate USB/network congestion or starvation of the Python
+                thread of the SDK.
+            consumption: from the callback to the first read by the frame
+                loop.
+            end_to_end: from the system timestamp to the first read by the
+                frame loop.
+            device_offset: the difference between the system and the device
+                timestamps, relative to the smallest difference observed.
+                Increasing values indicate transport delays.
+
+    Args:
+        clock: a function returning the current time in the eye tracker's
+            system clock (microseconds).
+        bin_width: the width of the histogram bins in milliseconds. Default
+            is 0.1.
+        max_value: the upper limit of the histogram bins in milliseconds.
+            Default is 200.
+    """
+    metrics = ("callback", "consumption", "end_to_end", "device_offset")
+    columns = ("device_time_stamp", "system_time_stamp", "callback_time_stamp",
+               "consumption_time_stamp")
+
+    def __init__(self, clock, bin_width=0.1, max_value=200.0):
+        self.clock = clock
+        self.bin_width = bin_width
+        self.max_value = max_value
+        self._lock = threading.Lock()
+        self.records = ChunkedBuffer(self.columns)
+        self.reset()
+
+    def reset(self):
+        """Start a new session.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self.records.clear()
+            self.histograms = {
+                m: StreamingHistogram(self.bin_width, self.max_value)
+                for m in self.metrics
+            }
+            self._min_offset = np.inf
+
+    def on_sample(self, gaze_data, callback_time):
+        """Record a sample arriving in the callback.
+
+            Called by TobiiController._on_gaze_data.
+
+        Args:
+            gaze_data: gaze data provided by the eye tracker.
+            callback_time: the time the callback received the sample.
+
+        Returns:
+            None
+        """
+        device = gaze_data["device_time_stamp"]
+        system = gaze_data["system_time_stamp"]
+        offset = system - device
+        with self._lock:
+            self.records.append((device, system, callback_time, np.nan))
+            self.histograms["callback"].add((callback_time - system) / 1000.0)
+            if offset < self._min_offset:
+                self._min_offset = offset
+            self.histograms["device_offset"].add(
+                (offset - self._min_offset) / 1000.0)
+
+    def consume(self, gaze_data, now=None):
+        """Record the first read of a sample by the frame loop.
+
+        Args:
+            gaze_data: the sample read by the frame loop.
+            now: the time of the read in the eye tracker's system clock
+                (microseconds). If None, the current time. Default is None.
+
+        Returns:
+            None
+        """
+        if now is None:
+            now = self.clock()
+        system = gaze_data["system_time_stamp"]
+        with self._lock:
+            # the sample is normally the last one, but the callback may have
+            # appended more in the meantime
+            idx = len(self.records) - 1
+            while idx >= 0 and self.records.get(idx,
+                                                "system_time_stamp") > system:
+                idx -= 1
+            if (idx < 0 or
+                    self.records.get(idx, "system_time_stamp") != system or
+                    not np.isnan(self.records.get(idx,
+                                                  "consumption_time_stamp"))):
+                return
+            self.records.set(idx, "consumption_time_stamp", now)
+            callback_time = self.records.get(idx, "callback_time_stamp")
+            self.histograms["consumption"].add((now - callback_time) / 1000.0)
+            self.histograms["end_to_end"].add((now - system) / 1000.0)
+
+    def summary(self, percentiles=(50, 95, 99)):
+        """Summarize the latencies of the current session.
+
+        Args:
+            percentiles: the percentiles to report. Default is (50, 95, 99).
+
+        Returns:
+            A dict mapping each metric to a dict of n, mean, min, max and
+            percentiles in milliseconds.
+        """
+        with self._lock:
+            return {
+                m: self.histograms[m].summary(percentiles)
+                for m in self.metrics
+            }
+
+    def to_array(self):
+        """Get the per-sample time points.
+
+        Args:
+            None
+
+        Returns:
+            numpy.ndarray of shape (n_samples, 4) with the columns in
+            LatencyMonitor.columns (microseconds). Samples never read by the
+            frame loop have NaN consumption time.
+        """
+        return self.records.to_array()
+
+    def format_header(self):
+        """Format the summary for the header of a session in the data file.
+
+        Args:
+            None
+
+        Returns:
+            str
+        """
+        lines = []
+        for metric, stats in self.summary().items():
+            lines.append("Latency {} (ms):\t{}\n".format(
+                metric, "\t".join("{}={}".format(k, round(v, 4))
+                                  for k, v in stats.items())))
+        return "".join(lines)
@@ -0,0 +1,104 @@
+"""Deferred import of the heavy dependencies."""
+import importlib
+import threading
+
+_lock = threading.RLock()
+
+
+class LazyModule:
+    """A module imported when one of its attributes is first used.
+
+        Importing psychopy_tobii_infant does not import tobii_research,
+        psychopy or PIL, so the analysis utilities can be used on machines
+        without them. The module is imported by the first controller or
+        visual routine needing it. Once imported, the attributes of the
+        module are copied to the proxy, so later lookups cost the same as on
+        the module.
+
+    Args:
+        names: the names of the module, tried in the given order. Relative
+            names are resolved against package.
+        package: the package of relative names. Default is None.
+    """
+    def __init__(self, *names, package=None):
+        self.__dict__["_LazyModule__names"] = names
+        self.__dict__["_LazyModule__package"] = package
+        self.__dict__["_LazyModule__module"] = None
+
+    def __getattr__(self, name):
+        return getattr(load_module(self), name)
+
+    def __setattr__(self, name, value):
+        setattr(load_module(self), name, value)
+        self.__dict__[name] = value
+
+    def __repr__(self):
+        if self.__module is None:
+            return "<lazy module {!r}>".format(self.__names[0])
+        return repr(self.__module)
+
+
+def load_module(lazy):
+    """Import the module of a LazyModule.
+
+    Args:
+        lazy: LazyModule object.
+
+    Returns:
+        The module. Raises ModuleNotFoundError if none of the names can be
+        imported.
+    """
+    state = lazy.__dict__
+    module = state["_LazyModule__module"]
+    if module is not None:
+        return module
+    with _lock:
+        if state["_LazyModule__module"] is not None:
+            return state["_LazyModule__module"]
+        error = None
+        for name in state["_LazyModule__names"]:
+            try:
+                module = importlib.import_module(
+                    name, state["_LazyModule__package"])
+                break
+            except ModuleNotFoundError as e:
+                if error is None:
+                    error = e
+        else:
+            raise error
+        state.update(vars(module))
+        state["_LazyModule__module"] = module
+    return module
+
+
+def is_available(lazy):
+    """Check whether the module of a LazyModule can be imported.
+
+    Args:
+        lazy: LazyModule object.
+
+    Returns:
+        bool
+    """
+    try:
+        load_module(lazy)
+    except ModuleNotFoundError:
+        return False
+    return True
+
+
+def lazy_function(lazy, name):
+    """Get a function of a LazyModule without importing the module.
+
+    Args:
+        lazy: LazyModule object.
+        name: the name of the function in the module.
+
+    Returns:
+        A function calling the function of the module.
+    """
+    def call(*args, **kwargs):
+        return getattr(lazy, name)(*args, **kwargs)
+
+    call.__name__ = name
+    return call
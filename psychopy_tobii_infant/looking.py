@@ -0,0 +1,190 @@
+"""Offline scoring of looking time with the rules of collect_lt."""
+import numpy as np
+
+
+def invalid_runs(t, valid, start, end):
+    """Run-length encode the missing data of a trial.
+
+        As in collect_lt, the absence starts at the last valid sample before
+        a run of invalid samples (or at the start of the trial) and ends at
+        the first valid sample after it.
+
+    Args:
+        t: array of the sample times in seconds.
+        valid: boolean array, whether either eye was tracked.
+        start, end: the time range of the trial in seconds.
+
+    Returns:
+        (gap_start, gap_end) arrays; gap_end is inf if the data end before
+        the participant looks back.
+    """
+    inside = (t >= start) & (t <= end)
+    t = t[inside]
+    missing = ~np.asarray(valid, dtype=bool)[inside]
+    # +1 at the starts and -1 at the ends of the runs of missing samples
+    edges = np.diff(np.concatenate(([0], missing.astype(np.int8), [0])))
+    first = np.flatnonzero(edges == 1)
+    stop = np.flatnonzero(edges == -1)
+    before = np.concatenate(([start], t))
+    after = np.concatenate((t, [np.inf]))
+    return before[first], after[stop]
+
+
+def score(t, valid, start, max_time, min_away, blink_dur=1):
+    """Compute the looking time of a trial as collect_lt does.
+
+        The trial ends at max_time or as soon as the participant has looked
+        away for min_away. Absences of at least blink_dur (and shorter than
+        min_away) are subtracted from the looking time; shorter ones are
+        tolerated. min_away and blink_dur can be arrays, which are broadcast
+        against each other, so a whole grid is scored at once, e.g.
+        score(t, valid, start, 10, [[1], [2], [3]], [0.2, 0.5]) returns an
+        array of shape (3, 2).
+
+    Args:
+        t: array of the sample times in seconds.
+        valid: boolean array, whether either eye was tracked.
+        start: the start of the trial in seconds.
+        max_time: maximum looking time in seconds.
+        min_away: minimum duration to stop in seconds.
+        blink_dur: the tolerable duration of missing data in seconds.
+            Default is 1.
+
+    Returns:
+        The looking time, rounded to milliseconds (a float or an array).
+    """
+    end = start + max_time
+    gap_start, gap_end = invalid_runs(np.asarray(t, dtype=float), valid,
+                                      start, end)
+    duration = gap_end - gap_start
+    min_away = np.asarray(min_away, dtype=float)[..., None]
+    blink_dur = np.asarray(blink_dur, dtype=float)[..., None]
+    # the first absence reaching min_away within the trial stops it
+    stops = (duration >= min_away) & (gap_start + min_away <= end)
+    n = len(duration)
+    first = np.where(stops.any(axis=-1),
+                     stops.argmax(axis=-1) if n else 0, n)
+    stop_time = np.append(gap_start, end)[first]
+    counted = ((np.arange(n) < first[..., None]) & (duration >= blink_dur) &
+               (duration < min_away) & (gap_end <= end))
+    away = np.where(counted, duration, 0.0).sum(axis=-1)
+    lt = np.round(stop_time - start - away, 3)
+    return lt if lt.ndim else float(lt)
+
+
+class LookingTimeScorer:
+    """Score looking time offline from recorded samples.
+
+        The intervals between the samples are those of the device
+        timestamps, so they are not affected by the delivery of the samples
+        to the experiment. Unlike collect_lt, which checks the latest sample
+        once per frame, every sample is used.
+
+    Args:
+        t: array of the sample times in seconds.
+        valid: boolean array, whether either eye was tracked.
+    """
+    def __init__(self, t, valid):
+        self.t = np.asarray(t, dtype=float)
+        self.valid = np.asarray(valid, dtype=bool)
+
+    @classmethod
+    def from_gaze_data(cls, gaze_data):
+        """Create a scorer of the gaze data provided by the eye tracker.
+
+            The times are on the system clock, anchored at the first sample.
+
+        Args:
+            gaze_data: list of gaze data, e.g. TobiiController.gaze_data.
+
+        Returns:
+            LookingTimeScorer
+        """
+        gaze_data = [x for x in gaze_data if "device_time_stamp" in x]
+        device = np.array([x["device_time_stamp"] for x in gaze_data],
+                          dtype=np.int64)
+        system = gaze_data[0]["system_time_stamp"] if gaze_data else 0
+        valid = [
+            x["left_gaze_point_validity"] or x["right_gaze_point_validity"]
+            for x in gaze_data
+        ]
+        t = (system + (device - device[:1])) / 1e6
+        return cls(t, valid)
+
+    @classmethod
+    def from_session(cls, session, time_unit="ms"):
+        """Create a scorer of a session of a data file.
+
+            The times are since the start of recording, as the TimeStamp and
+            the events. DeviceTimeStamp is used if it was recorded.
+
+        Args:
+            session: Session read from a data file.
+            time_unit: the unit of TimeStamp, "ms" or "us". Default is "ms".
+
+        Returns:
+            LookingTimeScorer
+        """
+        scale = 1e3 if time_unit == "ms" else 1e6
+        t = session.column("TimeStamp") / scale
+        if "DeviceTimeStamp" in session.columns and len(session):
+            device = session.column("DeviceTimeStamp")
+            t = t[0] + (device - device[0]) / 1e6
+        valid = ((session.column("ValidityLeft") > 0) |
+                 (session.column("ValidityRight") > 0))
+        return cls(t, valid)
+
+    def score(self, start, max_time, min_away, blink_dur=1):
+        """Compute the looking time of a trial.
+
+        Args:
+            start: the start of the trial in seconds, on the clock of the
+                scorer.
+            max_time, min_away, blink_dur: see score().
+
+        Returns:
+            The looking time (a float or an array).
+        """
+        return score(self.t, self.valid, start, max_time, min_away,
+                     blink_dur)
+
+    def grid(self, start, max_time, min_away, blink_dur):
+        """Compute the looking time of a trial for every combination.
+
+        Args:
+            start: the start of the trial in seconds.
+            max_time: maximum looking time in seconds.
+            min_away: list of the minimum durations to stop.
+            blink_dur: list of the tolerable durations of missing data.
+
+        Returns:
+            numpy.ndarray of shape (len(min_away), len(blink_dur)).
+        """
+        return self.score(start, max_time,
+                          np.asarray(min_away, dtype=float)[:, None],
+                          np.asarray(blink_dur, dtype=float)[None, :])
+
+    def compare(self, looking_times, t0=0):
+        """Compare the looking times computed live with the offline ones.
+
+        Args:
+            looking_times: list of the results of collect_lt, i.e.
+                TobiiController.looking_times.
+            t0: the system timestamp (in microseconds) of time 0 of the
+                scorer, e.g. TobiiController.t0 for a scorer created from a
+                data file. Default is 0.
+
+        Returns:
+            numpy.ndarray with the fields start (in seconds on the clock of
+            the scorer), live, offline and difference (offline - live).
+        """
+        table = np.empty(len(looking_times),
+                         dtype=[("start", float), ("live", float),
+                                ("offline", float), ("difference", float)])
+        for i, record in enumerate(looking_times):
+            start = (record["start"] - t0) / 1e6
+            offline = self.score(start, record["max_time"],
+                                 record["min_away"], record["blink_dur"])
+            table[i] = (start, record["lt"], offline,
+                        round(offline - record["lt"], 3))
+        return table
@@ -0,0 +1,276 @@
+"""Data files written through an optional streaming compressor."""
+import gzip
+import zlib
+
+from .durability import SyncAlways
+
+COMPRESSIONS = (None, "gzip", "zstd")
+
+
+def _import_zstd():
+    try:
+        import zstandard
+    except ImportError:
+        raise ModuleNotFoundError(
+            "zstandard is required for zstd compression. Install it with "
+            "`pip install zstandard`.")
+    return zstandard
+
+
+class DataFile:
+    """A text data file, optionally compressed while writing.
+
+        Text is encoded and handed to the compressor in blocks. Every
+        flush() ends a compressed block (a sync flush for gzip, a flushed
+        block for zstd), so everything written before the latest flush can
+        be decoded even if the file is never closed properly. A flush is
+        also made automatically after every flush_bytes of text.
+
+    Args:
+        filename: the name of the data file.
+        mode: "w" to create a new file or "a" to append. Default is "w".
+        compression: None, "gzip" or "zstd". Default is None.
+        level: the compression level. If None, the default level of the
+            compressor is used. Default is None.
+        flush_bytes: the amount of text (in bytes) between automatic flush
+            points. Default is 1048576 (1 MB).
+        durability: DurabilityPolicy deciding when the file is synced to the
+            disk. If None, SyncAlways is used. Default is None.
+    """
+    def __init__(self,
+                 filename,
+                 mode="w",
+                 compression=None,
+                 level=None,
+                 flush_bytes=1048576,
+                 durability=None):
+        if compression not in COMPRESSIONS:
+            raise ValueError(
+                "compression ({}) is not supported.".format(compression))
+        if mode not in ("w", "a"):
+            raise ValueError("mode ({}) is not supported.".format(mode))
+        self.name = filename
+        self.compression = compression
+        self.flush_bytes = flush_bytes
+        self._pending = []
+        self._pending_bytes = 0
+        self._unflushed = 0
+        self.closed = False
+        self._raw = open(filename, mode + "b")
+        if compression is None:
+            self._writer = self._raw
+        elif compression == "gzip":
+            self._writer = gzip.GzipFile(
+                fileobj=self._raw,
+                mode="wb",
+                compresslevel=6 if level is None else level)
+        else:
+            zstandard = _import_zstd()
+            self._zstd = zstandard
+            self._writer = zstandard.ZstdCompressor(
+                level=3 if level is None else level).stream_writer(
+                    self._raw, closefd=False)
+        self.durability = SyncAlways() if durability is None else durability
+        self.durability.attach(self)
+
+    def write(self, text):
+        """Write text to the file.
+
+        Args:
+            text: str to write.
+
+        Returns:
+            The number of characters written.
+        """
+        data = text.encode("utf-8")
+        self._pending.append(data)
+        self._pending_bytes += len(data)
+        if self._pending_bytes >= 65536:
+            self._push()
+        if self._unflushed >= self.flush_bytes:
+            self.flush()
+        self.durability.on_write(self, len(data))
+        return len(text)
+
+    def _push(self):
+        """Hand the pending text to the compressor."""
+        if self._pending:
+            self._writer.write(b"".join(self._pending))
+            self._unflushed += self._pending_bytes
+            self._pending = []
+            self._pending_bytes = 0
+
+    def flush(self, full=False):
+        """Write the pending data to the operating system.
+
+        Args:
+            full: whether to make a full flush point, from which the
+                decompression can start without the earlier data. Default
+                is False.
+
+        Returns:
+            None
+        """
+        self._push()
+        if self.compression == "gzip":
+            self._writer.flush(zlib.Z_FULL_FLUSH if full else zlib.Z_SYNC_FLUSH)
+        elif self.compression == "zstd":
+            self._writer.flush(self._zstd.FLUSH_FRAME if full else self._zstd.
+                               FLUSH_BLOCK)
+        self._raw.flush()
+        self._unflushed = 0
+
+    def commit(self):
+        """Flush the file and let the durability policy sync it.
+
+            Called at the points where the data should be safe, e.g. at the
+            end of a session.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self.flush()
+        self.durability.on_commit(self)
+
+    def fileno(self):
+        return self._raw.fileno()
+
+    def tell(self):
+        """Get the position in the file on the disk.
+
+            Call flush() first to include the pending data.
+
+        Args:
+            None
+
+        Returns:
+            The offset in bytes (of the compressed data if compressed).
+        """
+        return self._raw.tell()
+
+    def close(self):
+        """Flush and close the file.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        if self.closed:
+            return
+        self._push()
+        if self._writer is not self._raw:
+            self._writer.close()
+        self._raw.flush()
+        self.durability.on_close(self)
+        self._raw.close()
+        self.closed = True
+
+
+def detect_compression(filename):
+    """Detect the compression of a file from its magic number.
+
+    Args:
+        filename: the name of the file.
+
+    Returns:
+        None, "gzip" or "zstd".
+    """
+    with open(filename, "rb") as f:
+        magic = f.read(4)
+    if magic[:2] == b"\x1f\x8b":
+        return "gzip"
+    elif magic == b"\x28\xb5\x2f\xfd":
+        return "zstd"
+    return None
+
+
+def _iter_gzip(f, chunk_size):
+    """Decompress gzip data, tolerating a truncated end."""
+    decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+    while True:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            break
+        while chunk:
+            try:
+                yield decompressor.decompress(chunk)
+            except zlib.error:
+                # a partial block after the last flush point
+                return
+            chunk = decompressor.unused_data
+            if decompressor.eof:
+                # concatenated members (e.g. the file was appended)
+                decompressor = zlib.decompressobj(zlib.MAX_WBITS | 16)
+            else:
+                chunk = b""
+
+
+def _iter_zstd(f, chunk_size):
+    """Decompress zstd data, tolerating a truncated end."""
+    zstandard = _import_zstd()
+    reader = zstandard.ZstdDecompressor().stream_reader(
+        f, read_across_frames=True)
+    while True:
+        try:
+            chunk = reader.read(chunk_size)
+        except zstandard.ZstdError:
+            return
+        if not chunk:
+            return
+        yield chunk
+
+
+def _iter_deflate(f, chunk_size):
+    """Decompress raw deflate data starting at a full flush point."""
+    decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+    while not decompressor.eof:
+        chunk = f.read(chunk_size)
+        if not chunk:
+            return
+        try:
+            yield decompressor.decompress(chunk)
+        except zlib.error:
+            return
+
+
+def iter_lines(filename, chunk_size=1048576, offset=0, compression=False):
+    """Iterate the lines of a data file, decompressing it if needed.
+
+    Args:
+        filename: the name of the data file.
+        chunk_size: the number of bytes to read at once. Default is 1048576.
+        offset: the position (in the file on the disk) to start reading. For
+            compressed files it must be a full flush point. Default is 0.
+        compression: the compression of the file. If False, it is detected
+            from the file. Default is False.
+
+    Returns:
+        An iterator of str without the line endings.
+    """
+    if compression is False:
+        compression = detect_compression(filename)
+    with open(filename, "rb") as f:
+        f.seek(offset)
+        if compression is None:
+            chunks = iter(lambda: f.read(chunk_size), b"")
+        elif compression == "gzip":
+            if offset:
+                chunks = _iter_deflate(f, chunk_size)
+            else:
+                chunks = _iter_gzip(f, chunk_size)
+        else:
+            chunks = _iter_zstd(f, chunk_size)
+
+        rest = b""
+        for chunk in chunks:
+            lines = (rest + chunk).split(b"\n")
+            rest = lines.pop()
+            for line in lines:
+                yield line.decode("utf-8").rstrip("\r")
+        if rest:
+            yield rest.decode("utf-8").rstrip("\r")
@@ -0,0 +1,256 @@
+"""Timing spans of the controller, exported as Chrome trace events."""
+import functools
+import json
+import os
+import threading
+import time
+from itertools import count
+
+import numpy as np
+
+
+class _NullSpan:
+    """The span of a disabled profiler: does nothing."""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "start")
+
+    def __init__(self, profiler, name):
+        self.profiler = profiler
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler.record(self.name, self.start, time.perf_counter_ns())
+        return False
+
+
+class Profiler:
+    """Record named spans into preallocated arrays.
+
+        Recording a span writes four numbers into arrays allocated once, so
+        it is cheap enough for the callback of the Tobii SDK. Spans from
+        all threads are recorded with the thread they ran on. When the
+        arrays are full, further spans are counted as dropped. A disabled
+        profiler returns a shared span which does nothing.
+
+    Args:
+        capacity: the maximum number of spans. Default is 1000000 (32 MB).
+        enabled: whether to record the spans. Default is True.
+
+    Attributes:
+        dropped: the number of spans not recorded because the arrays were
+            full.
+    """
+    def __init__(self, capacity=1000000, enabled=True):
+        self.capacity = capacity
+        self.enabled = enabled
+        self._start = np.zeros(capacity, dtype=np.int64)
+        self._end = np.zeros(capacity, dtype=np.int64)
+        self._name = np.zeros(capacity, dtype=np.int32)
+        self._thread = np.zeros(capacity, dtype=np.int64)
+        self._names = []
+        self._name_ids = {}
+        self._thread_names = {}
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Forget the recorded spans.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        # next() of itertools.count is atomic, so threads get distinct slots
+        self._counter = count()
+        self._end[:] = 0
+        self.dropped = 0
+        self.origin = time.perf_counter_ns()
+
+    def span(self, name):
+        """Time a block of code.
+
+            E.g. with profiler.span("flush"): ...
+
+        Args:
+            name: the name of the span.
+
+        Returns:
+            A context manager.
+        """
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name)
+
+    def _name_id(self, name):
+        try:
+            return self._name_ids[name]
+        except KeyError:
+            with self._lock:
+                if name not in self._name_ids:
+                    self._name_ids[name] = len(self._names)
+                    self._names.append(name)
+                return self._name_ids[name]
+
+    def record(self, name, start, end):
+        """Add a span.
+
+        Args:
+            name: the name of the span.
+            start, end: time.perf_counter_ns() at the start and the end.
+
+        Returns:
+            None
+        """
+        i = next(self._counter)
+        if i >= self.capacity:
+            self.dropped += 1
+            return
+        thread = threading.get_ident()
+        if thread not in self._thread_names:
+            self._thread_names[thread] = threading.current_thread().name
+        self._start[i] = start
+        self._name[i] = self._name_id(name)
+        self._thread[i] = thread
+        # written last: marks the slot as complete
+        self._end[i] = end
+
+    def spans(self):
+        """Get the recorded spans.
+
+        Args:
+            None
+
+        Returns:
+            numpy.ndarray with the fields name (str), thread (the thread
+            identifier), start and duration (in microseconds since the
+            creation or the reset of the profiler), sorted by start.
+        """
+        idx = np.flatnonzero(self._end)
+        idx = idx[np.argsort(self._start[idx], kind="stable")]
+        table = np.empty(len(idx),
+                         dtype=[("name", object), ("thread", np.int64),
+                                ("start", float), ("duration", float)])
+        names = np.array(self._names, dtype=object)
+        table["name"] = names[self._name[idx]] if len(idx) else []
+        table["thread"] = self._thread[idx]
+        table["start"] = (self._start[idx] - self.origin) / 1000.0
+        table["duration"] = (self._end[idx] - self._start[idx]) / 1000.0
+        return table
+
+    def summary(self):
+        """Get the statistics of each kind of span.
+
+        Args:
+            None
+
+        Returns:
+            dict mapping the names to dicts with the keys n, total, mean and
+            max (in milliseconds).
+        """
+        table = self.spans()
+        result = {}
+        for name in self._names:
+            duration = table["duration"][table["name"] == name] / 1000.0
+            if len(duration):
+                result[name] = {
+                    "n": len(duration),
+                    "total": float(duration.sum()),
+                    "mean": float(duration.mean()),
+                    "max": float(duration.max()),
+                }
+        return result
+
+    def to_chrome_trace(self):
+        """Convert the spans to the Chrome Trace Event format.
+
+            The result can be opened in chrome://tracing or Perfetto.
+
+        Args:
+            None
+
+        Returns:
+            dict
+        """
+        pid = os.getpid()
+        events = [{
+            "name": "thread_name",
+            "ph": "M",
+            "pid": pid,
+            "tid": thread,
+            "args": {
+                "name": name
+            }
+        } for thread, name in self._thread_names.items()]
+        for name, thread, start, duration in self.spans().tolist():
+            events.append({
+                "name": name,
+                "ph": "X",
+                "pid": pid,
+                "tid": thread,
+                "ts": start,
+                "dur": duration
+            })
+        return {
+            "traceEvents": events,
+            "displayTimeUnit": "ms",
+            "otherData": {
+                "dropped": self.dropped
+            }
+        }
+
+    def save(self, filename):
+        """Write the spans to a Chrome trace file (JSON).
+
+        Args:
+            filename: the name of the file.
+
+        Returns:
+            None
+        """
+        with open(filename, "w") as f:
+            json.dump(self.to_chrome_trace(), f)
+
+
+# the profiler of the controllers when profiling is not started
+DISABLED = Profiler(capacity=0, enabled=False)
+
+
+def profiled(name):
+    """Record the calls of a method as spans of self.profiler.
+
+    Args:
+        name: the name of the spans.
+
+    Returns:
+        decorator
+    """
+    def decorator(method):
+        @functools.wraps(method)
+        def wrapper(self, *args, **kwargs):
+            profiler = self.profiler
+            if not profiler.enabled:
+                return method(self, *args, **kwargs)
+            with _Span(profiler, name):
+                return method(self, *args, **kwargs)
+
+        return wrapper
+
+    return decorator
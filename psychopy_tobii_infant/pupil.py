@@ -0,0 +1,306 @@
+"""Preprocessing of the pupil size, in real time and offline."""
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+OUTPUT_DTYPE = [("t", float), ("pupil", float), ("valid", bool),
+                ("clean", float), ("smoothed", float), ("corrected", float),
+                ("trial", np.int64)]
+
+
+def combine_eyes(left, right, left_valid=None, right_valid=None):
+    """Average the pupil sizes of both eyes, or take the valid eye.
+
+    Args:
+        left, right: arrays of the pupil diameters.
+        left_valid, right_valid: arrays of the validities. If None, the
+            diameters which are not NaN are valid. Default is None.
+
+    Returns:
+        numpy.ndarray, NaN if neither eye is valid.
+    """
+    left = np.asarray(left, dtype=float)
+    right = np.asarray(right, dtype=float)
+    lv = ~np.isnan(left) if left_valid is None else (
+        np.asarray(left_valid).astype(bool) & ~np.isnan(left))
+    rv = ~np.isnan(right) if right_valid is None else (
+        np.asarray(right_valid).astype(bool) & ~np.isnan(right))
+    out = np.full(len(left), np.nan)
+    both = lv & rv
+    out[both] = (left[both] + right[both]) / 2.0
+    out[lv & ~rv] = left[lv & ~rv]
+    out[rv & ~lv] = right[rv & ~lv]
+    return out
+
+
+def gaze_data_columns(gaze_data):
+    """Get the pupil columns of the gaze data provided by the eye tracker.
+
+    Args:
+        gaze_data: list of gaze data, e.g. TobiiController.gaze_data.
+
+    Returns:
+        (t, left, right, left_valid, right_valid) arrays; t is the system
+        timestamp in seconds.
+    """
+    keys = ("system_time_stamp", "left_pupil_diameter",
+            "right_pupil_diameter", "left_pupil_validity",
+            "right_pupil_validity")
+    columns = np.array([[x[key] for key in keys] for x in gaze_data],
+                       dtype=float).reshape(-1, len(keys))
+    t, left, right, lv, rv = columns.T
+    return t / 1e6, left, right, lv, rv
+
+
+class PupilPipeline:
+    """Clean the pupil size and correct it for the baseline of each trial.
+
+        The steps are causal, so the samples can be processed as they
+        arrive, in batches of any size, with the same results as processing
+        a whole session at once:
+
+        1. For each eye, samples changing faster than max_speed from the
+           previous sample are rejected, as are the missing samples
+           (blinks) and the samples within margin after them, when the
+           pupil is still reopening.
+        2. The accepted pupil sizes of both eyes are averaged.
+        3. Rejected samples are replaced with the last accepted one, for at
+           most max_gap after it; longer gaps stay missing.
+        4. The result is smoothed with a moving average of the latest
+           window samples.
+        5. From the first sample of a trial (see start_trial), the smoothed
+           size is corrected for the mean smoothed size during baseline
+           before the trial.
+
+        Only the latest samples are kept between batches.
+
+    Args:
+        max_speed: the maximum dilation speed in mm/s. Default is 10.
+        margin: the time rejected after a missing or rejected sample in
+            seconds. Default is 0.05.
+        max_gap: the longest gap filled with the last accepted sample in
+            seconds. Default is 0.25.
+        window: the number of samples of the moving average. Default is 5.
+        baseline: the duration of the baseline before a trial in seconds.
+            Default is 0.2.
+        method: "subtract" (the difference from the baseline) or "divide"
+            (the ratio to the baseline). Default is "subtract".
+
+    Attributes:
+        baselines: list of (onset, baseline) of the trials started so far.
+        latest: the output of the newest sample (see process), or None.
+    """
+    methods = ("subtract", "divide")
+
+    def __init__(self,
+                 max_speed=10.0,
+                 margin=0.05,
+                 max_gap=0.25,
+                 window=5,
+                 baseline=0.2,
+                 method="subtract"):
+        if method not in self.methods:
+            raise ValueError("method ({}) is not supported.".format(method))
+        if window < 1:
+            raise ValueError("window must be at least 1.")
+        self.max_speed = max_speed
+        self.margin = margin
+        self.max_gap = max_gap
+        self.window = window
+        self.baseline = baseline
+        self.method = method
+        self.reset()
+
+    def reset(self):
+        """Clear the state and the trials.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self._prev_t = np.nan
+        self._prev_pupil = [np.nan, np.nan]
+        self._last_bad = [-np.inf, -np.inf]
+        self._last_time = -np.inf
+        self._last_value = np.nan
+        self._tail = np.full(self.window - 1, np.nan)
+        self._hist_t = np.empty(0)
+        self._hist_v = np.empty(0)
+        self._onsets = []
+        self._baseline = np.nan
+        self._trial = -1
+        self.baselines = []
+        self.latest = None
+
+    def start_trial(self, onset):
+        """Start a trial.
+
+            The baseline is computed when the first sample at or after the
+            onset is processed, so samples delivered late by the eye tracker
+            are still included in the baseline.
+
+        Args:
+            onset: the time of the start of the trial in seconds, on the
+                clock of the samples.
+
+        Returns:
+            None
+        """
+        self._onsets.append(onset)
+        self._onsets.sort()
+
+    def process(self, t, left, right=None, left_valid=None, right_valid=None):
+        """Process a batch of samples.
+
+        Args:
+            t: array of the sample times in seconds, increasing.
+            left, right: arrays of the pupil diameters of the eyes (mm). If
+                right is None, left is the pupil size of both eyes.
+            left_valid, right_valid: arrays of the validities. Default is
+                None (valid if not NaN).
+
+        Returns:
+            numpy.ndarray with the fields t, pupil (both eyes), valid
+            (either eye accepted in step 1), clean, smoothed, corrected and
+            trial (the index of the trial, -1 before the first one).
+        """
+        t = np.asarray(t, dtype=float)
+        eyes = [np.array(left, dtype=float)]
+        validities = [left_valid]
+        if right is not None:
+            eyes.append(np.array(right, dtype=float))
+            validities.append(right_valid)
+        for eye, valid in zip(eyes, validities):
+            if valid is not None:
+                eye[~np.asarray(valid).astype(bool)] = np.nan
+        out = np.empty(len(t), dtype=OUTPUT_DTYPE)
+        out["t"] = t
+        out["pupil"] = eyes[0] if right is None else combine_eyes(*eyes)
+        start = 0
+        while True:
+            stop = len(t)
+            if self._onsets:
+                stop = start + int(
+                    np.searchsorted(t[start:], self._onsets[0], side="left"))
+            if stop > start:
+                self._run(out[start:stop], [x[start:stop] for x in eyes])
+            if stop == len(t):
+                break
+            self._begin_trial()
+            start = stop
+        if len(out):
+            self.latest = out[-1]
+        return out
+
+    def _reject(self, t, pupil, i):
+        """Step 1 for eye i: the pupil sizes with the rejected ones NaN."""
+        prev_t = np.concatenate(([self._prev_t], t[:-1]))
+        prev_pupil = np.concatenate(([self._prev_pupil[i]], pupil[:-1]))
+        with np.errstate(invalid="ignore", divide="ignore"):
+            speed = np.abs(pupil - prev_pupil) / (t - prev_t)
+        bad = np.isnan(pupil) | (speed > self.max_speed)
+        last_bad = np.maximum.accumulate(
+            np.concatenate(([self._last_bad[i]], np.where(bad, t,
+                                                          -np.inf))))[1:]
+        self._prev_pupil[i] = pupil[-1]
+        self._last_bad[i] = last_bad[-1]
+        return np.where(~bad & (t - last_bad > self.margin), pupil, np.nan)
+
+    def _run(self, out, eyes):
+        t = out["t"]
+        n = len(t)
+        accepted = [self._reject(t, eye, i) for i, eye in enumerate(eyes)]
+        self._prev_t = t[-1]
+        # 2. average of the accepted eyes
+        pupil = accepted[0] if len(accepted) == 1 else combine_eyes(*accepted)
+        valid = ~np.isnan(pupil)
+        out["valid"] = valid
+        # 3. fill the gaps with the last accepted sample; index 0 is the
+        # last accepted sample of the previous batches
+        values = np.concatenate(([self._last_value], pupil))
+        times = np.concatenate(([self._last_time], t))
+        idx = np.maximum.accumulate(
+            np.where(np.concatenate(([True], valid)), np.arange(n + 1), 0))
+        last = idx[1:]
+        clean = np.where(t - times[last] <= self.max_gap, values[last],
+                         np.nan)
+        out["clean"] = clean
+        # 4. moving average, NaN if the window has no samples
+        extended = np.concatenate((self._tail, clean))
+        windows = sliding_window_view(extended, self.window)
+        missing = np.isnan(windows)
+        count = self.window - missing.sum(axis=1)
+        total = np.where(missing, 0.0, windows).sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            smoothed = np.where(count > 0, total / count, np.nan)
+        out["smoothed"] = smoothed
+        # 5. baseline correction
+        if self.method == "subtract":
+            out["corrected"] = smoothed - self._baseline
+        else:
+            out["corrected"] = smoothed / self._baseline
+        out["trial"] = self._trial
+
+        self._last_value = values[idx[-1]]
+        self._last_time = times[idx[-1]]
+        self._tail = extended[len(extended) - self.window + 1:]
+        # keep the smoothed sizes which may be in the next baseline
+        first = np.searchsorted(t, t[-1] - self.baseline, side="left")
+        hist_t = np.concatenate((self._hist_t, t[first:]))
+        hist_v = np.concatenate((self._hist_v, smoothed[first:]))
+        keep = hist_t >= t[-1] - self.baseline
+        self._hist_t = hist_t[keep]
+        self._hist_v = hist_v[keep]
+
+    def _begin_trial(self):
+        onset = self._onsets.pop(0)
+        inside = (self._hist_t >= onset - self.baseline) & (self._hist_t <
+                                                             onset)
+        values = self._hist_v[inside]
+        values = values[~np.isnan(values)]
+        self._baseline = values.mean() if len(values) else np.nan
+        self._trial += 1
+        self.baselines.append((onset, self._baseline))
+
+    def process_gaze_data(self, gaze_data, onsets=()):
+        """Process the gaze data of a recording at once.
+
+            The results are identical to those of the samples processed as
+            they arrived, if the trials started at the same times.
+
+        Args:
+            gaze_data: list of gaze data, e.g. TobiiController.gaze_data.
+            onsets: the system timestamps of the starts of the trials in
+                seconds. Default is ().
+
+        Returns:
+            See process().
+        """
+        self.reset()
+        for onset in onsets:
+            self.start_trial(onset)
+        return self.process(*gaze_data_columns(gaze_data))
+
+    def process_session(self, session, start_event, time_unit="ms"):
+        """Process a session of a data file at once.
+
+        Args:
+            session: Session read from a data file.
+            start_event: the beginning of the events starting a trial, e.g.
+                "onset" for the events "onset face.png" and "onset car.png".
+            time_unit: the unit of TimeStamp, "ms" or "us". Default is "ms".
+
+        Returns:
+            See process(). The times are since the start of the recording.
+        """
+        scale = 1e3 if time_unit == "ms" else 1e6
+        self.reset()
+        for time, event in session.events:
+            if event.startswith(start_event):
+                self.start_trial(time / scale)
+        return self.process(session.column("TimeStamp") / scale,
+                            session.column("PupilSizeLeft"),
+                            session.column("PupilSizeRight"),
+                            session.column("PupilValidityLeft"),
+                            session.column("PupilValidityRight"))
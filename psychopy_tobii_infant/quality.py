@@ -0,0 +1,264 @@
+"""Real-time monitoring of eye-tracking data quality."""
+import math
+import threading
+
+import numpy as np
+
+
+def _gaze_angle(origin_a, point_a, origin_b, point_b):
+    """Angle in degrees between two gaze directions.
+
+    Args:
+        origin_a, point_a: gaze origin and gaze point of the first sample in
+            the user coordinate system.
+        origin_b, point_b: gaze origin and gaze point of the second sample.
+
+    Returns:
+        The angle between the gaze vectors in degrees.
+    """
+    ax = point_a[0] - origin_a[0]
+    ay = point_a[1] - origin_a[1]
+    az = point_a[2] - origin_a[2]
+    bx = point_b[0] - origin_b[0]
+    by = point_b[1] - origin_b[1]
+    bz = point_b[2] - origin_b[2]
+    # atan2 keeps the precision for the small angles between two samples
+    cross = math.sqrt((ay * bz - az * by)**2 + (az * bx - ax * bz)**2 +
+                      (ax * by - ay * bx)**2)
+    return math.degrees(math.atan2(cross, ax * bx + ay * by + az * bz))
+
+
+class DataQualityMonitor:
+    """Sliding-window data quality of the incoming gaze samples.
+
+        The monitor is updated with every gaze sample in the callback of the
+        Tobii SDK. Each update costs O(1): the statistics are kept as running
+        sums over a ring buffer. To avoid the accumulation of rounding
+        errors, the entries are also summed without subtraction since the
+        start of the current window; after every window these sums cover
+        exactly the ring and replace the running sums.
+
+    Args:
+        window: the length of the sliding window in seconds. Default is 1.
+        sampling_rate: the nominal sampling rate of the eye tracker in Hz.
+            Default is 60.
+
+    Attributes:
+        dropped_total: the number of dropped samples since the last reset.
+    """
+    def __init__(self, window=1.0, sampling_rate=60):
+        self.window = window
+        self.sampling_rate = sampling_rate
+        self.size = max(2, int(round(window * sampling_rate)))
+        self._expected_interval = 1e6 / sampling_rate
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        """Clear the window and the counters.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        with self._lock:
+            # per-sample values: left validity, right validity, squared
+            # sample-to-sample angle of each eye (None if not available),
+            # sampling interval (None for the first sample) and the number
+            # of dropped samples before the sample
+            self._ring = [None] * self.size
+            self._head = 0
+            self._count = 0
+            self._updates = 0
+            self._sums = self._zero_sums()
+            self._next_sums = self._zero_sums()
+            self._prev = None
+            self.dropped_total = 0
+
+    def _entry(self, gaze_data):
+        """Compute the per-sample values of the window."""
+        lv = int(bool(gaze_data["left_gaze_point_validity"]))
+        rv = int(bool(gaze_data["right_gaze_point_validity"]))
+        t = gaze_data["device_time_stamp"]
+        left = right = None
+        interval = None
+        dropped = 0
+        prev = self._prev
+        if prev is not None:
+            interval = t - prev["device_time_stamp"]
+            if interval > 1.5 * self._expected_interval:
+                dropped = int(round(interval / self._expected_interval)) - 1
+            if lv and prev["left_gaze_point_validity"]:
+                left = _gaze_angle(
+                    prev["left_gaze_origin_in_user_coordinate_system"],
+                    prev["left_gaze_point_in_user_coordinate_system"],
+                    gaze_data["left_gaze_origin_in_user_coordinate_system"],
+                    gaze_data["left_gaze_point_in_user_coordinate_system"])**2
+            if rv and prev["right_gaze_point_validity"]:
+                right = _gaze_angle(
+                    prev["right_gaze_origin_in_user_coordinate_system"],
+                    prev["right_gaze_point_in_user_coordinate_system"],
+                    gaze_data["right_gaze_origin_in_user_coordinate_system"],
+                    gaze_data["right_gaze_point_in_user_coordinate_system"])**2
+        self._prev = gaze_data
+        return (lv, rv, left, right, interval, dropped)
+
+    @staticmethod
+    def _zero_sums():
+        return [0, 0, 0.0, 0, 0.0, 0, 0.0, 0.0, 0, 0]
+
+    @staticmethod
+    def _accumulate(sums, entry, sign):
+        lv, rv, left, right, interval, dropped = entry
+        sums[0] += sign * lv
+        sums[1] += sign * rv
+        if left is not None:
+            sums[2] += sign * left
+            sums[3] += sign
+        if right is not None:
+            sums[4] += sign * right
+            sums[5] += sign
+        if interval is not None:
+            sums[6] += sign * interval
+            sums[7] += sign * interval * interval
+            sums[8] += sign
+        sums[9] += sign * dropped
+
+    def update(self, gaze_data):
+        """Add a gaze sample to the window.
+
+            Called by TobiiController._on_gaze_data.
+
+        Args:
+            gaze_data: gaze data provided by the eye tracker.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            entry = self._entry(gaze_data)
+            old = self._ring[self._head]
+            if old is not None:
+                self._accumulate(self._sums, old, -1)
+            self._accumulate(self._sums, entry, 1)
+            self._accumulate(self._next_sums, entry, 1)
+            self._ring[self._head] = entry
+            self._head = (self._head + 1) % self.size
+            self._count = min(self._count + 1, self.size)
+            self.dropped_total += entry[5]
+
+            self._updates += 1
+            if self._updates % self.size == 0:
+                # the ring holds the entries added since the last swap
+                self._sums = self._next_sums
+                self._next_sums = self._zero_sums()
+
+    def summary(self):
+        """Get the data quality in the current window.
+
+        Args:
+            None
+
+        Returns:
+            A dict with the following keys:
+                n_samples: the number of samples in the window.
+                valid_ratio_left, valid_ratio_right: the proportion of valid
+                    samples of each eye.
+                rms_s2s_left, rms_s2s_right: sample-to-sample RMS precision of
+                    each eye in degrees.
+                sampling_interval: the mean interval between samples in ms.
+                jitter: the standard deviation of the sampling interval in
+                    ms.
+                dropped: the number of dropped samples in the window.
+                dropped_total: the number of dropped samples since the last
+                    reset.
+            The values are NaN if they cannot be computed yet.
+        """
+        with self._lock:
+            n = self._count
+            (lv, rv, left, n_left, right, n_right, interval, interval_sq,
+             n_interval, dropped) = self._sums
+            dropped_total = self.dropped_total
+
+        def _ratio(x, n):
+            return x / n if n > 0 else np.nan
+
+        if n_interval > 0:
+            mean_interval = interval / n_interval
+            var = max(interval_sq / n_interval - mean_interval**2, 0.0)
+            jitter = math.sqrt(var) / 1000.0
+            mean_interval /= 1000.0
+        else:
+            mean_interval = jitter = np.nan
+
+        return {
+            "n_samples": n,
+            "valid_ratio_left": _ratio(lv, n),
+            "valid_ratio_right": _ratio(rv, n),
+            "rms_s2s_left": math.sqrt(max(_ratio(left, n_left), 0.0))
+            if n_left > 0 else np.nan,
+            "rms_s2s_right": math.sqrt(max(_ratio(right, n_right), 0.0))
+            if n_right > 0 else np.nan,
+            "sampling_interval": mean_interval,
+            "jitter": jitter,
+            "dropped": dropped,
+            "dropped_total": dropped_total,
+        }
+
+
+class QualityOverlay:
+    """Text overlay of the data quality for the experimenter.
+
+        Draw it on a window that is not visible to the participant, for
+        example a second window on the experimenter's monitor.
+
+    Args:
+        win: psychopy.visual.Window object to draw on.
+        monitor: DataQualityMonitor object.
+        pos: the position of the text in pixels. Default is the upper left
+            corner of the window.
+        color: the color of the text. Default is white.
+        **kwargs: other arguments to pass into psychopy.visual.TextStim.
+    """
+    _template = ("Valid L/R: {valid_ratio_left:.0%} / {valid_ratio_right:.0%}"
+                 "\nRMS L/R (deg): {rms_s2s_left:.3f} / {rms_s2s_right:.3f}"
+                 "\nInterval (ms): {sampling_interval:.2f}"
+                 " +/- {jitter:.2f}"
+                 "\nDropped: {dropped} ({dropped_total} total)")
+
+    def __init__(self, win, monitor, pos=None, color="white", **kwargs):
+        from psychopy import visual
+
+        self.win = win
+        self.monitor = monitor
+        if pos is None:
+            pos = (-win.size[0] / 2 + 10, win.size[1] / 2 - 10)
+        self.text = visual.TextStim(win,
+                                    pos=pos,
+                                    color=color,
+                                    units="pix",
+                                    height=14,
+                                    anchorHoriz="left",
+                                    anchorVert="top",
+                                    alignText="left",
+                                    autoLog=False,
+                                    **kwargs)
+        self._last_text = None
+
+    def draw(self):
+        """Draw the current data quality.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        text = self._template.format(**self.monitor.summary())
+        # TextStim.setText is expensive, only update when changed
+        if text != self._last_text:
+            self.text.setText(text)
+            self._last_text = text
+        self.text.draw()
@@ -0,0 +1,317 @@
+"""Read the data files written by TobiiController."""
+import os
+
+import numpy as np
+
+from .index import SessionIndex
+from .output import iter_lines
+
+
+def _parse_rows(rows, n_columns, truncated=False):
+    """Convert tab-separated rows of numbers to an array.
+
+    Args:
+        rows: list of str.
+        n_columns: the number of columns.
+        truncated: whether the last row may be incomplete. Default is False.
+
+    Returns:
+        numpy.ndarray of shape (n_rows, n_columns).
+    """
+    if truncated and rows:
+        try:
+            np.array(rows[-1].split("\t"), dtype=float)
+        except ValueError:
+            rows = rows[:-1]
+    if not rows:
+        return np.empty((0, n_columns))
+    return np.array(" ".join(rows).split(), dtype=float).reshape(-1, n_columns)
+
+
+class Session:
+    """A recording session (from start_recording to stop_recording).
+
+    Attributes:
+        header: dict of the information written before the column names,
+            e.g. the latency statistics.
+        columns: list of the names of the gaze data columns.
+        data: numpy.ndarray of shape (n_samples, n_columns).
+        events: list of (timestamp, event) recorded by record_event.
+        streams: dict mapping the name of an additional stream to a tuple
+            (columns, numpy.ndarray).
+        complete: whether the end of the session was found. False if the
+            file was truncated.
+    """
+    def __init__(self):
+        self.header = {}
+        self.columns = []
+        self.data = np.empty((0, 0))
+        self.events = []
+        self.streams = {}
+        self.complete = False
+
+    def __len__(self):
+        return len(self.data)
+
+    def column(self, name):
+        """Get a column of the gaze data.
+
+        Args:
+            name: the name of the column, e.g. "GazePointX".
+
+        Returns:
+            numpy.ndarray, a view into Session.data.
+        """
+        return self.data[:, self.columns.index(name)]
+
+
+class Recording:
+    """The contents of a data file.
+
+    Attributes:
+        info: dict of the information in the beginning of the file, e.g.
+            "Recording date" and "PsychoPy units".
+        validation: list of dicts, the validation results saved to the file.
+        sessions: list of Session objects.
+    """
+    def __init__(self):
+        self.info = {}
+        self.validation = []
+        self.sessions = []
+
+
+def _is_numeric(fields):
+    try:
+        for field in fields:
+            float(field)
+    except ValueError:
+        return False
+    return True
+
+
+def _separate_events(rows, events, positions, truncated=False):
+    """Move the events having as many fields as the columns out of the rows.
+
+        Such events (e.g. any event with a one-column schema) are taken as
+        rows when the lines are read; they are told apart by their content
+        only if the rows cannot be parsed, so the rows are checked once.
+
+    Args:
+        rows: list of str, the lines with as many fields as the columns.
+        events: list of (timestamp, event) of the other event lines.
+        positions: the number of rows read before each of the events.
+        truncated: whether the last row may be incomplete. Default is False.
+
+    Returns:
+        (rows, events): the rows of data and all the events in the order of
+        the file.
+    """
+    data = []
+    merged = []
+    k = 0
+    for i, line in enumerate(rows):
+        fields = line.split("\t")
+        if _is_numeric(fields):
+            data.append(line)
+            continue
+        if truncated and i == len(rows) - 1:
+            # a partial line at the end of a truncated file
+            break
+        while k < len(events) and positions[k] <= i:
+            merged.append(events[k])
+            k += 1
+        merged.append((float(fields[0]), "\t".join(fields[1:])))
+    merged.extend(events[k:])
+    return data, merged
+
+
+def _split_key(line):
+    key, _, value = line.partition("\t")
+    return key.rstrip(":"), value
+
+
+def parse_lines(lines, recording=None):
+    """Parse the lines of a data file.
+
+    Args:
+        lines: an iterable of lines without the line endings.
+        recording: Recording object to add the sessions to. If None, a new
+            one is created. Default is None.
+
+    Returns:
+        Recording
+    """
+    if recording is None:
+        recording = Recording()
+    session = None
+    rows = []
+    positions = []
+    stream = None
+    stream_rows = []
+    stream_columns = None
+
+    def _finish_session():
+        truncated = not session.complete
+        try:
+            session.data = _parse_rows(rows, len(session.columns), truncated)
+        except ValueError:
+            data, session.events = _separate_events(rows, session.events,
+                                                    positions, truncated)
+            session.data = _parse_rows(data, len(session.columns),
+                                       truncated)
+        recording.sessions.append(session)
+
+    for line in lines:
+        if not line:
+            continue
+        if session is None:
+            if line == "Session Start":
+                session = Session()
+                rows = []
+                positions = []
+                continue
+            key, value = _split_key(line)
+            if key == "Validation time":
+                recording.validation.append({key: value})
+            elif recording.validation and key.startswith("Mean"):
+                recording.validation[-1][key] = value
+            else:
+                recording.info.setdefault(key, value)
+        elif stream is not None:
+            if line.startswith("Stream End"):
+                session.streams[stream] = (stream_columns,
+                                           _parse_rows(stream_rows,
+                                                       len(stream_columns)))
+                stream = None
+            elif stream_columns is None:
+                stream_columns = line.split("\t")
+            else:
+                stream_rows.append(line)
+        elif line == "Session End":
+            session.complete = True
+            _finish_session()
+            session = None
+        elif line.startswith("Stream Start"):
+            stream = line.partition("\t")[2]
+            stream_columns = None
+            stream_rows = []
+        elif not session.columns:
+            if line.startswith("TimeStamp\t"):
+                session.columns = line.split("\t")
+            else:
+                key, value = _split_key(line)
+                session.header[key] = value
+        else:
+            fields = line.split("\t")
+            if len(fields) == len(session.columns):
+                rows.append(line)
+            else:
+                try:
+                    t = float(fields[0])
+                except ValueError:
+                    # a partial line at the end of a truncated file
+                    continue
+                session.events.append((t, "\t".join(fields[1:])))
+                positions.append(len(rows))
+
+    if session is not None:
+        # truncated file
+        _finish_session()
+    return recording
+
+
+def read_recording(filename):
+    """Read a data file written by TobiiController.
+
+        Compressed files (gzip or zstd) are decompressed transparently. A
+        truncated file is read up to its last complete line.
+
+    Args:
+        filename: the name of the data file.
+
+    Returns:
+        Recording
+    """
+    return parse_lines(iter_lines(filename))
+
+
+def _session_lines(lines):
+    """Stop iterating the lines at the end of the session."""
+    for line in lines:
+        yield line
+        if line == "Session End":
+            return
+
+
+def read_session(filename, session, index=None):
+    """Read one session of a data file using its index.
+
+        The data file is read from the offset of the session, so the earlier
+        sessions are not decompressed or parsed.
+
+    Args:
+        filename: the name of the data file.
+        session: the number of the session, starting from 0.
+        index: SessionIndex of the data file. If None, the index is loaded
+            from the sidecar file. Default is None.
+
+    Returns:
+        Session
+    """
+    if index is None:
+        index = SessionIndex.load(filename)
+    entry = index[session]
+    chunk_size = max(4096, min(1048576, entry["end"] - entry["offset"]))
+    lines = iter_lines(filename, chunk_size, offset=entry["offset"])
+    recording = parse_lines(_session_lines(lines))
+    if not recording.sessions:
+        raise ValueError(
+            "Session {} is not found at offset {} of {}.".format(
+                session, entry["offset"], filename))
+    return recording.sessions[0]
+
+
+def verify_recording(filename, index=None):
+    """Check a data file against its index.
+
+    Args:
+        filename: the name of the data file.
+        index: SessionIndex of the data file. If None, the index is loaded
+            from the sidecar file. Default is None.
+
+    Returns:
+        list of str describing the problems. Empty if the data file matches
+        the index.
+    """
+    if index is None:
+        index = SessionIndex.load(filename)
+    problems = []
+    size = os.path.getsize(filename)
+    if index.sessions and size < index.sessions[-1]["end"]:
+        problems.append("The file is truncated ({} of {} bytes).".format(
+            size, index.sessions[-1]["end"]))
+    for i, entry in enumerate(index.sessions):
+        if entry["end"] > size:
+            problems.append("Session {} is beyond the end of file.".format(i))
+            continue
+        try:
+            session = read_session(filename, i, index)
+        except ValueError as e:
+            problems.append(str(e))
+            continue
+        if not session.complete:
+            problems.append("Session {} is incomplete.".format(i))
+        if len(session) != entry["n_samples"]:
+            problems.append("Session {} has {} samples ({} indexed).".format(
+                i, len(session), entry["n_samples"]))
+        elif len(session):
+            for key, value in (("first", session.data[0, 0]),
+                               ("last", session.data[-1, 0])):
+                if not np.isclose(value, entry[key]):
+                    problems.append(
+                        "Session {}: the {} timestamp is {} ({} indexed)."
+                        .format(i, key, value, entry[key]))
+        if len(session.events) != entry["n_events"]:
+            problems.append("Session {} has {} events ({} indexed).".format(
+                i, len(session.events), entry["n_events"]))
+    return problems
@@ -0,0 +1,300 @@
+"""Replay of recorded gaze data through the controller."""
+import threading
+
+import numpy as np
+
+from .reader import read_recording
+from .simulation import (EYETRACKER_GAZE_DATA, EYETRACKER_USER_POSITION_GUIDE,
+                         SimulatedEyeTracker, get_system_time_stamp)
+
+# the keys of the gaze data of tobii_research
+GAZE_KEYS = ("device_time_stamp", "system_time_stamp") + tuple(
+    eye + key for eye in ("left", "right")
+    for key in ("_gaze_point_on_display_area",
+                "_gaze_point_in_user_coordinate_system",
+                "_gaze_point_validity", "_pupil_diameter", "_pupil_validity",
+                "_gaze_origin_in_user_coordinate_system",
+                "_gaze_origin_in_trackbox_coordinate_system",
+                "_gaze_origin_validity"))
+
+
+def save_raw(filename, gaze_data):
+    """Save the gaze data as provided by the eye tracker.
+
+        Unlike the data file, all the fields of the gaze data are kept in
+        their original coordinates, so the recording can be replayed
+        losslessly, e.g. save_raw("raw.npz", controller.gaze_data) after
+        stop_recording().
+
+    Args:
+        filename: the name of the .npz file.
+        gaze_data: list of gaze data.
+
+    Returns:
+        None
+    """
+    arrays = {}
+    for key in GAZE_KEYS:
+        is_int = key.endswith(("time_stamp", "validity"))
+        arrays[key] = np.array([x[key] for x in gaze_data],
+                               dtype=np.int64 if is_int else float)
+    np.savez_compressed(filename, **arrays)
+
+
+def load_raw(filename):
+    """Load the gaze data saved by save_raw.
+
+    Args:
+        filename: the name of the .npz file.
+
+    Returns:
+        list of gaze data.
+    """
+    with np.load(filename) as f:
+        arrays = {key: f[key] for key in f.files}
+    n = len(arrays["system_time_stamp"])
+    columns = {}
+    for key, values in arrays.items():
+        if values.ndim == 1:
+            columns[key] = values.tolist()
+        else:
+            columns[key] = [tuple(x) for x in values.tolist()]
+    return [{key: columns[key][i] for key in columns} for i in range(n)]
+
+
+def _to_adcs(units, resolution):
+    """Get the conversion of PsychoPy coordinates to Tobii ADCS."""
+    w, h = resolution
+    if units == "norm":
+        return lambda x, y: ((x + 1) / 2, (1 - y) / 2)
+    elif units == "height":
+        return lambda x, y: (x * h / w + 0.5, -y + 0.5)
+    elif units == "pix":
+        return lambda x, y: (x / w + 0.5, -y / h + 0.5)
+    return None
+
+
+def session_to_gaze_data(session,
+                         info,
+                         to_tobii=None,
+                         time_unit=None,
+                         display_area=None):
+    """Convert a session of a data file to gaze data.
+
+        The fields missing in the data file are filled in: the gaze points
+        in the user coordinate system are computed from the display area and
+        the gaze origins are set to 60 cm in front of the display.
+
+    Args:
+        session: Session read from a data file.
+        info: Recording.info of the data file, with the units and the
+            resolution.
+        to_tobii: a function converting (x, y) arrays in the units of the
+            data file to Tobii ADCS. Required for "cm" and "deg" units.
+            Default is None.
+        time_unit: the unit of TimeStamp, "ms" or "us". If None, it is
+            inferred from the sampling interval. Default is None.
+        display_area: the display area used for the user coordinate system.
+            Default is None (that of SimulatedEyeTracker).
+
+    Returns:
+        list of gaze data with system_time_stamp in microseconds since the
+        start of recording.
+    """
+    if to_tobii is None:
+        units = info.get("PsychoPy units")
+        resolution = [
+            int(x) for x in info.get("Recording resolution", "0 x 0").split(
+                "x")
+        ]
+        to_tobii = _to_adcs(units, resolution)
+        if to_tobii is None:
+            raise ValueError(
+                "Set to_tobii to convert units ({}).".format(units))
+    if display_area is None:
+        display_area = SimulatedEyeTracker().get_display_area()
+    n = len(session)
+    t = session.column("TimeStamp")
+    if time_unit is None:
+        interval = np.median(np.diff(t)) if n > 1 else 0
+        time_unit = "us" if interval > 50 else "ms"
+    system = np.round(t * (1000 if time_unit == "ms" else 1)).astype(np.int64)
+    if "DeviceTimeStamp" in session.columns:
+        device = session.column("DeviceTimeStamp").astype(np.int64)
+    else:
+        device = system
+    top_left = np.asarray(display_area.top_left, dtype=float)
+    right = np.asarray(display_area.top_right, dtype=float) - top_left
+    down = np.asarray(display_area.bottom_left, dtype=float) - top_left
+
+    def _column(name, default):
+        if name in session.columns:
+            return session.column(name)
+        return np.full(n, default)
+
+    columns = {"device_time_stamp": device.tolist()}
+    for eye, side, x_origin in (("left", "Left", -30.0),
+                                ("right", "Right", 30.0)):
+        valid = _column("Validity" + side, 0).astype(int)
+        x, y = to_tobii(_column("GazePointX" + side, np.nan),
+                        _column("GazePointY" + side, np.nan))
+        x = np.where(valid, x, np.nan)
+        y = np.where(valid, y, np.nan)
+        ucs = top_left + x[:, None] * right + y[:, None] * down
+        origin = np.where(valid[:, None], [[x_origin, 150.0, 600.0]], np.nan)
+        trackbox = np.where(valid[:, None], [[0.5, 0.5, 0.5]], np.nan)
+        pupil_valid = _column("PupilValidity" + side, 0).astype(int)
+        columns.update({
+            eye + "_gaze_point_on_display_area": list(zip(x, y)),
+            eye + "_gaze_point_in_user_coordinate_system":
+            [tuple(p) for p in ucs.tolist()],
+            eye + "_gaze_point_validity": valid.tolist(),
+            eye + "_pupil_diameter": _column("PupilSize" + side,
+                                             np.nan).tolist(),
+            eye + "_pupil_validity": pupil_valid.tolist(),
+            eye + "_gaze_origin_in_user_coordinate_system":
+            [tuple(p) for p in origin.tolist()],
+            eye + "_gaze_origin_in_trackbox_coordinate_system":
+            [tuple(p) for p in trackbox.tolist()],
+            eye + "_gaze_origin_validity": valid.tolist(),
+        })
+    system = system.tolist()
+    gaze_data = []
+    for i in range(n):
+        sample = {key: values[i] for key, values in columns.items()}
+        sample["system_time_stamp"] = system[i]
+        gaze_data.append(sample)
+    return gaze_data
+
+
+class ReplayEyeTracker(SimulatedEyeTracker):
+    """An eye tracker replaying recorded gaze data.
+
+        The samples are delivered to the subscribers of the gaze data with
+        their original inter-sample intervals, scaled by speed. The system
+        timestamps of the samples are those of the replay, so they can be
+        compared with tobii_research.get_system_time_stamp() as usual, while
+        the device timestamps are the recorded ones (repeated if looping).
+        Use it with the controllers through
+        EyeTrackerFinder.from_eyetrackers().
+
+    Args:
+        gaze_data: list of gaze data, e.g. from load_raw or
+            session_to_gaze_data.
+        speed: the speed of the replay relative to real time, e.g. 1 for
+            real time or 10 for ten times faster. If None, the samples are
+            delivered as fast as possible; their system timestamps then keep
+            the recorded intervals. Default is 1.
+        loop: whether to restart the replay at the end. Default is False.
+        **kwargs: other arguments of SimulatedEyeTracker, e.g. address.
+
+    Attributes:
+        finished: threading.Event set when all samples were delivered.
+        n_delivered: the number of delivered samples.
+    """
+    model = "Replay"
+    device_name = "Replayed eye tracker"
+
+    def __init__(self, gaze_data, speed=1.0, loop=False, **kwargs):
+        kwargs.setdefault("address", "tobii-prp://replay")
+        kwargs.setdefault("serial_number", "REPLAY")
+        super().__init__(**kwargs)
+        if not gaze_data:
+            raise ValueError("No gaze data to replay.")
+        self.gaze_data = gaze_data
+        self.speed = speed
+        self.loop = loop
+        self.finished = threading.Event()
+        self.n_delivered = 0
+        t = np.array([x["system_time_stamp"] for x in gaze_data],
+                     dtype=np.int64)
+        self._offsets = (t - t[0]).tolist()
+        intervals = np.diff(t)
+        if len(intervals) and np.median(intervals) > 0:
+            self.frequency = 1e6 / np.median(intervals)
+        # only the gaze data and the user position are available
+        self._producers = {
+            key: self._producers[key]
+            for key in (EYETRACKER_GAZE_DATA, EYETRACKER_USER_POSITION_GUIDE)
+        }
+
+    @classmethod
+    def from_file(cls, filename, session=-1, to_tobii=None, **kwargs):
+        """Create a replay of a recorded session.
+
+        Args:
+            filename: a data file written by the controller (plain or
+                compressed) or a .npz file written by save_raw.
+            session: the number of the session in the data file. Default is
+                -1 (the last one).
+            to_tobii: see session_to_gaze_data. Default is None.
+            **kwargs: other arguments of ReplayEyeTracker.
+
+        Returns:
+            ReplayEyeTracker
+        """
+        if filename.endswith(".npz"):
+            return cls(load_raw(filename), **kwargs)
+        recording = read_recording(filename)
+        return cls(
+            session_to_gaze_data(recording.sessions[session], recording.info,
+                                 to_tobii), **kwargs)
+
+    def _arguments(self):
+        arguments = super()._arguments()
+        arguments.update(gaze_data=self.gaze_data,
+                         speed=self.speed,
+                         loop=self.loop)
+        return arguments
+
+    def get_gaze_output_frequency(self):
+        return self.frequency
+
+    def set_gaze_output_frequency(self, frequency):
+        raise RuntimeWarning(
+            "The frequency of a replay is that of the recording.")
+
+    def _run(self, subscription, callback, stop):
+        if subscription != EYETRACKER_GAZE_DATA:
+            return super()._run(subscription, callback, stop)
+        self.finished.clear()
+        self.n_delivered = 0
+        start = get_system_time_stamp()
+        interval = int(1e6 / self.frequency / (self.speed or 1))
+        while not stop.is_set():
+            # the next loop follows the last sample after one interval
+            start = self._replay(callback, stop, start) + interval
+            if not self.loop:
+                break
+        self.finished.set()
+
+    def _replay(self, callback, stop, start):
+        """Deliver the samples once and return the last timestamp."""
+        t = start
+        for sample, offset in zip(self.gaze_data, self._offsets):
+            if stop.is_set():
+                break
+            if self.speed:
+                offset = int(offset / self.speed)
+                due = start + offset
+                now = get_system_time_stamp()
+                if now < due:
+                    stop.wait((due - now) / 1e6)
+                    if stop.is_set():
+                        break
+            sample = dict(sample)
+            t = sample["system_time_stamp"] = start + offset
+            callback(sample)
+            self.n_delivered += 1
+        return t
+
+    def wait(self, timeout=None):
+        """Wait until the replay is finished.
+
+        Args:
+            timeout: the maximum time to wait in seconds. Default is None.
+
+        Returns:
+            True if the replay is finished.
+        """
+        return self.finished.wait(timeout)
@@ -0,0 +1,228 @@
+"""Declarative column schema of the data file."""
+import numpy as np
+
+# name: (field, default precision); precision None means integer
+FIELDS = {
+    "GazePointXLeft": ("left_x", 4),
+    "GazePointYLeft": ("left_y", 4),
+    "ValidityLeft": ("left_validity", None),
+    "GazePointXRight": ("right_x", 4),
+    "GazePointYRight": ("right_y", 4),
+    "ValidityRight": ("right_validity", None),
+    "GazePointX": ("x", 4),
+    "GazePointY": ("y", 4),
+    "PupilSizeLeft": ("left_pupil", 4),
+    "PupilValidityLeft": ("left_pupil_validity", None),
+    "PupilSizeRight": ("right_pupil", 4),
+    "PupilValidityRight": ("right_pupil_validity", None),
+    "PupilSize": ("pupil", 4),
+    "DeviceTimeStamp": ("device_time_stamp", None),
+    "SystemTimeStamp": ("system_time_stamp", None),
+    "GazeOriginXLeft": ("left_origin_x", 2),
+    "GazeOriginYLeft": ("left_origin_y", 2),
+    "GazeOriginZLeft": ("left_origin_z", 2),
+    "GazeOriginValidityLeft": ("left_origin_validity", None),
+    "GazeOriginXRight": ("right_origin_x", 2),
+    "GazeOriginYRight": ("right_origin_y", 2),
+    "GazeOriginZRight": ("right_origin_z", 2),
+    "GazeOriginValidityRight": ("right_origin_validity", None),
+    "GazePoint3DXLeft": ("left_point_x", 2),
+    "GazePoint3DYLeft": ("left_point_y", 2),
+    "GazePoint3DZLeft": ("left_point_z", 2),
+    "GazePoint3DXRight": ("right_point_x", 2),
+    "GazePoint3DYRight": ("right_point_y", 2),
+    "GazePoint3DZRight": ("right_point_z", 2),
+}
+
+DEFAULT_COLUMNS = ("GazePointXLeft", "GazePointYLeft", "ValidityLeft",
+                   "GazePointXRight", "GazePointYRight", "ValidityRight",
+                   "GazePointX", "GazePointY", "PupilSizeLeft",
+                   "PupilValidityLeft", "PupilSizeRight",
+                   "PupilValidityRight", "PupilSize")
+
+# field prefix: (key in the gaze data, number of dimensions)
+_VECTORS = {
+    "left_origin": ("left_gaze_origin_in_user_coordinate_system", 3),
+    "right_origin": ("right_gaze_origin_in_user_coordinate_system", 3),
+    "left_point": ("left_gaze_point_in_user_coordinate_system", 3),
+    "right_point": ("right_gaze_point_in_user_coordinate_system", 3),
+}
+_SCALARS = {
+    "left_validity": "left_gaze_point_validity",
+    "right_validity": "right_gaze_point_validity",
+    "left_pupil": "left_pupil_diameter",
+    "right_pupil": "right_pupil_diameter",
+    "left_pupil_validity": "left_pupil_validity",
+    "right_pupil_validity": "right_pupil_validity",
+    "left_origin_validity": "left_gaze_origin_validity",
+    "right_origin_validity": "right_gaze_origin_validity",
+    "device_time_stamp": "device_time_stamp",
+    "system_time_stamp": "system_time_stamp",
+}
+
+
+class Column:
+    """A column of the data file.
+
+    Args:
+        name: the name of the column in the header.
+        field: the field of the gaze data, e.g. "left_x" or
+            "device_time_stamp". See FIELDS for the available fields.
+        precision: the number of decimals. None for integers. Default is 4.
+    """
+    def __init__(self, name, field, precision=4):
+        self.name = name
+        self.field = field
+        self.precision = precision
+
+    @property
+    def format(self):
+        if self.precision is None:
+            return "%d"
+        return "%.{}f".format(self.precision)
+
+
+class OutputSchema:
+    """The columns of the gaze data in the data file.
+
+        The first column is always "TimeStamp", the time since the start of
+        recording. The values of the columns are extracted from the samples
+        in one pass (see extract) and every row is formatted with a format
+        string generated once.
+
+    Args:
+        columns: list of the columns after TimeStamp. Each item is a name in
+            FIELDS, a tuple (name, precision) or a Column object. If None,
+            DEFAULT_COLUMNS are used. Default is None.
+        time_unit: the representation of TimeStamp: "ms" for milliseconds
+            rounded to 0.1 ms, or "us" for integer microseconds. Default is
+            "ms".
+    """
+    time_units = ("ms", "us")
+
+    def __init__(self, columns=None, time_unit="ms"):
+        if time_unit not in self.time_units:
+            raise ValueError(
+                "time_unit ({}) is not supported.".format(time_unit))
+        if columns is None:
+            columns = DEFAULT_COLUMNS
+        self.time_unit = time_unit
+        self.columns = [self._make_column(x) for x in columns]
+        self.fields = [x.field for x in self.columns]
+        self.header = "\t".join(["TimeStamp"] +
+                                [x.name for x in self.columns]) + "\n"
+        self.row_format = "\t".join(
+            ["%.1f" if time_unit == "ms" else "%d"] +
+            [x.format for x in self.columns]) + "\n"
+
+    @staticmethod
+    def _make_column(spec):
+        if isinstance(spec, Column):
+            return spec
+        if isinstance(spec, str):
+            name, precision = spec, False
+        else:
+            name, precision = spec
+        if name not in FIELDS:
+            raise ValueError("column ({}) is not supported.".format(name))
+        field, default = FIELDS[name]
+        return Column(name, field, default if precision is False else precision)
+
+    def convert_time(self, t):
+        """Convert the time since the start of recording.
+
+        Args:
+            t: time in microseconds, a number or an array.
+
+        Returns:
+            The time in the unit of TimeStamp.
+        """
+        if self.time_unit == "ms":
+            return np.round(np.asarray(t) / 1000.0, 1)
+        return np.asarray(t).astype(np.int64)
+
+    def format(self, values):
+        """Format the samples as rows of the data file.
+
+        Args:
+            values: dict of arrays, including "time" (microseconds since the
+                start of recording) and the fields of the columns.
+
+        Returns:
+            str
+        """
+        # timestamps in microseconds are exact in float64 (< 2 ** 53)
+        table = np.column_stack([self.convert_time(values["time"])] +
+                                [values[x] for x in self.fields])
+        fmt = self.row_format
+        # tolist() converts to Python numbers at once, which are formatted
+        # faster than numpy scalars
+        return "".join([fmt % tuple(row) for row in table.tolist()])
+
+
+def extract(records, fields, to_psychopy, t0):
+    """Extract the fields from the gaze data.
+
+    Args:
+        records: list of gaze data provided by the eye tracker.
+        fields: the fields to extract.
+        to_psychopy: a function converting Tobii ADCS (x, y) arrays to the
+            PsychoPy coordinate system.
+        t0: the system timestamp of the start of recording.
+
+    Returns:
+        dict of arrays, including "time".
+    """
+    values = {}
+
+    def _get(key):
+        return np.array([r[key] for r in records], dtype=float)
+
+    system = np.array([r["system_time_stamp"] for r in records],
+                      dtype=np.int64)
+    values["time"] = system - t0
+    needed = set(fields)
+    if needed & {"left_x", "left_y", "right_x", "right_y", "x", "y"}:
+        for eye in ("left", "right"):
+            p = _get(eye + "_gaze_point_on_display_area")
+            x, y = to_psychopy((p[:, 0], p[:, 1]))
+            values[eye + "_x"] = np.asarray(x, dtype=float)
+            values[eye + "_y"] = np.asarray(y, dtype=float)
+            values[eye + "_validity"] = _get(eye + "_gaze_point_validity")
+        for axis in ("x", "y"):
+            values[axis] = _combine(values["left_" + axis],
+                                    values["right_" + axis],
+                                    values["left_validity"],
+                                    values["right_validity"])
+    if "pupil" in needed:
+        for eye in ("left", "right"):
+            values[eye + "_pupil"] = _get(eye + "_pupil_diameter")
+            values[eye + "_pupil_validity"] = _get(eye + "_pupil_validity")
+        values["pupil"] = _combine(values["left_pupil"],
+                                   values["right_pupil"],
+                                   values["left_pupil_validity"],
+                                   values["right_pupil_validity"])
+    for prefix, (key, n) in _VECTORS.items():
+        if any(f.startswith(prefix + "_") for f in needed):
+            v = _get(key).reshape(len(records), n)
+            for i, axis in enumerate("xyz"[:n]):
+                values["{}_{}".format(prefix, axis)] = v[:, i]
+    for field in needed:
+        if field not in values:
+            if field == "system_time_stamp":
+                values[field] = system
+            else:
+                values[field] = _get(_SCALARS[field])
+    return values
+
+
+def _combine(left, right, left_validity, right_validity):
+    """Average of both eyes, or the valid eye."""
+    lv = left_validity.astype(bool)
+    rv = right_validity.astype(bool)
+    out = np.full(len(left), np.nan)
+    both = lv & rv
+    out[both] = (left[both] + right[both]) / 2.0
+    out[lv & ~rv] = left[lv & ~rv]
+    out[rv & ~lv] = right[rv & ~lv]
+    return out
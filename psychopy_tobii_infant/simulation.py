@@ -0,0 +1,348 @@
+"""A simulated eye tracker for testing without the hardware."""
+import math
+import threading
+import time
+from types import SimpleNamespace
+
+import numpy as np
+
+from .lazy import LazyModule, is_available, load_module
+
+# the values of the subscription constants in tobii_research
+EYETRACKER_GAZE_DATA = "eyetracker_gaze_data"
+EYETRACKER_USER_POSITION_GUIDE = "eyetracker_user_position_guide"
+EYETRACKER_EXTERNAL_SIGNAL = "eyetracker_external_signal"
+EYETRACKER_TIME_SYNCHRONIZATION_DATA = "eyetracker_time_synchronization_data"
+EYETRACKER_EYE_OPENNESS_DATA = "eyetracker_eye_openness_data"
+
+
+def _perf_counter_time_stamp():
+    return int(time.perf_counter() * 1e6)
+
+
+# tobii_research (or None without the SDK) and its clock, resolved by the
+# first call of get_system_time_stamp or get_subscription. The SDK is not
+# imported with the package, and a failing import is not retried on every
+# call.
+_sdk = None
+_clock = None
+
+
+def _resolve_sdk():
+    global _sdk, _clock
+    tr = LazyModule("tobii_research")
+    if is_available(tr):
+        _sdk = load_module(tr)
+        _clock = _sdk.get_system_time_stamp
+    else:
+        _clock = _perf_counter_time_stamp
+
+
+def get_system_time_stamp():
+    """Get the current time in microseconds.
+
+        The clock of tobii_research is used if it is available, so the
+        simulated samples can be mixed with the timestamps of the controller.
+
+    Args:
+        None
+
+    Returns:
+        int
+    """
+    if _clock is None:
+        _resolve_sdk()
+    return _clock()
+
+
+def get_subscription(name):
+    """Get the value of a subscription constant.
+
+        The constant of tobii_research is used if it is available, so the
+        simulated eye trackers can be used without the SDK.
+
+    Args:
+        name: the name of the constant, e.g. "EYETRACKER_GAZE_DATA".
+
+    Returns:
+        str
+    """
+    if _clock is None:
+        _resolve_sdk()
+    if _sdk is None:
+        return globals()[name]
+    return getattr(_sdk, name)
+
+
+def default_gaze(t):
+    """The default gaze path: a slow circle around the screen center.
+
+    Args:
+        t: time in seconds.
+
+    Returns:
+        The gaze position (x, y) in Tobii ADCS.
+    """
+    return (0.5 + 0.25 * math.cos(t), 0.5 + 0.25 * math.sin(t))
+
+
+def _create(cls, arguments):
+    """Unpickle an eye tracker."""
+    return cls(**arguments)
+
+
+class SimulatedEyeTracker:
+    """An object behaving like tobii_research.EyeTracker.
+
+        Each subscription is served by a thread producing samples at the
+        requested rate. If the thread falls behind (e.g. because of the
+        resolution of time.sleep), the missed samples are delivered in a
+        burst with their nominal timestamps, as the real SDK does.
+
+    Args:
+        frequency: the gaze output frequency in Hz. Default is 60.
+        gaze: a function mapping time in seconds to the gaze position (x, y)
+            in Tobii ADCS. Default is default_gaze.
+        noise: the standard deviation of the gaze position noise in Tobii
+            ADCS. Default is 0.002.
+        loss_rate: the probability of a sample being invalid. Default is 0.
+        pupil: the pupil diameter in mm. Default is 4.
+        signal_interval: the interval of the simulated TTL signal changes in
+            seconds. Default is 0.5.
+        sync_interval: the interval of the time synchronization data in
+            seconds. Default is 1.
+        address: the address of the eye tracker. Default is
+            "tobii-prp://simulated".
+        serial_number: the serial number of the eye tracker. Default is
+            "SIM-0001".
+        seed: the seed of the random number generator. Default is None.
+
+        A pickled eye tracker (e.g. sent to the acquisition process) is
+        unpickled as a new eye tracker with the same settings and without
+        subscriptions.
+    """
+    model = "Simulated"
+    device_name = "Simulated eye tracker"
+    # size (mm) and position of the display area in the user coordinate system
+    display_size = (530.0, 300.0)
+    display_bottom = 15.0
+    eye_position = ((-30.0, 150.0, 600.0), (30.0, 150.0, 600.0))
+
+    def __init__(self,
+                 frequency=60,
+                 gaze=default_gaze,
+                 noise=0.002,
+                 loss_rate=0.0,
+                 pupil=4.0,
+                 signal_interval=0.5,
+                 sync_interval=1.0,
+                 address="tobii-prp://simulated",
+                 serial_number="SIM-0001",
+                 seed=None):
+        self.frequency = frequency
+        self.gaze = gaze
+        self.noise = noise
+        self.loss_rate = loss_rate
+        self.pupil = pupil
+        self.signal_interval = signal_interval
+        self.sync_interval = sync_interval
+        self.address = address
+        self.serial_number = serial_number
+        self.seed = seed
+        self._rng = np.random.RandomState(seed)
+        self._rng_lock = threading.Lock()
+        self._device_offset = -get_system_time_stamp() + 1000000
+        self._subscriptions = {}
+        self._lock = threading.Lock()
+        w, h = self.display_size
+        b = self.display_bottom
+        self._display_area = SimpleNamespace(
+            top_left=(-w / 2, b + h, 0.0),
+            top_right=(w / 2, b + h, 0.0),
+            bottom_left=(-w / 2, b, 0.0),
+            bottom_right=(w / 2, b, 0.0),
+            width=w,
+            height=h)
+        self._producers = {
+            EYETRACKER_GAZE_DATA: (lambda: 1.0 / self.frequency,
+                                   self._gaze_sample),
+            EYETRACKER_USER_POSITION_GUIDE: (lambda: 1.0 / self.frequency,
+                                             self._user_position_sample),
+            EYETRACKER_EYE_OPENNESS_DATA: (lambda: 1.0 / self.frequency,
+                                           self._eye_openness_sample),
+            EYETRACKER_EXTERNAL_SIGNAL: (lambda: self.signal_interval,
+                                         self._external_signal_sample),
+            EYETRACKER_TIME_SYNCHRONIZATION_DATA:
+            (lambda: self.sync_interval, self._time_sync_sample),
+        }
+
+    def _arguments(self):
+        """The arguments recreating the eye tracker."""
+        return {
+            "frequency": self.frequency,
+            "gaze": self.gaze,
+            "noise": self.noise,
+            "loss_rate": self.loss_rate,
+            "pupil": self.pupil,
+            "signal_interval": self.signal_interval,
+            "sync_interval": self.sync_interval,
+            "address": self.address,
+            "serial_number": self.serial_number,
+            "seed": self.seed,
+        }
+
+    def __reduce__(self):
+        return (_create, (type(self), self._arguments()))
+
+    def get_gaze_output_frequency(self):
+        return self.frequency
+
+    def set_gaze_output_frequency(self, frequency):
+        self.frequency = frequency
+
+    def get_display_area(self):
+        return self._display_area
+
+    def _random(self, size=None):
+        with self._rng_lock:
+            return self._rng.random_sample(size)
+
+    def _normal(self, size=None):
+        with self._rng_lock:
+            return self._rng.normal(0, self.noise, size)
+
+    def _to_ucs(self, p):
+        """Convert a point in Tobii ADCS to the user coordinate system."""
+        area = self._display_area
+        return (area.top_left[0] + p[0] * area.width,
+                area.top_left[1] - p[1] * area.height, 0.0)
+
+    def _gaze_sample(self, n, system_time_stamp):
+        t = n / float(self.frequency)
+        p = self.gaze(t)
+        sample = {
+            "device_time_stamp": system_time_stamp + self._device_offset,
+            "system_time_stamp": system_time_stamp,
+        }
+        noise = self._normal(4)
+        valid = self._random(2) >= self.loss_rate
+        for i, eye in enumerate(("left", "right")):
+            v = int(valid[i])
+            if v:
+                eye_p = (p[0] + noise[2 * i], p[1] + noise[2 * i + 1])
+                origin = self.eye_position[i]
+                pupil = self.pupil
+                ucs = self._to_ucs(eye_p)
+            else:
+                eye_p = (np.nan, np.nan)
+                origin = ucs = (np.nan, np.nan, np.nan)
+                pupil = np.nan
+            sample.update({
+                eye + "_gaze_point_on_display_area": eye_p,
+                eye + "_gaze_point_in_user_coordinate_system": ucs,
+                eye + "_gaze_point_validity": v,
+                eye + "_pupil_diameter": pupil,
+                eye + "_pupil_validity": v,
+                eye + "_gaze_origin_in_user_coordinate_system": origin,
+                eye + "_gaze_origin_in_trackbox_coordinate_system":
+                (0.5, 0.5, 0.5) if v else (np.nan, np.nan, np.nan),
+                eye + "_gaze_origin_validity": v,
+            })
+        return sample
+
+    def _user_position_sample(self, n, system_time_stamp):
+        return {
+            "left_user_position": (0.55, 0.5, 0.5),
+            "left_user_position_validity": 1,
+            "right_user_position": (0.45, 0.5, 0.5),
+            "right_user_position_validity": 1,
+        }
+
+    def _eye_openness_sample(self, n, system_time_stamp):
+        valid = self._random(2) >= self.loss_rate
+        return {
+            "device_time_stamp": system_time_stamp + self._device_offset,
+            "system_time_stamp": system_time_stamp,
+            "left_eye_validity": int(valid[0]),
+            "left_eye_openness_value": 11.0 if valid[0] else np.nan,
+            "right_eye_validity": int(valid[1]),
+            "right_eye_openness_value": 11.0 if valid[1] else np.nan,
+        }
+
+    def _external_signal_sample(self, n, system_time_stamp):
+        return {
+            "device_time_stamp": system_time_stamp + self._device_offset,
+            "system_time_stamp": system_time_stamp,
+            "value": n % 2,
+            # EXTERNAL_SIGNAL_INITIAL_VALUE for the first sample
+            "change_type": 1 if n == 0 else 0,
+        }
+
+    def _time_sync_sample(self, n, system_time_stamp):
+        return {
+            "system_request_time_stamp": system_time_stamp,
+            "device_time_stamp": system_time_stamp + self._device_offset + 50,
+            "system_response_time_stamp": system_time_stamp + 100,
+        }
+
+    def _run(self, subscription, callback, stop):
+        interval, produce = self._producers[subscription]
+        start = get_system_time_stamp()
+        n = 0
+        while not stop.is_set():
+            due = start + int(n * interval() * 1e6)
+            now = get_system_time_stamp()
+            if now < due:
+                stop.wait((due - now) / 1e6)
+                continue
+            callback(produce(n, due))
+            n += 1
+
+    def subscribe_to(self, subscription, callback, as_dictionary=True):
+        """Start delivering the samples of a stream to the callback.
+
+        Args:
+            subscription: the stream, e.g. EYETRACKER_GAZE_DATA.
+            callback: the function called with every sample.
+            as_dictionary: only dictionaries are supported. Default is True.
+
+        Returns:
+            None
+        """
+        if subscription not in self._producers:
+            raise ValueError(
+                "subscription ({}) is not supported.".format(subscription))
+        if not as_dictionary:
+            raise ValueError("Only dictionary samples are supported.")
+        stop = threading.Event()
+        thread = threading.Thread(target=self._run,
+                                  args=(subscription, callback, stop),
+                                  daemon=True)
+        with self._lock:
+            self._subscriptions.setdefault(subscription, []).append(
+                (callback, stop, thread))
+        thread.start()
+
+    def unsubscribe_from(self, subscription, callback=None):
+        """Stop delivering the samples of a stream.
+
+        Args:
+            subscription: the stream, e.g. EYETRACKER_GAZE_DATA.
+            callback: the callback to remove. If None, remove all callbacks
+                of the stream. Default is None.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            subscribers = self._subscriptions.get(subscription, [])
+            removed = [
+                x for x in subscribers if callback is None or x[0] == callback
+            ]
+            self._subscriptions[subscription] = [
+                x for x in subscribers if x not in removed
+            ]
+        for _, stop, thread in removed:
+            stop.set()
+            if thread is not threading.current_thread():
+                thread.join()
@@ -0,0 +1,104 @@
+"""Buffered recording of the additional data streams of the eye tracker."""
+from .buffer import ChunkedBuffer
+
+# name: (subscription in tobii_research, columns, time column, output header,
+#        output format)
+STREAMS = {
+    "external_signal": (
+        "EYETRACKER_EXTERNAL_SIGNAL",
+        ("system_time_stamp", "device_time_stamp", "value", "change_type"),
+        "system_time_stamp",
+        ("TimeStamp", "DeviceTimeStamp", "Value", "ChangeType"),
+        ("%.1f", "%d", "%d", "%d"),
+    ),
+    "time_sync": (
+        "EYETRACKER_TIME_SYNCHRONIZATION_DATA",
+        ("system_request_time_stamp", "device_time_stamp",
+         "system_response_time_stamp"),
+        "system_request_time_stamp",
+        ("TimeStamp", "DeviceTimeStamp", "SystemResponseTimeStamp"),
+        ("%.1f", "%d", "%d"),
+    ),
+    "eye_openness": (
+        "EYETRACKER_EYE_OPENNESS_DATA",
+        ("system_time_stamp", "device_time_stamp", "left_eye_openness_value",
+         "left_eye_validity", "right_eye_openness_value",
+         "right_eye_validity"),
+        "system_time_stamp",
+        ("TimeStamp", "DeviceTimeStamp", "OpennessLeft", "ValidityLeft",
+         "OpennessRight", "ValidityRight"),
+        ("%.1f", "%d", "%.4f", "%d", "%.4f", "%d"),
+    ),
+}
+
+
+class StreamRecorder:
+    """Record an additional data stream of the eye tracker.
+
+        The callback only copies the values of the sample into a
+        ChunkedBuffer on the thread of the Tobii SDK; nothing is done per
+        sample on the main thread.
+
+    Args:
+        name: the name of the stream. One of "external_signal", "time_sync"
+            and "eye_openness".
+        chunk_size: the number of samples per chunk of the buffer. Default is
+            4096.
+
+    Attributes:
+        subscription: the name of the subscription constant in
+            tobii_research.
+        buffer: ChunkedBuffer holding the samples.
+    """
+    def __init__(self, name, chunk_size=4096):
+        if name not in STREAMS:
+            raise ValueError("stream ({}) is not supported.".format(name))
+        self.name = name
+        (self.subscription, self.columns, self.time_column, self.header,
+         self.formats) = STREAMS[name]
+        self.buffer = ChunkedBuffer(self.columns, chunk_size)
+
+    def callback(self, data):
+        """Callback function used by Tobii SDK.
+
+        Args:
+            data: the sample provided by the eye tracker.
+
+        Returns:
+            None
+        """
+        self.buffer.append(tuple(data[c] for c in self.columns))
+
+    def clear(self):
+        """Remove the recorded samples."""
+        self.buffer.clear()
+
+    def __len__(self):
+        return len(self.buffer)
+
+    def format_rows(self, t0, schema=None):
+        """Format the recorded samples for the data file.
+
+            The first column is the time relative to t0, in the same unit as
+            the timestamps of the gaze data.
+
+        Args:
+            t0: the system timestamp of the start of recording.
+            schema: OutputSchema of the gaze data. If None, the time is in
+                milliseconds. Default is None.
+
+        Returns:
+            str: tab-separated rows, including the column header.
+        """
+        data = self.buffer.to_array()
+        lines = ["\t".join(self.header)]
+        formats = list(self.formats)
+        if len(data):
+            if schema is None or schema.time_unit == "ms":
+                data[:, 0] = ((data[:, 0] - t0) / 1000.0).round(1)
+            else:
+                data[:, 0] = data[:, 0] - t0
+                formats[0] = "%d"
+            fmt = "\t".join(formats)
+            lines.extend(fmt % tuple(row) for row in data)
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+from psychopy_tobii_infant import TobiiController
+from psychopy_tobii_infant.discovery import EyeTrackerFinder
+from psychopy_tobii_infant.simulation import SimulatedEyeTracker
+
+
+class FakeWindow:
+    """The properties of a PsychoPy window used by the controller."""
+    units = "norm"
+    size = np.array([1280, 1024])
+
+
+class HeadlessController(TobiiController):
+    """Record a simulated eye tracker without PsychoPy."""
+    def _wait_for_eyetracker(self):
+        pass
+
+
+class DummyController(TobiiController):
+    """A controller without an eye tracker, for the conversions."""
+    def __init__(self, win):
+        self.win = win
+
+
+@pytest.fixture
+def fake_window():
+    return FakeWindow()
+
+
+@pytest.fixture
+def make_controller(tmp_path):
+    """Make a HeadlessController of a SimulatedEyeTracker.
+
+        It writes tmp_path / "data.tsv" unless another file is given to
+        start_recording().
+    """
+    def make(et=None, acquisition="thread", cls=HeadlessController):
+        if et is None:
+            et = SimulatedEyeTracker(seed=0)
+        return cls(FakeWindow(),
+                   et.address,
+                   str(tmp_path / "data.tsv"),
+                   finder=EyeTrackerFinder.from_eyetrackers(et),
+                   acquisition=acquisition)
+
+    return make
+
+
+@pytest.fixture
+def make_dummy_controller():
+    """Make a DummyController of a window (a FakeWindow by default)."""
+    def make(win=None):
+        return DummyController(FakeWindow() if win is None else win)
+
+    return make
@@ -0,0 +1,212 @@
+import pickle
+import time
+
+import numpy as np
+import pytest
+
+from psychopy_tobii_infant import TobiiController
+from psychopy_tobii_infant.acquisition import (ACQUISITION_FIELDS,
+                                               FeedSamples, WindowGeometry,
+                                               row_to_sample, sample_values)
+from psychopy_tobii_infant.feed import FIELDS, GazeFeed, GazeFeedReader
+from psychopy_tobii_infant.index import SessionIndex
+from psychopy_tobii_infant.reader import read_recording
+from psychopy_tobii_infant.simulation import SimulatedEyeTracker
+
+
+class SmallFeedController(TobiiController):
+    acquisition_capacity = 64
+
+
+def detected(p, gaze_data):
+    return p is not None
+
+
+def publish(feed, sample):
+    lv = sample["left_gaze_point_validity"]
+    rv = sample["right_gaze_point_validity"]
+    feed.publish((sample["system_time_stamp"], sample["device_time_stamp"]) +
+                 (0.0, ) * (len(FIELDS) - 4) + (lv, rv) +
+                 (sample["system_time_stamp"], ) + sample_values(sample))
+
+
+class TestFeedSamples:
+    """Test the samples read from the acquisition feed."""
+    @pytest.fixture(autouse=True)
+    def setup_feed(self):
+        self.feed = GazeFeed(capacity=8, fields=ACQUISITION_FIELDS)
+        self.reader = GazeFeedReader(self.feed.name)
+        self.et = SimulatedEyeTracker(loss_rate=0.3, seed=1)
+        yield
+        self.reader.close()
+        self.feed.close()
+
+    def test_row_to_sample(self):
+        for i in range(8):
+            sample = self.et._gaze_sample(i, 1000 + i)
+            publish(self.feed, sample)
+            rebuilt = row_to_sample(self.reader.get(i))
+            assert rebuilt["system_time_stamp"] == 1000 + i
+            for key, value in rebuilt.items():
+                np.testing.assert_equal(value, sample[key])
+
+    def test_sequence(self):
+        for i in range(3):
+            publish(self.feed, self.et._gaze_sample(i, i))
+        samples = FeedSamples(self.reader, start=1)
+        assert len(samples) == 2
+        snapshot = samples.snapshot()
+        assert samples[-1]["system_time_stamp"] == 2
+        for i in range(3, 10):
+            publish(self.feed, self.et._gaze_sample(i, i))
+        assert len(samples) == 9
+        assert len(snapshot) == 2
+        assert [x["system_time_stamp"] for x in samples[-3:]] == [7, 8, 9]
+        assert [x["system_time_stamp"]
+                for x in samples.view(5, 7)] == [6, 7]
+        # only the latest 8 samples are kept
+        with pytest.raises(IndexError):
+            snapshot[0]
+        with pytest.raises(IndexError):
+            samples[9]
+        assert self.reader.get(10) is None
+
+    def test_window_geometry(self, fake_window):
+        geometry = pickle.loads(
+            pickle.dumps(WindowGeometry.from_window(fake_window)))
+        assert geometry.size == (1280, 1024)
+        assert geometry.units == "norm"
+        assert geometry.monitor is None
+
+
+class TestAcquisitionProcess:
+    """Test recording in the acquisition process."""
+    @pytest.fixture(autouse=True)
+    def setup_tmp(self, tmp_path):
+        self.filename = str(tmp_path / "data.tsv")
+
+    def test_recording(self, make_controller):
+        et = SimulatedEyeTracker(frequency=600, seed=0)
+        controller = make_controller(et, "process")
+        try:
+            trigger = controller.add_predicate_trigger(detected)
+            controller.start_recording(self.filename)
+            assert trigger.wait(5)
+            assert controller.start_gaze_feed() == (
+                controller.acquisition.feed_name)
+            controller.record_event("stim")
+            with controller.trial("face", stimulus="face.png") as trial:
+                time.sleep(0.2)
+            x, y = controller.get_current_gaze_position()
+            assert -1 < x < 1 and -1 < y < 1
+            controller.stop_recording()
+            n = len(controller.gaze_data)
+            assert n > 600
+            n_trial = len(trial.samples)
+            assert 60 < n_trial < 180
+            assert controller.get_fsync_stats()["n"] >= 2
+            t = [x["system_time_stamp"] for x in controller.gaze_data[-2:]]
+            t0 = controller.t0
+            controller.audio_latency_header = (
+                "Calibration audio latency (ms):\tn=1\tmean=1.000\t"
+                "max=1.000\n")
+            controller.start_recording(newfile=False)
+            time.sleep(0.1)
+            controller.stop_recording()
+        finally:
+            controller.close()
+
+        sessions = read_recording(self.filename).sessions
+        session = sessions[0]
+        assert len(session) == n
+        assert "Calibration audio latency (ms)" not in session.header
+        assert sessions[1].header["Calibration audio latency (ms)"] == (
+            "n=1\tmean=1.000\tmax=1.000")
+        assert session.column("TimeStamp")[-1] == pytest.approx(
+            (t[-1] - t0) / 1000.0, abs=0.1)
+        assert [event for time, event in session.events
+                ] == ["stim", "Trial start face", "Trial end face"]
+        trials = SessionIndex.load(self.filename)[0]["trials"]
+        assert trials[0]["metadata"] == {"stimulus": "face.png"}
+        assert trials[0]["stop_index"] - trials[0]["start_index"] == n_trial
+
+    def test_monitors(self, make_controller):
+        et = SimulatedEyeTracker(frequency=600, seed=0)
+        controller = make_controller(et, "process")
+        fired = []
+        try:
+            controller.start_latency_monitor()
+            controller.start_quality_monitor()
+            trigger = controller.add_predicate_trigger(detected,
+                                                       callback=fired.append)
+            with pytest.raises(ValueError):
+                controller.add_predicate_trigger(lambda p, gaze_data: True)
+            assert controller.trigger_engine.triggers == (trigger, )
+            controller.start_recording(self.filename)
+            assert trigger.wait(5)
+            assert fired == [trigger]
+            assert trigger.sample["system_time_stamp"] <= trigger.fire_time
+            # arm the trigger in the acquisition process again
+            trigger.reset()
+            assert trigger.wait(5)
+            assert trigger.fire_count == 2
+            for i in range(5):
+                controller.get_current_gaze_position()
+                time.sleep(0.02)
+            stats = controller.get_latency_stats()
+            assert stats["callback"]["n"] > 100
+            assert 1 <= stats["consumption"]["n"] <= 5
+            assert len(controller.latency_monitor.to_array()) >= (
+                stats["callback"]["n"])
+            assert controller.get_data_quality()["valid_ratio_left"] > 0.5
+            controller.stop_quality_monitor()
+            with pytest.raises(RuntimeWarning):
+                controller.get_data_quality()
+            controller.remove_gaze_trigger()
+            assert controller.trigger_engine.triggers == ()
+            controller.stop_recording()
+        finally:
+            controller.close()
+
+        session = read_recording(self.filename).sessions[0]
+        assert "Latency callback (ms)" in session.header
+
+    def test_capacity(self, make_controller):
+        et = SimulatedEyeTracker(frequency=600, seed=0)
+        controller = make_controller(et, "process", SmallFeedController)
+        try:
+            controller.start_recording(self.filename)
+            with controller.trial("first"):
+                time.sleep(0.1)
+            time.sleep(0.3)
+            # the oldest samples have been overwritten in the feed
+            with pytest.raises(IndexError):
+                controller.gaze_data[0]
+            controller.stop_recording()
+            trial = controller.trials[0]
+            first = list(trial.samples)
+            assert 20 < len(first) < 120
+            samples = list(controller.gaze_data)
+            assert samples[trial.start_index:trial.stop_index] == first
+        finally:
+            controller.close()
+
+        session = read_recording(self.filename).sessions[0]
+        assert len(session) == len(samples)
+        assert session.column("TimeStamp")[0] == pytest.approx(
+            (samples[0]["system_time_stamp"] - controller.t0) / 1000.0,
+            abs=0.1)
+
+    def test_close(self, make_controller):
+        controller = make_controller(SimulatedEyeTracker(), "process")
+        name = controller.acquisition.feed_name
+        # closing without recording is not an error
+        controller.close()
+        assert not controller.acquisition.alive
+        with pytest.raises(FileNotFoundError):
+            GazeFeedReader(name)
+        controller.close()
+
+    def test_errors(self, make_controller):
+        with pytest.raises(ValueError):
+            make_controller(acquisition="subprocess")
@@ -0,0 +1,98 @@
+import time
+
+import pytest
+
+from psychopy_tobii_infant.audio import AudioPool
+
+
+class FakeSound:
+    """A sound whose play() takes some time, as the first play does."""
+    def __init__(self, name, delay=0.0):
+        self.name = name
+        self.delay = delay
+        self.volume = 0.8
+        self.calls = []
+
+    def setVolume(self, volume):
+        self.calls.append(("volume", volume))
+        self.volume = volume
+
+    def play(self):
+        time.sleep(self.delay)
+        self.calls.append(("play", self.volume))
+
+    def pause(self):
+        self.calls.append(("pause", ))
+
+    def stop(self):
+        self.calls.append(("stop", ))
+
+
+def clock():
+    return int(time.perf_counter() * 1e6)
+
+
+class TestAudioPool:
+    """Test the preloaded sounds of the calibration."""
+    def test_prime(self):
+        sounds = [FakeSound("a"), FakeSound("b")]
+        pool = AudioPool(sounds, clock=clock)
+        pool.prepare()
+        for sound in sounds:
+            assert sound.calls == [("volume", 0), ("play", 0), ("stop", ),
+                                   ("volume", 0.8)]
+        pool.close()
+
+    def test_not_blocking(self):
+        sounds = [FakeSound("a", delay=0.05), FakeSound("b", delay=0.05)]
+        pool = AudioPool(sounds, clock=clock, prime=False)
+        pool.prepare()
+        start = time.perf_counter()
+        pool.play(0)
+        pool.pause()
+        pool.play(1)
+        assert time.perf_counter() - start < 0.02
+        pool.wait()
+        assert sounds[0].calls == [("play", 0.8), ("pause", ), ("stop", )]
+        assert sounds[1].calls == [("play", 0.8)]
+        # the second sound waited for the first one
+        assert [x["point"] for x in pool.log] == [0, 1]
+        assert pool.log[0]["latency"] == pytest.approx(50, abs=30)
+        assert pool.log[1]["latency"] == pytest.approx(100, abs=40)
+        summary = pool.summary()
+        assert summary["n"] == 2
+        assert summary["max"] == pool.log[1]["latency"]
+        assert pool.format_header().startswith(
+            "Calibration audio latency (ms):\tn=2\tmean=")
+        pool.close()
+        assert sounds[1].calls[-1] == ("stop", )
+
+    def test_orders(self):
+        sounds = [FakeSound(x) for x in "abc"]
+        pool = AudioPool(sounds, clock=clock, prime=False)
+        assert [pool.sound_index(i) for i in range(5)] == [0, 1, 2, 0, 1]
+
+        pool = AudioPool(sounds, order="shuffle", seed=1, prime=False)
+        pool.prepare()
+        indices = [pool.sound_index(i) for i in range(6)]
+        assert sorted(indices[:3]) == [0, 1, 2]
+        assert indices[3:] == indices[:3]
+        pool.close()
+
+        pool = AudioPool(sounds, order="random", seed=1, prime=False)
+        indices = {pool.sound_index(0) for i in range(50)}
+        assert indices == {0, 1, 2}
+
+        with pytest.raises(ValueError):
+            AudioPool(sounds, order="sequential")
+        with pytest.raises(ValueError):
+            AudioPool([])
+
+    def test_single_sound(self):
+        sound = FakeSound("a")
+        pool = AudioPool(sound, clock=clock, prime=False)
+        pool.play(4)
+        pool.wait()
+        assert pool.log[0]["sound"] == 0
+        assert sound.calls == [("play", 0.8)]
+        pool.close()
@@ -0,0 +1,152 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from psychopy_tobii_infant.buffer import ChunkedBuffer, SampleStore
+
+
+class TestChunkedBuffer:
+    """Test the chunked buffer."""
+    def setup_method(self):
+        self.buffer = ChunkedBuffer(("a", "b"), chunk_size=4)
+
+    def test_append(self):
+        for i in range(10):
+            assert self.buffer.append((i, i * 2)) == i
+        assert len(self.buffer) == 10
+        arr = self.buffer.to_array()
+        assert arr.shape == (10, 2)
+        assert np.array_equal(arr[:, 0], np.arange(10))
+        assert np.array_equal(self.buffer.column("b"), np.arange(10) * 2)
+
+    def test_slice(self):
+        for i in range(10):
+            self.buffer.append((i, 0))
+        assert np.array_equal(self.buffer.column("a", 3, 9), np.arange(3, 9))
+        assert np.array_equal(self.buffer.column("a", 8), [8, 9])
+        assert self.buffer.to_array(5, 5).shape == (0, 2)
+
+    def test_get_set(self):
+        for i in range(6):
+            self.buffer.append((i, np.nan))
+        self.buffer.set(-1, "b", 1.5)
+        assert self.buffer.get(5, "b") == 1.5
+        assert np.isnan(self.buffer.get(4, "b"))
+        try:
+            self.buffer.get(6, "a")
+        except IndexError:
+            pass
+        else:
+            raise AssertionError("IndexError not raised")
+
+    def test_clear(self):
+        self.buffer.append((1, 1))
+        self.buffer.clear()
+        assert len(self.buffer) == 0
+        assert self.buffer.to_array().shape == (0, 2)
+
+
+def produce(store, n, rate=None):
+    """Append n samples, at a rate (Hz) like the eye tracker if given."""
+    start = time.perf_counter()
+    for i in range(n):
+        if rate is not None:
+            delay = start + i / rate - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+        store.append({"i": i})
+
+
+class TestSampleStore:
+    """Test the sample store shared by the callback and the frame loop."""
+    def test_snapshot(self):
+        store = SampleStore()
+        assert store.latest() is None
+        assert not store
+        for i in range(5):
+            store.append({"i": i})
+        view = store.snapshot()
+        store.append({"i": 5})
+        assert len(view) == 5
+        assert len(store) == 6
+        assert [x["i"] for x in view] == list(range(5))
+        assert view[-1]["i"] == 4
+        assert [x["i"] for x in view[1:10]] == [1, 2, 3, 4]
+        assert store.latest()["i"] == 5
+        assert store[-1]["i"] == 5
+        assert len(store[2:]) == 4
+        try:
+            view[5]
+        except IndexError:
+            pass
+        else:
+            raise AssertionError("IndexError not raised")
+
+    @pytest.mark.parametrize("index", [
+        slice(None, None, -1), slice(None, None, 2), slice(None, None, -2),
+        slice(4, 0, -1), slice(-2, None, -1), slice(0, 4, -1)])
+    def test_slice_step(self, index):
+        store = SampleStore()
+        for i in range(8):
+            store.append({"i": i})
+        expected = list(range(8))[2:7][index]
+        assert [x["i"] for x in store.view(2, 7)[index]] == expected
+        assert [x["i"] for x in store[index]] == list(range(8))[index]
+
+    def test_swap(self):
+        store = SampleStore()
+        for i in range(3):
+            store.append({"i": i})
+        old = store.swap()
+        store.append({"i": 3})
+        assert [x["i"] for x in old] == [0, 1, 2]
+        assert [x["i"] for x in store] == [3]
+        assert old.snapshot() is old
+        assert store.swaps == 1
+
+    def test_stress(self):
+        # readers take snapshots while a 1200 Hz producer appends
+        store = SampleStore()
+        n = 1200
+        errors = []
+        done = threading.Event()
+
+        def read():
+            last = -1
+            while not done.is_set():
+                view = store.snapshot()
+                if len(view):
+                    i = view[-1]["i"]
+                    if i < last or i != len(view) - 1:
+                        errors.append((last, i, len(view)))
+                    last = i
+                    if view[len(view) // 2]["i"] != len(view) // 2:
+                        errors.append(("middle", len(view)))
+
+        readers = [threading.Thread(target=read) for i in range(3)]
+        for reader in readers:
+            reader.start()
+        produce(store, n, rate=1200)
+        done.set()
+        for reader in readers:
+            reader.join()
+        assert errors == []
+        assert [x["i"] for x in store] == list(range(n))
+
+    def test_swap_while_producing(self):
+        # no sample is lost or duplicated by swapping at any time
+        store = SampleStore()
+        n = 200000
+        producer = threading.Thread(target=produce, args=(store, n))
+        views = []
+        producer.start()
+        while producer.is_alive():
+            views.append(store.swap())
+            time.sleep(0.001)
+        producer.join()
+        views.append(store.swap())
+        indices = [x["i"] for view in views for x in view]
+        assert indices == list(range(n))
+        assert len(views) > 2
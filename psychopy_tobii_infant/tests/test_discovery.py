@@ -0,0 +1,112 @@
+import json
+import time
+
+import pytest
+
+from psychopy_tobii_infant.discovery import EyeTrackerFinder
+from psychopy_tobii_infant.simulation import SimulatedEyeTracker
+
+
+class Backend:
+    """Simulated discovery of two eye trackers."""
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.n_discover = 0
+        self.n_connect = 0
+        self.addresses = {
+            "tobii-prp://SIM-0001": "SIM-0001",
+            "tobii-prp://SIM-0002": "SIM-0002",
+        }
+
+    def discover(self):
+        self.n_discover += 1
+        time.sleep(self.delay)
+        return [self.connect(x) for x in self.addresses]
+
+    def connect(self, address):
+        self.n_connect += 1
+        if address not in self.addresses:
+            raise RuntimeError("Cannot connect to {}".format(address))
+        return SimulatedEyeTracker(address=address,
+                                   serial_number=self.addresses[address])
+
+
+class TestDiscovery:
+    """Test finding eye trackers with the discovery cache."""
+    @pytest.fixture(autouse=True)
+    def setup_tmp(self, tmp_path):
+        self.cache_file = str(tmp_path / "cache" / "eyetrackers.json")
+        self.backend = Backend()
+
+    def make_finder(self, **kwargs):
+        return EyeTrackerFinder(self.backend.discover, self.backend.connect,
+                                self.cache_file, **kwargs)
+
+    def test_index(self):
+        finder = self.make_finder()
+        assert finder.find(1).serial_number == "SIM-0002"
+        with pytest.raises(ValueError):
+            finder.find(2)
+        # discovered once
+        assert self.backend.n_discover == 1
+        self.backend.addresses = {}
+        with pytest.raises(RuntimeError):
+            self.make_finder().find(0)
+
+    def test_address(self):
+        finder = self.make_finder()
+        eyetracker = finder.find("tobii-prp://SIM-0002")
+        assert eyetracker.serial_number == "SIM-0002"
+        assert self.backend.n_discover == 0
+        assert "connect" in finder.timings
+
+    def test_serial_number(self):
+        assert self.make_finder().find("SIM-0002").address.endswith("0002")
+        assert self.backend.n_discover == 1
+        with open(self.cache_file) as f:
+            cache = json.load(f)
+        assert [x["serial_number"] for x in cache["eyetrackers"]
+                ] == ["SIM-0001", "SIM-0002"]
+
+        # the cache is used by the next session
+        finder = self.make_finder()
+        assert finder.find("SIM-0002").serial_number == "SIM-0002"
+        assert self.backend.n_discover == 1
+        assert finder.timings["cache"] == "hit"
+
+        # stale cache
+        finder = self.make_finder(ttl=0)
+        time.sleep(0.01)
+        finder.find("SIM-0001")
+        assert self.backend.n_discover == 2
+        assert finder.timings["cache"] == "stale"
+
+        with pytest.raises(ValueError):
+            self.make_finder().find("SIM-0003")
+
+    def test_address_changed(self):
+        self.make_finder().discover()
+        self.backend.addresses = {"tobii-prp://SIM-0003": "SIM-0002"}
+        eyetracker = self.make_finder().find("SIM-0002")
+        assert eyetracker.address == "tobii-prp://SIM-0003"
+        assert self.backend.n_discover == 2
+
+    def test_prefetch(self):
+        self.backend.delay = 0.2
+        finder = self.make_finder()
+        start = time.perf_counter()
+        finder.prefetch()
+        finder.prefetch()
+        assert time.perf_counter() - start < 0.1
+        assert finder.find(0).serial_number == "SIM-0001"
+        assert self.backend.n_discover == 1
+        assert finder.timings["discovery"] >= 0.2
+
+    def test_prefetch_error(self):
+        def discover():
+            raise OSError("network is down")
+
+        finder = EyeTrackerFinder(discover, self.backend.connect, None)
+        finder.prefetch()
+        with pytest.raises(OSError):
+            finder.find(0)
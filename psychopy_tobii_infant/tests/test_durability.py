@@ -0,0 +1,78 @@
+import pickle
+
+import numpy as np
+import pytest
+
+from psychopy_tobii_infant.durability import (SyncAlways, SyncInBackground,
+                                              SyncOnClose, SyncPeriodic)
+from psychopy_tobii_infant.output import DataFile
+from psychopy_tobii_infant.reader import read_recording
+
+
+def write_sessions(datafile, n_sessions=2, n_samples=100):
+    datafile.write("PsychoPy units:\tnorm\n")
+    datafile.commit()
+    for s in range(n_sessions):
+        datafile.write("Session Start\nTimeStamp\tGazePointX\n")
+        datafile.commit()
+        for i in range(n_samples):
+            datafile.write("{}\t{}\n".format(i * 8.3, s))
+        datafile.write("Session End\n")
+        datafile.commit()
+
+
+class TestDurability:
+    """Test the policies syncing the data file to the disk."""
+    @pytest.fixture(autouse=True)
+    def setup_tmp(self, tmp_path):
+        self.filename = str(tmp_path / "data.tsv")
+
+    def write(self, policy, compression=None):
+        datafile = DataFile(self.filename, "w", compression, durability=policy)
+        write_sessions(datafile)
+        datafile.close()
+        recording = read_recording(self.filename)
+        assert len(recording.sessions) == 2
+        assert all(x.complete for x in recording.sessions)
+        return policy.summary()
+
+    def test_always(self):
+        summary = self.write(SyncAlways())
+        # five commits and close
+        assert summary["n"] == 6
+        assert summary["total"] >= summary["max"] >= summary["p50"] >= 0
+
+    def test_on_close(self):
+        summary = self.write(SyncOnClose(), "gzip")
+        assert summary["n"] == 1
+        assert summary["bytes"] > 0
+
+    def test_periodic(self):
+        policy = SyncPeriodic(nbytes=1000)
+        summary = self.write(policy)
+        sizes = np.array(policy.timings)[:-1, 0]
+        assert summary["n"] > 2
+        assert (sizes >= 1000).all()
+        with pytest.raises(ValueError):
+            SyncPeriodic()
+
+    def test_background(self):
+        policy = SyncInBackground(interval=0.01)
+        summary = self.write(policy, "gzip")
+        assert summary["n"] >= 1
+        assert policy._thread is None
+        # policies can be reused for the next file
+        assert self.write(policy)["n"] > summary["n"]
+
+    def test_empty(self):
+        summary = SyncAlways().summary()
+        assert summary["n"] == 0
+        assert np.isnan(summary["p95"])
+
+    def test_pickle(self):
+        # the policies are sent to the acquisition process
+        policy = pickle.loads(pickle.dumps(SyncInBackground(interval=0.01)))
+        assert policy.interval == 0.01
+        assert self.write(policy)["n"] >= 1
+        policy = pickle.loads(pickle.dumps(SyncPeriodic(interval=5)))
+        assert self.write(policy)["n"] >= 1
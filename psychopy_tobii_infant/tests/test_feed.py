@@ -0,0 +1,148 @@
+import multiprocessing
+import time
+
+import numpy as np
+import pytest
+
+from psychopy_tobii_infant.feed import FIELDS, GazeFeed, GazeFeedReader
+
+FIELDS3 = ("a", "b", "published")
+
+
+def read_all(name, n, queue):
+    """Read n rows in another process."""
+    reader = GazeFeedReader(name, start="oldest")
+    seqs = []
+    deadline = time.perf_counter() + 20
+    while len(seqs) < n and time.perf_counter() < deadline:
+        rows = reader.read()
+        seqs.extend(rows["seq"].astype(int).tolist())
+    queue.put((seqs, reader.dropped, reader.latency.summary()))
+    reader.close()
+
+
+class TestGazeFeed:
+    """Test the shared memory feed of the gaze data."""
+    @pytest.fixture(autouse=True)
+    def setup_feed(self):
+        self.feed = GazeFeed(capacity=8, fields=FIELDS3)
+        yield
+        self.feed.close()
+
+    def publish(self, n):
+        for i in range(n):
+            seq = self.feed.sequence
+            self.feed.publish((seq, seq * 2, time.perf_counter() * 1e6))
+
+    def test_read(self):
+        reader = GazeFeedReader(self.feed.name)
+        assert reader.fields == FIELDS3
+        assert reader.latest() is None
+        assert len(reader.read()) == 0
+        self.publish(5)
+        rows = reader.read()
+        assert rows["seq"].tolist() == [0, 1, 2, 3, 4]
+        assert rows["b"].tolist() == [0, 2, 4, 6, 8]
+        # a view into the shared memory
+        assert not rows.flags.owndata
+        assert reader.latest()["a"] == 4
+        assert reader.intact()
+        # wrapping around the end of the buffer
+        self.publish(6)
+        assert reader.read()["seq"].tolist() == [5, 6, 7]
+        assert reader.read(max_rows=2)["seq"].tolist() == [8, 9]
+        assert reader.read()["seq"].tolist() == [10]
+        assert reader.latency.summary()["n"] == 11
+        assert reader.dropped == 0
+        del rows
+        reader.close()
+
+    def test_overrun(self):
+        reader = GazeFeedReader(self.feed.name)
+        self.publish(3)
+        reader.read()
+        self.publish(8)
+        assert not reader.intact()
+        self.publish(4)
+        rows = reader.read()
+        # the 15 rows published, the last 8 are kept
+        assert rows["seq"].tolist() == [7]
+        assert reader.dropped == 4
+        assert reader.read()["seq"].tolist() == list(range(8, 15))
+        reader.close()
+        reader = GazeFeedReader(self.feed.name, start="oldest")
+        assert reader.read()["seq"][0] == 7
+        reader.close()
+        with pytest.raises(ValueError):
+            GazeFeedReader(self.feed.name, start="now")
+
+    def test_extend(self):
+        reader = GazeFeedReader(self.feed.name)
+        self.publish(3)
+        values = [(i, i * 2, 0.0) for i in range(3, 14)]
+        assert self.feed.extend(values) == 3
+        assert self.feed.extend([]) == 14
+        assert reader.sequence == 14
+        assert reader.get(5) is None
+        # the last 8 rows are kept
+        for seq in range(6, 14):
+            row = reader.get(seq)
+            assert (row["a"], row["b"]) == (seq, seq * 2)
+        reader.close()
+
+    def test_other_process(self):
+        feed = GazeFeed(capacity=4096)
+        n = 1200
+        queue = multiprocessing.Queue()
+        process = multiprocessing.Process(target=read_all,
+                                          args=(feed.name, n, queue))
+        process.start()
+        start = time.perf_counter()
+        for i in range(n):
+            # a simulated 1200 Hz eye tracker
+            delay = start + i / 1200.0 - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            values = np.zeros(len(FIELDS))
+            values[2] = time.perf_counter() * 1e6
+            feed.publish(values)
+        seqs, dropped, latency = queue.get(timeout=30)
+        process.join()
+        feed.close()
+        assert seqs == list(range(n))
+        assert dropped == 0
+        assert latency["n"] == n
+        assert latency["min"] >= 0
+
+    def test_controller(self, make_dummy_controller):
+        controller = make_dummy_controller()
+        name = controller.start_gaze_feed(capacity=16)
+        with pytest.raises(RuntimeWarning):
+            controller.start_gaze_feed()
+        reader = GazeFeedReader(name)
+        controller._publish_gaze_data(controller.gaze_feed, {
+            "system_time_stamp": 1000,
+            "device_time_stamp": 2000,
+            "left_gaze_point_validity": 1,
+            "right_gaze_point_validity": 0,
+            "left_gaze_point_on_display_area": (0.75, 0.25),
+            "right_gaze_point_on_display_area": (np.nan, np.nan),
+            "left_pupil_validity": 1,
+            "right_pupil_validity": 1,
+            "left_pupil_diameter": 3.0,
+            "right_pupil_diameter": 4.0,
+        })
+        row = reader.read()[0]
+        assert (row["x"], row["y"]) == (0.5, 0.5)
+        assert (row["left_x"], row["left_y"]) == (0.5, 0.5)
+        assert np.isnan(row["right_x"])
+        assert row["pupil"] == 3.5
+        assert row["system_time_stamp"] == 1000
+        del row
+        reader.close()
+        controller.recording = True
+        with pytest.raises(RuntimeWarning):
+            controller.stop_gaze_feed()
+        controller.recording = False
+        controller.stop_gaze_feed()
+        assert controller.gaze_feed is None
@@ -0,0 +1,77 @@
+import time
+
+import numpy as np
+
+from psychopy_tobii_infant.filters import (GazeFilterPipeline, MedianFilter,
+                                           MovingAverage, OneEuroFilter,
+                                           VelocityHold)
+
+
+class TestFilters:
+    """Test the streaming gaze filters."""
+    def setup_method(self):
+        rng = np.random.RandomState(0)
+        self.t = np.arange(200) / 100.0
+        self.x = 0.3 + rng.normal(0, 0.01, 200)
+        self.y = -0.2 + rng.normal(0, 0.01, 200)
+
+    def test_moving_average(self):
+        x, y = MovingAverage(3).process(self.t, self.x, self.y)
+        assert np.allclose(x[2:], np.convolve(self.x, np.ones(3) / 3,
+                                              "valid"))
+        assert x[0] == self.x[0]
+
+    def test_median(self):
+        x, y = MedianFilter(5).process(self.t, self.x, self.y)
+        assert x[10] == np.median(self.x[6:11])
+        assert y[10] == np.median(self.y[6:11])
+
+    def test_reduce_jitter(self):
+        for this_filter in (MovingAverage(10), MedianFilter(10),
+                            OneEuroFilter(), VelocityHold(5)):
+            x, y = this_filter.process(self.t, self.x, self.y)
+            assert np.std(x[20:]) < np.std(self.x[20:]) / 2
+            assert abs(np.mean(x[20:]) - 0.3) < 0.01
+
+    def test_batches(self):
+        whole = OneEuroFilter().process(self.t, self.x, self.y)
+        batched = OneEuroFilter()
+        parts = [
+            batched.process(self.t[i:i + 7], self.x[i:i + 7],
+                            self.y[i:i + 7]) for i in range(0, 200, 7)
+        ]
+        assert np.array_equal(whole[0], np.concatenate([p[0] for p in parts]))
+
+    def test_velocity_hold(self):
+        x = np.r_[np.full(10, 0.0), np.full(10, 1.0)]
+        out, _ = VelocityHold(5).process(self.t[:20], x, x)
+        assert np.all(out[:10] == 0.0)
+        assert np.all(out[10:] == 1.0)
+
+    def test_missing(self):
+        x = self.x.copy()
+        x[50] = np.nan
+        out, _ = GazeFilterPipeline(MedianFilter(3), MovingAverage(3)).process(
+            self.t, x, self.y)
+        assert np.isnan(out[50])
+        # the state was reset
+        assert out[51] == x[51]
+
+    def test_start_recording(self, make_controller):
+        controller = make_controller()
+        moving_average = MovingAverage(100)
+        controller.set_gaze_filter(moving_average)
+        try:
+            for i in range(2):
+                controller.start_recording()
+                # the samples of the previous recording are not filtered
+                assert controller._filter_index == 0
+                assert len(moving_average._window) == 0
+                assert np.isnan(controller._filtered_position[0])
+                time.sleep(0.2)
+                controller.get_current_gaze_position(filtered=True)
+                assert len(moving_average._window) == (
+                    controller._filter_index)
+                controller.stop_recording()
+        finally:
+            controller.close()
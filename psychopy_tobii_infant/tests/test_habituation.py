@@ -0,0 +1,147 @@
+import time
+
+import pytest
+
+from psychopy_tobii_infant.habituation import (HabituationCriterion,
+                                               HabituationRunner)
+
+
+class FakeWindow:
+    def __init__(self):
+        self.n_flips = 0
+
+    def flip(self):
+        self.n_flips += 1
+        time.sleep(0.001)
+
+
+class FakeController:
+    """Return scripted looking times and keep the events."""
+    def __init__(self, looks):
+        self.win = FakeWindow()
+        self.looks = list(looks)
+        self.events = []
+        self.calls = []
+
+    def record_event(self, event):
+        self.events.append(event)
+
+    def collect_lt(self, max_time, min_away, blink_dur=1):
+        self.calls.append((max_time, min_away, blink_dur))
+        time.sleep(0.02)
+        return self.looks.pop(0)
+
+
+class FakeStim:
+    def __init__(self, name):
+        self.name = name
+        self.history = []
+
+    def setAutoDraw(self, value):
+        self.history.append(value)
+
+
+class TestCriterion:
+    """Test the habituation criterion."""
+    def test_first_sliding(self):
+        criterion = HabituationCriterion(3, 0.5)
+        looks = [10, 10, 10, 8, 6, 5, 4, 3, 3]
+        results = [criterion.update(x) for x in looks]
+        assert criterion.baseline_sum == 30
+        # 5 + 4 + 3 < 15
+        assert results == [False] * 7 + [True, True]
+        assert criterion.window_sum == 10
+
+    def test_first_fixed(self):
+        criterion = HabituationCriterion(3, 0.5, mode="fixed")
+        looks = [10, 10, 10, 8, 6, 5, 4, 3, 3, 1]
+        tested = []
+        for x in looks:
+            habituated = criterion.update(x)
+            tested.append(criterion.tested)
+            if habituated:
+                break
+        # only the blocks 4-6 and 7-9 are tested
+        assert tested == [False] * 5 + [True, False, False, True]
+        assert len(criterion.looks) == 9
+
+    def test_max_baseline(self):
+        criterion = HabituationCriterion(2, 0.5, baseline="max")
+        looks = [4, 6, 10, 12, 8, 6, 5, 5]
+        results = [criterion.update(x) for x in looks]
+        # the peak (10 + 12) becomes the baseline once it does not overlap
+        assert criterion.baseline_sum == 22
+        assert results == [False] * 7 + [True]
+
+    def test_invalid(self):
+        with pytest.raises(ValueError):
+            HabituationCriterion(mode="moving")
+        with pytest.raises(ValueError):
+            HabituationCriterion(baseline="last")
+
+
+class TestRunner:
+    """Test the trial loop."""
+    def test_run(self):
+        controller = FakeController([10, 10, 10, 8, 6, 5, 4, 3, 3, 3])
+        loaded = []
+
+        def load(trial):
+            time.sleep(0.03)
+            loaded.append(trial)
+            return trial.upper()
+
+        stims = []
+
+        def show(trial, data):
+            assert data == trial.upper()
+            stims.append(FakeStim(data))
+            return stims[-1]
+
+        trials = ["stim{}".format(i) for i in range(10)]
+        runner = HabituationRunner(controller,
+                                   trials,
+                                   load=load,
+                                   show=show,
+                                   max_time=15,
+                                   min_away=2,
+                                   blink_dur=0.5,
+                                   iti=0.05)
+        assert runner.run()
+        assert len(runner.log) == 8
+        assert controller.calls == [(15, 2, 0.5)] * 8
+        # the next trial is loaded during the current one
+        assert loaded[:8] == trials[:8]
+        assert all(x["preloaded"] for x in runner.log[1:])
+        for x in runner.log[1:]:
+            assert x["iti"] == pytest.approx(0.05, abs=0.02)
+        assert [s.history for s in stims] == [[True, False]] * 8
+        assert runner.log[-1]["habituated"]
+        assert runner.log[-1]["baseline_sum"] == 30
+        starts = [e for e in controller.events if " start " in e]
+        ends = [e for e in controller.events if " end " in e]
+        assert len(starts) == len(ends) == 8
+        assert ends[-1].startswith("Habituation trial 8 end lt=3.000")
+        assert "habituated=True" in ends[-1]
+        # events must not contain tabs to be read back from the data file
+        assert not any("\t" in e for e in controller.events)
+
+    def test_max_trials(self):
+        controller = FakeController([10] * 5)
+        runner = HabituationRunner(controller, range(10), max_trials=5,
+                                   iti=0)
+        assert not runner.run()
+        assert len(runner.log) == 5
+
+    def test_slow_load(self):
+        controller = FakeController([10] * 3)
+
+        def load(trial):
+            time.sleep(0.1)
+            return trial
+
+        runner = HabituationRunner(controller, range(3), load=load, iti=0.01)
+        runner.run()
+        # loading took longer than the trial and the interval
+        assert not runner.log[1]["preloaded"]
+        assert runner.log[1]["iti"] > 0.05
@@ -0,0 +1,153 @@
+import numpy as np
+import pytest
+
+from psychopy_tobii_infant.heatmap import (HeatmapBuilder, histogram, render,
+                                           scanpath, smooth, split_trials,
+                                           window_extent)
+from psychopy_tobii_infant.reader import read_recording
+
+
+def write_trials(filename, trials, n_samples=100, seed=0):
+    """Write a session with a trial per (label, x, y) fixation."""
+    rng = np.random.default_rng(seed)
+    with open(filename, "w") as f:
+        f.write("Recording resolution:\t1280 x 720\n"
+                "PsychoPy units:\theight\nSession Start\n"
+                "TimeStamp\tGazePointX\tGazePointY\n")
+        events = []
+        t = 0.0
+        for label, x, y in trials:
+            events.append((t, "stim_onset " + label))
+            for i in range(n_samples):
+                if i % 10 == 0:
+                    f.write("{:.1f}\tnan\tnan\n".format(t))
+                else:
+                    f.write("{:.1f}\t{:.4f}\t{:.4f}\n".format(
+                        t, x + rng.normal(0, 0.01), y + rng.normal(0, 0.01)))
+                t += 10.0
+            events.append((t - 5.0, "stim_offset"))
+        for t, event in events:
+            f.write("{:.1f}\t{}\n".format(t, event))
+        f.write("Session End\n")
+
+
+class TestHeatmap:
+    """Test the offline heatmaps."""
+    @pytest.fixture(autouse=True)
+    def setup_tmp(self, tmp_path):
+        self.tmp_path = tmp_path
+        self.extent = (-1280 / 720 / 2, 1280 / 720 / 2, -0.5, 0.5)
+
+    def test_split_trials(self):
+        filename = str(self.tmp_path / "data.tsv")
+        write_trials(filename, [("a", 0, 0), ("b", 0.3, 0.2), ("a", 0, 0)])
+        recording = read_recording(filename)
+        assert window_extent(recording.info) == pytest.approx(self.extent)
+        session = recording.sessions[0]
+        assert split_trials(session, "stim_onset",
+                            "stim_offset") == [("stim_onset a", 0, 100),
+                                               ("stim_onset b", 100, 200),
+                                               ("stim_onset a", 200, 300)]
+        # without end events, a trial lasts until the next one
+        assert split_trials(session, "stim_offset") == [("stim_offset", 100,
+                                                         200),
+                                                        ("stim_offset", 200,
+                                                         300),
+                                                        ("stim_offset", 300,
+                                                         300)]
+
+    def test_histogram(self):
+        x = np.array([-0.8, 0.0, 0.1, np.nan, 0.85])
+        y = np.array([0.4, -0.1, -0.1, 0.0, -0.45])
+        counts = histogram(x, y, (4, 2), self.extent)
+        assert counts.sum() == 4
+        # the top row is first
+        assert counts[0, 0] == 1
+        assert counts[1, 3] == 1
+        assert counts[1, 2] == 2
+
+    def test_smooth(self):
+        image = np.zeros((21, 31))
+        image[10, 15] = 1.0
+        smoothed = smooth(image, 2.0)
+        assert smoothed.sum() == pytest.approx(1.0)
+        assert np.unravel_index(smoothed.argmax(), image.shape) == (10, 15)
+        assert np.allclose(smoothed, smoothed[::-1])
+        assert np.allclose(smoothed, smoothed[:, ::-1])
+        # separable: the outer product of the marginals
+        assert np.allclose(
+            smoothed, np.outer(smoothed.sum(axis=1), smoothed.sum(axis=0)))
+        assert (smooth(image, 0) == image).all()
+
+    def test_scanpath(self):
+        x = np.array([-0.8, np.nan, 0.8])
+        y = np.array([-0.1, -0.1, -0.1])
+        raster = scanpath(x, y, (16, 4), self.extent)
+        # a horizontal line through the valid samples
+        assert raster.sum() == 16
+        assert (raster[2] == 1).all()
+
+    @pytest.mark.parametrize("processes", [1, 2])
+    def test_builder(self, processes):
+        filenames = []
+        for i in range(3):
+            filenames.append(str(self.tmp_path / "data{}.tsv".format(i)))
+            write_trials(filenames[-1], [("left", -0.5, 0.2),
+                                         ("right", 0.5, -0.2)],
+                         seed=i)
+        cache_dir = str(self.tmp_path / "cache")
+        builder = HeatmapBuilder(bins=(32, 18),
+                                 sigma=1.0,
+                                 with_scanpath=True,
+                                 cache_dir=cache_dir,
+                                 processes=processes)
+        maps = builder.heatmaps(filenames, "stim_onset", "stim_offset")
+        assert set(maps) == {"stim_onset left", "stim_onset right"}
+        for heatmap in maps.values():
+            assert heatmap.shape == (18, 32)
+            assert heatmap.sum() == pytest.approx(1.0, abs=0.02)
+        # the peaks are at the fixations
+        left, right = maps["stim_onset left"], maps["stim_onset right"]
+        row, col = np.unravel_index(left.argmax(), (18, 32))
+        assert col < 16 and row < 9
+        row, col = np.unravel_index(right.argmax(), (18, 32))
+        assert col >= 16 and row >= 9
+
+        trial_maps = builder.trial_maps(filenames, "stim_onset",
+                                        "stim_offset")
+        assert [list(m["label"]) for m in trial_maps] == [[
+            "stim_onset left", "stim_onset right"
+        ]] * 3
+        assert (trial_maps[0]["histogram"].sum(axis=(1, 2)) == 90).all()
+        assert trial_maps[0]["scanpath"].shape == (2, 18, 32)
+
+        # regroup the cached histograms by file
+        def by_file(filename, session, label):
+            return filename if label.endswith("left") else None
+
+        grouped = builder.heatmaps(filenames,
+                                   "stim_onset",
+                                   "stim_offset",
+                                   key=by_file,
+                                   normalize=False)
+        assert set(grouped) == set(filenames)
+        assert grouped[filenames[0]].sum() == pytest.approx(90, rel=0.02)
+
+        image = render(left)
+        assert image.shape == (18, 32, 4)
+        assert image[..., 3].max() == 255
+
+    def test_cache(self):
+        filename = str(self.tmp_path / "data.tsv")
+        write_trials(filename, [("a", 0, 0)])
+        builder = HeatmapBuilder(cache_dir=str(self.tmp_path / "cache"),
+                                 processes=1)
+        first = builder.trial_maps([filename], "stim_onset")[0]
+        assert len(list((self.tmp_path / "cache").iterdir())) == 1
+        cached = builder.trial_maps([filename], "stim_onset")[0]
+        assert (first["histogram"] == cached["histogram"]).all()
+        # other parameters are cached separately
+        HeatmapBuilder(bins=(8, 8),
+                       cache_dir=str(self.tmp_path / "cache"),
+                       processes=1).trial_maps([filename], "stim_onset")
+        assert len(list((self.tmp_path / "cache").iterdir())) == 2
@@ -0,0 +1,46 @@
+import json
+import subprocess
+import sys
+
+HEAVY_MODULES = ("tobii_research", "tobii_research_addons", "psychopy", "PIL")
+# standard modules taking a large part of the import time, only needed by
+# the acquisition process and the parallel heatmaps
+SLOW_MODULES = ("multiprocessing", "concurrent")
+
+SCRIPT = """
+import json, sys
+import psychopy_tobii_infant
+from psychopy_tobii_infant import read_recording, OutputSchema, GazeFilter
+print(json.dumps(sorted(sys.modules)))
+"""
+
+
+def run_import():
+    output = subprocess.check_output([sys.executable, "-c", SCRIPT])
+    return json.loads(output.decode().splitlines()[-1])
+
+
+class TestImport:
+    """Test importing the package without the hardware dependencies."""
+    def test_no_heavy_modules(self):
+        imported = [
+            x for x in run_import() if x.split(".")[0] in HEAVY_MODULES
+        ]
+        assert imported == []
+
+    def test_no_slow_modules(self):
+        imported = [
+            x for x in run_import() if x.split(".")[0] in SLOW_MODULES
+        ]
+        assert imported == []
+
+    def test_lazy_module(self):
+        from psychopy_tobii_infant.lazy import (LazyModule, is_available,
+                                                lazy_function)
+        lazy = LazyModule("no_such_module", "json")
+        dumps = lazy_function(lazy, "dumps")
+        assert repr(lazy) == "<lazy module 'no_such_module'>"
+        assert dumps([1]) == "[1]"
+        assert lazy.loads is json.loads
+        assert is_available(lazy)
+        assert not is_available(LazyModule("no_such_module"))
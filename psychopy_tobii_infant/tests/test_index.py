@@ -0,0 +1,75 @@
+import os
+
+import pytest
+
+from psychopy_tobii_infant.index import SessionIndex, index_filename
+from psychopy_tobii_infant.output import DataFile
+from psychopy_tobii_infant.reader import (read_recording, read_session,
+                                          verify_recording)
+
+
+def write_indexed(filename, compression=None, n_sessions=5, n_samples=200):
+    """Write sessions and their index as TobiiController does."""
+    datafile = DataFile(filename, "w", compression)
+    index = SessionIndex(filename, compression)
+    datafile.write("Recording date:\t2021/09/01\nPsychoPy units:\tnorm\n")
+    datafile.commit()
+    for s in range(n_sessions):
+        datafile.flush(full=True)
+        offset = datafile.tell()
+        datafile.write("Session Start\nTimeStamp\tGazePointX\tSession\n")
+        datafile.commit()
+        for i in range(n_samples + s):
+            datafile.write("{:.1f}\t{:.4f}\t{}\n".format(i * 8.3, i / 1e3, s))
+        for i in range(s):
+            datafile.write("{:.1f}\tevent {}\n".format(i * 10.0, i))
+        datafile.write("Session End\n")
+        datafile.commit()
+        index.append(offset, datafile.tell(), n_samples + s, 0.0,
+                     round((n_samples + s - 1) * 8.3, 1), s)
+    datafile.close()
+    return index
+
+
+class TestIndex:
+    """Test reading sessions through the sidecar index."""
+    @pytest.fixture(autouse=True)
+    def setup_tmp(self, tmp_path):
+        self.filename = str(tmp_path / "data.tsv")
+
+    @pytest.mark.parametrize("compression", [None, "gzip", "zstd"])
+    def test_read_session(self, compression):
+        if compression == "zstd":
+            pytest.importorskip("zstandard")
+        write_indexed(self.filename, compression)
+        index = SessionIndex.load(self.filename)
+        assert len(index) == 5
+        assert index.compression == compression
+        for s in (3, 0, 4):
+            session = read_session(self.filename, s)
+            assert session.complete
+            assert len(session) == 200 + s
+            assert (session.column("Session") == s).all()
+            assert len(session.events) == s
+        assert verify_recording(self.filename) == []
+        # the index does not change the file
+        assert len(read_recording(self.filename).sessions) == 5
+
+    def test_truncated(self):
+        index = write_indexed(self.filename)
+        with open(self.filename, "r+b") as f:
+            f.truncate(index[3]["end"] - 10)
+        problems = verify_recording(self.filename)
+        assert any("truncated" in x for x in problems)
+        assert any(x.startswith("Session 3") for x in problems)
+        assert any(x.startswith("Session 4") for x in problems)
+        assert not any(x.startswith("Session 2") for x in problems)
+
+    def test_mismatch(self):
+        index = write_indexed(self.filename)
+        index.sessions[1]["n_events"] = 5
+        index.sessions[2]["last"] = 0.0
+        index.save()
+        problems = verify_recording(self.filename)
+        assert len(problems) == 2
+        assert os.path.exists(index_filename(self.filename))
@@ -0,0 +1,66 @@
+from psychopy_tobii_infant.latency import LatencyMonitor, StreamingHistogram
+
+
+class TestStreamingHistogram:
+    """Test the streaming histogram."""
+    def test_percentile(self):
+        hist = StreamingHistogram(bin_width=1, max_value=100)
+        for i in range(100):
+            hist.add(i + 0.5)
+        assert hist.percentile(50) == 50
+        assert hist.percentile(99) == 99
+        summary = hist.summary()
+        assert summary["n"] == 100
+        assert summary["mean"] == 50
+        assert summary["max"] == 99.5
+
+    def test_overflow(self):
+        hist = StreamingHistogram(bin_width=1, max_value=10)
+        hist.add(-1)
+        hist.add(1000)
+        assert hist.counts[0] == 1
+        assert hist.counts[-1] == 1
+        assert hist.percentile(100) == 1000
+
+
+class TestLatencyMonitor:
+    """Test the latency instrumentation."""
+    def setup_method(self):
+        self.now = 0
+        self.monitor = LatencyMonitor(lambda: self.now)
+
+    def test_latency(self):
+        for i in range(5):
+            sample = {
+                "device_time_stamp": i * 1000 - 50000,
+                "system_time_stamp": i * 1000,
+            }
+            self.monitor.on_sample(sample, i * 1000 + 2000)
+        self.now = 10000
+        self.monitor.consume(sample)
+        # consumed only once
+        self.now = 20000
+        self.monitor.consume(sample)
+
+        summary = self.monitor.summary()
+        assert summary["callback"]["n"] == 5
+        assert summary["callback"]["mean"] == 2
+        assert summary["consumption"]["n"] == 1
+        assert summary["consumption"]["mean"] == 4
+        assert summary["end_to_end"]["mean"] == 6
+        assert summary["device_offset"]["max"] == 0
+
+        records = self.monitor.to_array()
+        assert records.shape == (5, 4)
+        assert records[-1, 3] == 10000
+        assert "Latency callback (ms):" in self.monitor.format_header()
+
+    def test_reset(self):
+        self.monitor.on_sample(
+            {
+                "device_time_stamp": 0,
+                "system_time_stamp": 0
+            }, 100)
+        self.monitor.reset()
+        assert self.monitor.summary()["callback"]["n"] == 0
+        assert len(self.monitor.to_array()) == 0
@@ -0,0 +1,140 @@
+import numpy as np
+import pytest
+
+from psychopy_tobii_infant.looking import (LookingTimeScorer, invalid_runs,
+                                           score)
+from psychopy_tobii_infant.reader import read_recording
+
+
+def collect_lt(t, valid, start, max_time, min_away, blink_dur):
+    """The loop of TobiiController.collect_lt with a frame per sample."""
+    end = start + max_time
+    looking = True
+    absence = start
+    away_time = []
+    for ti, vi in zip(t, valid):
+        if ti < start or ti > end:
+            continue
+        if vi:
+            if not looking:
+                away_dur = ti - absence
+                if away_dur >= min_away:
+                    away_time.append(away_dur)
+                    return round(ti - start - np.sum(away_time), 3)
+                elif away_dur >= blink_dur:
+                    away_time.append(away_dur)
+            looking = True
+            absence = ti
+        else:
+            if ti - absence >= min_away:
+                away_time.append(ti - absence)
+                return round(ti - start - np.sum(away_time), 3)
+            looking = False
+    # the last frame of the trial
+    if not looking and end - absence >= min_away:
+        return round(absence - start - np.sum(away_time), 3)
+    return round(max_time - np.sum(away_time), 3)
+
+
+def random_validity(n, seed):
+    """Alternate runs of valid and invalid samples."""
+    rng = np.random.default_rng(seed)
+    valid = []
+    while len(valid) < n:
+        valid += [True] * rng.integers(1, 300)
+        valid += [False] * rng.geometric(0.02)
+    return np.array(valid[:n])
+
+
+class TestLooking:
+    """Test the offline looking time scorer."""
+    def test_invalid_runs(self):
+        t = np.arange(10) * 0.1
+        valid = np.array([0, 1, 1, 0, 0, 1, 1, 1, 0, 0], dtype=bool)
+        gap_start, gap_end = invalid_runs(t, valid, 0.0, 2.0)
+        assert gap_start == pytest.approx([0.0, 0.2, 0.7])
+        assert gap_end == pytest.approx([0.1, 0.5, np.inf])
+        # only the samples in the trial
+        gap_start, gap_end = invalid_runs(t, valid, 0.25, 0.75)
+        assert gap_start == pytest.approx([0.25])
+        assert gap_end == pytest.approx([0.5])
+
+    def test_rules(self):
+        t = np.arange(0, 20, 0.01)
+        valid = np.ones(len(t), dtype=bool)
+        assert score(t, valid, 1.0, 10, 2, 0.5) == 10
+        # a blink is tolerated, a longer absence is subtracted
+        valid[(t > 2) & (t < 2.3)] = False
+        valid[(t > 4) & (t < 5)] = False
+        assert score(t, valid, 1.0, 10, 2, 0.5) == pytest.approx(9.0,
+                                                                 abs=0.02)
+        # looking away for min_away stops the trial
+        valid[(t > 8) & (t < 12)] = False
+        assert score(t, valid, 1.0, 10, 2, 0.5) == pytest.approx(6.0,
+                                                                 abs=0.02)
+        # an absence still going on at max_time is not subtracted
+        assert score(t, valid, 1.0, 10, 5, 0.5) == pytest.approx(9.0,
+                                                                 abs=0.02)
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_grid(self, seed):
+        t = np.arange(6000) / 300 + np.random.default_rng(seed).uniform(
+            0, 1e-3, 6000)
+        valid = random_validity(6000, seed)
+        min_away = np.array([0.5, 1.0, 1.5, 2.0])
+        blink_dur = np.array([0.1, 0.25, 0.5])
+        scorer = LookingTimeScorer(t, valid)
+        for start in (0.0, 3.3, 7.0):
+            lt = scorer.grid(start, 10, min_away, blink_dur)
+            assert lt.shape == (4, 3)
+            for i, m in enumerate(min_away):
+                for j, b in enumerate(blink_dur):
+                    assert lt[i, j] == pytest.approx(
+                        collect_lt(t, valid, start, 10, m, b), abs=1e-9)
+
+    def test_gaze_data(self):
+        # delivered with jitter, sampled at exact device intervals
+        rng = np.random.default_rng(0)
+        n = 1200
+        device = 1000000 + np.arange(n) * 8333
+        system = 5000000 + np.arange(n) * 8333 + rng.integers(0, 3000, n)
+        valid = random_validity(n, 1)
+        gaze_data = [{
+            "device_time_stamp": int(device[i]),
+            "system_time_stamp": int(system[i]),
+            "left_gaze_point_validity": int(valid[i]),
+            "right_gaze_point_validity": 0
+        } for i in range(n)]
+        scorer = LookingTimeScorer.from_gaze_data(gaze_data)
+        assert np.diff(scorer.t) == pytest.approx(0.008333)
+        looking_times = [{
+            "start": 5100000,
+            "max_time": 5,
+            "min_away": 1,
+            "blink_dur": 0.2,
+            "lt": 3.0
+        }]
+        table = scorer.compare(looking_times)
+        assert table["start"][0] == pytest.approx(5.1)
+        assert table["offline"][0] == scorer.score(5.1, 5, 1, 0.2)
+        assert table["difference"][0] == pytest.approx(
+            table["offline"][0] - 3.0)
+
+    def test_session(self, tmp_path):
+        filename = str(tmp_path / "data.tsv")
+        valid = random_validity(1000, 2)
+        with open(filename, "w") as f:
+            f.write("Session Start\nTimeStamp\tValidityLeft\tValidityRight\t"
+                    "DeviceTimeStamp\n")
+            for i, v in enumerate(valid):
+                f.write("{:.1f}\t{}\t0\t{}\n".format(i * 10.0 + (i % 3),
+                                                    int(v),
+                                                    1000000 + i * 10000))
+            f.write("Session End\n")
+        session = read_recording(filename).sessions[0]
+        scorer = LookingTimeScorer.from_session(session)
+        assert scorer.t[0] == 0
+        assert np.diff(scorer.t) == pytest.approx(0.01)
+        assert scorer.valid.tolist() == valid.tolist()
+        lt = scorer.score(1.0, 5, [[1], [2]], [0.1, 0.3])
+        assert lt.shape == (2, 2)
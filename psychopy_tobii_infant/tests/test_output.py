@@ -0,0 +1,130 @@
+import os
+
+import numpy as np
+import pytest
+
+from psychopy_tobii_infant.output import DataFile, detect_compression
+from psychopy_tobii_infant.reader import read_recording
+from psychopy_tobii_infant.schema import OutputSchema
+
+COLUMNS = ["TimeStamp", "GazePointX", "GazePointY", "PupilSize"]
+
+
+def write_sessions(datafile, n_sessions=2, n_samples=100):
+    """Write data in the format of TobiiController."""
+    datafile.write("Recording date:\t2021/09/01\n")
+    datafile.write("PsychoPy units:\tnorm\n")
+    datafile.write("Validation time:\t10:00:00\n"
+                   "Mean accuracy (in degrees):\tleft=0.5\tright=0.6\n")
+    datafile.flush()
+    for s in range(n_sessions):
+        datafile.write("Session Start\n")
+        datafile.write("Latency callback (ms):\tn=10\tmean=1.5\n")
+        datafile.write("\t".join(COLUMNS) + "\n")
+        for i in range(n_samples):
+            datafile.write("{}\t{}\t{}\tnan\n".format(i * 8.3, s, i / 100))
+        datafile.write("0.0\tstart\n")
+        datafile.write("500.0\tend\ttrial 1\n")
+        datafile.write("Stream Start\texternal_signal\n"
+                       "TimeStamp\tValue\n1.0\t1\n2.0\t0\n"
+                       "Stream End\texternal_signal\n")
+        datafile.write("Session End\n")
+        datafile.flush()
+
+
+class TestOutput:
+    """Test writing and reading the data files."""
+    @pytest.fixture(autouse=True)
+    def setup_tmp(self, tmp_path):
+        self.tmp_path = tmp_path
+
+    def check(self, recording, n_sessions=2):
+        assert recording.info["PsychoPy units"] == "norm"
+        assert recording.validation[0]["Mean accuracy (in degrees)"] == (
+            "left=0.5\tright=0.6")
+        assert len(recording.sessions) == n_sessions
+        for s, session in enumerate(recording.sessions[:2]):
+            assert session.complete
+            assert session.columns == COLUMNS
+            assert session.data.shape == (100, 4)
+            assert np.all(session.column("GazePointX") == s)
+            assert np.isnan(session.column("PupilSize")).all()
+            assert session.events == [(0.0, "start"), (500.0, "end\ttrial 1")]
+            assert session.header["Latency callback (ms)"] == "n=10\tmean=1.5"
+            columns, data = session.streams["external_signal"]
+            assert columns == ["TimeStamp", "Value"]
+            assert np.array_equal(data, [[1.0, 1], [2.0, 0]])
+
+    @pytest.mark.parametrize("compression", [None, "gzip", "zstd"])
+    def test_roundtrip(self, compression):
+        if compression == "zstd":
+            pytest.importorskip("zstandard")
+        filename = str(self.tmp_path / "data.tsv")
+        datafile = DataFile(filename, "w", compression)
+        write_sessions(datafile)
+        datafile.close()
+        assert detect_compression(filename) == compression
+        self.check(read_recording(filename))
+
+    @pytest.mark.parametrize("compression", ["gzip", "zstd"])
+    def test_partial_file(self, compression):
+        if compression == "zstd":
+            pytest.importorskip("zstandard")
+        filename = str(self.tmp_path / "data.tsv")
+        datafile = DataFile(filename, "w", compression)
+        write_sessions(datafile)
+        # the file is not closed (e.g. the experiment crashed)
+        datafile.write("Session Start\n" + "\t".join(COLUMNS) + "\n")
+        datafile.write("1.0\t1\t1\t1\n" * 10)
+        datafile.flush()
+        datafile.write("2.0\t2\t2\t2\n" * 10)
+        datafile._push()
+        size = os.path.getsize(filename)
+        with open(filename, "rb") as f:
+            partial = f.read(size)
+        partial_name = str(self.tmp_path / "partial.tsv")
+        with open(partial_name, "wb") as f:
+            f.write(partial)
+        datafile.close()
+
+        recording = read_recording(partial_name)
+        self.check(recording, 3)
+        last = recording.sessions[-1]
+        assert not last.complete
+        assert len(last) >= 10
+
+    @pytest.mark.parametrize("complete", [True, False])
+    def test_events_like_rows(self, complete):
+        # with one column, every event has as many fields as the data
+        filename = str(self.tmp_path / "data.tsv")
+        datafile = DataFile(filename, "w")
+        datafile.write("Session Start\n")
+        datafile.write(OutputSchema(["GazePointX"]).header)
+        for i in range(5):
+            datafile.write("{}\t{}\n".format(i * 8.3, i / 10))
+        datafile.write("0.0\tstim\n"
+                       "8.3\ttrial\t1\n"
+                       "16.6\tend\n")
+        if complete:
+            datafile.write("Session End\n")
+        else:
+            datafile.write("24.9\tna")
+        datafile.close()
+
+        session = read_recording(filename).sessions[0]
+        assert session.complete == complete
+        assert session.data.shape == (5, 2)
+        assert np.allclose(session.column("GazePointX"),
+                           np.arange(5) / 10)
+        assert session.events == [(0.0, "stim"), (8.3, "trial\t1"),
+                                  (16.6, "end")]
+
+    def test_compression_ratio(self):
+        sizes = {}
+        for compression in (None, "gzip"):
+            filename = str(self.tmp_path / "data-{}.tsv".format(compression))
+            datafile = DataFile(filename, "w", compression)
+            write_sessions(datafile, 5, 2000)
+            datafile.close()
+            sizes[compression] = os.path.getsize(filename)
+        assert sizes["gzip"] < sizes[None] / 3
@@ -0,0 +1,94 @@
+import json
+import threading
+
+from psychopy_tobii_infant.profiling import (DISABLED, Profiler, _NULL_SPAN,
+                                             profiled)
+
+
+class Instrumented:
+    profiler = DISABLED
+
+    @profiled("work")
+    def work(self, x):
+        return x * 2
+
+
+class TestProfiler:
+    """Test the timing spans."""
+    def test_spans(self):
+        profiler = Profiler(capacity=100)
+        with profiler.span("outer"):
+            with profiler.span("inner"):
+                pass
+        spans = profiler.spans()
+        assert list(spans["name"]) == ["outer", "inner"]
+        assert (spans["duration"] >= 0).all()
+        assert spans["duration"][0] >= spans["duration"][1]
+        assert spans["start"][0] <= spans["start"][1]
+        summary = profiler.summary()
+        assert summary["outer"]["n"] == 1
+        profiler.reset()
+        assert len(profiler.spans()) == 0
+
+    def test_disabled(self):
+        assert DISABLED.span("x") is _NULL_SPAN
+        with DISABLED.span("x"):
+            pass
+        assert len(DISABLED.spans()) == 0
+        obj = Instrumented()
+        assert obj.work(2) == 4
+        obj.profiler = Profiler(capacity=10)
+        assert obj.work(3) == 6
+        assert list(obj.profiler.spans()["name"]) == ["work"]
+        assert Instrumented.work.__name__ == "work"
+
+    def test_capacity(self):
+        profiler = Profiler(capacity=5)
+        for i in range(8):
+            with profiler.span("x"):
+                pass
+        assert len(profiler.spans()) == 5
+        assert profiler.dropped == 3
+
+    def test_threads(self, tmp_path):
+        profiler = Profiler(capacity=10000)
+        # keep the threads alive, so their identifiers are not reused
+        barrier = threading.Barrier(5)
+
+        def run():
+            for i in range(1000):
+                with profiler.span("callback"):
+                    pass
+            barrier.wait()
+
+        threads = [
+            threading.Thread(target=run, name="sdk{}".format(i))
+            for i in range(4)
+        ]
+        for thread in threads:
+            thread.start()
+        for i in range(1000):
+            with profiler.span("frame"):
+                pass
+        barrier.wait()
+        for thread in threads:
+            thread.join()
+        spans = profiler.spans()
+        assert len(spans) == 5000
+        assert len(set(spans["thread"])) == 5
+        assert (spans["name"] == "frame").sum() == 1000
+
+        filename = str(tmp_path / "trace.json")
+        profiler.save(filename)
+        with open(filename) as f:
+            trace = json.load(f)
+        events = trace["traceEvents"]
+        names = {
+            e["args"]["name"]
+            for e in events if e["ph"] == "M" and e["name"] == "thread_name"
+        }
+        assert {"sdk0", "sdk3", "MainThread"} <= names
+        complete = [e for e in events if e["ph"] == "X"]
+        assert len(complete) == 5000
+        assert {"name", "pid", "tid", "ts", "dur"} <= set(complete[0])
+        assert trace["otherData"]["dropped"] == 0
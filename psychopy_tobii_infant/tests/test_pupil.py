@@ -0,0 +1,144 @@
+import numpy as np
+import pytest
+
+from psychopy_tobii_infant import TobiiController
+from psychopy_tobii_infant.buffer import SampleStore
+from psychopy_tobii_infant.pupil import PupilPipeline, combine_eyes
+
+
+class DummyController(TobiiController):
+    def __init__(self):
+        self._samples = SampleStore()
+        self.gaze_data = self._samples
+
+
+def make_session(n=6000, rate=600.0, seed=0):
+    """Pupil sizes with noise, blinks and artifacts."""
+    rng = np.random.default_rng(seed)
+    t = 100 + np.arange(n) / rate
+    size = 3.5 + 0.3 * np.sin(t) + rng.normal(0, 0.002, n)
+    left = size + 0.05
+    right = size - 0.05
+    lv = np.ones(n, dtype=int)
+    rv = np.ones(n, dtype=int)
+    for start in rng.integers(0, n - 200, 10):
+        lv[start:start + rng.integers(10, 150)] = 0
+        rv[start:start + rng.integers(10, 150)] = 0
+    spikes = rng.integers(0, n, 20)
+    left[spikes] += 1.0
+    left[lv == 0] = np.nan
+    right[rv == 0] = np.nan
+    return t, left, right, lv, rv
+
+
+def gaze_data(t, left, right, lv, rv):
+    return [{
+        "system_time_stamp": int(round(ti * 1e6)),
+        "left_pupil_diameter": li,
+        "right_pupil_diameter": ri,
+        "left_pupil_validity": lvi,
+        "right_pupil_validity": rvi,
+    } for ti, li, ri, lvi, rvi in zip(t, left, right, lv, rv)]
+
+
+class TestPupilPipeline:
+    """Test the preprocessing of the pupil size."""
+    def test_combine(self):
+        out = combine_eyes([3.0, 3.0, np.nan, 3.0], [4.0, 4.0, 4.0, 4.0],
+                           [1, 1, 1, 0], [1, 0, 1, 0])
+        assert out[:3].tolist() == [3.5, 3.0, 4.0]
+        assert np.isnan(out[3])
+
+    def test_steps(self):
+        dt = 1 / 128.0
+        t = np.arange(20) * dt
+        pupil = np.full(20, 3.0)
+        pupil[5:8] = np.nan
+        pupil[12] = 5.0
+        pipeline = PupilPipeline(max_speed=10, margin=1.5 * dt,
+                                 max_gap=2.5 * dt, window=1)
+        out = pipeline.process(t, pupil)
+        # the blink and the sample within the margin after it; both edges of
+        # the spike
+        expected = np.ones(20, dtype=bool)
+        expected[[5, 6, 7, 8, 12, 13, 14]] = False
+        assert out["valid"].tolist() == expected.tolist()
+        # the last accepted sample is held for max_gap
+        assert np.isnan(out["clean"][[7, 8, 14]]).all()
+        assert (out["clean"][[5, 6, 9, 12, 13]] == 3.0).all()
+        assert (out["trial"] == -1).all()
+        assert np.isnan(out["corrected"]).all()
+
+    def test_smoothing(self):
+        pipeline = PupilPipeline(window=3, max_speed=np.inf)
+        out = pipeline.process(np.arange(4) / 10.0, [1.0, 2.0, 3.0, 4.0])
+        assert out["smoothed"].tolist() == [1.0, 1.5, 2.0, 3.0]
+
+    def test_baseline(self):
+        t = np.arange(100) / 100.0
+        pupil = np.where(t < 0.5, 3.0, 4.0)
+        pipeline = PupilPipeline(max_speed=np.inf, window=1, baseline=0.2)
+        pipeline.start_trial(0.5)
+        out = pipeline.process(t, pupil)
+        assert (out["trial"][t < 0.5] == -1).all()
+        assert (out["trial"][t >= 0.5] == 0).all()
+        assert pipeline.baselines == [(0.5, 3.0)]
+        assert np.allclose(out["corrected"][t >= 0.5], 1.0)
+
+        pipeline = PupilPipeline(max_speed=np.inf, window=1, method="divide")
+        pipeline.start_trial(0.5)
+        out = pipeline.process(t, pupil)
+        assert np.allclose(out["corrected"][t >= 0.5], 4.0 / 3.0)
+        with pytest.raises(ValueError):
+            PupilPipeline(method="z-score")
+
+    @pytest.mark.parametrize("seed", [0, 1, 2])
+    def test_streaming_equals_batch(self, seed):
+        t, left, right, lv, rv = make_session(seed=seed)
+        onsets = [101.0, 103.2, 107.5]
+        batch = PupilPipeline()
+        for onset in onsets:
+            batch.start_trial(onset)
+        expected = batch.process(t, left, right, lv, rv)
+
+        stream = PupilPipeline()
+        rng = np.random.default_rng(seed)
+        bounds = np.sort(rng.choice(len(t), 300, replace=False))
+        outputs = []
+        pending = list(onsets)
+        for a, b in zip(np.concatenate(([0], bounds)),
+                        np.concatenate((bounds, [len(t)]))):
+            # trials are started during the recording, before the samples
+            # of their onsets arrive
+            while pending and pending[0] <= t[min(b, len(t) - 1)] + 0.01:
+                stream.start_trial(pending.pop(0))
+            outputs.append(stream.process(t[a:b], left[a:b], right[a:b],
+                                          lv[a:b], rv[a:b]))
+        result = np.concatenate(outputs)
+        for name in ("clean", "smoothed", "corrected"):
+            assert np.array_equal(result[name], expected[name],
+                                  equal_nan=True)
+        assert np.array_equal(result["trial"], expected["trial"])
+        assert stream.baselines == batch.baselines
+        assert expected["trial"].max() == 2
+        assert 0 < (~expected["valid"]).sum() < len(t) / 2
+
+    def test_controller(self):
+        t, left, right, lv, rv = make_session(n=1200)
+        samples = gaze_data(t, left, right, lv, rv)
+        controller = DummyController()
+        controller._samples.append(samples[0])
+        with pytest.raises(RuntimeWarning):
+            controller.get_current_pupil_size(corrected=True)
+        controller._samples.swap()
+        pipeline = controller.set_pupil_pipeline(PupilPipeline())
+        pipeline.start_trial(100.5)
+        values = []
+        for i in range(0, len(samples), 7):
+            for sample in samples[i:i + 7]:
+                controller._samples.append(sample)
+            values.append(controller.get_current_pupil_size(corrected=True))
+        offline = PupilPipeline().process_gaze_data(
+            controller.gaze_data, [onset for onset, _ in pipeline.baselines])
+        assert values[-1] == round(offline["corrected"][-1], 4)
+        assert offline["trial"][-1] == 0
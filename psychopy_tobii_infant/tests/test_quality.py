@@ -0,0 +1,106 @@
+import math
+import random
+import time
+
+from psychopy_tobii_infant.quality import DataQualityMonitor
+
+
+def make_sample(t, lv=1, rv=1, angle=0.0):
+    """A gaze sample looking at angle (in degrees) from 600 mm away."""
+    x = 600 * math.tan(math.radians(angle))
+    return {
+        "device_time_stamp": t,
+        "left_gaze_point_validity": lv,
+        "right_gaze_point_validity": rv,
+        "left_gaze_origin_in_user_coordinate_system": (0.0, 0.0, 600.0),
+        "left_gaze_point_in_user_coordinate_system": (x, 0.0, 0.0),
+        "right_gaze_origin_in_user_coordinate_system": (0.0, 0.0, 600.0),
+        "right_gaze_point_in_user_coordinate_system": (x, 0.0, 0.0),
+    }
+
+
+class TestDataQualityMonitor:
+    """Test the sliding-window data quality."""
+    def setup_method(self):
+        # 10 samples per window
+        self.monitor = DataQualityMonitor(window=0.1, sampling_rate=100)
+
+    def test_empty(self):
+        summary = self.monitor.summary()
+        assert summary["n_samples"] == 0
+        assert math.isnan(summary["valid_ratio_left"])
+
+    def test_valid_ratio(self):
+        for i in range(20):
+            self.monitor.update(make_sample(i * 10000, lv=i % 2, rv=1))
+        summary = self.monitor.summary()
+        assert summary["n_samples"] == 10
+        assert summary["valid_ratio_left"] == 0.5
+        assert summary["valid_ratio_right"] == 1.0
+
+    def test_precision(self):
+        for i in range(25):
+            self.monitor.update(make_sample(i * 10000, angle=0.1 * (i % 2)))
+        summary = self.monitor.summary()
+        assert round(summary["rms_s2s_left"], 6) == 0.1
+        assert round(summary["rms_s2s_right"], 6) == 0.1
+        # the left eye is lost
+        self.monitor.update(make_sample(25 * 10000, lv=0))
+        assert round(self.monitor.summary()["rms_s2s_left"], 6) == 0.1
+
+    def test_rounding(self):
+        rng = random.Random(2)
+        for i in range(30):
+            self.monitor.update(
+                make_sample(i * 10000, angle=rng.uniform(-30, 30)))
+        # the eyes stay still for more than a window
+        for i in range(30, 50):
+            self.monitor.update(make_sample(i * 10000, angle=1.0))
+        assert self.monitor.summary()["rms_s2s_left"] == 0.0
+
+    def test_jitter_and_dropped(self):
+        t = 0
+        self.monitor.update(make_sample(t))
+        for i in range(10):
+            t += 9000 if i % 2 else 11000
+            self.monitor.update(make_sample(t))
+        summary = self.monitor.summary()
+        assert round(summary["sampling_interval"], 6) == 10.0
+        assert round(summary["jitter"], 6) == 1.0
+        assert summary["dropped"] == 0
+
+        # three samples are missing
+        self.monitor.update(make_sample(t + 40000))
+        summary = self.monitor.summary()
+        assert summary["dropped"] == 3
+        assert summary["dropped_total"] == 3
+
+        # the gap leaves the window, but is still counted in total
+        for i in range(10):
+            self.monitor.update(make_sample(t + 40000 + (i + 1) * 10000))
+        summary = self.monitor.summary()
+        assert summary["dropped"] == 0
+        assert summary["dropped_total"] == 3
+
+    def test_reset(self):
+        for i in range(5):
+            self.monitor.update(make_sample(i * 50000))
+        self.monitor.reset()
+        summary = self.monitor.summary()
+        assert summary["n_samples"] == 0
+        assert summary["dropped_total"] == 0
+
+    def test_start_recording(self, make_controller):
+        controller = make_controller()
+        monitor = controller.start_quality_monitor(sampling_rate=60)
+        # samples of a previous recording
+        for i in range(5):
+            monitor.update(make_sample(i * 50000))
+        try:
+            controller.start_recording()
+            time.sleep(0.2)
+            controller.stop_recording()
+        finally:
+            controller.close()
+        # no gap between the recordings is counted as dropped samples
+        assert monitor.dropped_total == 0
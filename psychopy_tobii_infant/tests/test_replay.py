@@ -0,0 +1,116 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from psychopy_tobii_infant.discovery import EyeTrackerFinder
+from psychopy_tobii_infant.reader import read_recording
+from psychopy_tobii_infant.replay import (ReplayEyeTracker, load_raw,
+                                          save_raw, session_to_gaze_data)
+from psychopy_tobii_infant.schema import OutputSchema, extract
+from psychopy_tobii_infant.simulation import (EYETRACKER_GAZE_DATA,
+                                              SimulatedEyeTracker)
+
+
+def to_norm(p):
+    return (2 * p[0] - 1, -2 * p[1] + 1)
+
+
+class TestReplay:
+    """Test replaying recorded gaze data."""
+    @pytest.fixture(autouse=True)
+    def setup_tmp(self, tmp_path):
+        self.tmp_path = tmp_path
+        eyetracker = SimulatedEyeTracker(frequency=120, loss_rate=0.2, seed=0)
+        self.t0 = 5000000
+        # irregular intervals, as in real recordings
+        intervals = np.where(np.arange(240) % 7 == 0, 12000, 8333)
+        self.records = [
+            eyetracker._gaze_sample(i, self.t0 + int(t))
+            for i, t in enumerate(np.cumsum(intervals))
+        ]
+
+    def replay(self, eyetracker):
+        received = []
+        done = threading.Event()
+        eyetracker.subscribe_to(EYETRACKER_GAZE_DATA, received.append)
+        assert eyetracker.wait(10)
+        eyetracker.unsubscribe_from(EYETRACKER_GAZE_DATA)
+        done.set()
+        return received
+
+    def test_raw(self):
+        filename = str(self.tmp_path / "raw.npz")
+        save_raw(filename, self.records)
+        loaded = load_raw(filename)
+        assert len(loaded) == len(self.records)
+        for a, b in zip(loaded[::17], self.records[::17]):
+            assert a.keys() == b.keys()
+            for key in a:
+                assert np.allclose(a[key], b[key], equal_nan=True)
+
+    def test_fast(self):
+        eyetracker = ReplayEyeTracker(self.records, speed=None)
+        received = self.replay(eyetracker)
+        assert eyetracker.n_delivered == len(self.records)
+        assert [x["device_time_stamp"] for x in received
+                ] == [x["device_time_stamp"] for x in self.records]
+        original = np.diff([x["system_time_stamp"] for x in self.records])
+        replayed = np.diff([x["system_time_stamp"] for x in received])
+        assert (original == replayed).all()
+
+    def test_speed(self):
+        records = self.records[:60]
+        duration = (records[-1]["system_time_stamp"] -
+                    records[0]["system_time_stamp"]) / 1e6
+        eyetracker = ReplayEyeTracker(records, speed=4)
+        start = time.perf_counter()
+        received = self.replay(eyetracker)
+        elapsed = time.perf_counter() - start
+        assert len(received) == 60
+        assert duration / 4 * 0.9 < elapsed < duration / 4 + 0.5
+        replayed = np.diff([x["system_time_stamp"] for x in received])
+        original = np.diff([x["system_time_stamp"] for x in records])
+        assert np.allclose(replayed, original / 4, atol=1)
+
+    def test_data_file(self):
+        schema = OutputSchema()
+        values = extract(self.records, schema.fields, to_norm, self.t0)
+        filename = str(self.tmp_path / "data.tsv")
+        with open(filename, "w") as f:
+            f.write("Recording resolution:\t1280 x 720\n"
+                    "PsychoPy units:\tnorm\nSession Start\n")
+            f.write(schema.header + schema.format(values) + "Session End\n")
+
+        recording = read_recording(filename)
+        gaze_data = session_to_gaze_data(recording.sessions[0], recording.info)
+        assert len(gaze_data) == len(self.records)
+        for a, b in zip(gaze_data, self.records):
+            assert a["system_time_stamp"] == pytest.approx(
+                b["system_time_stamp"] - self.t0, abs=50)
+            for eye in ("left", "right"):
+                key = eye + "_gaze_point_validity"
+                assert a[key] == b[key]
+                if a[key]:
+                    assert np.allclose(a[eye + "_gaze_point_on_display_area"],
+                                       b[eye + "_gaze_point_on_display_area"],
+                                       atol=1e-4)
+
+        eyetracker = ReplayEyeTracker.from_file(filename, speed=None)
+        assert eyetracker.get_gaze_output_frequency() == pytest.approx(120,
+                                                                       rel=0.01)
+        finder = EyeTrackerFinder.from_eyetrackers(eyetracker)
+        assert finder.find("tobii-prp://replay") is eyetracker
+        assert finder.find(0) is eyetracker
+        assert len(self.replay(eyetracker)) == len(self.records)
+
+    def test_loop(self):
+        eyetracker = ReplayEyeTracker(self.records[:10], speed=None, loop=True)
+        received = []
+        eyetracker.subscribe_to(EYETRACKER_GAZE_DATA, received.append)
+        while len(received) < 30:
+            time.sleep(0.001)
+        eyetracker.unsubscribe_from(EYETRACKER_GAZE_DATA)
+        assert eyetracker.finished.is_set()
+        assert np.all(np.diff([x["system_time_stamp"] for x in received]) > 0)
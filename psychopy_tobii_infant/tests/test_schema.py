@@ -0,0 +1,111 @@
+import numpy as np
+
+from psychopy_tobii_infant import TobiiController
+from psychopy_tobii_infant.schema import Column, OutputSchema, extract
+from psychopy_tobii_infant.simulation import SimulatedEyeTracker
+
+
+def to_norm(p):
+    return (2 * p[0] - 1, -2 * p[1] + 1)
+
+
+class PixWindow:
+    units = "pix"
+    size = np.array([1280, 1024])
+
+
+class DummyController(TobiiController):
+    def __init__(self, t0):
+        self.win = PixWindow()
+        self.t0 = t0
+
+
+class TestSchema:
+    """Test formatting the gaze data with the output schema."""
+    def setup_method(self):
+        eyetracker = SimulatedEyeTracker(loss_rate=0.3, seed=0)
+        self.t0 = 1000000
+        self.records = [
+            eyetracker._gaze_sample(i, self.t0 + i * 16667)
+            for i in range(50)
+        ]
+
+    def parse(self, schema):
+        values = extract(self.records, schema.fields, to_norm, self.t0)
+        text = schema.format(values)
+        lines = text.splitlines()
+        assert len(lines) == len(self.records)
+        return [line.split("\t") for line in lines]
+
+    def test_default(self):
+        schema = OutputSchema()
+        assert schema.header.split("\t")[0] == "TimeStamp"
+        assert len(schema.header.split("\t")) == 14
+        rows = self.parse(schema)
+        for record, row in zip(self.records, rows):
+            assert len(row) == 14
+            assert float(row[0]) == round(
+                (record["system_time_stamp"] - self.t0) / 1000.0, 1)
+            lv = record["left_gaze_point_validity"]
+            rv = record["right_gaze_point_validity"]
+            assert row[3] == str(lv)
+            assert row[6] == str(rv)
+            lx = to_norm(record["left_gaze_point_on_display_area"])[0]
+            rx = to_norm(record["right_gaze_point_on_display_area"])[0]
+            if lv and rv:
+                assert float(row[7]) == round((lx + rx) / 2, 4)
+            elif lv:
+                assert float(row[7]) == round(lx, 4)
+            elif rv:
+                assert float(row[7]) == round(rx, 4)
+            else:
+                assert row[7] == "nan"
+
+    def test_custom(self):
+        schema = OutputSchema(
+            ["DeviceTimeStamp", ("GazePointX", 2), "GazeOriginZLeft",
+             Column("Pupil", "pupil", 1)],
+            time_unit="us")
+        assert schema.header == (
+            "TimeStamp\tDeviceTimeStamp\tGazePointX\tGazeOriginZLeft\tPupil\n")
+        rows = self.parse(schema)
+        for record, row in zip(self.records, rows):
+            assert int(row[0]) == record["system_time_stamp"] - self.t0
+            assert int(row[1]) == record["device_time_stamp"]
+            if record["left_gaze_origin_validity"]:
+                assert row[3] == "600.00"
+            if record["left_pupil_validity"]:
+                assert row[4] == "4.0"
+
+    def test_convert_time(self):
+        assert OutputSchema().convert_time(12345) == 12.3
+        assert OutputSchema(time_unit="us").convert_time(12345.0) == 12345
+
+    def test_unsupported(self):
+        for kwargs in ({"columns": ["Foo"]}, {"time_unit": "s"}):
+            try:
+                OutputSchema(**kwargs)
+            except ValueError:
+                pass
+            else:
+                raise AssertionError("ValueError not raised")
+
+    def test_pix(self):
+        # the positions of all samples are converted as arrays
+        controller = DummyController(self.t0)
+        text = controller._convert_tobii_records(self.records)
+        header = OutputSchema().header.split()
+        x = header.index("GazePointXLeft")
+        for record, line in zip(self.records, text.splitlines()):
+            row = line.split("\t")
+            if record["left_gaze_point_validity"]:
+                assert float(row[x]) == controller._get_psychopy_pos(
+                    record["left_gaze_point_on_display_area"])[0]
+            else:
+                assert row[x] == "nan"
+
+    def test_throughput(self):
+        values = extract(self.records * 200, OutputSchema().fields, to_norm,
+                         self.t0)
+        assert len(values["x"]) == 10000
+        assert np.isnan(values["x"]).any()
@@ -0,0 +1,73 @@
+import time
+
+import numpy as np
+
+from psychopy_tobii_infant import simulation
+from psychopy_tobii_infant.simulation import SimulatedEyeTracker
+from psychopy_tobii_infant.streams import StreamRecorder
+
+
+class TestStreams:
+    """Test recording the additional streams from a simulated eye tracker."""
+    def setup_method(self):
+        self.eyetracker = SimulatedEyeTracker(frequency=300,
+                                              signal_interval=0.02,
+                                              sync_interval=0.05,
+                                              seed=0)
+
+    def record(self, names, duration=0.2):
+        recorders = [StreamRecorder(name) for name in names]
+        for recorder in recorders:
+            self.eyetracker.subscribe_to(
+                getattr(simulation, recorder.subscription), recorder.callback)
+        time.sleep(duration)
+        for recorder in recorders:
+            self.eyetracker.unsubscribe_from(
+                getattr(simulation, recorder.subscription), recorder.callback)
+        return recorders
+
+    def test_record(self):
+        signal, sync, openness = self.record(
+            ["external_signal", "time_sync", "eye_openness"])
+        assert len(signal) >= 5
+        assert len(sync) >= 2
+        assert len(openness) >= 30
+        values = signal.buffer.column("value")
+        assert np.array_equal(values[:4], [0, 1, 0, 1])
+        assert signal.buffer.get(0, "change_type") == 1
+
+    def test_format(self):
+        signal, = self.record(["external_signal"], 0.05)
+        t0 = signal.buffer.get(0, "system_time_stamp") - 1000
+        lines = signal.format_rows(t0).splitlines()
+        assert lines[0] == "TimeStamp\tDeviceTimeStamp\tValue\tChangeType"
+        assert lines[1].split("\t")[0] == "1.0"
+        assert lines[1].split("\t")[2:] == ["0", "1"]
+        assert len(lines) == len(signal) + 1
+
+    def test_unsupported(self):
+        try:
+            StreamRecorder("eeg")
+        except ValueError:
+            pass
+        else:
+            raise AssertionError("ValueError not raised")
+
+
+class TestSimulatedEyeTracker:
+    """Test the simulated gaze data."""
+    def test_gaze_rate(self):
+        eyetracker = SimulatedEyeTracker(frequency=600, seed=0)
+        samples = []
+        eyetracker.subscribe_to(simulation.EYETRACKER_GAZE_DATA,
+                                samples.append)
+        time.sleep(0.25)
+        eyetracker.unsubscribe_from(simulation.EYETRACKER_GAZE_DATA,
+                                    samples.append)
+        n = len(samples)
+        assert 100 <= n <= 160
+        intervals = np.diff([x["system_time_stamp"] for x in samples])
+        assert np.all(np.abs(intervals - 1e6 / 600) <= 1)
+        # no more samples after unsubscribing
+        time.sleep(0.02)
+        assert len(samples) == n
@@ -0,0 +1,103 @@
+import numpy as np
+import pytest
+
+from psychopy_tobii_infant.buffer import SampleStore
+from psychopy_tobii_infant.index import SessionIndex
+from psychopy_tobii_infant.output import DataFile
+from psychopy_tobii_infant.reader import read_recording
+from psychopy_tobii_infant.trials import TrialIndex
+
+
+def append(store, times):
+    for t in times:
+        store.append({"system_time_stamp": t})
+
+
+class TestTrialIndex:
+    """Test the trial index built during recording."""
+    @pytest.fixture(autouse=True)
+    def setup_tmp(self, tmp_path):
+        self.filename = str(tmp_path / "data.tsv")
+        self.store = SampleStore()
+        self.trials = TrialIndex(self.store)
+
+    def test_live(self):
+        append(self.store, range(0, 100, 10))
+        trial = self.trials.start("face", 35, stimulus="face.png")
+        assert self.trials.current is trial
+        with pytest.raises(RuntimeWarning):
+            self.trials.start("car", 40)
+        # the samples which have arrived so far
+        assert [x["system_time_stamp"] for x in trial.samples] == [
+            40, 50, 60, 70, 80, 90
+        ]
+        append(self.store, range(100, 130, 10))
+        self.trials.end(125, lt=1.5)
+        # samples delivered after the end marker are included
+        assert len(trial.samples) == 9
+        assert trial.stop_index is None
+        append(self.store, [130])
+        assert trial.samples[-1]["system_time_stamp"] == 120
+        assert (trial.start_index, trial.stop_index) == (4, 13)
+        assert trial.metadata == {"stimulus": "face.png", "lt": 1.5}
+        with pytest.raises(RuntimeWarning):
+            self.trials.end(200)
+        with pytest.raises(ValueError):
+            self.trials.start("a\tb", 200)
+
+    def test_zero_copy(self):
+        append(self.store, range(10))
+        self.trials.start("a", 2)
+        self.trials.end(5)
+        samples = self.trials[0].samples
+        assert samples[0] is self.store[2]
+        # the view of the recording after the swap of stop_recording
+        self.trials.source = self.store.swap()
+        append(self.store, range(3))
+        assert [x["system_time_stamp"] for x in self.trials[0].samples] == [
+            2, 3, 4
+        ]
+
+    def test_persist(self):
+        append(self.store, range(0, 1000, 10))
+        for i, name in enumerate(["face", "car", "face"]):
+            self.trials.start(name, 100 + i * 300, number=i)
+            self.trials.end(300 + i * 300)
+        assert [t.number for t in self.trials.find("face")] == [0, 2]
+        datafile = DataFile(self.filename, "w")
+        index = SessionIndex(self.filename)
+        datafile.write("Recording date:\t2021/09/01\n")
+        datafile.flush(full=True)
+        offset = datafile.tell()
+        datafile.write("Session Start\nTimeStamp\tGazePointX\tGazePointY\n")
+        for x in self.store:
+            t = x["system_time_stamp"]
+            datafile.write("{:.1f}\t{:.4f}\t0.5\n".format(t, t / 1e3))
+        for trial in self.trials:
+            datafile.write("{:.1f}\tTrial start {}\n".format(
+                trial.start, trial.name))
+            datafile.write("{:.1f}\tTrial end {}\n".format(
+                trial.end, trial.name))
+        datafile.write("Session End\n")
+        datafile.commit()
+        index.append(offset, datafile.tell(), 100, 0, 990, 6,
+                     trials=self.trials.to_dicts(float))
+        datafile.close()
+
+        loaded = TrialIndex.load(self.filename)
+        assert len(loaded) == 3
+        trial = loaded[1]
+        assert (trial.name, trial.start, trial.end) == ("car", 400, 600)
+        assert trial.metadata == {"number": 1}
+        assert isinstance(trial.samples, np.ndarray)
+        assert trial.samples.base is not None
+        assert np.allclose(trial.samples[:, 1],
+                           np.arange(400, 600, 10) / 1000.0)
+
+        session = read_recording(self.filename).sessions[0]
+        recreated = TrialIndex.from_session(session)
+        assert [t.name for t in recreated] == ["face", "car", "face"]
+        for a, b in zip(recreated, loaded):
+            assert (a.start_index, a.stop_index) == (b.start_index,
+                                                      b.stop_index)
+            assert np.array_equal(a.samples, b.samples)
@@ -0,0 +1,115 @@
+import pickle
+
+import pytest
+
+from psychopy_tobii_infant.triggers import (DwellTrigger, GazeTriggerEngine,
+                                            PredicateTrigger, Region,
+                                            RegionTrigger)
+
+
+def make_sample(t, p=(0.5, 0.5), valid=1):
+    """A gaze sample at the time t (microseconds)."""
+    return {
+        "device_time_stamp": t,
+        "system_time_stamp": t,
+        "left_gaze_point_validity": valid,
+        "right_gaze_point_validity": valid,
+        "left_gaze_point_on_display_area": p,
+        "right_gaze_point_on_display_area": p,
+    }
+
+
+class TestTriggers:
+    """Test the gaze-contingent triggers."""
+    def setup_method(self):
+        self.now = 0
+        self.engine = GazeTriggerEngine(lambda: self.now)
+        self.region = Region((0.5, 0.5), (0.1, 0.1))
+
+    def feed(self, t, p=(0.5, 0.5), valid=1):
+        self.now = t + 500
+        self.engine.process(make_sample(t, p, valid))
+
+    def test_region(self):
+        fired = []
+        trigger = self.engine.add(
+            RegionTrigger(self.region, callback=fired.append, once=False))
+        self.feed(0, (0.1, 0.1))
+        assert not trigger.triggered
+        self.feed(1000)
+        assert trigger.triggered
+        assert trigger.latency == 0.5
+        assert fired == [trigger]
+        # staying inside does not fire again
+        self.feed(2000)
+        assert trigger.fire_count == 1
+        self.feed(3000, (0.1, 0.1))
+        self.feed(4000)
+        assert trigger.fire_count == 2
+
+    def test_ellipse(self):
+        region = Region((0.5, 0.5), (0.1, 0.1), shape="ellipse")
+        assert region.contains((0.55, 0.55))
+        assert not region.contains((0.59, 0.59))
+        assert self.region.contains((0.59, 0.59))
+
+    def test_region_errors(self):
+        with pytest.raises(ValueError):
+            Region((0.5, 0.5), (0.1, 0.1), shape="circle")
+        for half_size in ((0.0, 0.1), (0.1, 0.0), (0.1, float("nan"))):
+            with pytest.raises(ValueError):
+                Region((0.5, 0.5), half_size)
+
+    def test_dwell(self):
+        trigger = self.engine.add(
+            DwellTrigger(self.region, dwell=0.01, max_gap=0.002))
+        for t in range(0, 9000, 1000):
+            self.feed(t)
+        # short gap is tolerated
+        self.feed(9000, valid=0)
+        assert not trigger.triggered
+        self.feed(10000)
+        assert trigger.triggered
+        assert trigger.sample["device_time_stamp"] == 10000
+
+        # disarmed until reset
+        trigger.reset()
+        self.feed(11000, valid=0)
+        self.feed(15000, valid=0)
+        self.feed(16000)
+        self.feed(20000)
+        assert not trigger.triggered
+        self.feed(26000)
+        assert trigger.triggered
+
+    def test_predicate(self):
+        trigger = self.engine.add(
+            PredicateTrigger(lambda p, gaze_data: p is None))
+        self.feed(0)
+        assert not trigger.triggered
+        self.feed(1000, valid=0)
+        assert trigger.triggered
+
+    def test_remove(self):
+        trigger = self.engine.add(RegionTrigger(self.region))
+        self.engine.remove(trigger)
+        self.feed(0)
+        assert not trigger.triggered
+        assert self.engine.triggers == ()
+
+    def test_pickle(self):
+        fired = []
+        trigger = self.engine.add(
+            DwellTrigger(self.region, 0.1, callback=fired.append))
+        self.feed(0)
+        copy = pickle.loads(pickle.dumps(trigger))
+        assert copy.callback is None and not copy.triggered
+        # the state of the condition is copied
+        assert copy._start == 0 and copy.region.contains((0.5, 0.5))
+        copy._fire(make_sample(1000), 1500)
+        assert copy.triggered and copy.latency == 0.5
+        assert not trigger.triggered and not fired
+        resets = []
+        trigger._reset_hook = lambda: resets.append(True)
+        trigger.reset()
+        assert resets == [True]
@@ -0,0 +1,126 @@
+import numpy as np
+import pytest
+
+from psychopy_tobii_infant.units import UnitConverter
+
+
+class FakeMonitor:
+    def __init__(self, width=53.0, distance=65.0, size=(1920, 1080)):
+        self.name = "fake"
+        self.width = width
+        self.distance = distance
+        self.size = size
+        self.calls = 0
+
+    def getWidth(self):
+        self.calls += 1
+        return self.width
+
+    def getDistance(self):
+        return self.distance
+
+    def getSizePix(self):
+        return self.size
+
+
+class FakeWindow:
+    def __init__(self, monitor, units="deg"):
+        self.monitor = monitor
+        self.units = units
+        self.size = np.array(monitor.size)
+
+
+# psychopy.tools.monitorunittools
+def ref_pix2deg(pix, mon, correctFlat=False):
+    cm = pix * float(mon.getWidth()) / mon.getSizePix()[0]
+    if correctFlat:
+        return np.degrees(np.arctan(cm / mon.getDistance()))
+    return cm / (mon.getDistance() * 0.017455)
+
+
+def ref_deg2pix(degrees, mon, correctFlat=False):
+    dist = mon.getDistance()
+    if correctFlat:
+        rads = np.radians(degrees)
+        x, y = rads[..., 0], rads[..., 1]
+        cm = np.empty(rads.shape)
+        cm[..., 0] = np.hypot(dist, np.tan(y) * dist) * np.tan(x)
+        cm[..., 1] = np.hypot(dist, np.tan(x) * dist) * np.tan(y)
+    else:
+        cm = np.array(degrees) * dist * 0.017455
+    return cm * mon.getSizePix()[0] / float(mon.getWidth())
+
+
+class TestUnitConverter:
+    """Test the cached conversions of the monitor units."""
+    def setup_method(self):
+        self.mon = FakeMonitor()
+        self.win = FakeWindow(self.mon)
+        self.converter = UnitConverter(self.win)
+        rng = np.random.default_rng(0)
+        self.pix = rng.uniform(-960, 960, size=(1000, 2))
+        self.deg = rng.uniform(-35, 35, size=(1000, 2))
+
+    def test_from_pix(self):
+        x, y = self.pix.T
+        for units in ("degFlat", "degFlatPos"):
+            result = np.column_stack(self.converter.from_pix(x, y, units))
+            expected = ref_pix2deg(self.pix, self.mon, correctFlat=True)
+            assert np.abs(result - expected).max() < 1e-9
+        result = np.column_stack(self.converter.from_pix(x, y, "deg"))
+        assert np.allclose(result, ref_pix2deg(self.pix, self.mon))
+        result = np.column_stack(self.converter.from_pix(x, y, "cm"))
+        assert np.allclose(result, self.pix * 53.0 / 1920)
+        assert self.converter.from_pix(96, 0, "cm") == pytest.approx(
+            (2.65, 0))
+
+    def test_to_pix(self):
+        x, y = self.deg.T
+        result = np.column_stack(self.converter.to_pix(x, y, "degFlat"))
+        expected = ref_deg2pix(self.deg, self.mon, correctFlat=True)
+        assert np.abs(result - expected).max() < 1e-6
+        result = np.column_stack(self.converter.to_pix(x, y, "deg"))
+        assert np.allclose(result, ref_deg2pix(self.deg, self.mon))
+        cm = self.converter.from_pix(self.pix[:, 0], self.pix[:, 1], "cm")
+        assert np.allclose(np.column_stack(self.converter.to_pix(*cm, "cm")),
+                           self.pix)
+
+    def test_cache(self):
+        for i in range(10):
+            self.converter.from_pix(1.0, 1.0, "deg")
+        assert self.converter.computed == 1
+        self.mon.distance = 50.0
+        x, y = self.converter.from_pix(100.0, 0, "deg")
+        assert self.converter.computed == 2
+        assert x == pytest.approx(ref_pix2deg(100.0, self.mon))
+        self.win.monitor = FakeMonitor(width=30.0)
+        x, y = self.converter.from_pix(100.0, 0, "deg")
+        assert self.converter.computed == 3
+        assert x == pytest.approx(ref_pix2deg(100.0, self.win.monitor))
+
+    def test_errors(self):
+        self.mon.distance = None
+        with pytest.raises(ValueError):
+            self.converter.from_pix(1.0, 1.0, "deg")
+        self.mon.distance = 65.0
+        with pytest.raises(ValueError):
+            self.converter.to_pix(1.0, 1.0, "norm")
+
+    def test_controller(self, make_dummy_controller):
+        controller = make_dummy_controller(self.win)
+        for units in ("cm", "deg"):
+            p = controller._get_psychopy_pos((0.75, 0.25), units)
+            # rounded to whole pixels
+            assert controller._get_tobii_pos(p, units) == pytest.approx(
+                (0.75, 0.25), abs=1e-3)
+        # as in PsychoPy, pix2deg and deg2pix of degFlat are not inverses
+        p = controller._get_psychopy_pos((0.75, 0.25), "degFlat")
+        assert p == pytest.approx(
+            tuple(ref_pix2deg(np.array([480.0, 270.0]), self.mon, True)))
+        p = controller._get_tobii_pos((10.0, 5.0), "degFlat")
+        p_pix = np.round(ref_deg2pix(np.array([10.0, 5.0]), self.mon, True))
+        assert p == pytest.approx(
+            (p_pix[0] / 1920 + 0.5, -p_pix[1] / 1080 + 0.5))
+        assert controller._get_unit_converter().computed == 1
+        controller.win = FakeWindow(FakeMonitor())
+        assert controller._get_unit_converter().win is controller.win
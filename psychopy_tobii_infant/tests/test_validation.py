@@ -0,0 +1,119 @@
+import time
+
+import numpy as np
+import pytest
+
+from psychopy_tobii_infant.buffer import SampleStore
+from psychopy_tobii_infant.simulation import (EYETRACKER_GAZE_DATA,
+                                              SimulatedEyeTracker)
+from psychopy_tobii_infant.validation import (ValidationEngine,
+                                              ValidationPointResult,
+                                              adcs_to_ucs, angle_between)
+
+
+class TestValidation:
+    """Test the native validation metrics."""
+    def setup_method(self):
+        self.eyetracker = SimulatedEyeTracker(frequency=300,
+                                              noise=0.0,
+                                              seed=0)
+        self.area = self.eyetracker.get_display_area()
+
+    def make_samples(self, points, origin=(0.0, 150.0, 600.0)):
+        ucs = adcs_to_ucs(self.area, points)
+        return [{
+            eye + "_gaze_point_in_user_coordinate_system": tuple(p),
+            eye + "_gaze_origin_in_user_coordinate_system": origin,
+            eye + "_gaze_point_validity": int(np.isfinite(p).all()),
+            eye + "_gaze_origin_validity": 1,
+        } for p in ucs for eye in ("left", "right")]
+
+    def merge(self, samples):
+        # the left and right eyes of the same sample
+        return [dict(a, **b) for a, b in zip(samples[::2], samples[1::2])]
+
+    def test_angle_between(self):
+        a = np.array([[1.0, 0, 0], [1, 0, 0], [1, 0, 0]])
+        b = np.array([[0, 1.0, 0], [1, 1, 0], [-1, 0, 0]])
+        assert np.allclose(angle_between(a, b), [90, 45, 180])
+
+    def test_adcs_to_ucs(self):
+        ucs = adcs_to_ucs(self.area, [(0, 0), (1, 1), (0.5, 0.5)])
+        assert np.allclose(ucs[0], self.area.top_left)
+        assert np.allclose(ucs[1], self.area.bottom_right)
+        assert np.allclose(ucs[2], (0, 15 + 150, 0))
+
+    def test_metrics(self):
+        target = adcs_to_ucs(self.area, [(0.5, 0.5)])[0]
+        # the gaze alternates between two points around the target
+        points = [(0.55, 0.5), (0.45, 0.5)] * 10 + [(np.nan, np.nan)] * 5
+        samples = self.merge(self.make_samples(points))
+        result = ValidationPointResult((0.5, 0.5), samples, target)
+        # 0.05 of the width (530 mm) at 600 mm
+        offset = np.degrees(np.arctan(0.05 * 530 / np.hypot(600, 15)))
+        for eye in ("left", "right"):
+            assert result.data_loss[eye] == pytest.approx(0.2)
+            assert result.accuracy[eye] == pytest.approx(offset, rel=1e-3)
+            assert result.precision_std[eye] == pytest.approx(offset,
+                                                              rel=1e-3)
+            assert result.precision_rms[eye] == pytest.approx(2 * offset,
+                                                              rel=1e-3)
+
+    def test_no_data(self):
+        result = ValidationPointResult((0.5, 0.5), [], np.zeros(3))
+        assert result.data_loss["left"] == 1.0
+        assert np.isnan(result.accuracy["right"])
+
+    def test_engine(self):
+        engine = ValidationEngine(self.eyetracker, sample_count=10)
+        with pytest.raises(RuntimeWarning):
+            engine.start_collecting_data((0.5, 0.5))
+        engine.enter_validation_mode()
+        for point in ((0.25, 0.25), (0.75, 0.75)):
+            engine.start_collecting_data(point)
+            while engine.is_collecting_data:
+                time.sleep(0.005)
+        engine.leave_validation_mode()
+        result = engine.compute()
+        assert len(result.points) == 2
+        table = result.to_array()
+        assert (table["n_samples"] == 10).all()
+        assert np.allclose(table["data_loss_left"], 0)
+        # the simulated gaze circles around the screen center
+        assert result.average_accuracy_left > 0
+        assert np.isfinite(result.average_precision_std_right)
+        with pytest.raises(ValueError):
+            ValidationEngine(self.eyetracker, sample_count=5)
+        # the subscription is removed
+        assert self.eyetracker._subscriptions[EYETRACKER_GAZE_DATA] == []
+
+    def test_engine_buffer(self):
+        samples = SampleStore()
+        self.eyetracker.subscribe_to(EYETRACKER_GAZE_DATA, samples.append)
+        try:
+            engine = ValidationEngine(self.eyetracker,
+                                      sample_count=10,
+                                      timeout_ms=100,
+                                      samples=samples)
+            engine.enter_validation_mode()
+            # the samples are read from the buffer, without subscribing
+            assert len(
+                self.eyetracker._subscriptions[EYETRACKER_GAZE_DATA]) == 1
+            engine.start_collecting_data((0.5, 0.5))
+            while engine.is_collecting_data:
+                time.sleep(0.005)
+            start = len(samples)
+            # the second point times out before 10 samples
+            engine.start_collecting_data((0.25, 0.25))
+            self.eyetracker.unsubscribe_from(EYETRACKER_GAZE_DATA)
+            while engine.is_collecting_data:
+                time.sleep(0.005)
+            engine.leave_validation_mode()
+            result = engine.compute()
+        finally:
+            self.eyetracker.unsubscribe_from(EYETRACKER_GAZE_DATA)
+        first, second = result.points
+        assert len(first.samples) == 10
+        assert first.samples[-1] in samples
+        assert second.samples == list(samples[start:])
+        assert len(second.samples) < 10
@@ -0,0 +1,108 @@
+import time
+
+import numpy as np
+import pytest
+
+from psychopy_tobii_infant.video import FrameBuffer, to_texture
+
+
+def make_frames(n, fps=30, delay=0.0, decoded=None):
+    """Return a function generating n frames at fps."""
+    def open_frames():
+        for i in range(n):
+            if delay:
+                time.sleep(delay)
+            if decoded is not None:
+                decoded.append(i)
+            yield i / fps, np.full((4, 6, 3), i, dtype=np.uint8)
+
+    return open_frames
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.perf_counter() + timeout
+    while not condition():
+        assert time.perf_counter() < deadline
+        time.sleep(0.001)
+
+
+class TestFrameBuffer:
+    """Test the decode-ahead buffer of the video stimulus."""
+    def test_texture(self):
+        frame = np.zeros((2, 3, 3), dtype=np.uint8)
+        frame[0] = 255
+        texture = to_texture(frame)
+        assert texture.dtype == np.float32
+        # the first row is at the bottom
+        assert (texture[-1] == 1).all() and (texture[0] == -1).all()
+
+    def test_bounded(self):
+        decoded = []
+        buffer = FrameBuffer(make_frames(100, decoded=decoded), size=5)
+        buffer.start()
+        wait_for(lambda: buffer.buffered == 5)
+        time.sleep(0.05)
+        # one more frame is waiting to be put
+        assert len(decoded) <= 6
+        buffer.stop()
+
+    def test_display(self):
+        buffer = FrameBuffer(make_frames(30), size=4)
+        buffer.start()
+        wait_for(lambda: buffer.buffered == 4)
+        shown = []
+        # a display at 60 Hz shows each frame twice
+        for i in range(64):
+            frame = buffer.get(i / 60)
+            if frame is not None:
+                shown.append(int(frame[1][0, 0, 0]))
+            wait_for(lambda: buffer.buffered > 0 or buffer._done.is_set())
+        assert shown == list(range(30))
+        assert buffer.finished
+        stats = buffer.summary()
+        assert stats["shown"] == 30
+        assert stats["dropped"] == 0
+        assert stats["max_lag"] == pytest.approx(0, abs=1e-9)
+
+    def test_slow_display(self):
+        buffer = FrameBuffer(make_frames(30), size=30)
+        buffer.start()
+        wait_for(lambda: buffer._done.is_set())
+        # a display at 10 Hz skips two frames of every three
+        shown = [buffer.get(i / 10) for i in range(10)]
+        assert [int(x[1][0, 0, 0]) for x in shown] == list(range(0, 30, 3))
+        assert buffer.dropped == 18
+        assert max(buffer.lags) < 1 / 30
+
+    def test_slow_decoder(self):
+        buffer = FrameBuffer(make_frames(10, delay=0.02), size=4)
+        buffer.start()
+        start = time.perf_counter()
+        while not buffer.finished:
+            buffer.get(time.perf_counter() - start)
+            time.sleep(1 / 120)
+        stats = buffer.summary()
+        assert stats["underruns"] > 0
+        assert stats["shown"] + stats["dropped"] == 10
+        assert stats["max_lag"] > 0
+
+    def test_loop(self):
+        buffer = FrameBuffer(make_frames(3), size=2, loop=True)
+        buffer.start()
+        times = []
+        while len(times) < 10:
+            frame = buffer.get(times[-1] + 1.001 / 30 if times else 0.0)
+            if frame is not None:
+                times.append(frame[0])
+        buffer.stop()
+        assert np.diff(times) == pytest.approx(1 / 30)
+
+    def test_error(self):
+        def open_frames():
+            raise OSError("no such file")
+
+        buffer = FrameBuffer(open_frames)
+        buffer.start()
+        wait_for(lambda: buffer._done.is_set())
+        assert isinstance(buffer.error, OSError)
+        assert buffer.finished
@@ -0,0 +1,276 @@
+"""Index of the trials of a recording."""
+import numpy as np
+
+from .index import SessionIndex
+from .reader import read_session
+
+START_EVENT = "Trial start "
+END_EVENT = "Trial end "
+
+
+def _bisect(samples, t, lo, hi):
+    """The first sample of samples[lo:hi] at or after the system time t."""
+    while lo < hi:
+        mid = (lo + hi) // 2
+        if samples[mid]["system_time_stamp"] < t:
+            lo = mid + 1
+        else:
+            hi = mid
+    return lo
+
+
+class Trial:
+    """A trial of a recording.
+
+    Args:
+        index: the TrialIndex of the trial.
+        name: the name of the trial.
+        start, end: the times of the start and the end of the trial. end is
+            None while the trial is running.
+        metadata: dict of information of the trial. Default is None.
+        start_index, stop_index: the range of the samples of the trial, if
+            known. Default is None.
+
+    Attributes:
+        number: the position of the trial in the index.
+    """
+    def __init__(self,
+                 index,
+                 name,
+                 start,
+                 end=None,
+                 metadata=None,
+                 start_index=None,
+                 stop_index=None):
+        self.index = index
+        self.number = len(index)
+        self.name = name
+        self.start = start
+        self.end = end
+        self.metadata = dict(metadata or {})
+        self.start_index = start_index
+        self.stop_index = stop_index
+
+    def __repr__(self):
+        return "Trial({!r}, {}, {}, start={}, end={})".format(
+            self.name, self.number, self.metadata, self.start, self.end)
+
+    @property
+    def samples(self):
+        """The samples of the trial, without copying them.
+
+            During recording, the samples which have arrived so far. Rows
+            of Session.data (a numpy view) for a trial read from a file.
+        """
+        start, stop = self.index.resolve(self)
+        source = self.index.source
+        if isinstance(source, np.ndarray):
+            return source[start:stop]
+        return source.view(start, stop)
+
+
+class TrialIndex:
+    """The trials of a recording, delimited by start and end markers.
+
+        During recording, the trials are started and ended by
+        TobiiController.start_trial and end_trial (or the trial context),
+        which also record the events "Trial start <name>" and "Trial end
+        <name>". The samples of a trial are those with the system timestamp
+        in [start, end); the range is looked up by bisection when the
+        samples are requested, so samples delivered late by the eye tracker
+        are included. The index is saved in the session index of the data
+        file with the times converted as TimeStamp.
+
+    Args:
+        source: the samples, a SampleStore or SampleView during recording,
+            or Session.data offline.
+
+    Attributes:
+        trials: list of Trial objects.
+        current: the running trial, or None.
+    """
+    def __init__(self, source):
+        self.source = source
+        self.trials = []
+        self.current = None
+
+    def __len__(self):
+        return len(self.trials)
+
+    def __getitem__(self, idx):
+        return self.trials[idx]
+
+    def __iter__(self):
+        return iter(self.trials)
+
+    def find(self, name):
+        """Get the trials of a name.
+
+        Args:
+            name: the name of the trials.
+
+        Returns:
+            list of Trial objects.
+        """
+        return [trial for trial in self.trials if trial.name == name]
+
+    def start(self, name, t, **metadata):
+        """Start a trial.
+
+        Args:
+            name: the name of the trial.
+            t: the system timestamp of the start.
+            **metadata: information of the trial.
+
+        Returns:
+            Trial
+        """
+        if self.current is not None:
+            raise RuntimeWarning("Trial {} is not ended.".format(
+                self.current.name))
+        if "\t" in name or "\n" in name:
+            raise ValueError("The name of a trial must not contain tabs or "
+                             "line breaks.")
+        trial = Trial(self, name, t, metadata=metadata)
+        self.trials.append(trial)
+        self.current = trial
+        return trial
+
+    def end(self, t, **metadata):
+        """End the running trial.
+
+        Args:
+            t: the system timestamp of the end.
+            **metadata: information of the trial, added to that given at
+                the start.
+
+        Returns:
+            Trial
+        """
+        trial = self.current
+        if trial is None:
+            raise RuntimeWarning("No trial is running.")
+        trial.end = t
+        trial.metadata.update(metadata)
+        self.current = None
+        return trial
+
+    def resolve(self, trial):
+        """Find the range of the samples of a trial.
+
+            The range is kept once a sample after the end of the trial has
+            arrived.
+
+        Args:
+            trial: Trial object.
+
+        Returns:
+            (start_index, stop_index)
+        """
+        if trial.stop_index is not None:
+            return trial.start_index, trial.stop_index
+        samples = self.source.snapshot()
+        n = len(samples)
+        start = trial.start_index
+        if start is None:
+            start = _bisect(samples, trial.start, 0, n)
+            if start < n:
+                trial.start_index = start
+        if trial.end is None:
+            return start, n
+        stop = _bisect(samples, trial.end, start, n)
+        if stop < n:
+            trial.stop_index = stop
+        return start, stop
+
+    def to_dicts(self, convert_time=None):
+        """Get the trials as dicts, e.g. for the session index.
+
+        Args:
+            convert_time: function converting the system timestamps, e.g. to
+                the TimeStamp of the data file. Default is None.
+
+        Returns:
+            list of dicts with the keys name, start, end, start_index,
+            stop_index and metadata.
+        """
+        convert_time = convert_time or (lambda t: t)
+        result = []
+        for trial in self.trials:
+            start, stop = self.resolve(trial)
+            result.append({
+                "name": trial.name,
+                "start": convert_time(trial.start),
+                "end": None if trial.end is None else convert_time(trial.end),
+                "start_index": int(start),
+                "stop_index": int(stop),
+                "metadata": trial.metadata,
+            })
+        return result
+
+    @classmethod
+    def from_dicts(cls, dicts, source):
+        """Create an index from the result of to_dicts.
+
+        Args:
+            dicts: list of dicts.
+            source: the samples of the trials, e.g. Session.data.
+
+        Returns:
+            TrialIndex
+        """
+        index = cls(source)
+        for x in dicts:
+            index.trials.append(
+                Trial(index, x["name"], x["start"], x["end"], x["metadata"],
+                      x["start_index"], x["stop_index"]))
+        return index
+
+    @classmethod
+    def load(cls, filename, session=0, index=None):
+        """Read the trials of a session of a data file.
+
+            Only the session is read, using the session index.
+
+        Args:
+            filename: the name of the data file.
+            session: the number of the session, starting from 0. Default
+                is 0.
+            index: SessionIndex of the data file. If None, the index is
+                loaded from the sidecar file. Default is None.
+
+        Returns:
+            TrialIndex whose source is Session.data.
+        """
+        if index is None:
+            index = SessionIndex.load(filename)
+        data = read_session(filename, session, index).data
+        return cls.from_dicts(index[session].get("trials", []), data)
+
+    @classmethod
+    def from_session(cls, session):
+        """Recreate the trials of a session from its events.
+
+            Use this for data files without a session index; the metadata
+            of the trials are only saved in the index.
+
+        Args:
+            session: Session read from a data file.
+
+        Returns:
+            TrialIndex whose source is Session.data.
+        """
+        index = cls(session.data)
+        for time, event in session.events:
+            if event.startswith(START_EVENT):
+                if index.current is not None:
+                    index.end(time)
+                index.start(event[len(START_EVENT):], time)
+            elif event.startswith(END_EVENT) and index.current is not None:
+                index.end(time)
+        t = session.column("TimeStamp") if len(session) else np.empty(0)
+        for trial in index.trials:
+            trial.start_index = int(np.searchsorted(t, trial.start))
+            trial.stop_index = len(t) if trial.end is None else int(
+                np.searchsorted(t, trial.end))
+        return index
@@ -0,0 +1,307 @@
+"""Gaze-contingent triggers evaluated in the callback of the Tobii SDK."""
+import threading
+
+
+def _gaze_point(gaze_data):
+    """Get the average gaze point in Tobii ADCS.
+
+    Args:
+        gaze_data: gaze data provided by the eye tracker.
+
+    Returns:
+        The gaze position (x, y) in Tobii ADCS, or None if neither of the
+        eyes is detected.
+    """
+    lv = gaze_data["left_gaze_point_validity"]
+    rv = gaze_data["right_gaze_point_validity"]
+    if lv and rv:
+        lp = gaze_data["left_gaze_point_on_display_area"]
+        rp = gaze_data["right_gaze_point_on_display_area"]
+        return ((lp[0] + rp[0]) / 2.0, (lp[1] + rp[1]) / 2.0)
+    elif lv:
+        return gaze_data["left_gaze_point_on_display_area"]
+    elif rv:
+        return gaze_data["right_gaze_point_on_display_area"]
+    return None
+
+
+class Region:
+    """A rectangular or elliptical area in Tobii ADCS.
+
+    Args:
+        center: the center (x, y) of the region in Tobii ADCS.
+        half_size: half of the width and the height of the region in Tobii
+            ADCS.
+        shape: "rect" or "ellipse". Default is "rect".
+    """
+    def __init__(self, center, half_size, shape="rect"):
+        if shape not in ("rect", "ellipse"):
+            raise ValueError("shape ({}) is not supported.".format(shape))
+        self.cx, self.cy = center
+        self.hx, self.hy = (abs(x) for x in half_size)
+        if not (self.hx > 0 and self.hy > 0):
+            raise ValueError(
+                "The width and the height of the region must be positive.")
+        self.shape = shape
+
+    def contains(self, p):
+        """Whether the point p (x, y) in Tobii ADCS is inside the region."""
+        dx = (p[0] - self.cx) / self.hx
+        dy = (p[1] - self.cy) / self.hy
+        if self.shape == "rect":
+            return -1.0 <= dx <= 1.0 and -1.0 <= dy <= 1.0
+        return dx * dx + dy * dy <= 1.0
+
+
+class GazeTrigger:
+    """Base class of the gaze-contingent triggers.
+
+        The condition is evaluated for every sample in the callback of the
+        Tobii SDK, so it must be cheap. When the condition is met, the
+        trigger is fired: `triggered` is set and the callback (if any) is
+        called on the thread of the SDK.
+
+    Args:
+        callback: a function called with the trigger when fired. It runs on
+            the thread of the Tobii SDK and should return quickly. Default
+            is None.
+        once: whether to disarm the trigger after it is fired. Use reset() to
+            arm it again. Default is True.
+
+    Attributes:
+        fire_count: the number of times the trigger has been fired.
+        sample: the gaze sample which fired the trigger.
+        fire_time: the time the trigger was fired in the eye tracker's
+            system clock (microseconds).
+        latency: the time from the system timestamp of the sample to the
+            firing of the trigger in milliseconds.
+    """
+    # called by reset(), e.g. to arm the copy of the trigger evaluated in
+    # the acquisition process
+    _reset_hook = None
+
+    def __init__(self, callback=None, once=True):
+        self.callback = callback
+        self.once = once
+        self._event = threading.Event()
+        self.fire_count = 0
+        self.sample = None
+        self.fire_time = None
+        self.latency = None
+        self.armed = True
+
+    def __getstate__(self):
+        # the condition is copied, without the callback and the event
+        state = self.__dict__.copy()
+        for key in ("callback", "_event", "_reset_hook"):
+            state.pop(key, None)
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.callback = None
+        self._event = threading.Event()
+
+    @property
+    def triggered(self):
+        """Whether the trigger has been fired since the last reset."""
+        return self._event.is_set()
+
+    def wait(self, timeout=None):
+        """Block until the trigger is fired.
+
+        Args:
+            timeout: timeout in seconds. Default is None (wait forever).
+
+        Returns:
+            bool: whether the trigger has been fired.
+        """
+        return self._event.wait(timeout)
+
+    def reset(self):
+        """Clear the trigger and arm it again.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self._event.clear()
+        self.armed = True
+        if self._reset_hook is not None:
+            self._reset_hook()
+
+    def _fire(self, gaze_data, now):
+        self.sample = gaze_data
+        self.fire_time = now
+        self.latency = (now - gaze_data["system_time_stamp"]) / 1000.0
+        self.fire_count += 1
+        if self.once:
+            self.armed = False
+        self._event.set()
+        if self.callback is not None:
+            self.callback(self)
+
+    def evaluate(self, p, gaze_data):
+        """Whether the condition is met.
+
+        Args:
+            p: the average gaze point in Tobii ADCS, None if not detected.
+            gaze_data: gaze data provided by the eye tracker.
+
+        Returns:
+            bool
+        """
+        raise NotImplementedError
+
+
+class RegionTrigger(GazeTrigger):
+    """Fired when the gaze enters a region.
+
+    Args:
+        region: Region object.
+        callback: see GazeTrigger.
+        once: see GazeTrigger.
+    """
+    def __init__(self, region, callback=None, once=True):
+        super().__init__(callback, once)
+        self.region = region
+        self._inside = False
+
+    def evaluate(self, p, gaze_data):
+        inside = p is not None and self.region.contains(p)
+        entered = inside and not self._inside
+        self._inside = inside
+        return entered
+
+
+class DwellTrigger(GazeTrigger):
+    """Fired when the gaze stays in a region for a duration.
+
+    Args:
+        region: Region object.
+        dwell: the duration of dwelling in seconds.
+        max_gap: the tolerable duration of missing data in seconds. The
+            dwelling restarts if the gaze leaves the region or the data are
+            missing longer than max_gap. Default is 0.1.
+        callback: see GazeTrigger.
+        once: see GazeTrigger.
+    """
+    def __init__(self, region, dwell, max_gap=0.1, callback=None, once=True):
+        super().__init__(callback, once)
+        self.region = region
+        self.dwell = dwell
+        self.max_gap = max_gap
+        self._dwell_us = dwell * 1e6
+        self._max_gap_us = max_gap * 1e6
+        self._start = None
+        self._last_inside = None
+        self._done = False
+
+    def evaluate(self, p, gaze_data):
+        t = gaze_data["device_time_stamp"]
+        if p is None:
+            if (self._start is not None
+                    and t - self._last_inside > self._max_gap_us):
+                self._start = None
+                self._done = False
+            return False
+        if not self.region.contains(p):
+            self._start = None
+            self._done = False
+            return False
+
+        if self._start is None:
+            self._start = t
+        self._last_inside = t
+        if not self._done and t - self._start >= self._dwell_us:
+            # fire once per dwell
+            self._done = True
+            return True
+        return False
+
+
+class PredicateTrigger(GazeTrigger):
+    """Fired when a custom predicate returns True.
+
+    Args:
+        predicate: a function called with (p, gaze_data), where p is the
+            average gaze point in Tobii ADCS (None if not detected) and
+            gaze_data is the raw sample.
+        callback: see GazeTrigger.
+        once: see GazeTrigger.
+    """
+    def __init__(self, predicate, callback=None, once=True):
+        super().__init__(callback, once)
+        self.predicate = predicate
+
+    def evaluate(self, p, gaze_data):
+        return bool(self.predicate(p, gaze_data))
+
+
+class GazeTriggerEngine:
+    """Evaluate the registered triggers for every gaze sample.
+
+        The triggers are stored in a tuple which is replaced (not mutated)
+        when a trigger is added or removed, so the callback of the Tobii SDK
+        never waits for the main thread.
+
+    Args:
+        clock: a function returning the current time in the eye tracker's
+            system clock (microseconds).
+    """
+    def __init__(self, clock):
+        self.clock = clock
+        self.triggers = ()
+        self._lock = threading.Lock()
+
+    def add(self, trigger):
+        """Register a trigger.
+
+        Args:
+            trigger: GazeTrigger object.
+
+        Returns:
+            The trigger.
+        """
+        with self._lock:
+            self.triggers = self.triggers + (trigger, )
+        return trigger
+
+    def remove(self, trigger):
+        """Unregister a trigger.
+
+        Args:
+            trigger: GazeTrigger object.
+
+        Returns:
+            None
+        """
+        with self._lock:
+            self.triggers = tuple(x for x in self.triggers if x is not trigger)
+
+    def clear(self):
+        """Unregister all triggers."""
+        with self._lock:
+            self.triggers = ()
+
+    def process(self, gaze_data):
+        """Evaluate the triggers with a new sample.
+
+            Called by TobiiController._on_gaze_data.
+
+        Args:
+            gaze_data: gaze data provided by the eye tracker.
+
+        Returns:
+            None
+        """
+        triggers = self.triggers
+        if not triggers:
+            return
+        p = _gaze_point(gaze_data)
+        for trigger in triggers:
+            # evaluate even if disarmed to keep the state up to date
+            if trigger.evaluate(p, gaze_data) and trigger.armed:
+                trigger._fire(gaze_data, self.clock())
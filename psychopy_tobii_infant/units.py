@@ -0,0 +1,118 @@
+"""Conversions between pixels and the physical units of a monitor."""
+import numpy as np
+
+# PsychoPy's size of 1 deg at the centre of the screen, in units of distance
+_DEG_PER_CM_DIST = 0.017455
+
+
+class UnitConverter:
+    """Convert between pixels and cm, deg, degFlat and degFlatPos.
+
+        The results are those of PsychoPy's pix2cm, pix2deg, cm2pix and
+        deg2pix, but computed from coefficients of the monitor geometry
+        which are read once: PsychoPy reads the calibration of the monitor
+        at every call. The conversions are closed forms (a scale factor,
+        and arctan or tan for the flat-screen correction), so they are
+        exact rather than interpolated and work on arrays of any shape.
+        The coefficients are computed again when the monitor of the window
+        is replaced, or when its width, distance or size in pixels is
+        changed.
+
+    Args:
+        win: psychopy.visual.Window object.
+
+    Attributes:
+        computed: the number of times the coefficients were computed.
+    """
+    units = ("cm", "deg", "degFlat", "degFlatPos")
+
+    def __init__(self, win):
+        self.win = win
+        self.computed = 0
+        self._monitor = None
+        self._geometry = None
+        self._coefficients = None
+
+    def _geometry_of(self, monitor):
+        size = monitor.getSizePix()
+        return (monitor.getWidth(), monitor.getDistance(),
+                None if size is None else float(size[0]))
+
+    def coefficients(self):
+        """Get the coefficients of the current monitor geometry.
+
+        Args:
+            None
+
+        Returns:
+            tuple of the size of a pixel (cm) and the viewing distance (cm).
+        """
+        monitor = self.win.monitor
+        geometry = self._geometry_of(monitor)
+        if monitor is not self._monitor or geometry != self._geometry:
+            width, distance, size = geometry
+            name = getattr(monitor, "name", monitor)
+            if size is None:
+                raise ValueError("Monitor {} has no known size in pixels "
+                                 "(SEE MONITOR CENTER)".format(name))
+            if width is None:
+                raise ValueError("Monitor {} has no known width in cm "
+                                 "(SEE MONITOR CENTER)".format(name))
+            if distance is None:
+                raise ValueError("Monitor {} has no known distance "
+                                 "(SEE MONITOR CENTER)".format(name))
+            self._coefficients = (float(width) / size, float(distance))
+            self._monitor = monitor
+            self._geometry = geometry
+            self.computed += 1
+        return self._coefficients
+
+    def from_pix(self, x, y, units):
+        """Convert pixels to a unit of the monitor.
+
+        Args:
+            x, y: the coordinates in pixels (numbers or arrays).
+            units: "cm", "deg", "degFlat" or "degFlatPos".
+
+        Returns:
+            tuple (x, y) in the units.
+        """
+        cm_per_pix, distance = self.coefficients()
+        if units == "cm":
+            return (x * cm_per_pix, y * cm_per_pix)
+        elif units == "deg":
+            scale = cm_per_pix / (distance * _DEG_PER_CM_DIST)
+            return (x * scale, y * scale)
+        elif units in ("degFlat", "degFlatPos"):
+            scale = cm_per_pix / distance
+            return (np.degrees(np.arctan(np.multiply(x, scale))),
+                    np.degrees(np.arctan(np.multiply(y, scale))))
+        else:
+            raise ValueError("unit ({}) is not supported.".format(units))
+
+    def to_pix(self, x, y, units):
+        """Convert a unit of the monitor to pixels.
+
+        Args:
+            x, y: the coordinates in the units (numbers or arrays).
+            units: "cm", "deg", "degFlat" or "degFlatPos".
+
+        Returns:
+            tuple (x, y) in pixels.
+        """
+        cm_per_pix, distance = self.coefficients()
+        if units == "cm":
+            return (x / cm_per_pix, y / cm_per_pix)
+        elif units == "deg":
+            scale = distance * _DEG_PER_CM_DIST / cm_per_pix
+            return (x * scale, y * scale)
+        elif units in ("degFlat", "degFlatPos"):
+            # the position on a flat screen: each coordinate is lengthened
+            # by the distance to the screen along the other axis
+            tan_x = np.tan(np.radians(x))
+            tan_y = np.tan(np.radians(y))
+            scale = distance / cm_per_pix
+            return (scale * tan_x * np.sqrt(1 + tan_y**2),
+                    scale * tan_y * np.sqrt(1 + tan_x**2))
+        else:
+            raise ValueError("unit ({}) is not supported.".format(units))
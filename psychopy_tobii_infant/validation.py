@@ -0,0 +1,277 @@
+"""Validation of the calibration without tobii_research_addons."""
+import time
+
+import numpy as np
+
+from .buffer import SampleStore
+from .simulation import get_subscription
+
+EYES = ("left", "right")
+
+
+def _unit(v):
+    """Normalize an array of vectors of shape (n, 3)."""
+    return v / np.linalg.norm(v, axis=-1, keepdims=True)
+
+
+def angle_between(a, b):
+    """Angles between pairs of vectors.
+
+    Args:
+        a, b: arrays of shape (n, 3) (or broadcastable).
+
+    Returns:
+        numpy.ndarray of angles in degrees.
+    """
+    cross = np.linalg.norm(np.cross(a, b), axis=-1)
+    dot = np.sum(a * b, axis=-1)
+    return np.degrees(np.arctan2(cross, dot))
+
+
+def adcs_to_ucs(display_area, points):
+    """Convert points in Tobii ADCS to the user coordinate system.
+
+    Args:
+        display_area: the display area of the eye tracker, with top_left,
+            top_right and bottom_left in the user coordinate system (mm).
+        points: array of shape (n, 2) in Tobii ADCS.
+
+    Returns:
+        numpy.ndarray of shape (n, 3).
+    """
+    top_left = np.asarray(display_area.top_left, dtype=float)
+    right = np.asarray(display_area.top_right, dtype=float) - top_left
+    down = np.asarray(display_area.bottom_left, dtype=float) - top_left
+    points = np.atleast_2d(np.asarray(points, dtype=float))
+    return top_left + points[:, :1] * right + points[:, 1:2] * down
+
+
+class ValidationPointResult:
+    """Validation metrics of one point.
+
+        The metrics are dicts with the keys "left" and "right". Angles are
+        in degrees.
+
+    Attributes:
+        position: the position of the point in Tobii ADCS.
+        samples: list of the gaze data collected for the point.
+        accuracy: mean angle between the gaze and the point.
+        precision_rms: root mean square of the angles between successive
+            gaze samples.
+        precision_std: root mean square of the angles between the gaze
+            samples and their mean direction.
+        data_loss: the proportion of invalid samples.
+    """
+    def __init__(self, position, samples, target):
+        self.position = tuple(position)
+        self.samples = samples
+        self.accuracy = {}
+        self.precision_rms = {}
+        self.precision_std = {}
+        self.data_loss = {}
+        n = len(samples)
+        for eye in EYES:
+            if n == 0:
+                for metric in (self.accuracy, self.precision_rms,
+                               self.precision_std):
+                    metric[eye] = np.nan
+                self.data_loss[eye] = 1.0
+                continue
+            gaze = np.array(
+                [s[eye + "_gaze_point_in_user_coordinate_system"]
+                 for s in samples], dtype=float)
+            origin = np.array(
+                [s[eye + "_gaze_origin_in_user_coordinate_system"]
+                 for s in samples], dtype=float)
+            valid = np.array(
+                [s[eye + "_gaze_point_validity"] and
+                 s[eye + "_gaze_origin_validity"] for s in samples],
+                dtype=bool)
+            valid &= np.isfinite(gaze).all(axis=1)
+            valid &= np.isfinite(origin).all(axis=1)
+            self.data_loss[eye] = 1.0 - valid.mean()
+            direction = _unit(gaze[valid] - origin[valid])
+            if len(direction) == 0:
+                self.accuracy[eye] = np.nan
+            else:
+                self.accuracy[eye] = float(
+                    angle_between(direction, target - origin[valid]).mean())
+            if len(direction) < 2:
+                self.precision_rms[eye] = self.precision_std[eye] = np.nan
+                continue
+            s2s = angle_between(direction[1:], direction[:-1])
+            self.precision_rms[eye] = float(np.sqrt(np.mean(s2s**2)))
+            mean_direction = _unit(direction.mean(axis=0))
+            dispersion = angle_between(direction, mean_direction)
+            self.precision_std[eye] = float(np.sqrt(np.mean(dispersion**2)))
+
+
+class ValidationResult:
+    """The result of a validation.
+
+        The averages have the same names as the result of
+        tobii_research_addons, so both can be processed the same way.
+
+    Attributes:
+        points: list of ValidationPointResult.
+        average_accuracy_left, average_accuracy_right,
+        average_precision_rms_left, average_precision_rms_right,
+        average_precision_std_left, average_precision_std_right,
+        average_data_loss_left, average_data_loss_right: the means of the
+            points (ignoring points without valid data).
+    """
+    def __init__(self, points):
+        self.points = points
+        for metric in ("accuracy", "precision_rms", "precision_std",
+                       "data_loss"):
+            for eye in EYES:
+                values = np.array([getattr(p, metric)[eye] for p in points],
+                                  dtype=float)
+                average = (float(np.nanmean(values))
+                           if np.isfinite(values).any() else np.nan)
+                setattr(self, "average_{}_{}".format(metric, eye), average)
+
+    def to_array(self):
+        """Get the metrics of the points as a structured array.
+
+        Args:
+            None
+
+        Returns:
+            numpy.ndarray with the fields x, y, n_samples and
+            <metric>_<eye> for every metric and eye.
+        """
+        fields = [("x", float), ("y", float), ("n_samples", int)]
+        metrics = ("accuracy", "precision_rms", "precision_std", "data_loss")
+        fields += [("{}_{}".format(m, eye), float) for m in metrics
+                   for eye in EYES]
+        table = np.empty(len(self.points), dtype=fields)
+        for i, p in enumerate(self.points):
+            table[i] = ((p.position[0], p.position[1], len(p.samples)) +
+                        tuple(getattr(p, m)[eye] for m in metrics
+                              for eye in EYES))
+        return table
+
+
+class ValidationEngine:
+    """Collect the gaze data at validation points and compute the metrics.
+
+        A replacement of ScreenBasedCalibrationValidation of
+        tobii_research_addons with the same interface. The samples of a point
+        are read from a buffer of the gaze data (e.g. the SampleStore of the
+        controller): those appended from the time start_collecting_data() is
+        called until sample_count samples have arrived or the timeout
+        expires.
+
+    Args:
+        eyetracker: the eye tracker object.
+        sample_count: the number of samples to collect for each point.
+            Default is 30.
+        timeout_ms: the maximum duration of the collection for each point in
+            milliseconds. Default is 1000.
+        samples: the buffer the gaze data are appended to, with len() and
+            view(start, stop), e.g. TobiiController.gaze_data. If None, the
+            engine subscribes to the gaze data of the eye tracker in
+            validation mode and appends them to a SampleStore of its own.
+            Default is None.
+    """
+    def __init__(self,
+                 eyetracker,
+                 sample_count=30,
+                 timeout_ms=1000,
+                 samples=None):
+        if not 10 <= sample_count <= 3000:
+            raise ValueError("sample_count must be between 10 and 3000.")
+        if not 100 <= timeout_ms <= 3000:
+            raise ValueError("timeout_ms must be between 100 and 3000.")
+        self.eyetracker = eyetracker
+        self.sample_count = sample_count
+        self.timeout_ms = timeout_ms
+        self.subscribe = samples is None
+        self.samples = SampleStore() if samples is None else samples
+        self.in_validation_mode = False
+        # position and the range [start, stop) of the samples of each point;
+        # stop is None while the point is collected
+        self._points = []
+        self._deadline = 0.0
+
+    def enter_validation_mode(self):
+        """Start the validation."""
+        if self.in_validation_mode:
+            raise RuntimeWarning("Already in validation mode.")
+        self._points = []
+        if self.subscribe:
+            self.eyetracker.subscribe_to(
+                get_subscription("EYETRACKER_GAZE_DATA"),
+                self.samples.append,
+                as_dictionary=True)
+        self.in_validation_mode = True
+
+    def leave_validation_mode(self):
+        """Stop the validation."""
+        self._finish()
+        if self.subscribe:
+            self.eyetracker.unsubscribe_from(
+                get_subscription("EYETRACKER_GAZE_DATA"),
+                self.samples.append)
+        self.in_validation_mode = False
+
+    def start_collecting_data(self, point):
+        """Start collecting the gaze data for a point.
+
+        Args:
+            point: the position of the point in Tobii ADCS, a tuple (x, y) or
+                an object with x and y (e.g. tobii_research_addons.Point2).
+
+        Returns:
+            None
+        """
+        if not self.in_validation_mode:
+            raise RuntimeWarning("Not in validation mode.")
+        self._finish()
+        position = (point.x, point.y) if hasattr(point, "x") else point
+        self._points.append([tuple(position), len(self.samples), None])
+        self._deadline = time.perf_counter() + self.timeout_ms / 1000.0
+
+    def _finish(self, timeout=True):
+        """End the collection of the current point.
+
+        Args:
+            timeout: whether to end it before sample_count samples have
+                arrived. Default is True.
+
+        Returns:
+            True if the current point is (or was already) finished.
+        """
+        if not self._points or self._points[-1][2] is not None:
+            return True
+        point = self._points[-1]
+        n = len(self.samples)
+        if n - point[1] >= self.sample_count:
+            point[2] = point[1] + self.sample_count
+        elif timeout:
+            point[2] = n
+        return point[2] is not None
+
+    @property
+    def is_collecting_data(self):
+        return not self._finish(time.perf_counter() >= self._deadline)
+
+    def compute(self):
+        """Compute the metrics of the collected points.
+
+        Args:
+            None
+
+        Returns:
+            ValidationResult
+        """
+        self._finish()
+        display_area = self.eyetracker.get_display_area()
+        targets = adcs_to_ucs(display_area, [p for p, _, _ in self._points])
+        return ValidationResult([
+            ValidationPointResult(position,
+                                  list(self.samples.view(start, stop)),
+                                  target)
+            for (position, start, stop), target in zip(self._points, targets)
+        ])
@@ -0,0 +1,352 @@
+"""Video stimuli decoded ahead of the display in a background thread."""
+import queue
+import threading
+import time
+
+import numpy as np
+
+
+def moviepy_frames(filename):
+    """Decode the frames of a video file with moviepy (as MovieStim3).
+
+        The audio is not decoded.
+
+    Args:
+        filename: the name of the video file.
+
+    Yields:
+        (t, frame): the presentation time in seconds and the RGB frame as a
+        numpy.ndarray of shape (height, width, 3) and dtype uint8.
+    """
+    from moviepy.video.io.VideoFileClip import VideoFileClip
+
+    clip = VideoFileClip(filename, audio=False)
+    try:
+        for t, frame in clip.iter_frames(with_times=True, dtype="uint8"):
+            yield t, frame
+    finally:
+        clip.close()
+
+
+def to_texture(frame):
+    """Convert an RGB frame to the image of psychopy.visual.ImageStim.
+
+        PsychoPy takes float images in [-1, 1] with the first row at the
+        bottom.
+
+    Args:
+        frame: numpy.ndarray of shape (height, width, 3) and dtype uint8.
+
+    Returns:
+        numpy.ndarray of dtype float32.
+    """
+    texture = np.flipud(frame).astype(np.float32)
+    texture /= 127.5
+    texture -= 1.0
+    return texture
+
+
+class FrameBuffer:
+    """A bounded buffer of frames decoded ahead in a background thread.
+
+        The decoding thread blocks when the buffer is full, so at most
+        size frames are kept in memory. The display takes the frame due at
+        a given time; older frames which were not shown are dropped.
+
+    Args:
+        open_frames: function returning an iterable of (t, frame), t being
+            the presentation time in seconds.
+        size: the maximum number of decoded frames. Default is 8.
+        loop: whether to restart the video at the end. Default is False.
+        convert: function applied to every frame in the decoding thread.
+            Default is None.
+
+    Attributes:
+        shown: the number of frames returned by get().
+        dropped: the number of decoded frames that were never shown.
+        underruns: the number of calls to get() when the buffer was empty
+            but the video was not finished, i.e. decoding was behind.
+        lags: list of the delays (in seconds) between the presentation
+            time of the shown frames and the time they were due.
+    """
+    def __init__(self, open_frames, size=8, loop=False, convert=None):
+        self.open_frames = open_frames
+        self.size = size
+        self.loop = loop
+        self.convert = convert
+        self._queue = queue.Queue(maxsize=size)
+        self._stop = threading.Event()
+        self._done = threading.Event()
+        self._thread = None
+        self._next = None
+        self.error = None
+        self.reset_stats()
+
+    def reset_stats(self):
+        """Clear the statistics.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self.shown = 0
+        self.dropped = 0
+        self.underruns = 0
+        self.lags = []
+
+    def start(self):
+        """Start decoding.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self.stop()
+        self._stop.clear()
+        self._done.clear()
+        self._queue = queue.Queue(maxsize=self.size)
+        self._next = None
+        self.error = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop decoding and discard the buffered frames.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        if self._thread is None:
+            return
+        self._stop.set()
+        # unblock the decoding thread
+        while self._thread.is_alive():
+            try:
+                self._queue.get(timeout=0.01)
+            except queue.Empty:
+                pass
+        self._thread = None
+
+    def _put(self, item):
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.05)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def _run(self):
+        offset = 0.0
+        interval = 0.0
+        try:
+            while not self._stop.is_set():
+                last = None
+                for t, frame in self.open_frames():
+                    if self.convert is not None:
+                        frame = self.convert(frame)
+                    if not self._put((offset + t, frame)):
+                        return
+                    if last is not None:
+                        interval = t - last
+                    last = t
+                if last is None or not self.loop:
+                    break
+                # the next loop starts one frame after the last one
+                offset += last + interval
+        except Exception as e:
+            self.error = e
+        finally:
+            self._done.set()
+
+    @property
+    def buffered(self):
+        """The number of decoded frames waiting to be shown."""
+        return self._queue.qsize() + (self._next is not None)
+
+    @property
+    def finished(self):
+        """Whether all the frames were taken."""
+        return (self._done.is_set() and self._next is None
+                and self._queue.empty())
+
+    def get(self, t):
+        """Take the frame due at a time.
+
+        Args:
+            t: the time since the start of the video in seconds.
+
+        Returns:
+            (t, frame) of the latest frame due at t, or None if no new frame
+            is due (keep showing the previous one).
+        """
+        due = None
+        while True:
+            if self._next is None:
+                try:
+                    self._next = self._queue.get_nowait()
+                except queue.Empty:
+                    if due is None and not self._done.is_set():
+                        self.underruns += 1
+                    break
+            if self._next[0] > t:
+                break
+            if due is not None:
+                self.dropped += 1
+            due, self._next = self._next, None
+        if due is not None:
+            self.shown += 1
+            self.lags.append(t - due[0])
+        return due
+
+    def summary(self):
+        """Get the statistics of the display.
+
+        Args:
+            None
+
+        Returns:
+            dict with the keys shown, dropped, underruns, buffered,
+            mean_lag and max_lag (in seconds).
+        """
+        lags = np.array(self.lags) if self.lags else np.zeros(1)
+        return {
+            "shown": self.shown,
+            "dropped": self.dropped,
+            "underruns": self.underruns,
+            "buffered": self.buffered,
+            "mean_lag": float(lags.mean()),
+            "max_lag": float(lags.max()),
+        }
+
+
+class VideoStim:
+    """A video stimulus decoded ahead of the display.
+
+        A replacement of psychopy.visual.MovieStim3 for collect_lt: the
+        frames are decoded and converted to textures in a background thread,
+        so the flip loop only uploads the frame due at the next flip. Call
+        play() and draw it before every flip, e.g. with
+        collect_lt(..., stimuli=[video]), and check get_stats() after the
+        trial. The sound of the video is not played; use MovieStim3 for
+        videos with sound.
+
+    Args:
+        win: psychopy.visual.Window object.
+        filename: the name of the video file.
+        buffer_size: the maximum number of decoded frames. Default is 8.
+        loop: whether to restart the video at the end. Default is False.
+        open_frames: function returning an iterable of (t, frame) for the
+            video. Default is None (decode the file with moviepy).
+        **kwargs: other arguments to pass into psychopy.visual.ImageStim,
+            e.g. size, pos and units.
+    """
+    def __init__(self,
+                 win,
+                 filename,
+                 buffer_size=8,
+                 loop=False,
+                 open_frames=None,
+                 **kwargs):
+        from psychopy import visual
+
+        self.win = win
+        self.filename = filename
+        if open_frames is None:
+            def open_frames():
+                return moviepy_frames(filename)
+        self.buffer = FrameBuffer(open_frames, buffer_size, loop, to_texture)
+        kwargs.setdefault("name", filename)
+        self.stim = visual.ImageStim(win, image=None, autoLog=False, **kwargs)
+        self.playing = False
+        self._start = None
+        self._last_flip = None
+        self._has_frame = False
+
+    @property
+    def frame_period(self):
+        period = getattr(self.win, "monitorFramePeriod", None)
+        return period or 1 / 60.0
+
+    def play(self):
+        """Start decoding; the video starts at the next flip.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        if not self.playing:
+            self.buffer.start()
+            self.buffer.reset_stats()
+            self._start = None
+            self._last_flip = None
+            self.playing = True
+
+    def stop(self):
+        """Stop the video.
+
+        Args:
+            None
+
+        Returns:
+            None
+        """
+        self.buffer.stop()
+        self.playing = False
+
+    def _on_flip(self):
+        self._last_flip = time.perf_counter()
+        if self._start is None:
+            self._start = self._last_flip
+
+    def draw(self, win=None):
+        """Draw the frame due at the next flip.
+
+        Args:
+            win: not used; for compatibility with the stimuli of PsychoPy.
+
+        Returns:
+            None
+        """
+        if not self.playing:
+            return
+        if self.buffer.error is not None:
+            error, self.buffer.error = self.buffer.error, None
+            raise error
+        if self._start is None:
+            due = 0.0
+        else:
+            # the next flip is one refresh after the last one
+            due = self._last_flip + self.frame_period - self._start
+        frame = self.buffer.get(due)
+        if frame is not None:
+            # the only texture upload of the frame
+            self.stim.image = frame[1]
+            self._has_frame = True
+        if self._has_frame:
+            self.stim.draw()
+        self.win.callOnFlip(self._on_flip)
+
+    @property
+    def finished(self):
+        return self.buffer.finished
+
+    def get_stats(self):
+        """Get the statistics of the display since play().
+
+        Args:
+            None
+
+        Returns:
+            dict, see FrameBuffer.summary.
+        """
+        return self.buffer.summary()